@@ -34,6 +34,13 @@ def main() -> None:
     np.savetxt(save_path/'field_disp_y.csv',mesh_world.fields_disp[:,:,1], delimiter=',')
     np.savetxt(save_path/'field_disp_z.csv',mesh_world.fields_disp[:,:,2], delimiter=',')
 
+    # Binary copies for meshio.loadSimDataNpy, the field is stored with
+    # shape=(time,coord,field) so it can be memory mapped without reordering
+    np.save(save_path/'coords.npy',np.ascontiguousarray(mesh_world.coords[:,:3]))
+    np.save(save_path/'connectivity.npy',mesh_world.connectivity.astype(np.uint64))
+    np.save(save_path/'field_disp.npy',
+            np.ascontiguousarray(mesh_world.fields_disp.transpose(1,0,2)))
+
     num_frames = mesh_world.fields_disp.shape[1]
     for ff in range(num_frames):
         save_file = save_path / f"field_disp_frame{ff}.csv"
@@ -0,0 +1,234 @@
+const std = @import("std");
+const print = std.debug.print;
+const time = std.time;
+const Instant = time.Instant;
+
+const meshio = @import("zigraster/zig/meshio.zig");
+const Coords = meshio.Coords;
+const Connect = meshio.Connect;
+const Field = meshio.Field;
+const SimData = meshio.SimData;
+const MeshOrder = meshio.MeshOrder;
+const SpaceCurve = meshio.SpaceCurve;
+
+const Rotation = @import("zigraster/zig/rotation.zig").Rotation;
+const NDArray = @import("zigraster/zig/ndarray.zig").NDArray;
+
+const Camera = @import("zigraster/zig/camera.zig").Camera;
+const CameraOps = @import("zigraster/zig/camera.zig").CameraOps;
+
+const Raster = @import("zigraster/zig/raster.zig").Raster;
+const RasterOpts = @import("zigraster/zig/raster.zig").RasterOpts;
+
+// Times rastering the cylinder and scrambled synthetic plates in their
+// original numbering and renumbered along the morton and hilbert curves.
+// The mean node jump is the average |change in node index| between
+// consecutive node gathers in element order, a proxy for cache misses on the
+// coords and field.
+//
+// Usage: main_bench_renumber [plate_grid_n ...]
+pub fn main() !void {
+    const print_break = [_]u8{'-'} ** 80;
+    print("{s}\nZig Rasteriser: space filling curve renumbering\n{s}\n",
+          .{ print_break, print_break });
+
+    const page_alloc = std.heap.page_allocator;
+    const args = try std.process.argsAlloc(page_alloc);
+    defer std.process.argsFree(page_alloc, args);
+
+    var arena = std.heap.ArenaAllocator.init(page_alloc);
+    defer arena.deinit();
+    const arena_alloc = arena.allocator();
+
+    const path_data = "data/cylinder/";
+    const path_fields = [_][]const u8{
+        path_data ++ "field_disp_x.csv",
+        path_data ++ "field_disp_y.csv",
+        path_data ++ "field_disp_z.csv",
+    };
+    const cylinder = try meshio.load_sim_data(page_alloc,
+                                              path_data ++ "coords.csv",
+                                              path_data ++ "connectivity.csv",
+                                              path_fields[0..]);
+    try benchMesh(arena_alloc, "cylinder", &cylinder);
+
+    var grids_n: std.ArrayList(usize) = .empty;
+    for (args[1..]) |arg| {
+        try grids_n.append(arena_alloc, try std.fmt.parseInt(usize, arg, 10));
+    }
+    if (grids_n.items.len == 0) {
+        try grids_n.appendSlice(arena_alloc, &.{ 250, 1000 });
+    }
+    for (grids_n.items) |grid_n| {
+        const plate = try scrambledPlate(arena_alloc, grid_n);
+        var name_buff: [64]u8 = undefined;
+        const name = try std.fmt.bufPrint(&name_buff, "plate {d}x{d}",
+                                          .{ grid_n, grid_n });
+        try benchMesh(arena_alloc, name, &plate);
+    }
+}
+
+fn benchMesh(allocator: std.mem.Allocator,
+             name: []const u8,
+             sim_data: *const SimData) !void {
+
+    print("\n{s}: coords={d}, elements={d}, time steps={d}\n",
+          .{ name, sim_data.coords.len, sim_data.connect.elem_n,
+             sim_data.field.getTimeN() });
+
+    const pixel_num = [_]u32{ 960, 1280 };
+    const pixel_size = [_]f64{ 5.3e-3, 5.3e-3 };
+    const focal_leng: f64 = 50.0;
+    const cam_rot = Rotation.init(0.0,
+                                  std.math.degreesToRadians(-30.0),
+                                  std.math.degreesToRadians(-10.0));
+    const roi_pos = CameraOps.roi_cent_from_coords(&sim_data.coords);
+    const cam_pos = CameraOps.pos_fill_frame_from_rot(&sim_data.coords,
+                                                      pixel_num,
+                                                      pixel_size,
+                                                      focal_leng,
+                                                      cam_rot,
+                                                      1.1);
+    const camera = Camera.init(pixel_num, pixel_size, cam_pos, cam_rot,
+                               roi_pos, focal_leng, 2);
+
+    const frame_ind: usize = sim_data.field.getTimeN() - 1;
+    const num_fields: usize = sim_data.field.getFieldsN();
+    var images_dims = [_]usize{ num_fields, pixel_num[1], pixel_num[0] };
+    const image_len: usize = num_fields * pixel_num[1] * pixel_num[0];
+    const images_ref = try NDArray(f64).init(allocator,
+                                           try allocator.alloc(f64, image_len),
+                                           images_dims[0..]);
+    var images = try NDArray(f64).init(allocator,
+                                       try allocator.alloc(f64, image_len),
+                                       images_dims[0..]);
+
+    const opts = RasterOpts{ .threads_n = 1 };
+    const repeats_n: usize = 3;
+
+    const orders = [_]?SpaceCurve{ null, .morton, .hilbert };
+    for (orders) |curve| {
+        var sim_bench: SimData = sim_data.*;
+        var time_renumber: f64 = 0.0;
+        if (curve) |curve_kind| {
+            const time_start = try Instant.now();
+            const mesh_order = try MeshOrder.init(allocator,
+                                                  &sim_data.coords,
+                                                  &sim_data.connect,
+                                                  curve_kind);
+            sim_bench = try meshio.renumberSimData(allocator, sim_data,
+                                                   &mesh_order);
+            const time_end = try Instant.now();
+            time_renumber = @floatFromInt(time_end.since(time_start));
+        }
+
+        var time_best: f64 = std.math.inf(f64);
+        for (0..repeats_n) |_| {
+            const time_start = try Instant.now();
+            try Raster.rasterOneFrame(std.heap.page_allocator,
+                                      frame_ind,
+                                      &sim_bench.coords,
+                                      &sim_bench.connect,
+                                      &sim_bench.field,
+                                      &camera,
+                                      opts,
+                                      &images);
+            const time_end = try Instant.now();
+            time_best = @min(time_best,
+                             @as(f64, @floatFromInt(time_end.since(time_start))));
+        }
+
+        if (curve == null) {
+            @memcpy(images_ref.elems, images.elems);
+        }
+        var diff_max: f64 = 0.0;
+        for (images_ref.elems, images.elems) |val_ref, val| {
+            diff_max = @max(diff_max, @abs(val - val_ref));
+        }
+
+        print("  {s: <8} raster = {d:8.3}ms, renumber = {d:8.3}ms, " ++
+              "mean node jump = {d:10.1}, max|image diff| = {e:.2}\n",
+              .{ if (curve) |curve_kind| @tagName(curve_kind) else "original",
+                 time_best / time.ns_per_ms,
+                 time_renumber / time.ns_per_ms,
+                 meanNodeJump(&sim_bench.connect),
+                 diff_max });
+    }
+}
+
+fn meanNodeJump(connect: *const Connect) f64 {
+    var jump_sum: f64 = 0.0;
+    for (1..connect.table.len) |ii| {
+        const node_a: f64 = @floatFromInt(connect.table[ii - 1]);
+        const node_b: f64 = @floatFromInt(connect.table[ii]);
+        jump_sum += @abs(node_b - node_a);
+    }
+    return jump_sum / @as(f64, @floatFromInt(@max(1, connect.table.len - 1)));
+}
+
+// Gently curved triangulated plate with its nodes and elements shuffled, as
+// meshes from a mesher with no spatial ordering arrive. Three fields over
+// three time steps vary smoothly over the plate.
+fn scrambledPlate(allocator: std.mem.Allocator, grid_n: usize) !SimData {
+    const coord_n: usize = grid_n * grid_n;
+    const elem_n: usize = 2 * (grid_n - 1) * (grid_n - 1);
+    var prng = std.Random.DefaultPrng.init(grid_n);
+    const random = prng.random();
+
+    const node_shuffle = try allocator.alloc(usize, coord_n);
+    for (node_shuffle, 0..) |*nn, ii| nn.* = ii;
+    random.shuffle(usize, node_shuffle);
+
+    const grid_step: f64 = 1.0 / @as(f64, @floatFromInt(grid_n - 1));
+    var coords = try Coords.init(allocator, coord_n);
+    for (0..grid_n) |jj| {
+        for (0..grid_n) |ii| {
+            const nn: usize = node_shuffle[jj * grid_n + ii];
+            coords.x[nn] = grid_step * @as(f64, @floatFromInt(ii));
+            coords.y[nn] = grid_step * @as(f64, @floatFromInt(jj));
+            coords.z[nn] = 0.1 * @sin(3.0 * coords.x[nn]) * @cos(2.0 * coords.y[nn]);
+        }
+    }
+
+    const elem_shuffle = try allocator.alloc(usize, elem_n);
+    for (elem_shuffle, 0..) |*ee, ii| ee.* = ii;
+    random.shuffle(usize, elem_shuffle);
+
+    const table = try allocator.alloc(Connect.Index, 3 * elem_n);
+    var ee: usize = 0;
+    for (0..grid_n - 1) |jj| {
+        for (0..grid_n - 1) |ii| {
+            const n0: usize = jj * grid_n + ii;
+            const tris = [_]usize{ n0, n0 + 1, n0 + grid_n,
+                                   n0 + 1, n0 + grid_n + 1, n0 + grid_n };
+            for (0..2) |tt| {
+                const elem: usize = elem_shuffle[ee + tt];
+                for (0..3) |kk| {
+                    table[3 * elem + kk] = @intCast(node_shuffle[tris[3 * tt + kk]]);
+                }
+            }
+            ee += 2;
+        }
+    }
+
+    const time_n: usize = 3;
+    const fields_n: usize = 3;
+    const field = try Field.init(allocator, time_n, coord_n, fields_n);
+    const field_view = field.view3();
+    for (0..time_n) |tt| {
+        const time_f: f64 = @floatFromInt(tt + 1);
+        for (0..coord_n) |nn| {
+            for (0..fields_n) |ff| {
+                const ff_f: f64 = @floatFromInt(ff + 1);
+                field_view.setAt(.{ tt, nn, ff }, 
+                                 time_f * @sin(ff_f * coords.x[nn]) * coords.y[nn]);
+            }
+        }
+    }
+
+    return .{
+        .coords = coords,
+        .connect = .{ .nodes_per_elem = 3, .elem_n = elem_n, .table = table },
+        .field = field,
+    };
+}
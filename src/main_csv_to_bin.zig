@@ -0,0 +1,91 @@
+const std = @import("std");
+const print = std.debug.print;
+const time = std.time;
+const Instant = time.Instant;
+
+const meshio = @import("zigraster/zig/meshio.zig");
+
+// Converts the csv coords, connectivity and displacement fields in a data
+// directory to a single binary file that can be memory mapped with
+// meshio.loadSimDataBin and to coords.npy, connectivity.npy and 
+// field_disp.npy for meshio.loadSimDataNpy and numpy. 
+// Usage: main_csv_to_bin [data_dir] [out_file]
+pub fn main() !void {
+    const print_break = [_]u8{'-'} ** 80;
+    print("{s}\nZig Raster: CSV to Binary\n{s}\n", .{ print_break, print_break });
+
+    //==========================================================================
+    // MEMORY ALLOCATORS
+    const page_alloc = std.heap.page_allocator;
+
+    var sim_arena = std.heap.ArenaAllocator.init(page_alloc);
+    defer sim_arena.deinit();
+    const sim_alloc = sim_arena.allocator();
+
+    const args = try std.process.argsAlloc(sim_alloc);
+    const path_data: []const u8 = if (args.len > 1) args[1] else "data/block/";
+    const file_out: []const u8 = if (args.len > 2) args[2] else "sim_data.zbin";
+
+    //==========================================================================
+    // Load simulation data from csv
+    const path_coords = try std.fs.path.join(sim_alloc,
+        &.{ path_data, "coords.csv" });
+    const path_connect = try std.fs.path.join(sim_alloc,
+        &.{ path_data, "connectivity.csv" });
+
+    const path_fields = [_][]const u8{
+        try std.fs.path.join(sim_alloc, &.{ path_data, "field_disp_x.csv" }),
+        try std.fs.path.join(sim_alloc, &.{ path_data, "field_disp_y.csv" }),
+        try std.fs.path.join(sim_alloc, &.{ path_data, "field_disp_z.csv" }),
+    };
+
+    const sim_data = try meshio.load_sim_data(sim_alloc,
+                                              path_coords,
+                                              path_connect,
+                                              path_fields[0..]);
+
+    //==========================================================================
+    // Save binary next to the csv files
+    var data_dir = try std.fs.cwd().openDir(path_data, .{});
+    defer data_dir.close();
+
+    const time_start = try Instant.now();
+    try meshio.saveSimDataBin(&sim_data, data_dir, file_out);
+    const time_end = try Instant.now();
+    const time_save: f64 = @floatFromInt(time_end.since(time_start));
+
+    print("{s}\n", .{print_break});
+    print("Saved: {s}{s}\n", .{ path_data, file_out });
+    print("Save time = {d:.3}ms\n", .{time_save / time.ns_per_ms});
+
+    // Check the file maps back to the same data
+    var mapped = try meshio.loadSimDataBin(sim_alloc, data_dir, file_out);
+    defer mapped.deinit(sim_alloc);
+
+    if (!std.mem.eql(f64, sim_data.field.array.elems,
+                     mapped.sim_data.field.array.elems)) {
+        print("WARNING: binary field does not match csv field.\n", .{});
+    }
+
+    //==========================================================================
+    // Save numpy files next to the csv files
+    const time_npy_start = try Instant.now();
+    try meshio.saveSimDataNpy(sim_alloc, &sim_data, data_dir, 
+                              "coords.npy", "connectivity.npy", "field_disp.npy");
+    const time_npy_end = try Instant.now();
+    const time_save_npy: f64 = @floatFromInt(time_npy_end.since(time_npy_start));
+
+    print("{s}\n", .{print_break});
+    print("Saved: {s}coords.npy, connectivity.npy, field_disp.npy\n", .{path_data});
+    print("Save time = {d:.3}ms\n", .{time_save_npy / time.ns_per_ms});
+
+    var loaded_npy = try meshio.loadSimDataNpy(sim_alloc, data_dir, "coords.npy",
+                                               "connectivity.npy", "field_disp.npy");
+    defer loaded_npy.deinit();
+
+    if (!std.mem.eql(f64, sim_data.field.array.elems,
+                     loaded_npy.sim_data.field.array.elems)) {
+        print("WARNING: numpy field does not match csv field.\n", .{});
+    }
+    print("{s}\n", .{print_break});
+}
@@ -68,6 +68,16 @@ def main() -> None:
 
     zr.set_camera(cam_data)
 
+    time_start = time.perf_counter()
+    images = zr.render(render_mesh.coords,
+                       render_mesh.connectivity,
+                       render_mesh.fields_render,
+                       cam_data,
+                       threads_n=8)
+    time_end = time.perf_counter()
+    print(f"{images.shape=}")
+    print(f"Render time = {1000.0*(time_end-time_start):.3f}ms")
+
 
     # print()
     # print(80*"-")
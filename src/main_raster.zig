@@ -27,6 +27,7 @@ const Camera = @import("zigraster/zig/camera.zig").Camera;
 const CameraOps = @import("zigraster/zig/camera.zig").CameraOps;
 
 const Raster = @import("zigraster/zig/raster.zig").Raster;
+const RasterOpts = @import("zigraster/zig/raster.zig").RasterOpts;
 
 pub const SimData = struct {
     coords: Coords,
@@ -97,6 +98,14 @@ pub fn main() !void {
     const cam_rot = Rotation.init(alpha_z, beta_y, gamma_x);
     const fov_scale_factor: f64 = 1.1;
     const subsample: u8 = 2;
+
+    // Use all cores to raster screen tiles in parallel, threads_n = 1 gives
+    // the serial raster loop
+    const raster_opts = RasterOpts{
+        .threads_n = try std.Thread.getCpuCount(),
+        .tile_size = 64,
+        .verbose = true,
+    };
     
     print("{s}\n", .{print_break});
     const roi_pos = CameraOps.roi_cent_from_coords(&sim_data.coords);
@@ -156,6 +165,7 @@ pub fn main() !void {
                               &sim_data.connect, 
                               &sim_data.field, 
                               &camera, 
+                              raster_opts,
                               &images_arr);
                            
     time_end = try Instant.now();
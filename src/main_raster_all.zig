@@ -4,6 +4,7 @@ const time = std.time;
 const Instant = time.Instant;
 
 const meshio = @import("zigraster/zig/meshio.zig");
+const exodus = @import("zigraster/zig/exodus.zig");
 const Coords = meshio.Coords;
 const Connect = meshio.Connect;
 const Field = meshio.Field;
@@ -27,6 +28,10 @@ const Camera = @import("zigraster/zig/camera.zig").Camera;
 const CameraOps = @import("zigraster/zig/camera.zig").CameraOps;
 
 const Raster = @import("zigraster/zig/raster.zig").Raster;
+const RasterOpts = @import("zigraster/zig/raster.zig").RasterOpts;
+
+const framesink = @import("zigraster/zig/framesink.zig");
+const FrameSink = framesink.FrameSink;
 
 pub const SimData = struct {
     coords: Coords,
@@ -34,10 +39,27 @@ pub const SimData = struct {
     field: Field,
 };
 
+// Output written to raster-out, the first command line argument
+const SinkKind = enum {
+    csv,    // all frames in memory plus one csv per field and frame
+    npy,    // single raster_all.npy stack, shape=(time,field,px_y,px_x)
+    raw,    // as npy without the header
+    mmap,   // raw stack in a memory map, appended to on every run
+    tiff,   // one 16 bit tiff per field and frame
+    none,   // no output, times rastering alone
+};
+
+// Usage: main_raster_all [csv|npy|raw|mmap|tiff|none] [exodus_file]
 pub fn main() !void {
     const print_break = [_]u8{'-'} ** 80;
     print("{s}\nZig Rasteriser\n{s}\n", .{ print_break, print_break });
 
+    const args = try std.process.argsAlloc(std.heap.page_allocator);
+    defer std.process.argsFree(std.heap.page_allocator, args);
+    const sink_kind: SinkKind = if (args.len > 1) 
+        std.meta.stringToEnum(SinkKind, args[1]) orelse return error.UnknownSink
+        else .csv;
+
     var time_start = try Instant.now();
     var time_end = try Instant.now();
 
@@ -58,10 +80,38 @@ pub fn main() !void {
         path_data ++ "field_disp_z.csv",
     };
 
-    const sim_data = try meshio.load_sim_data(page_alloc,
-                                              path_coords,
-                                              path_connect,
-                                              path_fields[0..]);
+    // An exodus file given as the second argument is skinned and read 
+    // directly. Otherwise the numpy files written by main_csv_to_bin are used
+    // if they exist as they load much faster than the csv files.
+    var data_dir = try std.fs.cwd().openDir(path_data, .{});
+    defer data_dir.close();
+    const path_exodus: ?[]const u8 = if (args.len > 2) args[2] else null;
+    const npy_exists = if (data_dir.access("field_disp.npy", .{})) true 
+                       else |_| false;
+
+    var sim_exodus: exodus.SimDataExodus = undefined;
+    var sim_npy: meshio.SimDataNpy = undefined;
+    if (path_exodus) |path| {
+        sim_exodus = try exodus.loadSimDataExodus(page_alloc, 
+                                                  std.fs.cwd(), 
+                                                  path, 
+                                                  .{});
+    } else if (npy_exists) {
+        sim_npy = try meshio.loadSimDataNpy(page_alloc, 
+                                            data_dir, 
+                                            "coords.npy", 
+                                            "connectivity.npy", 
+                                            "field_disp.npy");
+    }
+    defer if (path_exodus != null) sim_exodus.deinit() 
+          else if (npy_exists) sim_npy.deinit();
+
+    const sim_data = if (path_exodus != null) sim_exodus.sim_data 
+        else if (npy_exists) sim_npy.sim_data 
+        else try meshio.load_sim_data(page_alloc,
+                                      path_coords,
+                                      path_connect,
+                                      path_fields[0..]);
 
     //--------------------------------------------------------------------------
     // CHECK FIELD LOADED CORRECTLY
@@ -93,6 +143,16 @@ pub fn main() !void {
     const cam_rot = Rotation.init(alpha_z, beta_y, gamma_x);
     const fov_scale_factor: f64 = 1.1;
     const subsample: u8 = 2;
+
+    // Use all cores to raster whole frames in parallel, each frame is then
+    // rastered serially by its worker. frame_threads_n = 1 rasters the frames
+    // one at a time using threads_n to raster screen tiles in parallel.
+    const raster_opts = RasterOpts{
+        .threads_n = 1,
+        .tile_size = 64,
+        .frame_threads_n = try std.Thread.getCpuCount(),
+        .verbose = true,
+    };
     
     print("{s}\n", .{print_break});
     const roi_pos = CameraOps.roi_cent_from_coords(&sim_data.coords);
@@ -140,20 +200,59 @@ pub fn main() !void {
 
     time_start = try Instant.now();
 
-    const image_array = try Raster.rasterAllFrames(page_alloc, 
-                                                   out_dir, 
-                                                   &sim_data.coords, 
-                                                   &sim_data.connect, 
-                                                   &sim_data.field, 
-                                                   &camera);
+    if (sink_kind == .csv) {
+        const image_array = try Raster.rasterAllFrames(page_alloc, 
+                                                       out_dir, 
+                                                       &sim_data.coords, 
+                                                       &sim_data.connect, 
+                                                       &sim_data.field, 
+                                                       &camera,
+                                                       raster_opts);
+
+        // Print diagnostics to console to see if there is an image
+        const image_max = std.mem.max(f64, image_array.elems);
+        const image_min = std.mem.min(f64, image_array.elems);
+        print("Image: [max, min] = [{}, {}]\n\n", .{ image_max, image_min });
+    } else {
+        var file_sink = framesink.FileSink.init(out_dir, "raster_all.npy", .npy);
+        if (sink_kind == .raw) {
+            file_sink = framesink.FileSink.init(out_dir, "raster_all.raw", .raw);
+        }
+        var stack_sink = framesink.MmapStackSink.init(out_dir, 
+                                                      "raster_all_stack.raw", 
+                                                      true);
+        var tiff_sink = framesink.TiffSink.init(out_dir, null);
+        var null_sink = framesink.NullSink{};
+
+        const sink: FrameSink = switch (sink_kind) {
+            .npy, .raw => file_sink.frameSink(),
+            .mmap => stack_sink.frameSink(),
+            .tiff => tiff_sink.frameSink(),
+            .none, .csv => null_sink.frameSink(),
+        };
+
+        // Files are written on a background thread, the memory map is 
+        // rastered into directly so it does not need one
+        var threaded_sink = framesink.ThreadedSink.init(page_alloc, sink, 4);
+        defer threaded_sink.deinit();
+        const sinks = [_]FrameSink{ 
+            if (sink_kind == .mmap) sink else threaded_sink.frameSink() 
+        };
+
+        try Raster.rasterAllFramesToSinks(page_alloc, 
+                                          &sim_data.coords, 
+                                          &sim_data.connect, 
+                                          &sim_data.field, 
+                                          &camera,
+                                          raster_opts,
+                                          sinks[0..]);
+
+        print("Sink: {s}, time waiting for the writer = {d:.3}ms\n", 
+              .{ @tagName(sink_kind), threaded_sink.time_wait / time.ns_per_ms });
+    }
 
     time_end = try Instant.now();
     const time_raster: f64 = @floatFromInt(time_end.since(time_start));
     print("Total raster time = {d:.3}ms\n\n", .{time_raster / time.ns_per_ms});
 
-    // Print diagnostics to console to see if there is an image
-    const image_max = std.mem.max(f64, image_array.elems);
-    const image_min = std.mem.min(f64, image_array.elems);
-    print("Image: [max, min] = [{}, {}]\n\n", .{ image_max, image_min });
-
 } // main, end
@@ -35,15 +35,28 @@ def main() -> None:
     #---------------------------------------------------------------------------
     plot_opts = po.PlotOptsGeneral()
 
+    # Stack of all frames from main_raster_all, shape=(time,field,px_y,px_x),
+    # mapped so only the plotted frame is read
+    image_stack_path = data_path / "raster_all.npy"
+    image_stack = None
+    if image_stack_path.is_file():
+        print(f"Found image stack file: {image_stack_path.resolve()}")
+        image_stack = np.load(image_stack_path,mmap_mode="r")
+
     for ff in range(field_num):
         image_path = data_path / f"{image_tag}_field{ff}_frame{frame_num}.csv"
+        image_buff = None
 
-        if image_path.is_file():
+        if image_stack is not None and ff < image_stack.shape[1]:
+            image_found = True
+            image_buff = np.asarray(image_stack[frame_num,ff,:,:])
+        elif image_path.is_file():
             image_found = True
             print(f"Found image file: {image_path.resolve()}")
             image_buff = pd.read_csv(image_path,header=None)
             image_buff = image_buff.to_numpy()    
-        
+
+        if image_buff is not None:
             (fig, ax) = plt.subplots(figsize=plot_opts.single_fig_size_square,
                                     layout='constrained')
             fig.set_dpi(plot_opts.resolution)
@@ -25,6 +25,28 @@ typedef struct cMat44F {
     size_t numel;
 } CMat44F;
 
+typedef struct cNDArrayF {
+    double* elems;
+    size_t* dims;
+    size_t elems_num;
+    size_t dims_num;
+} CNDArrayF;
+
+typedef struct cNDArrayU {
+    size_t* elems;
+    size_t* dims;
+    size_t elems_num;
+    size_t dims_num;
+} CNDArrayU;
+
+// Connectivity table, node indices are 32 bit so it is used in place
+typedef struct cNDArrayU32 {
+    uint32_t* elems;
+    size_t* dims;
+    size_t elems_num;
+    size_t dims_num;
+} CNDArrayU32;
+
 typedef struct cCamera {
     CVec2U32 pixels_num;
     CVec2F pixels_size;
@@ -39,6 +61,83 @@ typedef struct cCamera {
     CMat44F world_to_cam;
 } CCamera;
 
+typedef struct cPixelWindow {
+    size_t x_start;
+    size_t y_start;
+    size_t x_n;
+    size_t y_n;
+} CPixelWindow;
+
+typedef struct cRasterOpts {
+    size_t threads_n;
+    size_t tile_size;
+    size_t frame_threads_n;
+    uint8_t vis_buffer;
+} CRasterOpts;
+
 void printCamera(const CCamera* cam);
+void printRasterOpts(const CRasterOpts* opts);
+
+// Returns 0 on success. The images are written into the caller's buffer,
+// images->elems must not be NULL.
+int renderFrames(const CNDArrayF* coords,
+                 const CNDArrayU32* connect,
+                 const CNDArrayF* fields,
+                 const CCamera* camera,
+                 const CRasterOpts* opts,
+                 const size_t* frames,
+                 size_t frames_n,
+                 CNDArrayF* images);
+
+// Renders one time step from each of cameras_n cameras with the same pixel
+// count and sub-sampling, images shape=(cameras_n,field_n,px_y,px_x).
+int renderFrameMultiCamera(const CNDArrayF* coords,
+                           const CNDArrayU32* connect,
+                           const CNDArrayF* fields,
+                           const CCamera* cameras,
+                           size_t cameras_n,
+                           const CRasterOpts* opts,
+                           size_t frame_ind,
+                           CNDArrayF* images);
+
+// Renders only the pixel windows of the camera image. images is flat, each
+// window in turn is stored with shape=(frames_n,field_n,y_n,x_n).
+int renderWindows(const CNDArrayF* coords,
+                  const CNDArrayU32* connect,
+                  const CNDArrayF* fields,
+                  const CCamera* camera,
+                  const CRasterOpts* opts,
+                  const size_t* frames,
+                  size_t frames_n,
+                  const CPixelWindow* windows,
+                  size_t windows_n,
+                  CNDArrayF* images);
+
+// Persistent renderer holding a copy of the mesh and fields. Returns NULL if
+// the mesh is invalid. Free with rendererDestroy.
+void* rendererCreate(const CNDArrayF* coords,
+                     const CNDArrayU32* connect,
+                     const CNDArrayF* fields);
+void rendererDestroy(void* renderer);
+int rendererRender(void* renderer,
+                   const CCamera* camera,
+                   const CRasterOpts* opts,
+                   const size_t* frames,
+                   size_t frames_n,
+                   CNDArrayF* images);
+int rendererRenderMultiCamera(void* renderer,
+                              const CCamera* cameras,
+                              size_t cameras_n,
+                              const CRasterOpts* opts,
+                              size_t frame_ind,
+                              CNDArrayF* images);
+int rendererRenderWindows(void* renderer,
+                          const CCamera* camera,
+                          const CRasterOpts* opts,
+                          const size_t* frames,
+                          size_t frames_n,
+                          const CPixelWindow* windows,
+                          size_t windows_n,
+                          CNDArrayF* images);
 
 #endif // ZIGRASTER_H
\ No newline at end of file
@@ -19,6 +19,24 @@ cdef extern from "zigraster.h":
         double* mat
         size_t numel
 
+    ctypedef struct CNDArrayF:
+        double* elems
+        size_t* dims
+        size_t elems_num
+        size_t dims_num
+
+    ctypedef struct CNDArrayU:
+        size_t* elems
+        size_t* dims
+        size_t elems_num
+        size_t dims_num
+
+    ctypedef struct CNDArrayU32:
+        uint32_t* elems
+        size_t* dims
+        size_t elems_num
+        size_t dims_num
+
     ctypedef struct CCamera:
         CVec2U32 pixels_num
         CVec2F pixels_size
@@ -32,5 +50,71 @@ cdef extern from "zigraster.h":
         CMat44F cam_to_world
         CMat44F world_to_cam
 
+    ctypedef struct CPixelWindow:
+        size_t x_start
+        size_t y_start
+        size_t x_n
+        size_t y_n
+
+    ctypedef struct CRasterOpts:
+        size_t threads_n
+        size_t tile_size
+        size_t frame_threads_n
+        uint8_t vis_buffer
+
     void printCamera(const CCamera* cam)
+    void printRasterOpts(const CRasterOpts* opts)
+
+    int renderFrames(const CNDArrayF* coords,
+                     const CNDArrayU32* connect,
+                     const CNDArrayF* fields,
+                     const CCamera* camera,
+                     const CRasterOpts* opts,
+                     const size_t* frames,
+                     size_t frames_n,
+                     CNDArrayF* images) nogil
+
+    int renderFrameMultiCamera(const CNDArrayF* coords,
+                               const CNDArrayU32* connect,
+                               const CNDArrayF* fields,
+                               const CCamera* cameras,
+                               size_t cameras_n,
+                               const CRasterOpts* opts,
+                               size_t frame_ind,
+                               CNDArrayF* images) nogil
+
+    int renderWindows(const CNDArrayF* coords,
+                      const CNDArrayU32* connect,
+                      const CNDArrayF* fields,
+                      const CCamera* camera,
+                      const CRasterOpts* opts,
+                      const size_t* frames,
+                      size_t frames_n,
+                      const CPixelWindow* windows,
+                      size_t windows_n,
+                      CNDArrayF* images) nogil
 
+    void* rendererCreate(const CNDArrayF* coords,
+                         const CNDArrayU32* connect,
+                         const CNDArrayF* fields) nogil
+    void rendererDestroy(void* renderer) nogil
+    int rendererRender(void* renderer,
+                       const CCamera* camera,
+                       const CRasterOpts* opts,
+                       const size_t* frames,
+                       size_t frames_n,
+                       CNDArrayF* images) nogil
+    int rendererRenderMultiCamera(void* renderer,
+                                  const CCamera* cameras,
+                                  size_t cameras_n,
+                                  const CRasterOpts* opts,
+                                  size_t frame_ind,
+                                  CNDArrayF* images) nogil
+    int rendererRenderWindows(void* renderer,
+                              const CCamera* camera,
+                              const CRasterOpts* opts,
+                              const size_t* frames,
+                              size_t frames_n,
+                              const CPixelWindow* windows,
+                              size_t windows_n,
+                              CNDArrayF* images) nogil
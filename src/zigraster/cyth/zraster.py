@@ -1,10 +1,16 @@
 import cython
 from cython.cimports import zigraster as zr
+from cython.cimports.libc.stdlib import malloc, free
 import numpy as np
 import pyvale as pyv
 
 
-def set_camera(cam: pyv.CameraData) -> None:
+@cython.cfunc
+def _camera_to_c(cam: pyv.CameraData,
+                 c_to_w: cython.double[::1],
+                 w_to_c: cython.double[::1]) -> zr.CCamera:
+    # The matrix memory views are passed in so the caller keeps the buffers
+    # alive for as long as the C camera struct is in use
     pixels_num: zr.CVec2U32 = zr.CVec2U32(cam.pixels_num[0],cam.pixels_num[1])
     pixels_size: zr.CVec2F = zr.CVec2F(cam.pixels_size[0],cam.pixels_size[1])
     pos_world: zr.CVec3F = zr.CVec3F(cam.pos_world[0],
@@ -22,15 +28,10 @@ def set_camera(cam: pyv.CameraData) -> None:
                                       cam.image_dims[1])
     image_dist: cython.double = cam.image_dist
 
-    c_to_w_flat_np = np.ascontiguousarray(cam.cam_to_world_mat.flatten())
-    c_to_w: cython.double[::1] = c_to_w_flat_np
     cam_to_world_mat: zr.CMat44F = zr.CMat44F(cython.address(c_to_w[0]),16)
-
-    w_to_c_flat_np = np.ascontiguousarray(cam.world_to_cam_mat.flatten())
-    w_to_c: cython.double[::1] = w_to_c_flat_np
     world_to_cam_mat: zr.CMat44F = zr.CMat44F(cython.address(w_to_c[0]),16)
 
-    ccam: zr.CCamera = zr.CCamera(
+    return zr.CCamera(
         pixels_num,
         pixels_size,
         pos_world,
@@ -43,5 +44,674 @@ def set_camera(cam: pyv.CameraData) -> None:
         cam_to_world_mat,
         world_to_cam_mat,
     )
-    
+
+
+@cython.cclass
+class _CameraArray:
+    # Contiguous C array of cameras for the multi-camera render, owns the
+    # flattened matrices the C structs point into
+    ptr: cython.pointer(zr.CCamera)
+    n: cython.size_t
+    _mats: list
+
+    def __cinit__(self, cams: list[pyv.CameraData]):
+        self.ptr = cython.NULL
+        self.n = len(cams)
+        self._mats = []
+        if self.n == 0:
+            raise ValueError("At least one camera is needed.")
+
+        self.ptr = cython.cast(cython.pointer(zr.CCamera),
+                               malloc(self.n*cython.sizeof(zr.CCamera)))
+        if self.ptr == cython.NULL:
+            raise MemoryError()
+
+        ii: cython.size_t
+        for ii in range(self.n):
+            c_to_w = np.ascontiguousarray(cams[ii].cam_to_world_mat.flatten())
+            w_to_c = np.ascontiguousarray(cams[ii].world_to_cam_mat.flatten())
+            self._mats.append((c_to_w,w_to_c))
+            self.ptr[ii] = _camera_to_c(cams[ii],c_to_w,w_to_c)
+
+    def __dealloc__(self):
+        if self.ptr != cython.NULL:
+            free(self.ptr)
+
+
+def _multi_out_np(out: np.ndarray | None,
+                  cams: list[pyv.CameraData],
+                  fields_n: int) -> np.ndarray:
+    images_shape = (len(cams),
+                    fields_n,
+                    int(cams[0].pixels_num[1]),
+                    int(cams[0].pixels_num[0]))
+    if out is None:
+        out = np.empty(images_shape,dtype=np.float64)
+    elif (out.dtype != np.float64 or out.shape != images_shape
+          or not out.flags.c_contiguous or not out.flags.writeable):
+        raise ValueError("out must be a writeable C contiguous float64 array "
+                         + f"with shape={images_shape}.")
+    return out
+
+
+def set_camera(cam: pyv.CameraData) -> None:
+    c_to_w_flat_np = np.ascontiguousarray(cam.cam_to_world_mat.flatten())
+    w_to_c_flat_np = np.ascontiguousarray(cam.world_to_cam_mat.flatten())
+
+    ccam: zr.CCamera = _camera_to_c(cam,c_to_w_flat_np,w_to_c_flat_np)
+
     zr.printCamera(cython.address(ccam))
+
+
+def set_raster_opts(threads_n: int = 1,
+                    tile_size: int = 64,
+                    frame_threads_n: int = 1,
+                    vis_buffer: bool = False) -> None:
+    # threads_n > 1 rasters square screen tiles of tile_size sub-pixels in
+    # parallel, threads_n = 1 uses the serial raster loop. frame_threads_n > 1
+    # rasters whole frames in parallel when rastering all frames. vis_buffer
+    # rasters a static mesh once and then only shades each frame.
+    copts: zr.CRasterOpts = zr.CRasterOpts(threads_n,
+                                           tile_size,
+                                           frame_threads_n,
+                                           vis_buffer)
+
+    zr.printRasterOpts(cython.address(copts))
+
+
+def _mesh_to_np(coords: np.ndarray,
+                connectivity: np.ndarray,
+                fields: np.ndarray) -> tuple[np.ndarray,np.ndarray,np.ndarray]:
+    # pyvale meshes store homogeneous coords with shape=(num_nodes,4), only
+    # the first three columns are passed to zig
+    if coords.ndim != 2 or coords.shape[1] < 3:
+        raise ValueError("coords must have shape=(num_nodes,3) or (num_nodes,4).")
+    coords_np = np.ascontiguousarray(coords[:,:3].T,dtype=np.float64)
+
+    # zig indexes nodes with u32, wider tables are range checked here so the
+    # conversion cannot wrap
+    if (connectivity.dtype != np.uint32 and connectivity.size > 0
+        and (connectivity.min() < 0
+             or connectivity.max() > np.iinfo(np.uint32).max)):
+        raise ValueError("connectivity node indices must be in [0,2**32).")
+    connect_np = np.ascontiguousarray(connectivity,dtype=np.uint32)
+    if connect_np.ndim != 2:
+        raise ValueError("connectivity must have shape=(num_elems,nodes_per_elem).")
+
+    fields_np = np.ascontiguousarray(fields,dtype=np.float64)
+    if fields_np.ndim != 3 or fields_np.shape[0] != coords_np.shape[1]:
+        raise ValueError("fields must have shape=(num_nodes,num_time_steps,num_fields).")
+
+    return (coords_np,connect_np,fields_np)
+
+
+@cython.cfunc
+def _flat_to_c(arr: np.ndarray,
+               dims: cython.p_size_t,
+               dims_n: cython.size_t) -> np.ndarray:
+    # Writes the shape of arr into the caller's dims buffer, which must hold
+    # dims_n entries and outlive the C struct pointing at it. The flat array
+    # is a view so pointers into it point into arr.
+    if arr.ndim != dims_n or not arr.flags.c_contiguous:
+        raise ValueError(f"Expected a C contiguous array with {dims_n} dims.")
+    if arr.size == 0:
+        raise ValueError("Mesh, fields and images must not be empty.")
+    ii: cython.size_t
+    for ii in range(dims_n):
+        dims[ii] = arr.shape[ii]
+    return arr.reshape(-1)
+
+
+@cython.cfunc
+def _f64_to_c(arr: np.ndarray,
+              dims: cython.p_size_t,
+              dims_n: cython.size_t) -> zr.CNDArrayF:
+    flat_mv: cython.double[::1] = _flat_to_c(arr,dims,dims_n)
+    c_arr: zr.CNDArrayF
+    c_arr.elems = cython.address(flat_mv[0])
+    c_arr.dims = dims
+    c_arr.elems_num = flat_mv.shape[0]
+    c_arr.dims_num = dims_n
+    return c_arr
+
+
+@cython.cfunc
+def _u32_to_c(arr: np.ndarray,
+              dims: cython.p_size_t,
+              dims_n: cython.size_t) -> zr.CNDArrayU32:
+    flat_mv: cython.uint[::1] = _flat_to_c(arr,dims,dims_n)
+    c_arr: zr.CNDArrayU32
+    c_arr.elems = cython.address(flat_mv[0])
+    c_arr.dims = dims
+    c_arr.elems_num = flat_mv.shape[0]
+    c_arr.dims_num = dims_n
+    return c_arr
+
+
+def _frames_out_np(frames: np.ndarray | None,
+                   out: np.ndarray | None,
+                   time_n: int,
+                   fields_n: int,
+                   cam: pyv.CameraData) -> tuple[np.ndarray,np.ndarray]:
+    if frames is None:
+        frames_np = np.arange(time_n,dtype=np.uintp)
+    else:
+        frames_np = np.ascontiguousarray(frames,dtype=np.uintp).ravel()
+
+    images_shape = (frames_np.shape[0],
+                    fields_n,
+                    int(cam.pixels_num[1]),
+                    int(cam.pixels_num[0]))
+    if out is None:
+        out = np.empty(images_shape,dtype=np.float64)
+    elif (out.dtype != np.float64 or out.shape != images_shape
+          or not out.flags.c_contiguous or not out.flags.writeable):
+        raise ValueError("out must be a writeable C contiguous float64 array "
+                         + f"with shape={images_shape}.")
+
+    return (frames_np,out)
+
+
+def _windows_out_np(frames: np.ndarray | None,
+                    out: np.ndarray | None,
+                    windows,
+                    time_n: int,
+                    fields_n: int
+                    ) -> tuple[np.ndarray,np.ndarray,np.ndarray,list[np.ndarray]]:
+    if frames is None:
+        frames_np = np.arange(time_n,dtype=np.uintp)
+    else:
+        frames_np = np.ascontiguousarray(frames,dtype=np.uintp).ravel()
+
+    windows_np = np.ascontiguousarray(windows,dtype=np.uintp).reshape(-1,4)
+
+    # Each window is stored in turn in one flat buffer, the images returned
+    # are views into it
+    images_n = 0
+    images_shapes = []
+    for (_,_,x_n,y_n) in windows_np:
+        images_shapes.append((frames_np.shape[0],fields_n,int(y_n),int(x_n)))
+        images_n += int(np.prod(images_shapes[-1]))
+
+    if out is None:
+        out = np.empty((images_n,),dtype=np.float64)
+    elif (out.dtype != np.float64 or out.shape != (images_n,)
+          or not out.flags.c_contiguous or not out.flags.writeable):
+        raise ValueError("out must be a writeable C contiguous float64 array "
+                         + f"with shape={(images_n,)}.")
+
+    images = []
+    images_start = 0
+    for images_shape in images_shapes:
+        image_n = int(np.prod(images_shape))
+        images.append(out[images_start:images_start+image_n].reshape(images_shape))
+        images_start += image_n
+
+    return (frames_np,windows_np,out,images)
+
+
+def render(coords: np.ndarray,
+           connectivity: np.ndarray,
+           fields: np.ndarray,
+           cam: pyv.CameraData,
+           frames: np.ndarray | None = None,
+           out: np.ndarray | None = None,
+           threads_n: int = 1,
+           tile_size: int = 64,
+           frame_threads_n: int = 1,
+           vis_buffer: bool = False) -> np.ndarray:
+    """Renders the nodal fields of a mesh to images with the zig rasteriser.
+
+    The connectivity, fields and output images are passed to zig without
+    copying if they are already C contiguous with the expected dtype, uint32
+    for the connectivity and float64 otherwise. The GIL is released while
+    rastering so other Python threads keep running.
+
+    Parameters
+    ----------
+    coords : np.ndarray
+        Node coordinates, shape=(num_nodes,3) or homogeneous coordinates with
+        shape=(num_nodes,4) as stored by pyvale. The first three columns are
+        transposed to one contiguous array per axis which is a copy unless
+        coords is Fortran ordered.
+    connectivity : np.ndarray
+        Node indices for each element, shape=(num_elems,nodes_per_elem). Used
+        in place if uint32, other integer dtypes are converted on each call.
+    fields : np.ndarray
+        Nodal fields, shape=(num_nodes,num_time_steps,num_fields), float64.
+    cam : pyv.CameraData
+        Camera to render with.
+    frames : np.ndarray | None, optional
+        Time steps to render, defaults to None which renders all time steps.
+    out : np.ndarray | None, optional
+        Output image buffer, shape=(num_frames,num_fields,pixels_y,pixels_x),
+        float64 and C contiguous. Defaults to None which allocates the output.
+
+    Returns
+    -------
+    np.ndarray
+        The rendered images, shape=(num_frames,num_fields,pixels_y,pixels_x).
+    """
+    (coords_np,connect_np,fields_np) = _mesh_to_np(coords,connectivity,fields)
+    (frames_np,out) = _frames_out_np(frames,
+                                     out,
+                                     fields_np.shape[1],
+                                     fields_np.shape[2],
+                                     cam)
+
+    # Nothing to render, avoids indexing into empty memory views below
+    if out.size == 0:
+        return out
+
+    c_to_w_flat_np = np.ascontiguousarray(cam.cam_to_world_mat.flatten())
+    w_to_c_flat_np = np.ascontiguousarray(cam.world_to_cam_mat.flatten())
+    ccam: zr.CCamera = _camera_to_c(cam,c_to_w_flat_np,w_to_c_flat_np)
+
+    copts: zr.CRasterOpts = zr.CRasterOpts(threads_n,
+                                           tile_size,
+                                           frame_threads_n,
+                                           vis_buffer)
+
+    coords_dims: cython.size_t[2]
+    connect_dims: cython.size_t[2]
+    fields_dims: cython.size_t[3]
+    images_dims: cython.size_t[4]
+    c_coords: zr.CNDArrayF = _f64_to_c(coords_np,coords_dims,2)
+    c_connect: zr.CNDArrayU32 = _u32_to_c(connect_np,connect_dims,2)
+    c_fields: zr.CNDArrayF = _f64_to_c(fields_np,fields_dims,3)
+    c_images: zr.CNDArrayF = _f64_to_c(out,images_dims,4)
+
+    frames_mv: cython.size_t[::1] = frames_np
+    frames_n: cython.size_t = frames_np.shape[0]
+    status: cython.int = 0
+
+    with cython.nogil:
+        status = zr.renderFrames(cython.address(c_coords),
+                                 cython.address(c_connect),
+                                 cython.address(c_fields),
+                                 cython.address(ccam),
+                                 cython.address(copts),
+                                 cython.address(frames_mv[0]),
+                                 frames_n,
+                                 cython.address(c_images))
+
+    if status != 0:
+        raise RuntimeError(f"zigraster renderFrames failed with status={status}.")
+
+    return out
+
+
+def render_multi_camera(coords: np.ndarray,
+                        connectivity: np.ndarray,
+                        fields: np.ndarray,
+                        cams: list[pyv.CameraData],
+                        frame: int = 0,
+                        out: np.ndarray | None = None,
+                        threads_n: int = 1,
+                        tile_size: int = 64) -> np.ndarray:
+    """Renders one time step from each camera of a stereo or multi-view rig.
+
+    The field values of the frame are read once and shared by all views,
+    which are rendered in parallel using up to threads_n threads. All cameras
+    must have the same pixel count and sub-sampling.
+
+    Parameters
+    ----------
+    coords, connectivity, fields : np.ndarray
+        Mesh and nodal fields as for render().
+    cams : list[pyv.CameraData]
+        Cameras to render with.
+    frame : int, optional
+        Time step to render, defaults to 0.
+    out : np.ndarray | None, optional
+        Output image buffer, shape=(num_cams,num_fields,pixels_y,pixels_x),
+        float64 and C contiguous. Defaults to None which allocates the output.
+
+    Returns
+    -------
+    np.ndarray
+        The rendered images, shape=(num_cams,num_fields,pixels_y,pixels_x).
+    """
+    (coords_np,connect_np,fields_np) = _mesh_to_np(coords,connectivity,fields)
+    ccams = _CameraArray(cams)
+    out = _multi_out_np(out,cams,fields_np.shape[2])
+    if out.size == 0:
+        return out
+
+    copts: zr.CRasterOpts = zr.CRasterOpts(threads_n,tile_size,1,False)
+
+    coords_dims: cython.size_t[2]
+    connect_dims: cython.size_t[2]
+    fields_dims: cython.size_t[3]
+    images_dims: cython.size_t[4]
+    c_coords: zr.CNDArrayF = _f64_to_c(coords_np,coords_dims,2)
+    c_connect: zr.CNDArrayU32 = _u32_to_c(connect_np,connect_dims,2)
+    c_fields: zr.CNDArrayF = _f64_to_c(fields_np,fields_dims,3)
+    c_images: zr.CNDArrayF = _f64_to_c(out,images_dims,4)
+
+    frame_ind: cython.size_t = frame
+    status: cython.int = 0
+
+    with cython.nogil:
+        status = zr.renderFrameMultiCamera(cython.address(c_coords),
+                                           cython.address(c_connect),
+                                           cython.address(c_fields),
+                                           ccams.ptr,
+                                           ccams.n,
+                                           cython.address(copts),
+                                           frame_ind,
+                                           cython.address(c_images))
+
+    if status != 0:
+        raise RuntimeError("zigraster renderFrameMultiCamera failed with "
+                           + f"status={status}.")
+
+    return out
+
+
+def render_windows(coords: np.ndarray,
+                   connectivity: np.ndarray,
+                   fields: np.ndarray,
+                   cam: pyv.CameraData,
+                   windows,
+                   frames: np.ndarray | None = None,
+                   out: np.ndarray | None = None,
+                   threads_n: int = 1) -> list[np.ndarray]:
+    """Renders only the given pixel windows of the camera image, e.g. a region
+    of interest or the subsets used for image correlation.
+
+    Sub-pixel buffers are only allocated for the windows and each window only
+    rasters the elements that overlap it. The images are the same as cropping
+    the full images from render(). Windows are shared between up to threads_n
+    threads.
+
+    Parameters
+    ----------
+    coords, connectivity, fields : np.ndarray
+        Mesh and nodal fields as for render().
+    cam : pyv.CameraData
+        Camera to render with.
+    windows : array_like
+        Pixel windows as rows of (x_start,y_start,x_num,y_num), shape=(N,4),
+        which must lie inside the camera image.
+    frames : np.ndarray | None, optional
+        Time steps to render, defaults to None which renders all time steps.
+    out : np.ndarray | None, optional
+        Flat float64 output buffer holding every window in turn. Defaults to
+        None which allocates the output.
+
+    Returns
+    -------
+    list[np.ndarray]
+        The images of each window, shape=(num_frames,num_fields,y_num,x_num),
+        as views into out.
+    """
+    (coords_np,connect_np,fields_np) = _mesh_to_np(coords,connectivity,fields)
+    (frames_np,windows_np,out,images) = _windows_out_np(frames,
+                                                        out,
+                                                        windows,
+                                                        fields_np.shape[1],
+                                                        fields_np.shape[2])
+    if out.size == 0:
+        return images
+
+    c_to_w_flat_np = np.ascontiguousarray(cam.cam_to_world_mat.flatten())
+    w_to_c_flat_np = np.ascontiguousarray(cam.world_to_cam_mat.flatten())
+    ccam: zr.CCamera = _camera_to_c(cam,c_to_w_flat_np,w_to_c_flat_np)
+
+    copts: zr.CRasterOpts = zr.CRasterOpts(threads_n,64,1,False)
+
+    coords_dims: cython.size_t[2]
+    connect_dims: cython.size_t[2]
+    fields_dims: cython.size_t[3]
+    images_dims: cython.size_t[1]
+    c_coords: zr.CNDArrayF = _f64_to_c(coords_np,coords_dims,2)
+    c_connect: zr.CNDArrayU32 = _u32_to_c(connect_np,connect_dims,2)
+    c_fields: zr.CNDArrayF = _f64_to_c(fields_np,fields_dims,3)
+    c_images: zr.CNDArrayF = _f64_to_c(out,images_dims,1)
+
+    frames_mv: cython.size_t[::1] = frames_np
+    windows_mv: cython.size_t[:,::1] = windows_np
+    c_windows: cython.pointer(zr.CPixelWindow) = cython.cast(
+        cython.pointer(zr.CPixelWindow),cython.address(windows_mv[0,0]))
+    frames_n: cython.size_t = frames_np.shape[0]
+    windows_n: cython.size_t = windows_np.shape[0]
+    status: cython.int = 0
+
+    with cython.nogil:
+        status = zr.renderWindows(cython.address(c_coords),
+                                  cython.address(c_connect),
+                                  cython.address(c_fields),
+                                  cython.address(ccam),
+                                  cython.address(copts),
+                                  cython.address(frames_mv[0]),
+                                  frames_n,
+                                  c_windows,
+                                  windows_n,
+                                  cython.address(c_images))
+
+    if status != 0:
+        raise RuntimeError(f"zigraster renderWindows failed with status={status}.")
+
+    return images
+
+
+@cython.cclass
+class Renderer:
+    """Keeps a copy of a mesh and its fields resident in zig so that many
+    cameras can be rendered without passing the mesh across each time.
+
+    The zig memory is freed by close(), also called on leaving a with block.
+    A renderer must not be used from more than one thread at a time.
+    """
+    _handle: cython.p_void
+    _time_n: cython.Py_ssize_t
+    _fields_n: cython.Py_ssize_t
+
+    def __cinit__(self):
+        self._handle = cython.NULL
+
+    def __init__(self,
+                 coords: np.ndarray,
+                 connectivity: np.ndarray,
+                 fields: np.ndarray) -> None:
+        """
+        Parameters
+        ----------
+        coords : np.ndarray
+            Node coordinates, shape=(num_nodes,3) or (num_nodes,4).
+        connectivity : np.ndarray
+            Node indices for each element, shape=(num_elems,nodes_per_elem).
+        fields : np.ndarray
+            Nodal fields, shape=(num_nodes,num_time_steps,num_fields).
+        """
+        (coords_np,connect_np,fields_np) = _mesh_to_np(coords,
+                                                       connectivity,
+                                                       fields)
+        if coords_np.size == 0 or connect_np.size == 0 or fields_np.size == 0:
+            raise ValueError("Renderer needs a non-empty mesh and fields.")
+
+        coords_dims: cython.size_t[2]
+        connect_dims: cython.size_t[2]
+        fields_dims: cython.size_t[3]
+        c_coords: zr.CNDArrayF = _f64_to_c(coords_np,coords_dims,2)
+        c_connect: zr.CNDArrayU32 = _u32_to_c(connect_np,connect_dims,2)
+        c_fields: zr.CNDArrayF = _f64_to_c(fields_np,fields_dims,3)
+
+        self.close()
+        with cython.nogil:
+            self._handle = zr.rendererCreate(cython.address(c_coords),
+                                             cython.address(c_connect),
+                                             cython.address(c_fields))
+
+        if self._handle == cython.NULL:
+            raise RuntimeError("zigraster rendererCreate failed.")
+
+        self._time_n = fields_np.shape[1]
+        self._fields_n = fields_np.shape[2]
+
+    def __dealloc__(self):
+        if self._handle != cython.NULL:
+            zr.rendererDestroy(self._handle)
+            self._handle = cython.NULL
+
+    def __enter__(self) -> "Renderer":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Frees the zig copy of the mesh, safe to call more than once."""
+        if self._handle != cython.NULL:
+            zr.rendererDestroy(self._handle)
+            self._handle = cython.NULL
+
+    @property
+    def closed(self) -> bool:
+        return self._handle == cython.NULL
+
+    def render(self,
+               cam: pyv.CameraData,
+               frames: np.ndarray | None = None,
+               out: np.ndarray | None = None,
+               threads_n: int = 1,
+               tile_size: int = 64,
+               frame_threads_n: int = 1,
+               vis_buffer: bool = False) -> np.ndarray:
+        """Renders the resident mesh with the given camera, see render() for
+        the frames and out parameters. Rendering again with the same camera
+        reuses the projected node coordinates.
+        """
+        if self._handle == cython.NULL:
+            raise ValueError("Renderer is closed.")
+
+        (frames_np,out) = _frames_out_np(frames,
+                                         out,
+                                         self._time_n,
+                                         self._fields_n,
+                                         cam)
+        if out.size == 0:
+            return out
+
+        c_to_w_flat_np = np.ascontiguousarray(cam.cam_to_world_mat.flatten())
+        w_to_c_flat_np = np.ascontiguousarray(cam.world_to_cam_mat.flatten())
+        ccam: zr.CCamera = _camera_to_c(cam,c_to_w_flat_np,w_to_c_flat_np)
+
+        copts: zr.CRasterOpts = zr.CRasterOpts(threads_n,
+                                               tile_size,
+                                               frame_threads_n,
+                                               vis_buffer)
+
+        images_dims: cython.size_t[4]
+        c_images: zr.CNDArrayF = _f64_to_c(out,images_dims,4)
+
+        frames_mv: cython.size_t[::1] = frames_np
+        frames_n: cython.size_t = frames_np.shape[0]
+        status: cython.int = 0
+
+        with cython.nogil:
+            status = zr.rendererRender(self._handle,
+                                       cython.address(ccam),
+                                       cython.address(copts),
+                                       cython.address(frames_mv[0]),
+                                       frames_n,
+                                       cython.address(c_images))
+
+        if status != 0:
+            raise RuntimeError(f"zigraster rendererRender failed with status={status}.")
+
+        return out
+
+    def render_multi_camera(self,
+                            cams: list[pyv.CameraData],
+                            frame: int = 0,
+                            out: np.ndarray | None = None,
+                            threads_n: int = 1,
+                            tile_size: int = 64) -> np.ndarray:
+        """Renders one time step of the resident mesh from each camera, see
+        render_multi_camera() for the parameters.
+        """
+        if self._handle == cython.NULL:
+            raise ValueError("Renderer is closed.")
+
+        ccams = _CameraArray(cams)
+        out = _multi_out_np(out,cams,self._fields_n)
+        if out.size == 0:
+            return out
+
+        copts: zr.CRasterOpts = zr.CRasterOpts(threads_n,tile_size,1,False)
+
+        images_dims: cython.size_t[4]
+        c_images: zr.CNDArrayF = _f64_to_c(out,images_dims,4)
+
+        frame_ind: cython.size_t = frame
+        status: cython.int = 0
+
+        with cython.nogil:
+            status = zr.rendererRenderMultiCamera(self._handle,
+                                                  ccams.ptr,
+                                                  ccams.n,
+                                                  cython.address(copts),
+                                                  frame_ind,
+                                                  cython.address(c_images))
+
+        if status != 0:
+            raise RuntimeError("zigraster rendererRenderMultiCamera failed "
+                               + f"with status={status}.")
+
+        return out
+
+    def render_windows(self,
+                       cam: pyv.CameraData,
+                       windows,
+                       frames: np.ndarray | None = None,
+                       out: np.ndarray | None = None,
+                       threads_n: int = 1) -> list[np.ndarray]:
+        """Renders pixel windows of the resident mesh with the given camera,
+        see render_windows() for the parameters. Rendering again with the same
+        camera reuses the projected node coordinates.
+        """
+        if self._handle == cython.NULL:
+            raise ValueError("Renderer is closed.")
+
+        (frames_np,windows_np,out,images) = _windows_out_np(frames,
+                                                            out,
+                                                            windows,
+                                                            self._time_n,
+                                                            self._fields_n)
+        if out.size == 0:
+            return images
+
+        c_to_w_flat_np = np.ascontiguousarray(cam.cam_to_world_mat.flatten())
+        w_to_c_flat_np = np.ascontiguousarray(cam.world_to_cam_mat.flatten())
+        ccam: zr.CCamera = _camera_to_c(cam,c_to_w_flat_np,w_to_c_flat_np)
+
+        copts: zr.CRasterOpts = zr.CRasterOpts(threads_n,64,1,False)
+
+        images_dims: cython.size_t[1]
+        c_images: zr.CNDArrayF = _f64_to_c(out,images_dims,1)
+
+        frames_mv: cython.size_t[::1] = frames_np
+        windows_mv: cython.size_t[:,::1] = windows_np
+        c_windows: cython.pointer(zr.CPixelWindow) = cython.cast(
+            cython.pointer(zr.CPixelWindow),cython.address(windows_mv[0,0]))
+        frames_n: cython.size_t = frames_np.shape[0]
+        windows_n: cython.size_t = windows_np.shape[0]
+        status: cython.int = 0
+
+        with cython.nogil:
+            status = zr.rendererRenderWindows(self._handle,
+                                              cython.address(ccam),
+                                              cython.address(copts),
+                                              cython.address(frames_mv[0]),
+                                              frames_n,
+                                              c_windows,
+                                              windows_n,
+                                              cython.address(c_images))
+
+        if status != 0:
+            raise RuntimeError("zigraster rendererRenderWindows failed "
+                               + f"with status={status}.")
+
+        return images
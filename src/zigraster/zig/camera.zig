@@ -208,8 +208,8 @@ const cam_pos_exp = Vec3f.initSlice(&cam_pos_arr);
 test "CameraOps.pos_fill_frame_from_rot" {}
 
 test "CameraOps.calc_cam_pos" {
-    const coords = try Coords.init(testing.allocator, coord_n);
-    defer coords.deinit();
+    var coords = try Coords.init(testing.allocator, coord_n);
+    defer coords.deinit(testing.allocator);
 
     @memcpy(coords.x, coord_x[0..]);
     @memcpy(coords.y, coord_y[0..]);
@@ -226,8 +226,8 @@ test "CameraOps.calc_cam_pos" {
 }
 
 test "CameraOps.image_dist_from_fov" {
-    const coords = try Coords.init(testing.allocator, coord_n);
-    defer coords.deinit();
+    var coords = try Coords.init(testing.allocator, coord_n);
+    defer coords.deinit(testing.allocator);
 
     @memcpy(coords.x, coord_x[0..]);
     @memcpy(coords.y, coord_y[0..]);
@@ -241,8 +241,8 @@ test "CameraOps.image_dist_from_fov" {
 }
 
 test "CameraOps.fov_from_cam_rot" {
-    const coords = try Coords.init(testing.allocator, coord_n);
-    defer coords.deinit();
+    var coords = try Coords.init(testing.allocator, coord_n);
+    defer coords.deinit(testing.allocator);
 
     @memcpy(coords.x, coord_x[0..]);
     @memcpy(coords.y, coord_y[0..]);
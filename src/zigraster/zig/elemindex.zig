@@ -0,0 +1,463 @@
+const std = @import("std");
+
+const Coords = @import("meshio.zig").Coords;
+const Connect = @import("meshio.zig").Connect;
+const Camera = @import("camera.zig").Camera;
+const Raster = @import("raster.zig").Raster;
+
+//------------------------------------------------------------------------------
+// ELEMENT BVH
+//
+// Bounding volume hierarchy over the world space bounding boxes of the
+// elements. It only depends on the coords and connectivity so it is built
+// once per mesh and shared by every camera and frame. A frustum query walks
+// the tree and drops whole subtrees whose box projects entirely off one side
+// of the image, so finding the elements a zoomed in camera can see costs
+// roughly the number of visible elements rather than the whole mesh.
+//
+// Boxes are only culled when all their corners are in front of the camera.
+// The region of space that projects left of the image (and in front of the
+// camera) is convex, so if all eight corners of a box are in it every node
+// inside the box is too and the element would be culled by the raster
+// bounds anyway. The query is therefore conservative and rastering only the
+// returned elements gives exactly the same image as rastering all of them.
+
+pub const ElemIndexError = error{
+    IndexSizeMismatch,
+    TooManyElems,
+};
+
+// Elements per leaf, small leaves cull more but make a deeper tree
+pub const leaf_size: usize = 8;
+// Raster space margin in pixels on the culling planes, far larger than the
+// rounding error of the node projection
+const cull_margin: f64 = 1e-6;
+const stack_size: usize = 64;
+
+pub const Box = struct {
+    min: [3]f64 = @splat(std.math.inf(f64)),
+    max: [3]f64 = @splat(-std.math.inf(f64)),
+
+    fn grow(self: *Box, pos: [3]f64) void {
+        for (0..3) |dd| {
+            self.min[dd] = @min(self.min[dd], pos[dd]);
+            self.max[dd] = @max(self.max[dd], pos[dd]);
+        }
+    }
+
+    fn merge(self: *Box, other: Box) void {
+        self.grow(other.min);
+        self.grow(other.max);
+    }
+
+    fn corner(self: *const Box, corner_ind: usize) [3]f64 {
+        return .{
+            if (corner_ind & 1 == 0) self.min[0] else self.max[0],
+            if (corner_ind & 2 == 0) self.min[1] else self.max[1],
+            if (corner_ind & 4 == 0) self.min[2] else self.max[2],
+        };
+    }
+};
+
+const BVHNode = struct {
+    box: Box,
+    // Leaves hold elem_order[start..start + count], inner nodes have their
+    // first child next in the array and the second child at right
+    start: u32,
+    count: u32,
+    right: u32,
+
+    fn isLeaf(self: *const BVHNode) bool {
+        return self.count > 0;
+    }
+};
+
+// Where a box is relative to the image of a camera
+const Cull = enum { outside, inside, partial };
+
+pub const ElemBVH = struct {
+    nodes_buff: []BVHNode,
+    nodes: []BVHNode,
+    // Element indices grouped by leaf
+    elem_order: []u32,
+    elem_boxes: []Box,
+    elem_n: usize,
+
+    const Self = @This();
+
+    pub fn init(allocator: std.mem.Allocator,
+                coords: *const Coords,
+                connect: *const Connect) !Self {
+
+        const elem_n: usize = connect.elem_n;
+        if (elem_n > std.math.maxInt(u32)) {
+            return ElemIndexError.TooManyElems;
+        }
+
+        // A binary tree with at most leaf_size elements per leaf
+        const leaves_max: usize = @max(1, 2 * ((elem_n + leaf_size - 1) / leaf_size));
+        const nodes_buff = try allocator.alloc(BVHNode, 2 * leaves_max);
+        errdefer allocator.free(nodes_buff);
+        const elem_order = try allocator.alloc(u32, elem_n);
+        errdefer allocator.free(elem_order);
+        const elem_boxes = try allocator.alloc(Box, elem_n);
+        errdefer allocator.free(elem_boxes);
+
+        var self = Self{
+            .nodes_buff = nodes_buff,
+            .nodes = nodes_buff[0..0],
+            .elem_order = elem_order,
+            .elem_boxes = elem_boxes,
+            .elem_n = elem_n,
+        };
+
+        const centroids = try allocator.alloc([3]f64, elem_n);
+        defer allocator.free(centroids);
+
+        for (0..elem_n) |ee| {
+            self.elem_order[ee] = @intCast(ee);
+            self.elem_boxes[ee] = elemBox(coords, connect, ee);
+            for (0..3) |dd| {
+                centroids[ee][dd] = 0.5 * (self.elem_boxes[ee].min[dd]
+                                           + self.elem_boxes[ee].max[dd]);
+            }
+        }
+
+        var nodes_n: usize = 0;
+        if (elem_n > 0) {
+            self.build(centroids, 0, elem_n, &nodes_n);
+        }
+        self.nodes = self.nodes_buff[0..nodes_n];
+        return self;
+    }
+
+    pub fn deinit(self: *Self, allocator: std.mem.Allocator) void {
+        allocator.free(self.nodes_buff);
+        allocator.free(self.elem_order);
+        allocator.free(self.elem_boxes);
+    }
+
+    fn elemBox(coords: *const Coords, connect: *const Connect, elem_ind: usize) Box {
+        var box = Box{};
+        for (connect.getElem(elem_ind)) |node_ind| {
+            box.grow(.{ coords.x[node_ind], coords.y[node_ind], coords.z[node_ind] });
+        }
+        return box;
+    }
+
+    // Splits the elements at the median centroid along the longest axis of
+    // the centroid bounds until the leaves are small enough
+    fn build(self: *Self, centroids: []const [3]f64, start: usize, end: usize,
+             nodes_n: *usize) void {
+
+        const node_ind: usize = nodes_n.*;
+        nodes_n.* += 1;
+
+        var box = Box{};
+        var cent_box = Box{};
+        for (self.elem_order[start..end]) |ee| {
+            box.merge(self.elem_boxes[ee]);
+            cent_box.grow(centroids[ee]);
+        }
+
+        if (end - start <= leaf_size) {
+            self.nodes_buff[node_ind] = .{ .box = box, .start = @intCast(start),
+                                      .count = @intCast(end - start), .right = 0 };
+            return;
+        }
+
+        var axis: usize = 0;
+        for (1..3) |dd| {
+            if (cent_box.max[dd] - cent_box.min[dd]
+                > cent_box.max[axis] - cent_box.min[axis]) {
+                axis = dd;
+            }
+        }
+
+        const mid: usize = start + (end - start) / 2;
+        selectNth(self.elem_order[start..end], centroids, axis, mid - start);
+        self.build(centroids, start, mid, nodes_n);
+        const right: usize = nodes_n.*;
+        self.build(centroids, mid, end, nodes_n);
+
+        self.nodes_buff[node_ind] = .{ .box = box, .start = @intCast(start),
+                                  .count = 0, .right = @intCast(right) };
+    }
+
+    // Reorders elems so the element at nth has the centroid it would have if
+    // they were sorted along axis, with no larger centroids before it and no
+    // smaller ones after. Quickselect so the build is O(n log n) overall.
+    fn selectNth(elems: []u32, centroids: []const [3]f64, axis: usize, 
+                 nth: usize) void {
+        var lo: usize = 0;
+        var hi: usize = elems.len - 1;
+        while (lo < hi) {
+            const pivot: f64 = centroids[elems[lo + (hi - lo) / 2]][axis];
+            var ii: usize = lo;
+            var jj: usize = hi;
+            while (ii <= jj) {
+                while (centroids[elems[ii]][axis] < pivot) ii += 1;
+                while (centroids[elems[jj]][axis] > pivot) jj -= 1;
+                if (ii <= jj) {
+                    std.mem.swap(u32, &elems[ii], &elems[jj]);
+                    ii += 1;
+                    if (jj == 0) break;
+                    jj -= 1;
+                }
+            }
+            if (nth <= jj) {
+                hi = jj;
+            } else if (nth >= ii) {
+                lo = ii;
+            } else {
+                return;
+            }
+        }
+    }
+
+    // Updates the boxes after the coords have moved without rebuilding the
+    // tree. Culling stays exact but gets less effective the further the
+    // nodes move from where the tree was built.
+    pub fn refit(self: *Self, coords: *const Coords, connect: *const Connect) !void {
+        if (connect.elem_n != self.elem_n) {
+            return ElemIndexError.IndexSizeMismatch;
+        }
+        for (0..self.elem_n) |ee| {
+            self.elem_boxes[ee] = elemBox(coords, connect, ee);
+        }
+        // Children are always after their parent
+        var node_ind: usize = self.nodes.len;
+        while (node_ind > 0) {
+            node_ind -= 1;
+            const node = &self.nodes[node_ind];
+            node.box = Box{};
+            if (node.isLeaf()) {
+                for (self.elem_order[node.start..node.start + node.count]) |ee| {
+                    node.box.merge(self.elem_boxes[ee]);
+                }
+            } else {
+                node.box.merge(self.nodes[node_ind + 1].box);
+                node.box.merge(self.nodes[node.right].box);
+            }
+        }
+    }
+
+    fn cullBox(box: *const Box, camera: *const Camera) Cull {
+        const x_max: f64 = @as(f64, @floatFromInt(camera.pixels_num[0] - 1));
+        const y_max: f64 = @as(f64, @floatFromInt(camera.pixels_num[1] - 1));
+
+        var all_left = true;
+        var all_right = true;
+        var all_above = true;
+        var all_below = true;
+        var all_inside = true;
+
+        for (0..8) |cc| {
+            const raster = Raster.worldToRasterCoords(
+                .{ .elems = box.corner(cc) }, camera);
+            const x = raster.get(0);
+            const y = raster.get(1);
+            // Behind the camera the projection flips so nothing can be said
+            if (!(raster.get(2) > 0.0)) {
+                return .partial;
+            }
+
+            all_left = all_left and (x < -cull_margin);
+            all_right = all_right and (x > x_max + cull_margin);
+            all_above = all_above and (y < -cull_margin);
+            all_below = all_below and (y > y_max + cull_margin);
+            all_inside = all_inside
+                and (x > cull_margin) and (x < x_max - cull_margin)
+                and (y > cull_margin) and (y < y_max - cull_margin);
+        }
+
+        if (all_left or all_right or all_above or all_below) {
+            return .outside;
+        }
+        return if (all_inside) .inside else .partial;
+    }
+
+    // Writes the elements that may be in view of the camera into elems_out,
+    // which must hold elem_n indices. They are in tree order, not element
+    // order, so a caller that rasters them must restore element order for
+    // the depth test to give the same images.
+    pub fn queryFrustum(self: *const Self,
+                        camera: *const Camera,
+                        elems_out: []usize) ![]usize {
+        if (elems_out.len < self.elem_n) {
+            return ElemIndexError.IndexSizeMismatch;
+        }
+        if (self.nodes.len == 0) {
+            return elems_out[0..0];
+        }
+
+        var found_n: usize = 0;
+        var stack: [stack_size]u32 = undefined;
+        var stack_n: usize = 1;
+        stack[0] = 0;
+
+        while (stack_n > 0) {
+            stack_n -= 1;
+            const node = &self.nodes[stack[stack_n]];
+            const cull = cullBox(&node.box, camera);
+            if (cull == .outside) {
+                continue;
+            }
+
+            // Every element under an inside node is kept without more tests,
+            // the leaves of a subtree are a contiguous run of elem_order
+            if (node.isLeaf() or (cull == .inside)) {
+                const end: usize = self.subtreeEnd(node);
+                for (self.elem_order[node.start..end]) |ee| {
+                    elems_out[found_n] = ee;
+                    found_n += 1;
+                }
+                continue;
+            }
+
+            const node_ind: u32 = @intCast(node - self.nodes.ptr);
+            stack[stack_n] = node.right;
+            stack[stack_n + 1] = node_ind + 1;
+            stack_n += 2;
+        }
+
+        return elems_out[0..found_n];
+    }
+
+    // One past the last element under node in elem_order
+    fn subtreeEnd(self: *const Self, node: *const BVHNode) usize {
+        var last = node;
+        while (!last.isLeaf()) {
+            last = &self.nodes[last.right];
+        }
+        return last.start + last.count;
+    }
+};
+
+//------------------------------------------------------------------------------
+const testing = std.testing;
+const expect = testing.expect;
+const Vec3f = @import("vecstack.zig").Vec3f;
+const Rotation = @import("rotation.zig").Rotation;
+
+// Triangulated plate at z=0 with grid_n by grid_n nodes and unit spacing
+fn testPlate(allocator: std.mem.Allocator, grid_n: usize) !struct { Coords, Connect } {
+    var coords = try Coords.init(allocator, grid_n * grid_n);
+    for (0..grid_n) |jj| {
+        for (0..grid_n) |ii| {
+            coords.x[jj * grid_n + ii] = @floatFromInt(ii);
+            coords.y[jj * grid_n + ii] = @floatFromInt(jj);
+            coords.z[jj * grid_n + ii] = 0.0;
+        }
+    }
+
+    const elem_n: usize = 2 * (grid_n - 1) * (grid_n - 1);
+    const table = try allocator.alloc(Connect.Index, 3 * elem_n);
+    const row: Connect.Index = @intCast(grid_n);
+    var ee: usize = 0;
+    for (0..grid_n - 1) |jj| {
+        for (0..grid_n - 1) |ii| {
+            const n0: Connect.Index = @intCast(jj * grid_n + ii);
+            const tris = [_]Connect.Index{ n0, n0 + 1, n0 + row,
+                                           n0 + 1, n0 + row + 1, n0 + row };
+            @memcpy(table[3 * ee .. 3 * ee + 6], tris[0..]);
+            ee += 2;
+        }
+    }
+    return .{ coords, .{ .nodes_per_elem = 3, .elem_n = elem_n, .table = table } };
+}
+
+fn expectBoxesNested(bvh: *const ElemBVH) !void {
+    for (bvh.nodes, 0..) |node, nn| {
+        if (node.isLeaf()) {
+            try expect(node.count <= leaf_size);
+            for (bvh.elem_order[node.start..node.start + node.count]) |ee| {
+                for (0..3) |dd| {
+                    try expect(node.box.min[dd] <= bvh.elem_boxes[ee].min[dd]);
+                    try expect(node.box.max[dd] >= bvh.elem_boxes[ee].max[dd]);
+                }
+            }
+        } else {
+            for ([_]usize{ nn + 1, node.right }) |child| {
+                for (0..3) |dd| {
+                    try expect(node.box.min[dd] <= bvh.nodes[child].box.min[dd]);
+                    try expect(node.box.max[dd] >= bvh.nodes[child].box.max[dd]);
+                }
+            }
+        }
+    }
+}
+
+test "ElemBVH holds every element once and refits" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    const coords, const connect = try testPlate(talloc, 21);
+    var bvh = try ElemBVH.init(talloc, &coords, &connect);
+
+    const seen = try talloc.alloc(bool, connect.elem_n);
+    @memset(seen, false);
+    for (bvh.elem_order) |ee| {
+        try expect(!seen[ee]);
+        seen[ee] = true;
+    }
+    try expect(std.mem.allEqual(bool, seen, true));
+    try expect(bvh.subtreeEnd(&bvh.nodes[0]) == connect.elem_n);
+    try expectBoxesNested(&bvh);
+
+    for (0..coords.len) |nn| {
+        coords.z[nn] = 0.1 * coords.x[nn] * coords.y[nn];
+    }
+    try bvh.refit(&coords, &connect);
+    try expectBoxesNested(&bvh);
+    try expect(bvh.nodes[0].box.max[2] == 40.0);
+}
+
+test "ElemBVH.queryFrustum keeps elements in view" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    const coords, const connect = try testPlate(talloc, 41);
+    const bvh = try ElemBVH.init(talloc, &coords, &connect);
+    const found_buff = try talloc.alloc(usize, connect.elem_n);
+
+    // The view is 4 units square centred on (10,30)
+    const pos_arr = [_]f64{ 10.0, 30.0, 100.0 };
+    const roi_arr = [_]f64{ 10.0, 30.0, 0.0 };
+    const camera = Camera.init([_]u32{ 40, 40 },
+                               [_]f64{ 0.05, 0.05 },
+                               Vec3f.initSlice(&pos_arr),
+                               Rotation.init(0.0, 0.0, 0.0),
+                               Vec3f.initSlice(&roi_arr),
+                               50.0,
+                               1);
+
+    const found = try bvh.queryFrustum(&camera, found_buff);
+    try expect(found.len > 0);
+    try expect(found.len < connect.elem_n / 10);
+    std.mem.sort(usize, found, {}, std.sort.asc(usize));
+    for (1..found.len) |ff| {
+        try expect(found[ff - 1] < found[ff]);
+    }
+
+    // Every element with a node inside the view is found
+    var found_ind: usize = 0;
+    for (0..connect.elem_n) |ee| {
+        var in_view = false;
+        for (connect.getElem(ee)) |nn| {
+            in_view = in_view or ((@abs(coords.x[nn] - 10.0) < 1.9)
+                                  and (@abs(coords.y[nn] - 30.0) < 1.9));
+        }
+        while ((found_ind < found.len) and (found[found_ind] < ee)) {
+            found_ind += 1;
+        }
+        if (in_view) {
+            try expect((found_ind < found.len) and (found[found_ind] == ee));
+        }
+    }
+
+    try testing.expectError(ElemIndexError.IndexSizeMismatch,
+                            bvh.queryFrustum(&camera, found_buff[1..]));
+}
@@ -0,0 +1,1015 @@
+const std = @import("std");
+const print = std.debug.print;
+const time = std.time;
+const Instant = time.Instant;
+
+const meshio = @import("meshio.zig");
+const Coords = meshio.Coords;
+const Connect = meshio.Connect;
+const Field = meshio.Field;
+const SimData = meshio.SimData;
+
+//------------------------------------------------------------------------------
+// NETCDF CLASSIC
+//
+// Exodus files written by MOOSE are netCDF-3 classic (version 1) or 64 bit
+// offset (version 2) files. The header holds the dims, global attributes and
+// variables, each variable giving its dims, type and the byte offset of its
+// data. Everything is big endian. Variables whose first dim is the unlimited
+// record dim (time_step in exodus) are interleaved: record r of every record
+// variable is stored together, so one time step of a variable is a single
+// contiguous slab at begin + r*record_bytes. Nothing is read until it is
+// asked for so only the needed arrays and time steps come off disk.
+//
+// netCDF-4 (HDF5) and CDF-5 files are not supported.
+
+pub const ExodusError = error{
+    NcBadMagic,
+    NcUnsupportedVersion,
+    NcBadHeader,
+    NcTruncated,
+    NcValueOutOfRange,
+    NcSlabOutOfRange,
+    ExoDimNotFound,
+    ExoVarNotFound,
+    ExoNodalVarNotFound,
+    ExoBlockNotFound,
+    ExoUnsupportedElem,
+    ExoBadConnect,
+    ExoTimeOutOfRange,
+};
+
+const nc_magic = "CDF";
+const nc_dimension: u32 = 0x0A;
+const nc_variable: u32 = 0x0B;
+const nc_attribute: u32 = 0x0C;
+// numrecs while a file is still being written, the count is then taken from
+// the file size
+const nc_streaming: u32 = 0xFFFFFFFF;
+
+// First guess at the header size, doubled until the whole header is read
+const nc_header_read_init: usize = 1 << 16;
+
+pub const NcType = enum(u32) {
+    byte = 1,
+    char = 2,
+    short = 3,
+    int = 4,
+    float = 5,
+    double = 6,
+
+    pub fn Type(comptime self: NcType) type {
+        return switch (self) {
+            .byte => i8,
+            .char => u8,
+            .short => i16,
+            .int => i32,
+            .float => f32,
+            .double => f64,
+        };
+    }
+
+    pub fn size(self: NcType) usize {
+        return switch (self) {
+            inline else => |nt| @sizeOf(nt.Type()),
+        };
+    }
+};
+
+pub const NcDim = struct {
+    name: []const u8,
+    // Zero for the record dim, the length is then the number of records
+    len: usize,
+};
+
+pub const NcVar = struct {
+    name: []const u8,
+    dim_ids: []const usize,
+    nc_type: NcType,
+    begin: u64,
+    // Values in the whole variable, or in one record for record variables
+    slab_n: usize,
+    is_record: bool,
+    // Exodus element type attribute of connectivity variables, e.g. HEX8
+    elem_type: []const u8 = "",
+};
+
+fn padTo4(len: usize) usize {
+    return std.mem.alignForward(usize, len, 4);
+}
+
+const HeaderParser = struct {
+    bytes: []const u8,
+    pos: usize = 0,
+    version: u8,
+
+    const Self = @This();
+
+    fn take(self: *Self, len: usize) ![]const u8 {
+        if (self.pos + len > self.bytes.len) {
+            return ExodusError.NcTruncated;
+        }
+        const taken = self.bytes[self.pos..self.pos + len];
+        self.pos += len;
+        return taken;
+    }
+
+    fn readU32(self: *Self) !u32 {
+        return std.mem.readInt(u32, (try self.take(4))[0..4], .big);
+    }
+
+    fn readOffset(self: *Self) !u64 {
+        if (self.version == 1) {
+            return try self.readU32();
+        }
+        return std.mem.readInt(u64, (try self.take(8))[0..8], .big);
+    }
+
+    fn readName(self: *Self) ![]const u8 {
+        const len: usize = try self.readU32();
+        const name = try self.take(len);
+        _ = try self.take(padTo4(len) - len);
+        return name;
+    }
+
+    // Lists start with their tag and length, or two zeros when absent
+    fn readListLen(self: *Self, tag: u32) !usize {
+        const list_tag = try self.readU32();
+        const list_len: usize = try self.readU32();
+        if ((list_tag != tag) and ((list_tag != 0) or (list_len != 0))) {
+            return ExodusError.NcBadHeader;
+        }
+        return list_len;
+    }
+
+    // Returns the value of a char attribute called attr_name if there is one
+    fn readAttrs(self: *Self, attr_name: []const u8) !?[]const u8 {
+        var found: ?[]const u8 = null;
+        const attr_n = try self.readListLen(nc_attribute);
+        for (0..attr_n) |_| {
+            const name = try self.readName();
+            const nc_type = std.meta.intToEnum(NcType, try self.readU32())
+                catch return ExodusError.NcBadHeader;
+            const vals_n: usize = try self.readU32();
+            const vals = try self.take(vals_n * nc_type.size());
+            _ = try self.take(padTo4(vals.len) - vals.len);
+            if ((nc_type == .char) and std.mem.eql(u8, name, attr_name)) {
+                found = std.mem.sliceTo(vals, 0);
+            }
+        }
+        return found;
+    }
+};
+
+pub const NcFile = struct {
+    file: std.fs.File,
+    arena: std.heap.ArenaAllocator,
+    version: u8,
+    records_n: usize,
+    record_bytes: usize,
+    dims: []NcDim,
+    vars: []NcVar,
+
+    const Self = @This();
+
+    pub fn open(allocator: std.mem.Allocator,
+                dir: std.fs.Dir,
+                path: []const u8) !Self {
+
+        var file = try dir.openFile(path, .{ .mode = .read_only });
+        errdefer file.close();
+        const file_size: usize = @intCast((try file.stat()).size);
+
+        var arena = std.heap.ArenaAllocator.init(allocator);
+        errdefer arena.deinit();
+        const arena_alloc = arena.allocator();
+
+        // The header is kept as names point into it
+        var read_n: usize = @min(nc_header_read_init, file_size);
+        while (true) : (read_n = @min(2 * read_n, file_size)) {
+            const header = try arena_alloc.alloc(u8, read_n);
+            if (try file.preadAll(header, 0) != read_n) {
+                return ExodusError.NcTruncated;
+            }
+
+            var nc_file = Self{
+                .file = file,
+                .arena = undefined,
+                .version = 0,
+                .records_n = 0,
+                .record_bytes = 0,
+                .dims = &.{},
+                .vars = &.{},
+            };
+            nc_file.parseHeader(arena_alloc, header, file_size) catch |err| {
+                if ((err == ExodusError.NcTruncated) and (read_n < file_size)) {
+                    continue;
+                }
+                return err;
+            };
+            nc_file.arena = arena;
+            return nc_file;
+        }
+    }
+
+    pub fn close(self: *Self) void {
+        self.file.close();
+        self.arena.deinit();
+    }
+
+    fn parseHeader(self: *Self,
+                   arena_alloc: std.mem.Allocator,
+                   header: []const u8,
+                   file_size: usize) !void {
+
+        if ((header.len < 4) or !std.mem.startsWith(u8, header, nc_magic)) {
+            // netCDF-4 files are HDF5 and start with \x89HDF
+            return ExodusError.NcBadMagic;
+        }
+        self.version = header[3];
+        if ((self.version != 1) and (self.version != 2)) {
+            return ExodusError.NcUnsupportedVersion;
+        }
+
+        var parser = HeaderParser{ .bytes = header, .pos = 4, .version = self.version };
+        const records_n = try parser.readU32();
+
+        //----------------------------------------------------------------------
+        const dims_n = try parser.readListLen(nc_dimension);
+        self.dims = try arena_alloc.alloc(NcDim, dims_n);
+        for (self.dims) |*dim| {
+            dim.name = try parser.readName();
+            dim.len = try parser.readU32();
+        }
+
+        // Global attributes are not needed
+        _ = try parser.readAttrs("");
+
+        //----------------------------------------------------------------------
+        const vars_n = try parser.readListLen(nc_variable);
+        self.vars = try arena_alloc.alloc(NcVar, vars_n);
+        var record_vars_n: usize = 0;
+        for (self.vars) |*nc_var| {
+            nc_var.name = try parser.readName();
+
+            const var_dims_n: usize = try parser.readU32();
+            const dim_ids = try arena_alloc.alloc(usize, var_dims_n);
+            for (dim_ids) |*dim_id| {
+                dim_id.* = try parser.readU32();
+                if (dim_id.* >= self.dims.len) {
+                    return ExodusError.NcBadHeader;
+                }
+            }
+            nc_var.dim_ids = dim_ids;
+
+            nc_var.elem_type = (try parser.readAttrs("elem_type")) orelse "";
+            nc_var.nc_type = std.meta.intToEnum(NcType, try parser.readU32())
+                catch return ExodusError.NcBadHeader;
+            // vsize is clipped for large variables so the size is taken from
+            // the dims instead
+            _ = try parser.readU32();
+            nc_var.begin = try parser.readOffset();
+
+            nc_var.is_record = (dim_ids.len > 0) and (self.dims[dim_ids[0]].len == 0);
+            nc_var.slab_n = 1;
+            for (dim_ids[@intFromBool(nc_var.is_record)..]) |dim_id| {
+                nc_var.slab_n *= self.dims[dim_id].len;
+            }
+            if (nc_var.is_record) {
+                record_vars_n += 1;
+                self.record_bytes += padTo4(nc_var.slab_n * nc_var.nc_type.size());
+            } else if (nc_var.begin + nc_var.slab_n * nc_var.nc_type.size() > file_size) {
+                return ExodusError.NcTruncated;
+            }
+        }
+
+        // A single record variable is not padded between records
+        if (record_vars_n == 1) {
+            for (self.vars) |nc_var| {
+                if (nc_var.is_record) {
+                    self.record_bytes = nc_var.slab_n * nc_var.nc_type.size();
+                }
+            }
+        }
+
+        self.records_n = records_n;
+        if ((records_n == nc_streaming) and (self.record_bytes > 0)) {
+            var records_start: usize = file_size;
+            for (self.vars) |nc_var| {
+                if (nc_var.is_record) {
+                    records_start = @min(records_start, nc_var.begin);
+                }
+            }
+            self.records_n = (file_size - records_start) / self.record_bytes;
+        }
+    }
+
+    pub fn findDim(self: *const Self, name: []const u8) ?usize {
+        for (self.dims) |dim| {
+            if (std.mem.eql(u8, dim.name, name)) {
+                return if (dim.len == 0) self.records_n else dim.len;
+            }
+        }
+        return null;
+    }
+
+    pub fn getDim(self: *const Self, name: []const u8) !usize {
+        return self.findDim(name) orelse ExodusError.ExoDimNotFound;
+    }
+
+    pub fn findVar(self: *const Self, name: []const u8) ?*const NcVar {
+        for (self.vars) |*nc_var| {
+            if (std.mem.eql(u8, nc_var.name, name)) {
+                return nc_var;
+            }
+        }
+        return null;
+    }
+
+    pub fn getVar(self: *const Self, name: []const u8) !*const NcVar {
+        return self.findVar(name) orelse ExodusError.ExoVarNotFound;
+    }
+
+    // Reads out.len values starting at elem_start in the slab of record
+    // rec_ind, which is ignored for fixed size variables, converting from the
+    // file type to EType
+    pub fn readSlab(self: *const Self,
+                    comptime EType: type,
+                    nc_var: *const NcVar,
+                    rec_ind: usize,
+                    elem_start: usize,
+                    out: []EType) !void {
+
+        if (elem_start + out.len > nc_var.slab_n) {
+            return ExodusError.NcSlabOutOfRange;
+        }
+        if (nc_var.is_record and (rec_ind >= self.records_n)) {
+            return ExodusError.NcSlabOutOfRange;
+        }
+
+        var offset: u64 = nc_var.begin + elem_start * nc_var.nc_type.size();
+        if (nc_var.is_record) {
+            offset += rec_ind * self.record_bytes;
+        }
+
+        switch (nc_var.nc_type) {
+            inline else => |nt| {
+                const SType = nt.Type();
+                const UType = std.meta.Int(.unsigned, @bitSizeOf(SType));
+
+                // Read through a fixed buffer so nothing is allocated here
+                var chunk: [8192]u8 = undefined;
+                const chunk_n: usize = chunk.len / @sizeOf(SType);
+                var done_n: usize = 0;
+                while (done_n < out.len) {
+                    const read_n: usize = @min(chunk_n, out.len - done_n);
+                    const bytes = chunk[0..read_n * @sizeOf(SType)];
+                    if (try self.file.preadAll(bytes, offset) != bytes.len) {
+                        return ExodusError.NcTruncated;
+                    }
+
+                    for (out[done_n..done_n + read_n], 0..) |*dest, ii| {
+                        const raw = std.mem.readInt(UType,
+                            bytes[ii * @sizeOf(SType)..][0..@sizeOf(SType)], .big);
+                        dest.* = try castValue(EType, SType, @bitCast(raw));
+                    }
+                    done_n += read_n;
+                    offset += bytes.len;
+                }
+            },
+        }
+    }
+
+    // Reads the row of a 2D char variable, e.g. one name of name_nod_var
+    pub fn readString(self: *const Self,
+                      nc_var: *const NcVar,
+                      row_ind: usize,
+                      buff: []u8) ![]const u8 {
+        if ((nc_var.nc_type != .char) or (nc_var.dim_ids.len != 2)) {
+            return ExodusError.NcBadHeader;
+        }
+        const row_len: usize = self.dims[nc_var.dim_ids[1]].len;
+        const str_buff = buff[0..@min(row_len, buff.len)];
+        try self.readSlab(u8, nc_var, 0, row_ind * row_len, str_buff);
+        return std.mem.trimRight(u8, std.mem.sliceTo(str_buff, 0), " ");
+    }
+};
+
+fn castValue(comptime EType: type, comptime SType: type, value: SType) !EType {
+    if (EType == SType) {
+        return value;
+    }
+    return switch (@typeInfo(EType)) {
+        .float => switch (@typeInfo(SType)) {
+            .float => @floatCast(value),
+            else => @floatFromInt(value),
+        },
+        else => switch (@typeInfo(SType)) {
+            .float => ExodusError.NcValueOutOfRange,
+            else => std.math.cast(EType, value) orelse ExodusError.NcValueOutOfRange,
+        },
+    };
+}
+
+//------------------------------------------------------------------------------
+// EXODUS
+//
+// Nodes are stored as coordx, coordy and coordz, or as coord with shape
+// (num_dim,num_nodes) in older files. Element block k is connectK with shape
+// (num_el_in_blkK,num_nod_per_elK) of 1 based node numbers and its block id
+// is eb_prop1[k-1]. Nodal variable k is vals_nod_var{k}, shape=(time_step,
+// num_nodes), named in name_nod_var, older files use a single vals_nod_var
+// with shape=(time_step,num_nod_var,num_nodes).
+
+pub const ElemShape = enum {
+    tri,
+    quad,
+    tet,
+    hex,
+
+    // Higher order elements are rendered with their corner nodes, which
+    // exodus always numbers first
+    pub fn fromName(elem_type: []const u8) !ElemShape {
+        var upper_buff: [32]u8 = undefined;
+        const upper = std.ascii.upperString(upper_buff[0..@min(elem_type.len, 32)],
+                                            elem_type[0..@min(elem_type.len, 32)]);
+        if (std.mem.startsWith(u8, upper, "TET")) {
+            return .tet;
+        } else if (std.mem.startsWith(u8, upper, "HEX")) {
+            return .hex;
+        } else if (std.mem.startsWith(u8, upper, "TRI")) {
+            return .tri;
+        } else if (std.mem.startsWith(u8, upper, "QUAD")
+                   or std.mem.startsWith(u8, upper, "SHELL")) {
+            return .quad;
+        }
+        return ExodusError.ExoUnsupportedElem;
+    }
+
+    pub fn cornersN(self: ElemShape) usize {
+        return switch (self) {
+            .tri => 3,
+            .quad, .tet => 4,
+            .hex => 8,
+        };
+    }
+};
+
+// Element sides by local corner number, wound anti-clockwise seen from
+// outside the element, in exodus side order
+const tet_faces = [4][3]u8{ .{ 0, 1, 3 }, .{ 1, 2, 3 }, .{ 0, 3, 2 }, .{ 0, 2, 1 } };
+const hex_faces = [6][4]u8{ .{ 0, 1, 5, 4 }, .{ 1, 2, 6, 5 }, .{ 2, 3, 7, 6 },
+                            .{ 0, 4, 7, 3 }, .{ 0, 3, 2, 1 }, .{ 4, 5, 6, 7 } };
+
+pub const ElemBlock = struct {
+    id: i64,
+    shape: ElemShape,
+    nodes_per_elem: usize,
+    elem_n: usize,
+    // 0 based node indices, shape=(elem_n,nodes_per_elem)
+    table: []usize,
+
+    pub fn getElem(self: *const ElemBlock, elem_ind: usize) []const usize {
+        return self.table[elem_ind * self.nodes_per_elem..][0..self.nodes_per_elem];
+    }
+};
+
+pub const ExodusReader = struct {
+    nc: NcFile,
+    node_n: usize,
+    dim_n: usize,
+    time_n: usize,
+    block_n: usize,
+    nodal_var_n: usize,
+
+    const Self = @This();
+
+    pub fn open(allocator: std.mem.Allocator,
+                dir: std.fs.Dir,
+                path: []const u8) !Self {
+        var nc = try NcFile.open(allocator, dir, path);
+        errdefer nc.close();
+
+        return .{
+            .node_n = try nc.getDim("num_nodes"),
+            .dim_n = try nc.getDim("num_dim"),
+            .time_n = nc.findDim("time_step") orelse 0,
+            .block_n = nc.findDim("num_el_blk") orelse 0,
+            .nodal_var_n = nc.findDim("num_nod_var") orelse 0,
+            .nc = nc,
+        };
+    }
+
+    pub fn close(self: *Self) void {
+        self.nc.close();
+    }
+
+    pub fn readTimes(self: *const Self, times: []f64) !void {
+        const time_var = try self.nc.getVar("time_whole");
+        for (times, 0..) |*time_val, tt| {
+            try self.nc.readSlab(f64, time_var, tt, 0, time_val[0..1]);
+        }
+    }
+
+    pub fn readCoords(self: *const Self, allocator: std.mem.Allocator) !Coords {
+        var coords = try Coords.init(allocator, self.node_n);
+        errdefer coords.deinit(allocator);
+        @memset(coords.z, 0.0);
+
+        const axes = [_][]f64{ coords.x, coords.y, coords.z };
+        const axis_names = [_][]const u8{ "coordx", "coordy", "coordz" };
+        for (0..@min(self.dim_n, 3)) |dd| {
+            if (self.nc.findVar(axis_names[dd])) |coord_var| {
+                try self.nc.readSlab(f64, coord_var, 0, 0, axes[dd]);
+            } else {
+                const coord_var = try self.nc.getVar("coord");
+                try self.nc.readSlab(f64, coord_var, 0, dd * self.node_n, axes[dd]);
+            }
+        }
+        return coords;
+    }
+
+    pub fn blockId(self: *const Self, block_ind: usize) !i64 {
+        // Files without ids number the blocks from 1
+        const prop_var = self.nc.findVar("eb_prop1") orelse {
+            return @intCast(block_ind + 1);
+        };
+        var block_id: [1]i64 = undefined;
+        try self.nc.readSlab(i64, prop_var, 0, block_ind, block_id[0..]);
+        return block_id[0];
+    }
+
+    pub fn readBlock(self: *const Self,
+                     allocator: std.mem.Allocator,
+                     block_ind: usize) !ElemBlock {
+        if (block_ind >= self.block_n) {
+            return ExodusError.ExoBlockNotFound;
+        }
+
+        var name_buff: [32]u8 = undefined;
+        const connect_name = try std.fmt.bufPrint(name_buff[0..], "connect{d}",
+                                                  .{block_ind + 1});
+        const connect_var = try self.nc.getVar(connect_name);
+        if (connect_var.dim_ids.len != 2) {
+            return ExodusError.ExoBadConnect;
+        }
+
+        const elem_n: usize = self.nc.dims[connect_var.dim_ids[0]].len;
+        const nodes_per_elem: usize = self.nc.dims[connect_var.dim_ids[1]].len;
+        const shape = try ElemShape.fromName(connect_var.elem_type);
+        if (nodes_per_elem < shape.cornersN()) {
+            return ExodusError.ExoBadConnect;
+        }
+
+        const table = try allocator.alloc(usize, elem_n * nodes_per_elem);
+        errdefer allocator.free(table);
+        try self.nc.readSlab(usize, connect_var, 0, 0, table);
+        for (table) |*node_ind| {
+            if ((node_ind.* == 0) or (node_ind.* > self.node_n)) {
+                return ExodusError.ExoBadConnect;
+            }
+            node_ind.* -= 1;
+        }
+
+        return .{
+            .id = try self.blockId(block_ind),
+            .shape = shape,
+            .nodes_per_elem = nodes_per_elem,
+            .elem_n = elem_n,
+            .table = table,
+        };
+    }
+
+    pub fn nodalVarInd(self: *const Self, name: []const u8) !usize {
+        const names_var = self.nc.findVar("name_nod_var")
+            orelse return ExodusError.ExoNodalVarNotFound;
+        var name_buff: [256]u8 = undefined;
+        for (0..self.nodal_var_n) |vv| {
+            const var_name = try self.nc.readString(names_var, vv, name_buff[0..]);
+            if (std.mem.eql(u8, var_name, name)) {
+                return vv;
+            }
+        }
+        return ExodusError.ExoNodalVarNotFound;
+    }
+
+    // Reads nodal variable var_ind at one time step for all nodes
+    pub fn readNodalVar(self: *const Self,
+                        var_ind: usize,
+                        time_ind: usize,
+                        out: []f64) !void {
+        if (time_ind >= self.time_n) {
+            return ExodusError.ExoTimeOutOfRange;
+        }
+
+        var name_buff: [32]u8 = undefined;
+        const var_name = try std.fmt.bufPrint(name_buff[0..], "vals_nod_var{d}",
+                                              .{var_ind + 1});
+        if (self.nc.findVar(var_name)) |nodal_var| {
+            try self.nc.readSlab(f64, nodal_var, time_ind, 0, out[0..self.node_n]);
+        } else {
+            const nodal_var = try self.nc.getVar("vals_nod_var");
+            try self.nc.readSlab(f64, nodal_var, time_ind, var_ind * self.node_n,
+                                 out[0..self.node_n]);
+        }
+    }
+};
+
+//------------------------------------------------------------------------------
+// SURFACE SKINNING
+
+// Sorted corner nodes of a side, triangles use maxInt for the fourth node
+const FaceKey = [4]usize;
+
+fn faceKey(corners: []const usize) FaceKey {
+    var key: FaceKey = @splat(std.math.maxInt(usize));
+    @memcpy(key[0..corners.len], corners);
+    std.mem.sort(usize, key[0..], {}, std.sort.asc(usize));
+    return key;
+}
+
+fn appendFace(tris: *std.ArrayList(usize),
+              allocator: std.mem.Allocator,
+              corners: []const usize) !void {
+    // Quads are split along the 0-2 diagonal keeping the winding
+    try tris.appendSlice(allocator, corners[0..3]);
+    if (corners.len == 4) {
+        try tris.appendSlice(allocator, &.{ corners[0], corners[2], corners[3] });
+    }
+}
+
+// Visits the sides of every element in order, with the side corners as node
+// indices. Surface elements are their own single side.
+fn forEachFace(blocks: []const ElemBlock, context: anytype) !void {
+    var corners_buff: [4]usize = undefined;
+    for (blocks) |*block| {
+        for (0..block.elem_n) |ee| {
+            const elem = block.getElem(ee);
+            switch (block.shape) {
+                .tri, .quad => try context.face(elem[0..block.shape.cornersN()], false),
+                .tet => for (tet_faces) |face| {
+                    for (face, 0..) |local, cc| {
+                        corners_buff[cc] = elem[local];
+                    }
+                    try context.face(corners_buff[0..3], true);
+                },
+                .hex => for (hex_faces) |face| {
+                    for (face, 0..) |local, cc| {
+                        corners_buff[cc] = elem[local];
+                    }
+                    try context.face(corners_buff[0..4], true);
+                },
+            }
+        }
+    }
+}
+
+// Returns the outer surface of the blocks as triangles, three node indices
+// each wound anti-clockwise seen from outside. Sides of volume elements that
+// are shared by two elements are inside the mesh and are dropped, the rest
+// are kept in element and side order.
+pub fn skinBlocks(allocator: std.mem.Allocator,
+                  blocks: []const ElemBlock) ![]usize {
+
+    var face_counts = std.AutoHashMap(FaceKey, u32).init(allocator);
+    defer face_counts.deinit();
+
+    const Counter = struct {
+        counts: *std.AutoHashMap(FaceKey, u32),
+
+        fn face(self: *const @This(), corners: []const usize, volume: bool) !void {
+            if (volume) {
+                const entry = try self.counts.getOrPutValue(faceKey(corners), 0);
+                entry.value_ptr.* += 1;
+            }
+        }
+    };
+    try forEachFace(blocks, Counter{ .counts = &face_counts });
+
+    var tris: std.ArrayList(usize) = .empty;
+    errdefer tris.deinit(allocator);
+
+    const Collector = struct {
+        counts: *const std.AutoHashMap(FaceKey, u32),
+        tris: *std.ArrayList(usize),
+        allocator: std.mem.Allocator,
+
+        fn face(self: *const @This(), corners: []const usize, volume: bool) !void {
+            if (!volume or (self.counts.get(faceKey(corners)) == 1)) {
+                try appendFace(self.tris, self.allocator, corners);
+            }
+        }
+    };
+    try forEachFace(blocks, Collector{ .counts = &face_counts,
+                                       .tris = &tris,
+                                       .allocator = allocator });
+
+    return tris.toOwnedSlice(allocator);
+}
+
+//------------------------------------------------------------------------------
+// SIM DATA
+
+pub const ExodusOpts = struct {
+    // Element block ids to render, null renders every block
+    block_ids: ?[]const i64 = null,
+    // Nodal variables loaded as the fields, in this order
+    nodal_vars: []const []const u8 = &.{ "disp_x", "disp_y", "disp_z" },
+    // Time steps [time_start,time_end) are loaded, null runs to the last step
+    time_start: usize = 0,
+    time_end: ?usize = null,
+    // Time steps are only read when loadTimeStep is called, otherwise all are
+    // read on load
+    lazy: bool = false,
+};
+
+// Surface mesh of an exodus file with the nodes renumbered to only those on
+// the surface, in order of first use. The file stays open so time steps can
+// be read into the field as they are needed. Only deinit() should be used to
+// free this.
+pub const SimDataExodus = struct {
+    sim_data: SimData,
+    reader: ExodusReader,
+    arena: std.heap.ArenaAllocator,
+    // Exodus node index of each surface node
+    node_map: []usize,
+    var_inds: []usize,
+    // Exodus time step of field time index zero
+    time_start: usize,
+    time_loaded: []bool,
+    nodes_buff: []f64,
+
+    const Self = @This();
+
+    // Reads field time index time_ind, relative to time_start, from the file
+    // if it has not been read yet
+    pub fn loadTimeStep(self: *Self, time_ind: usize) !void {
+        if (time_ind >= self.time_loaded.len) {
+            return ExodusError.ExoTimeOutOfRange;
+        }
+        if (self.time_loaded[time_ind]) {
+            return;
+        }
+
+        const field_view = self.sim_data.field.view3();
+        for (self.var_inds, 0..) |var_ind, ff| {
+            try self.reader.readNodalVar(var_ind, self.time_start + time_ind,
+                                         self.nodes_buff);
+            for (self.node_map, 0..) |node_ind, nn| {
+                field_view.setAt(.{ time_ind, nn, ff }, self.nodes_buff[node_ind]);
+            }
+        }
+        self.time_loaded[time_ind] = true;
+    }
+
+    pub fn loadAllTimeSteps(self: *Self) !void {
+        for (0..self.time_loaded.len) |tt| {
+            try self.loadTimeStep(tt);
+        }
+    }
+
+    pub fn deinit(self: *Self) void {
+        self.reader.close();
+        self.arena.deinit();
+    }
+};
+
+pub fn loadSimDataExodus(allocator: std.mem.Allocator,
+                         dir: std.fs.Dir,
+                         path: []const u8,
+                         opts: ExodusOpts) !SimDataExodus {
+
+    var time_start = try Instant.now();
+    var time_end = try Instant.now();
+
+    var reader = try ExodusReader.open(allocator, dir, path);
+    errdefer reader.close();
+
+    var arena = std.heap.ArenaAllocator.init(allocator);
+    errdefer arena.deinit();
+    const arena_alloc = arena.allocator();
+
+    const time_last: usize = opts.time_end orelse reader.time_n;
+    if ((time_last > reader.time_n) or (opts.time_start > time_last)) {
+        return ExodusError.ExoTimeOutOfRange;
+    }
+
+    //--------------------------------------------------------------------------
+    // Skin the selected blocks
+    time_start = try Instant.now();
+    var blocks: std.ArrayList(ElemBlock) = .empty;
+    for (0..reader.block_n) |bb| {
+        if (opts.block_ids) |block_ids| {
+            const block_id = try reader.blockId(bb);
+            if (std.mem.indexOfScalar(i64, block_ids, block_id) == null) {
+                continue;
+            }
+        }
+        try blocks.append(arena_alloc, try reader.readBlock(arena_alloc, bb));
+    }
+    if (blocks.items.len == 0) {
+        return ExodusError.ExoBlockNotFound;
+    }
+
+    const tris = try skinBlocks(arena_alloc, blocks.items);
+    time_end = try Instant.now();
+    const time_skin: f64 = @floatFromInt(time_end.since(time_start));
+
+    //--------------------------------------------------------------------------
+    // Renumber to the surface nodes
+    const no_node = std.math.maxInt(usize);
+    const node_to_surf = try allocator.alloc(usize, reader.node_n);
+    defer allocator.free(node_to_surf);
+    @memset(node_to_surf, no_node);
+
+    var node_map: std.ArrayList(usize) = .empty;
+    const table = try arena_alloc.alloc(Connect.Index, tris.len);
+    for (tris, table) |node_ind, *surf_ind| {
+        if (node_to_surf[node_ind] == no_node) {
+            node_to_surf[node_ind] = node_map.items.len;
+            try node_map.append(arena_alloc, node_ind);
+        }
+        surf_ind.* = std.math.cast(Connect.Index, node_to_surf[node_ind])
+            orelse return meshio.MeshIOError.ConnectIndexOverflow;
+    }
+    const surf_n: usize = node_map.items.len;
+
+    var all_coords = try reader.readCoords(allocator);
+    defer all_coords.deinit(allocator);
+    var coords = try Coords.init(arena_alloc, surf_n);
+    for (node_map.items, 0..) |node_ind, nn| {
+        coords.x[nn] = all_coords.x[node_ind];
+        coords.y[nn] = all_coords.y[node_ind];
+        coords.z[nn] = all_coords.z[node_ind];
+    }
+
+    const connect = Connect{
+        .nodes_per_elem = 3,
+        .elem_n = tris.len / 3,
+        .table = table,
+    };
+
+    //--------------------------------------------------------------------------
+    // Fields
+    const var_inds = try arena_alloc.alloc(usize, opts.nodal_vars.len);
+    for (opts.nodal_vars, var_inds) |var_name, *var_ind| {
+        var_ind.* = reader.nodalVarInd(var_name) catch |err| {
+            print("Exodus: nodal variable '{s}' not found.\n", .{var_name});
+            return err;
+        };
+    }
+
+    const time_n: usize = time_last - opts.time_start;
+    const field = try Field.init(arena_alloc, time_n, surf_n, var_inds.len);
+    const time_loaded = try arena_alloc.alloc(bool, time_n);
+    @memset(time_loaded, false);
+
+    var sim_exodus = SimDataExodus{
+        .sim_data = .{
+            .coords = coords,
+            .connect = connect,
+            .field = field,
+        },
+        .reader = reader,
+        .arena = undefined,
+        .node_map = node_map.items,
+        .var_inds = var_inds,
+        .time_start = opts.time_start,
+        .time_loaded = time_loaded,
+        .nodes_buff = try arena_alloc.alloc(f64, reader.node_n),
+    };
+
+    time_start = try Instant.now();
+    if (!opts.lazy) {
+        try sim_exodus.loadAllTimeSteps();
+    }
+    time_end = try Instant.now();
+    const time_fields: f64 = @floatFromInt(time_end.since(time_start));
+
+    print("\nExodus: nodes={}, blocks={}, time steps={}\n",
+        .{ reader.node_n, blocks.items.len, reader.time_n });
+    print("Exodus: surface nodes={}, triangles={}, skin time = {d:.3}ms\n",
+        .{ surf_n, connect.elem_n, time_skin / time.ns_per_ms });
+    print("Exodus: fields={}, time steps={}, read time = {d:.3}ms{s}\n",
+        .{ var_inds.len, time_n, time_fields / time.ns_per_ms,
+           if (opts.lazy) " (lazy)" else "" });
+
+    sim_exodus.arena = arena;
+    return sim_exodus;
+}
+
+//------------------------------------------------------------------------------
+const testing = std.testing;
+const expect = testing.expect;
+const expectEqual = testing.expectEqual;
+const expectEqualSlices = testing.expectEqualSlices;
+
+// Dot of the triangle normal with the vector from centre to its first node
+fn outwardDot(comptime IndexType: type, 
+              coords: *const Coords, 
+              tri: []const IndexType, 
+              centre: [3]f64) f64 {
+    const p0 = coords.getVec3(tri[0]);
+    const e1 = coords.getVec3(tri[1]).sub(p0);
+    const e2 = coords.getVec3(tri[2]).sub(p0);
+    const normal = [3]f64{ e1.get(1) * e2.get(2) - e1.get(2) * e2.get(1),
+                           e1.get(2) * e2.get(0) - e1.get(0) * e2.get(2),
+                           e1.get(0) * e2.get(1) - e1.get(1) * e2.get(0) };
+    var out_dot: f64 = 0.0;
+    for (0..3) |dd| {
+        out_dot += normal[dd] * (p0.get(dd) - centre[dd]);
+    }
+    return out_dot;
+}
+
+test "exodus.skinBlocks keeps outer sides wound outwards" {
+    const talloc = testing.allocator;
+
+    // Two unit hexes sharing the x = 1 side, nodes 8..11 are at x = 2
+    const positions = [12][3]f64{ .{ 0, 0, 0 }, .{ 1, 0, 0 }, .{ 1, 1, 0 }, .{ 0, 1, 0 },
+                                  .{ 0, 0, 1 }, .{ 1, 0, 1 }, .{ 1, 1, 1 }, .{ 0, 1, 1 },
+                                  .{ 2, 0, 0 }, .{ 2, 0, 1 }, .{ 2, 1, 1 }, .{ 2, 1, 0 } };
+    var coords = try Coords.init(talloc, positions.len);
+    defer coords.deinit(talloc);
+    for (positions, 0..) |pos, nn| {
+        coords.x[nn] = pos[0];
+        coords.y[nn] = pos[1];
+        coords.z[nn] = pos[2];
+    }
+    var table = [_]usize{ 0, 1, 2, 3, 4, 5, 6, 7,
+                          1, 8, 11, 2, 5, 9, 10, 6 };
+
+    const blocks = [_]ElemBlock{.{ .id = 1, .shape = .hex, .nodes_per_elem = 8,
+                                   .elem_n = 2, .table = table[0..] }};
+    const tris = try skinBlocks(talloc, blocks[0..]);
+    defer talloc.free(tris);
+
+    // 10 outer quads as 20 triangles
+    try expectEqual(@as(usize, 60), tris.len);
+    for (0..tris.len / 3) |tt| {
+        try expect(outwardDot(usize, &coords, tris[3 * tt..][0..3], .{ 1.0, 0.5, 0.5 }) > 0.0);
+    }
+
+    // A lone tet keeps all four sides, a shared tri block passes through
+    var tet_table = [_]usize{ 0, 1, 3, 4 };
+    var tri_table = [_]usize{ 0, 1, 2 };
+    const mixed = [_]ElemBlock{
+        .{ .id = 1, .shape = .tet, .nodes_per_elem = 4, .elem_n = 1, .table = tet_table[0..] },
+        .{ .id = 2, .shape = .tri, .nodes_per_elem = 3, .elem_n = 1, .table = tri_table[0..] },
+    };
+    const tet_tris = try skinBlocks(talloc, mixed[0..]);
+    defer talloc.free(tet_tris);
+    try expectEqual(@as(usize, 15), tet_tris.len);
+    try expectEqualSlices(usize, &.{ 0, 1, 4 }, tet_tris[0..3]);
+    try expectEqualSlices(usize, &.{ 0, 1, 2 }, tet_tris[12..15]);
+}
+
+test "exodus.loadSimDataExodus matches the block csv data" {
+    const talloc = testing.allocator;
+
+    // Only runs from the repo root where the data directory is
+    var data_dir = std.fs.cwd().openDir("data/block", .{}) catch return error.SkipZigTest;
+    defer data_dir.close();
+
+    var sim_exo = try loadSimDataExodus(talloc, data_dir, "case25_out.e", .{});
+    defer sim_exo.deinit();
+    const sim_data = &sim_exo.sim_data;
+
+    // The csv files were skinned from this file by pyvale
+    try expectEqual(@as(usize, 24), sim_data.coords.len);
+    try expectEqual(@as(usize, 44), sim_data.connect.elem_n);
+    try expectEqualSlices(usize, &.{ 9, 24, 3 }, sim_data.field.buffer_dims);
+
+    // Every surface triangle faces out of the block
+    var centre = [3]f64{ 0.0, 0.0, 0.0 };
+    for (0..sim_data.coords.len) |nn| {
+        const pos = sim_data.coords.getVec3(nn);
+        for (0..3) |dd| {
+            centre[dd] += pos.get(dd) / @as(f64, @floatFromInt(sim_data.coords.len));
+        }
+    }
+    for (0..sim_data.connect.elem_n) |ee| {
+        try expect(outwardDot(Connect.Index, &sim_data.coords,
+                              sim_data.connect.getElem(ee), centre) > 0.0);
+    }
+
+    // Lazy loading reads the same values one step at a time
+    var sim_lazy = try loadSimDataExodus(talloc, data_dir, "case25_out.e",
+                                         .{ .time_start = 4, .lazy = true });
+    defer sim_lazy.deinit();
+    try expectEqual(@as(usize, 5), sim_lazy.sim_data.field.getTimeN());
+    try sim_lazy.loadTimeStep(3);
+    const field = &sim_data.field;
+    for (0..field.getCoordN()) |nn| {
+        for (0..field.getFieldsN()) |ff| {
+            try expectEqual(field.at(7, nn, ff), sim_lazy.sim_data.field.at(3, nn, ff));
+            try expectEqual(@as(f64, 0.0), sim_lazy.sim_data.field.at(2, nn, ff));
+        }
+    }
+
+    try testing.expectError(ExodusError.ExoNodalVarNotFound,
+        loadSimDataExodus(talloc, data_dir, "case25_out.e",
+                          .{ .nodal_vars = &.{"not_a_var"} }));
+    try testing.expectError(ExodusError.NcBadMagic,
+        loadSimDataExodus(talloc, data_dir, "coords.csv", .{}));
+}
@@ -0,0 +1,890 @@
+const std = @import("std");
+const print = std.debug.print;
+const time = std.time;
+const Instant = time.Instant;
+
+const MatSlice = @import("matslice.zig").MatSlice;
+const NDArray = @import("ndarray.zig").NDArray;
+const npy = @import("npy.zig");
+
+//------------------------------------------------------------------------------
+// FRAME SINKS
+//
+// Raster.rasterFramesToSinks pushes each finished frame, shape=(fields_n,
+// px_y,px_x), to a list of sinks instead of keeping every frame in memory.
+// Frames are pushed from the raster workers so push must be safe to call from
+// several threads at once and frames can arrive in any order. frame_ii is the
+// position of the frame in the rastered list and frame_ind its time step.
+//
+// A sink can also hand out the storage for a frame with frameSlot so the
+// frame is rastered straight into it, the first sink in the list to do this
+// is used and push is then called with the slot itself.
+
+pub const FrameDims = struct {
+    frames_n: usize,
+    fields_n: usize,
+    px_y: usize,
+    px_x: usize,
+
+    pub fn frameLen(self: FrameDims) usize {
+        return self.fields_n * self.px_y * self.px_x;
+    }
+
+    pub fn imageLen(self: FrameDims) usize {
+        return self.px_y * self.px_x;
+    }
+};
+
+pub const FrameSinkError = error{
+    SinkDimsMismatch,
+    SinkFrameOutOfRange,
+    SinkStackSizeMismatch,
+};
+
+pub const FrameSink = struct {
+    ptr: *anyopaque,
+    vtable: *const VTable,
+
+    pub const VTable = struct {
+        begin: *const fn (ptr: *anyopaque, dims: FrameDims) anyerror!void,
+        frameSlot: *const fn (ptr: *anyopaque, frame_ii: usize) ?[]f64,
+        push: *const fn (ptr: *anyopaque,
+                         frame_ii: usize,
+                         frame_ind: usize,
+                         image: []const f64) anyerror!void,
+        end: *const fn (ptr: *anyopaque) anyerror!void,
+    };
+
+    // Builds the interface for a pointer to any struct with begin, push and
+    // end methods matching the vtable, frameSlot is optional.
+    pub fn init(sink_ptr: anytype) FrameSink {
+        const T = @typeInfo(@TypeOf(sink_ptr)).pointer.child;
+        const gen = struct {
+            fn beginErased(ptr: *anyopaque, dims: FrameDims) anyerror!void {
+                const self: *T = @ptrCast(@alignCast(ptr));
+                return self.begin(dims);
+            }
+
+            fn frameSlotErased(ptr: *anyopaque, frame_ii: usize) ?[]f64 {
+                if (!@hasDecl(T, "frameSlot")) {
+                    return null;
+                }
+                const self: *T = @ptrCast(@alignCast(ptr));
+                return self.frameSlot(frame_ii);
+            }
+
+            fn pushErased(ptr: *anyopaque,
+                          frame_ii: usize,
+                          frame_ind: usize,
+                          image: []const f64) anyerror!void {
+                const self: *T = @ptrCast(@alignCast(ptr));
+                return self.push(frame_ii, frame_ind, image);
+            }
+
+            fn endErased(ptr: *anyopaque) anyerror!void {
+                const self: *T = @ptrCast(@alignCast(ptr));
+                return self.end();
+            }
+
+            const vtable = VTable{
+                .begin = beginErased,
+                .frameSlot = frameSlotErased,
+                .push = pushErased,
+                .end = endErased,
+            };
+        };
+
+        return .{ .ptr = sink_ptr, .vtable = &gen.vtable };
+    }
+
+    pub fn begin(self: FrameSink, dims: FrameDims) !void {
+        return self.vtable.begin(self.ptr, dims);
+    }
+
+    pub fn frameSlot(self: FrameSink, frame_ii: usize) ?[]f64 {
+        return self.vtable.frameSlot(self.ptr, frame_ii);
+    }
+
+    pub fn push(self: FrameSink,
+                frame_ii: usize,
+                frame_ind: usize,
+                image: []const f64) !void {
+        return self.vtable.push(self.ptr, frame_ii, frame_ind, image);
+    }
+
+    pub fn end(self: FrameSink) !void {
+        return self.vtable.end(self.ptr);
+    }
+};
+
+fn checkFrameInd(dims: FrameDims, frame_ii: usize, image: []const f64) !void {
+    if (frame_ii >= dims.frames_n) {
+        return FrameSinkError.SinkFrameOutOfRange;
+    }
+    if (image.len != dims.frameLen()) {
+        return FrameSinkError.SinkDimsMismatch;
+    }
+}
+
+//------------------------------------------------------------------------------
+// Keeps every frame in a caller owned array, shape=(frames_n,fields_n,px_y,
+// px_x). Frames are rastered straight into the array.
+pub const MemorySink = struct {
+    frames: *NDArray(f64),
+    dims: FrameDims = undefined,
+
+    const Self = @This();
+
+    pub fn init(frames: *NDArray(f64)) Self {
+        return .{ .frames = frames };
+    }
+
+    pub fn frameSink(self: *Self) FrameSink {
+        return FrameSink.init(self);
+    }
+
+    pub fn begin(self: *Self, dims: FrameDims) !void {
+        const frames_dims = [_]usize{ dims.frames_n, dims.fields_n,
+                                      dims.px_y, dims.px_x };
+        if (!std.mem.eql(usize, self.frames.dims, frames_dims[0..])) {
+            return FrameSinkError.SinkDimsMismatch;
+        }
+        self.dims = dims;
+    }
+
+    pub fn frameSlot(self: *Self, frame_ii: usize) ?[]f64 {
+        const frame_len: usize = self.dims.frameLen();
+        return self.frames.elems[frame_ii*frame_len..(frame_ii + 1)*frame_len];
+    }
+
+    pub fn push(self: *Self,
+                frame_ii: usize,
+                frame_ind: usize,
+                image: []const f64) !void {
+        _ = frame_ind;
+        try checkFrameInd(self.dims, frame_ii, image);
+        const slot = self.frameSlot(frame_ii).?;
+        if (slot.ptr != image.ptr) {
+            @memcpy(slot, image);
+        }
+    }
+
+    pub fn end(self: *Self) !void {
+        _ = self;
+    }
+};
+
+//------------------------------------------------------------------------------
+// Saves one csv file per field and frame named raster_all_field{}_frame{}.csv
+// where the frame is the time step. Every value is formatted as text so this
+// is slow and large, it is kept for plot_images.py.
+pub const CsvSink = struct {
+    out_dir: std.fs.Dir,
+    dims: FrameDims = undefined,
+
+    const Self = @This();
+
+    pub fn init(out_dir: std.fs.Dir) Self {
+        return .{ .out_dir = out_dir };
+    }
+
+    pub fn frameSink(self: *Self) FrameSink {
+        return FrameSink.init(self);
+    }
+
+    pub fn begin(self: *Self, dims: FrameDims) !void {
+        self.dims = dims;
+    }
+
+    pub fn push(self: *Self,
+                frame_ii: usize,
+                frame_ind: usize,
+                image: []const f64) !void {
+        try checkFrameInd(self.dims, frame_ii, image);
+        const image_len: usize = self.dims.imageLen();
+        var name_buff: [1024]u8 = undefined;
+
+        for (0..self.dims.fields_n) |ff| {
+            const file_name = try std.fmt.bufPrint(name_buff[0..],
+                                                   "raster_all_field{d}_frame{d}.csv",
+                                                   .{ ff, frame_ind });
+            const image_mat = try MatSlice(f64).init(
+                @constCast(image[ff*image_len..(ff + 1)*image_len]),
+                self.dims.px_y,
+                self.dims.px_x);
+            try image_mat.saveCSV(self.out_dir, file_name);
+        }
+    }
+
+    pub fn end(self: *Self) !void {
+        _ = self;
+    }
+};
+
+//------------------------------------------------------------------------------
+// Writes all frames to one file as raw native f64 or as a .npy array with
+// shape=(frames_n,fields_n,px_y,px_x). The file is sized up front and each
+// frame is written at its own offset so frames can arrive in any order.
+pub const FileSink = struct {
+    dir: std.fs.Dir,
+    path: []const u8,
+    format: Format,
+    file: ?std.fs.File = null,
+    data_offset: usize = 0,
+    dims: FrameDims = undefined,
+
+    pub const Format = enum {
+        raw,
+        npy,
+    };
+
+    const Self = @This();
+
+    pub fn init(dir: std.fs.Dir, path: []const u8, format: Format) Self {
+        return .{ .dir = dir, .path = path, .format = format };
+    }
+
+    pub fn frameSink(self: *Self) FrameSink {
+        return FrameSink.init(self);
+    }
+
+    pub fn begin(self: *Self, dims: FrameDims) !void {
+        self.dims = dims;
+        const file = try self.dir.createFile(self.path, .{});
+        errdefer file.close();
+
+        self.data_offset = 0;
+        if (self.format == .npy) {
+            var header_buff: [256]u8 = undefined;
+            const shape = [_]usize{ dims.frames_n, dims.fields_n,
+                                    dims.px_y, dims.px_x };
+            const header = try npy.formatHeader(header_buff[0..],
+                                                npy.descr(f64),
+                                                false,
+                                                shape[0..]);
+            try file.pwriteAll(header, 0);
+            self.data_offset = header.len;
+        }
+
+        const file_size: usize = self.data_offset
+                                 + dims.frames_n*dims.frameLen()*@sizeOf(f64);
+        try std.posix.ftruncate(file.handle, file_size);
+        self.file = file;
+    }
+
+    pub fn push(self: *Self,
+                frame_ii: usize,
+                frame_ind: usize,
+                image: []const f64) !void {
+        _ = frame_ind;
+        try checkFrameInd(self.dims, frame_ii, image);
+        const frame_bytes: usize = self.dims.frameLen() * @sizeOf(f64);
+        try self.file.?.pwriteAll(std.mem.sliceAsBytes(image),
+                                  self.data_offset + frame_ii*frame_bytes);
+    }
+
+    pub fn end(self: *Self) !void {
+        if (self.file) |file| {
+            file.close();
+            self.file = null;
+        }
+    }
+};
+
+//------------------------------------------------------------------------------
+// Stack of raw native f64 frames in a shared memory map of the file, each
+// shape=(fields_n,px_y,px_x). Frames are rastered straight into the mapping
+// and written back by the OS. With append the new frames go after the frames
+// already in the file, frames_start is the index of the first new frame. The
+// stack can be read with np.memmap(path, dtype=float, mode='r').reshape(
+// -1,fields_n,px_y,px_x).
+pub const MmapStackSink = struct {
+    dir: std.fs.Dir,
+    path: []const u8,
+    append: bool,
+    file: ?std.fs.File = null,
+    mapping: []align(std.heap.page_size_min) u8 = &.{},
+    frames_start: usize = 0,
+    dims: FrameDims = undefined,
+
+    const Self = @This();
+
+    pub fn init(dir: std.fs.Dir, path: []const u8, append: bool) Self {
+        return .{ .dir = dir, .path = path, .append = append };
+    }
+
+    pub fn frameSink(self: *Self) FrameSink {
+        return FrameSink.init(self);
+    }
+
+    pub fn begin(self: *Self, dims: FrameDims) !void {
+        self.dims = dims;
+        const frame_bytes: usize = dims.frameLen() * @sizeOf(f64);
+
+        const file = try self.dir.createFile(self.path,
+                                             .{ .read = true,
+                                                .truncate = !self.append });
+        errdefer file.close();
+
+        const file_size: usize = @intCast((try file.stat()).size);
+        if ((frame_bytes == 0) or (file_size % frame_bytes != 0)) {
+            return FrameSinkError.SinkStackSizeMismatch;
+        }
+        self.frames_start = file_size / frame_bytes;
+
+        const stack_size: usize = file_size + dims.frames_n*frame_bytes;
+        try std.posix.ftruncate(file.handle, stack_size);
+        if (stack_size > 0) {
+            self.mapping = try std.posix.mmap(null,
+                                              stack_size,
+                                              std.posix.PROT.READ | std.posix.PROT.WRITE,
+                                              .{ .TYPE = .SHARED },
+                                              file.handle,
+                                              0);
+        }
+        self.file = file;
+    }
+
+    pub fn frameSlot(self: *Self, frame_ii: usize) ?[]f64 {
+        const frame_len: usize = self.dims.frameLen();
+        const frame_bytes: usize = frame_len * @sizeOf(f64);
+        const start: usize = (self.frames_start + frame_ii) * frame_bytes;
+        const bytes: []align(@alignOf(f64)) u8 =
+            @alignCast(self.mapping[start..start + frame_bytes]);
+        return std.mem.bytesAsSlice(f64, bytes);
+    }
+
+    pub fn push(self: *Self,
+                frame_ii: usize,
+                frame_ind: usize,
+                image: []const f64) !void {
+        _ = frame_ind;
+        try checkFrameInd(self.dims, frame_ii, image);
+        const slot = self.frameSlot(frame_ii).?;
+        if (slot.ptr != image.ptr) {
+            @memcpy(slot, image);
+        }
+    }
+
+    pub fn end(self: *Self) !void {
+        if (self.mapping.len > 0) {
+            std.posix.munmap(self.mapping);
+            self.mapping = &.{};
+        }
+        if (self.file) |file| {
+            file.close();
+            self.file = null;
+        }
+    }
+};
+
+//------------------------------------------------------------------------------
+// Saves one 16 bit greyscale TIFF per field and frame named
+// raster_all_field{}_frame{}.tiff. Values are mapped linearly from the field
+// range to [0,65535] and clipped, without a range each image is scaled to its
+// own min and max. The range used is saved in the image description as
+// "min=<v> max=<v>" so the values can be recovered to within 1/65535 of it.
+pub const TiffSink = struct {
+    out_dir: std.fs.Dir,
+    // One [min,max] per field or null to use the range of each image
+    field_ranges: ?[]const [2]f64,
+    dims: FrameDims = undefined,
+
+    const Self = @This();
+
+    pub fn init(out_dir: std.fs.Dir, field_ranges: ?[]const [2]f64) Self {
+        return .{ .out_dir = out_dir, .field_ranges = field_ranges };
+    }
+
+    pub fn frameSink(self: *Self) FrameSink {
+        return FrameSink.init(self);
+    }
+
+    pub fn begin(self: *Self, dims: FrameDims) !void {
+        if (self.field_ranges) |ranges| {
+            if (ranges.len != dims.fields_n) {
+                return FrameSinkError.SinkDimsMismatch;
+            }
+        }
+        self.dims = dims;
+    }
+
+    pub fn push(self: *Self,
+                frame_ii: usize,
+                frame_ind: usize,
+                image: []const f64) !void {
+        try checkFrameInd(self.dims, frame_ii, image);
+        const image_len: usize = self.dims.imageLen();
+        var name_buff: [1024]u8 = undefined;
+
+        for (0..self.dims.fields_n) |ff| {
+            const field_image = image[ff*image_len..(ff + 1)*image_len];
+            const range: [2]f64 = if (self.field_ranges) |ranges| ranges[ff]
+                else .{ std.mem.min(f64, field_image),
+                        std.mem.max(f64, field_image) };
+
+            const file_name = try std.fmt.bufPrint(name_buff[0..],
+                                                   "raster_all_field{d}_frame{d}.tiff",
+                                                   .{ ff, frame_ind });
+            try saveTiff16(self.out_dir, file_name, field_image,
+                           self.dims.px_x, self.dims.px_y, range);
+        }
+    }
+
+    pub fn end(self: *Self) !void {
+        _ = self;
+    }
+};
+
+pub fn quantise16(value: f64, range: [2]f64) u16 {
+    const span: f64 = range[1] - range[0];
+    if (!(span > 0.0)) {
+        return 0;
+    }
+    const unit: f64 = std.math.clamp((value - range[0]) / span, 0.0, 1.0);
+    return @intFromFloat(@round(unit * 65535.0));
+}
+
+const TiffTag = enum(u16) {
+    image_width = 256,
+    image_length = 257,
+    bits_per_sample = 258,
+    compression = 259,
+    photometric = 262,
+    image_description = 270,
+    strip_offsets = 273,
+    samples_per_pixel = 277,
+    rows_per_strip = 278,
+    strip_byte_counts = 279,
+    sample_format = 339,
+};
+
+const TiffType = enum(u16) {
+    ascii = 2,
+    short = 3,
+    long = 4,
+};
+
+const tiff_entries_n: usize = 11;
+
+fn writeTiffEntry(writer: *std.Io.Writer,
+                  tag: TiffTag,
+                  tiff_type: TiffType,
+                  count: u32,
+                  value: u32) !void {
+    try writer.writeInt(u16, @intFromEnum(tag), .little);
+    try writer.writeInt(u16, @intFromEnum(tiff_type), .little);
+    try writer.writeInt(u32, count, .little);
+    // Shorts are left justified in the four byte value field
+    if (tiff_type == .short) {
+        try writer.writeInt(u16, @intCast(value), .little);
+        try writer.writeInt(u16, 0, .little);
+    } else {
+        try writer.writeInt(u32, value, .little);
+    }
+}
+
+// Little endian baseline TIFF with a single uncompressed strip. The header,
+// directory and description come first so the pixels are streamed last.
+pub fn saveTiff16(out_dir: std.fs.Dir,
+                  file_name: []const u8,
+                  image: []const f64,
+                  width: usize,
+                  height: usize,
+                  range: [2]f64) !void {
+
+    var desc_buff: [128]u8 = undefined;
+    const desc = try std.fmt.bufPrint(desc_buff[0..], "min={e} max={e}\x00",
+                                      .{ range[0], range[1] });
+
+    const ifd_offset: u32 = 8;
+    const ifd_len: u32 = @intCast(2 + tiff_entries_n*12 + 4);
+    const desc_offset: u32 = ifd_offset + ifd_len;
+    const pixels_offset: u32 = std.mem.alignForward(u32,
+                                                    desc_offset + @as(u32, @intCast(desc.len)),
+                                                    2);
+    const pixels_bytes: u32 = @intCast(width * height * @sizeOf(u16));
+
+    const tiff_file = try out_dir.createFile(file_name, .{});
+    defer tiff_file.close();
+
+    var write_buf: [8192]u8 = undefined;
+    var file_writer = tiff_file.writer(&write_buf);
+    const writer = &file_writer.interface;
+
+    try writer.writeAll("II");
+    try writer.writeInt(u16, 42, .little);
+    try writer.writeInt(u32, ifd_offset, .little);
+
+    // Entries must be in increasing tag order
+    try writer.writeInt(u16, @intCast(tiff_entries_n), .little);
+    try writeTiffEntry(writer, .image_width, .long, 1, @intCast(width));
+    try writeTiffEntry(writer, .image_length, .long, 1, @intCast(height));
+    try writeTiffEntry(writer, .bits_per_sample, .short, 1, 16);
+    try writeTiffEntry(writer, .compression, .short, 1, 1);
+    try writeTiffEntry(writer, .photometric, .short, 1, 1);
+    try writeTiffEntry(writer, .image_description, .ascii,
+                       @intCast(desc.len), desc_offset);
+    try writeTiffEntry(writer, .strip_offsets, .long, 1, pixels_offset);
+    try writeTiffEntry(writer, .samples_per_pixel, .short, 1, 1);
+    try writeTiffEntry(writer, .rows_per_strip, .long, 1, @intCast(height));
+    try writeTiffEntry(writer, .strip_byte_counts, .long, 1, pixels_bytes);
+    try writeTiffEntry(writer, .sample_format, .short, 1, 1);
+    try writer.writeInt(u32, 0, .little);
+
+    try writer.writeAll(desc);
+    try writer.splatByteAll(0, pixels_offset - desc_offset - desc.len);
+
+    // Quantised in chunks so the writer gets whole blocks of bytes
+    var chunk: [4096]u16 = undefined;
+    var start: usize = 0;
+    while (start < image.len) : (start += chunk.len) {
+        const chunk_n: usize = @min(chunk.len, image.len - start);
+        for (image[start..start + chunk_n], chunk[0..chunk_n]) |value, *quant| {
+            quant.* = std.mem.nativeToLittle(u16, quantise16(value, range));
+        }
+        try writer.writeAll(std.mem.sliceAsBytes(chunk[0..chunk_n]));
+    }
+
+    try writer.flush();
+}
+
+//------------------------------------------------------------------------------
+// Drops every frame, used to time rastering without any output
+pub const NullSink = struct {
+    frames_n: std.atomic.Value(usize) = std.atomic.Value(usize).init(0),
+
+    const Self = @This();
+
+    pub fn frameSink(self: *Self) FrameSink {
+        return FrameSink.init(self);
+    }
+
+    pub fn begin(self: *Self, dims: FrameDims) !void {
+        _ = dims;
+        self.frames_n.store(0, .monotonic);
+    }
+
+    pub fn push(self: *Self,
+                frame_ii: usize,
+                frame_ind: usize,
+                image: []const f64) !void {
+        _ = frame_ii;
+        _ = frame_ind;
+        _ = image;
+        _ = self.frames_n.fetchAdd(1, .monotonic);
+    }
+
+    pub fn end(self: *Self) !void {
+        _ = self;
+    }
+};
+
+//------------------------------------------------------------------------------
+// Passes frames to another sink on a background writer thread so rastering
+// does not wait on I/O. Each pushed frame is copied into one of buffers_n
+// frame buffers, push only blocks when all of them are still queued. An error
+// from the inner sink is returned by the next push or by end.
+pub const ThreadedSink = struct {
+    allocator: std.mem.Allocator,
+    inner: FrameSink,
+    buffers_n: usize,
+
+    mutex: std.Thread.Mutex = .{},
+    cond: std.Thread.Condition = .{},
+    thread: ?std.Thread = null,
+    dims: FrameDims = undefined,
+    buffers: []f64 = &.{},
+    // Stack of free buffer indices and a ring of queued frames
+    free_inds: []usize = &.{},
+    free_n: usize = 0,
+    queue: []Queued = &.{},
+    queue_head: usize = 0,
+    queue_n: usize = 0,
+    closing: bool = false,
+    err: ?anyerror = null,
+    // Time push spent waiting for a free buffer, summed over all threads
+    time_wait: f64 = 0.0,
+
+    const Queued = struct {
+        frame_ii: usize,
+        frame_ind: usize,
+        buff_ind: usize,
+    };
+
+    const Self = @This();
+
+    pub fn init(allocator: std.mem.Allocator,
+                inner: FrameSink,
+                buffers_n: usize) Self {
+        return .{
+            .allocator = allocator,
+            .inner = inner,
+            .buffers_n = @max(buffers_n, 1),
+        };
+    }
+
+    pub fn deinit(self: *Self) void {
+        self.allocator.free(self.buffers);
+        self.allocator.free(self.free_inds);
+        self.allocator.free(self.queue);
+        self.buffers = &.{};
+        self.free_inds = &.{};
+        self.queue = &.{};
+    }
+
+    pub fn frameSink(self: *Self) FrameSink {
+        return FrameSink.init(self);
+    }
+
+    pub fn begin(self: *Self, dims: FrameDims) !void {
+        try self.inner.begin(dims);
+        self.deinit();
+
+        self.dims = dims;
+        self.buffers = try self.allocator.alloc(f64, self.buffers_n*dims.frameLen());
+        self.free_inds = try self.allocator.alloc(usize, self.buffers_n);
+        self.queue = try self.allocator.alloc(Queued, self.buffers_n);
+        for (0..self.buffers_n) |bb| {
+            self.free_inds[bb] = bb;
+        }
+        self.free_n = self.buffers_n;
+        self.queue_head = 0;
+        self.queue_n = 0;
+        self.closing = false;
+        self.err = null;
+        self.time_wait = 0.0;
+
+        self.thread = try std.Thread.spawn(.{}, writeQueued, .{self});
+    }
+
+    fn frameBuffer(self: *const Self, buff_ind: usize) []f64 {
+        const frame_len: usize = self.dims.frameLen();
+        return self.buffers[buff_ind*frame_len..(buff_ind + 1)*frame_len];
+    }
+
+    pub fn push(self: *Self,
+                frame_ii: usize,
+                frame_ind: usize,
+                image: []const f64) !void {
+        try checkFrameInd(self.dims, frame_ii, image);
+
+        const time_start = try Instant.now();
+        self.mutex.lock();
+        while ((self.free_n == 0) and (self.err == null)) {
+            self.cond.wait(&self.mutex);
+        }
+        if (self.err) |err| {
+            self.mutex.unlock();
+            return err;
+        }
+        self.free_n -= 1;
+        const buff_ind: usize = self.free_inds[self.free_n];
+        const time_end = try Instant.now();
+        self.time_wait += @floatFromInt(time_end.since(time_start));
+        self.mutex.unlock();
+
+        @memcpy(self.frameBuffer(buff_ind), image);
+
+        self.mutex.lock();
+        const queue_ind: usize = (self.queue_head + self.queue_n) % self.queue.len;
+        self.queue[queue_ind] = .{
+            .frame_ii = frame_ii,
+            .frame_ind = frame_ind,
+            .buff_ind = buff_ind,
+        };
+        self.queue_n += 1;
+        self.mutex.unlock();
+        self.cond.broadcast();
+    }
+
+    fn writeQueued(self: *Self) void {
+        self.mutex.lock();
+        defer self.mutex.unlock();
+
+        while (true) {
+            while ((self.queue_n == 0) and !self.closing) {
+                self.cond.wait(&self.mutex);
+            }
+            // Only stop once everything queued has been written
+            if (self.queue_n == 0) {
+                break;
+            }
+
+            const queued = self.queue[self.queue_head];
+            self.queue_head = (self.queue_head + 1) % self.queue.len;
+            self.queue_n -= 1;
+
+            // Frames are dropped after the first error
+            if (self.err == null) {
+                self.mutex.unlock();
+                const result = self.inner.push(queued.frame_ii,
+                                               queued.frame_ind,
+                                               self.frameBuffer(queued.buff_ind));
+                self.mutex.lock();
+                result catch |err| {
+                    self.err = self.err orelse err;
+                };
+            }
+
+            self.free_inds[self.free_n] = queued.buff_ind;
+            self.free_n += 1;
+            self.cond.broadcast();
+        }
+    }
+
+    pub fn end(self: *Self) !void {
+        if (self.thread) |thread| {
+            self.mutex.lock();
+            self.closing = true;
+            self.mutex.unlock();
+            self.cond.broadcast();
+
+            thread.join();
+            self.thread = null;
+        }
+
+        // The inner sink is always ended so its files are closed
+        const inner_result = self.inner.end();
+        if (self.err) |err| {
+            return err;
+        }
+        try inner_result;
+    }
+};
+
+//------------------------------------------------------------------------------
+const testing = std.testing;
+const expect = testing.expect;
+const expectEqual = testing.expectEqual;
+const expectEqualSlices = testing.expectEqualSlices;
+const expectError = testing.expectError;
+
+// Pushes frames in reverse order with frame value = frame_ind + pixel index
+fn pushTestFrames(sink: FrameSink, dims: FrameDims, image: []f64) !void {
+    try sink.begin(dims);
+    var ii: usize = dims.frames_n;
+    while (ii > 0) {
+        ii -= 1;
+        const slot = sink.frameSlot(ii) orelse image;
+        for (slot, 0..) |*px, pp| {
+            px.* = @as(f64, @floatFromInt(10*ii + pp)) * 0.5;
+        }
+        try sink.push(ii, 10*ii, slot);
+    }
+    try sink.end();
+}
+
+// Reads a whole test file into buff and returns the bytes read
+fn readTestFile(dir: std.fs.Dir, path: []const u8, buff: []u8) ![]u8 {
+    const file = try dir.openFile(path, .{});
+    defer file.close();
+    const read_n = try file.preadAll(buff, 0);
+    return buff[0..read_n];
+}
+
+fn expectTestFrames(dims: FrameDims, frames: []const f64) !void {
+    const frame_len: usize = dims.frameLen();
+    try expectEqual(dims.frames_n*frame_len, frames.len);
+    for (0..dims.frames_n) |ii| {
+        for (0..frame_len) |pp| {
+            try expectEqual(@as(f64, @floatFromInt(10*ii + pp)) * 0.5,
+                            frames[ii*frame_len + pp]);
+        }
+    }
+}
+
+test "framesink memory, file and threaded sinks" {
+    const talloc = testing.allocator;
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    const dims = FrameDims{ .frames_n = 5, .fields_n = 2, .px_y = 3, .px_x = 4 };
+    const image = try talloc.alloc(f64, dims.frameLen());
+    defer talloc.free(image);
+
+    // Memory
+    const frames_mem = try talloc.alloc(f64, dims.frames_n*dims.frameLen());
+    defer talloc.free(frames_mem);
+    var frames_dims = [_]usize{ dims.frames_n, dims.fields_n, dims.px_y, dims.px_x };
+    var frames_arr = try NDArray(f64).init(talloc, frames_mem, frames_dims[0..]);
+    defer frames_arr.deinit(talloc);
+    var memory_sink = MemorySink.init(&frames_arr);
+    try pushTestFrames(memory_sink.frameSink(), dims, image);
+    try expectTestFrames(dims, frames_arr.elems);
+
+    // Room for two runs of frames and a header
+    const file_buff = try talloc.alloc(f64, 2*dims.frames_n*dims.frameLen() + 64);
+    defer talloc.free(file_buff);
+
+    // Raw and npy files through the background writer
+    inline for (.{ FileSink.Format.raw, FileSink.Format.npy }) |format| {
+        var file_sink = FileSink.init(tmp_dir.dir, "frames.bin", format);
+        var threaded_sink = ThreadedSink.init(talloc, file_sink.frameSink(), 2);
+        defer threaded_sink.deinit();
+        try pushTestFrames(threaded_sink.frameSink(), dims, image);
+
+        const bytes = try readTestFile(tmp_dir.dir, "frames.bin",
+                                       std.mem.sliceAsBytes(file_buff));
+        var data_offset: usize = 0;
+        if (format == .npy) {
+            try expect(std.mem.startsWith(u8, bytes, npy.magic));
+            data_offset = 10 + std.mem.readInt(u16, bytes[8..10], .little);
+            try expect(std.mem.indexOf(u8, bytes[0..data_offset], 
+                                       "'shape': (5, 2, 3, 4)") != null);
+            try expect(std.mem.indexOf(u8, bytes[0..data_offset], 
+                                       npy.descr(f64)) != null);
+        }
+        const frames_bytes: []align(8) u8 = @alignCast(bytes[data_offset..]);
+        try expectTestFrames(dims, std.mem.bytesAsSlice(f64, frames_bytes));
+    }
+
+    // Memory mapped stack, the second run appends
+    for (0..2) |rr| {
+        var stack_sink = MmapStackSink.init(tmp_dir.dir, "stack.bin", rr > 0);
+        try pushTestFrames(stack_sink.frameSink(), dims, image);
+        try expectEqual(rr*dims.frames_n, stack_sink.frames_start);
+    }
+    const stack: []align(8) u8 = @alignCast(try readTestFile(
+        tmp_dir.dir, "stack.bin", std.mem.sliceAsBytes(file_buff)));
+    const stack_frames = std.mem.bytesAsSlice(f64, stack);
+    const run_len: usize = dims.frames_n*dims.frameLen();
+    try expectTestFrames(dims, stack_frames[0..run_len]);
+    try expectTestFrames(dims, stack_frames[run_len..]);
+
+    var null_sink = NullSink{};
+    try pushTestFrames(null_sink.frameSink(), dims, image);
+    try expectEqual(dims.frames_n, null_sink.frames_n.load(.monotonic));
+}
+
+test "framesink tiff sink quantises to 16 bit" {
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    try expectEqual(@as(u16, 0), quantise16(-2.0, .{ -1.0, 1.0 }));
+    try expectEqual(@as(u16, 32768), quantise16(0.0, .{ -1.0, 1.0 }));
+    try expectEqual(@as(u16, 65535), quantise16(7.0, .{ -1.0, 1.0 }));
+    try expectEqual(@as(u16, 0), quantise16(1.0, .{ 1.0, 1.0 }));
+
+    const dims = FrameDims{ .frames_n = 1, .fields_n = 1, .px_y = 2, .px_x = 3 };
+    const image = [_]f64{ 0.0, 1.0, 2.0, 3.0, 4.0, 5.0 };
+    var tiff_sink = TiffSink.init(tmp_dir.dir, null);
+    const sink = tiff_sink.frameSink();
+    try sink.begin(dims);
+    try sink.push(0, 4, image[0..]);
+    try sink.end();
+
+    var file_buff: [512]u8 = undefined;
+    const bytes = try readTestFile(tmp_dir.dir, "raster_all_field0_frame4.tiff",
+                                   file_buff[0..]);
+    try expect(std.mem.startsWith(u8, bytes, "II"));
+    try expectEqual(@as(u16, 42), std.mem.readInt(u16, bytes[2..4], .little));
+
+    const pixels = bytes[bytes.len - image.len*2..];
+    try expectEqual(@as(u16, 0), std.mem.readInt(u16, pixels[0..2], .little));
+    try expectEqual(@as(u16, 13107), std.mem.readInt(u16, pixels[2..4], .little));
+    try expectEqual(@as(u16, 65535), std.mem.readInt(u16, pixels[10..12], .little));
+
+    try expectError(FrameSinkError.SinkFrameOutOfRange,
+                    tiff_sink.push(1, 0, image[0..]));
+}
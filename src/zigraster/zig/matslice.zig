@@ -9,6 +9,7 @@ const expectEqualSlices = testing.expectEqualSlices;
 
 const VecSlice = @import("vecslice.zig").VecSlice;
 const sliceops = @import("sliceops.zig");
+const npy = @import("npy.zig");
 
 pub fn MatSlice(comptime EType: type) type {
     return struct {
@@ -48,14 +49,24 @@ pub fn MatSlice(comptime EType: type) type {
             self.fillDiag(0, 1);
         }
 
-        pub fn get(self: *const Self, row: usize, col: usize) EType {
+        // Bounds are only asserted, so get, set and getRow are unchecked in
+        // ReleaseFast and ReleaseSmall builds
+        pub inline fn get(self: *const Self, row: usize, col: usize) EType {
+            assert((row < self.rows_n) and (col < self.cols_n));
             return self.elems[(row * self.cols_n) + col];
         }
 
-        pub fn set(self: *Self, row: usize, col: usize, val: EType) void {
+        pub inline fn set(self: *Self, row: usize, col: usize, val: EType) void {
+            assert((row < self.rows_n) and (col < self.cols_n));
             self.elems[(row * self.cols_n) + col] = val;
         }
 
+        pub inline fn getRow(self: *const Self, row_ind: usize) []EType {
+            assert(row_ind < self.rows_n);
+            const start_ind: usize = row_ind*self.cols_n;
+            return self.elems[start_ind..start_ind + self.cols_n];
+        }
+
         pub fn transpose(self: *Self, buffer: *Self) !void {
             assert(self.cols_n == buffer.cols_n);
             assert(self.rows_n == buffer.rows_n);
@@ -138,6 +149,13 @@ pub fn MatSlice(comptime EType: type) type {
             print("\n", .{});
         }
 
+        pub fn saveNpy(self: *const Self,
+                       out_dir: std.fs.Dir,
+                       file_name: []const u8) !void {
+            const shape = [_]usize{ self.rows_n, self.cols_n };
+            try npy.saveSlice(EType, out_dir, file_name, shape[0..], self.elems);
+        }
+
         pub fn saveCSV(self: *const Self, 
                        out_dir: std.fs.Dir, 
                        file_name: []const u8) !void {
@@ -262,6 +280,14 @@ pub fn MatSliceOps(comptime EType: type) type {
 const TestType = f64;
 const talloc = testing.allocator;
 
+test "MatSlice.getRow" {
+    var elems = [_]f64{ 0, 1, 2, 3, 4, 5 };
+    const mat = try MatSlice(f64).init(elems[0..], 2, 3);
+
+    try expectEqualSlices(f64, elems[3..6], mat.getRow(1));
+    try expectEqual(mat.get(1, 2), 5);
+}
+
 test "MatSlice.getSlice" {
 	const rows: usize = 3;
     const cols: usize = 4;
@@ -545,3 +571,17 @@ test "MatSliceOps.mulMat" {
     try expectEqualSlices(TestType, mat_exp.elems, mat_out.elems);
 }
 
+
+test "MatSlice.saveNpy" {
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    var m0 = [_]TestType{ 1, 2, 3, 4, 5, 6 };
+    const mat0 = try MatSlice(TestType).init(&m0, 2, 3);
+    try mat0.saveNpy(tmp_dir.dir, "mat0.npy");
+
+    var mapped = try npy.NpyMapped.mapFile(tmp_dir.dir, "mat0.npy");
+    defer mapped.deinit();
+    try expectEqualSlices(usize, &.{ 2, 3 }, mapped.view.header.shape());
+    try expectEqualSlices(TestType, mat0.elems, try mapped.view.slice(TestType));
+}
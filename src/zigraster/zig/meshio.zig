@@ -8,6 +8,8 @@ const slice = @import("sliceops.zig");
 
 const MatSlice = @import("matslice.zig").MatSlice;
 const NDArray = @import("ndarray.zig").NDArray;
+const NDView = @import("ndarray.zig").NDView;
+const npy = @import("npy.zig");
 
 
 // TODO: this should wrap a MatSlice and allocate a buffer
@@ -43,23 +45,50 @@ pub const Coords = struct {
 
 // TODO; this should wrap a MatSlice and allocate a buffer. Note: Row major so 
 // we need to have dims=[elem_num,node_nums]
-pub const Connect = struct {
-    nodes_per_elem: u8,
-    elem_n: usize,
-    table: []usize,
+//
+// Node indices are stored as IndexType. Connect uses u32, which covers any
+// mesh we raster in half the memory of usize, ConnectT(usize) is only needed
+// to view tables owned by someone else.
+pub fn ConnectT(comptime IndexType: type) type {
+    return struct {
+        nodes_per_elem: u8,
+        elem_n: usize,
+        table: []IndexType,
+
+        const Self: type = @This();
+        pub const Index: type = IndexType;
+
+        pub fn getElem(self: *const Self, elem_num: usize) []IndexType {
+            const ind_start: usize = elem_num * self.nodes_per_elem;
+            const ind_end: usize = ind_start + self.nodes_per_elem;
+            return self.table[ind_start..ind_end];
+        }
 
-    const Self: type = @This();
+        pub fn getInd(self: *const Self, elem_num: usize, node_num: usize) usize {
+            return self.table[elem_num * self.nodes_per_elem + node_num];
+        }
 
-    pub fn getElem(self: *const Self, elem_num: usize) []usize {
-        const ind_start: usize = elem_num * self.nodes_per_elem;
-        const ind_end: usize = ind_start + self.nodes_per_elem;
-        return self.table[ind_start..ind_end];
-    }
+        // Copies the table into one with another index type, fails if a node
+        // index does not fit
+        pub fn convert(self: *const Self, 
+                       comptime OtherIndex: type,
+                       allocator: std.mem.Allocator) !ConnectT(OtherIndex) {
+            const table = try allocator.alloc(OtherIndex, self.table.len);
+            errdefer allocator.free(table);
+            for (self.table, table) |node_ind, *node_other| {
+                node_other.* = std.math.cast(OtherIndex, node_ind)
+                    orelse return MeshIOError.ConnectIndexOverflow;
+            }
+            return .{
+                .nodes_per_elem = self.nodes_per_elem,
+                .elem_n = self.elem_n,
+                .table = table,
+            };
+        }
+    };
+}
 
-    pub fn getInd(self: *const Self, elem_num: usize, node_num: usize) usize {
-        return self.table[elem_num * self.nodes_per_elem + node_num];
-    }
-};
+pub const Connect = ConnectT(u32);
 
 
 pub const Field = struct {
@@ -89,6 +118,40 @@ pub const Field = struct {
         };
     }
 
+    // Wraps existing field values without copying them. The array is always
+    // indexed as [time,coord,field] and the strides give where each of these
+    // indices steps in memory, e.g. [fields_n,time_n*fields_n,1] for values 
+    // stored with shape=(coord_n,time_n,fields_n).
+    pub fn initView(alloc: std.mem.Allocator, elems: []f64, time_n: usize, 
+                    coord_n: usize, fields_n: usize, strides: [3]usize) !Self {
+
+        var buff_dims = try alloc.alloc(usize,3);
+        buff_dims[0] = time_n;
+        buff_dims[1] = coord_n;
+        buff_dims[2] = fields_n;
+
+        const arr = try NDArray(f64).init(alloc,elems,buff_dims);
+        @memcpy(arr.strides, strides[0..]);
+
+        return .{
+            .array = arr,
+            .buffer_dims = buff_dims,
+            .buffer_array = elems,
+        };
+    }
+
+    // Unchecked [time,coord,field] view for hot loops, see NDView
+    pub fn view3(self: *const Self) NDView(f64, 3) {
+        return self.array.view3() catch unreachable;
+    }
+
+    pub inline fn at(self: *const Self, 
+                     time_ind: usize, 
+                     coord_ind: usize, 
+                     field_ind: usize) f64 {
+        return self.view3().at(.{ time_ind, coord_ind, field_ind });
+    }
+
     pub fn getTimeN(self: *const Self) usize {return self.buffer_dims[0];}
     pub fn getCoordN(self: *const Self) usize {return self.buffer_dims[1];}
     pub fn getFieldsN(self: *const Self) usize {return self.buffer_dims[2];}
@@ -99,11 +162,26 @@ pub const Field = struct {
     }
 };
 
+// Lines longer than this cannot be parsed, a field row holds one value per
+// time step so this allows for ~40k time steps
+pub const csv_read_buff_size: usize = 1 << 20;
+
+pub const CsvError = error{
+    CsvEmpty,
+    CsvRowLengthMismatch,
+    CsvRowCountMismatch,
+    CsvNegativeIndex,
+};
+
+// Streams the csv file at path through read_buff and calls 
+// context.parseLine(line_ind, line) for each non-empty line. Lines point into
+// read_buff and are only valid until the next line is read so nothing is
+// allocated per line. Returns the number of lines parsed.
 // TODO: should probably pass in an io struct here
 // NOTE: fixed for 0.16-dev to init io
-pub fn readCsvToList(allocator: std.mem.Allocator, 
-                     path: []const u8
-                     ) !std.ArrayList([]const u8) {
+pub fn streamCsv(path: []const u8, 
+                 read_buff: []u8, 
+                 context: anytype) !usize {
 
     var file = try std.fs.cwd().openFile(path, .{ .mode = .read_only});
     defer file.close();
@@ -111,141 +189,272 @@ pub fn readCsvToList(allocator: std.mem.Allocator,
     var single_thread_io: std.Io.Threaded = .init_single_threaded;
     const io = single_thread_io.io();
 
-    var read_buff: [4096]u8 = undefined;    
-    var reader = file.reader(io,&read_buff); // type: std.fs.File.Reader
-	
-    var lines: std.ArrayList([] const u8)  = .{};
+    var reader = file.reader(io,read_buff); // type: std.fs.File.Reader
 
-    // Read lines without the trailing '\n' (exclusive).
+    var line_ind: usize = 0;
     while (try reader.interface.takeDelimiter('\n')) |line| {
-        // Optional: trim Windows '\r'
-        const clean = if (@import("builtin").os.tag == .windows)
-            std.mem.trimRight(u8, line, "\r")
-        else
-            line;
-
-        const copy = try allocator.dupe(u8, clean);
-        try lines.append(allocator,copy);
-    } 
-    
-    return lines;
+        // Trim Windows '\r' and skip blank lines, e.g. at the end of the file
+        const clean = std.mem.trimRight(u8, line, "\r");
+        if (clean.len == 0) {
+            continue;
+        }
+
+        try context.parseLine(line_ind, clean);
+        line_ind += 1;
+    }
+
+    return line_ind;
 }
 
-pub fn parseCoords(csv_lines: *const std.ArrayList([]const u8), 
-                   coords: *Coords) !void {
-    const num_coords: u8 = 3;
-    var num_count: u8 = 0;
+// Splits a csv line in place without allocating
+const CsvTokens = struct {
+    line: []const u8,
+    pos: usize = 0,
+
+    fn next(self: *CsvTokens) ?[]const u8 {
+        if (self.pos > self.line.len) {
+            return null;
+        }
+        const start: usize = self.pos;
+        const end: usize = std.mem.indexOfScalarPos(u8, self.line, start, ',') 
+                           orelse self.line.len;
+        self.pos = end + 1;
+        return self.line[start..end];
+    }
+};
 
-    for (csv_lines.items, 0..) |line_str, ii| {
-        //print("\nParsing line: {}\n", .{ii});
-        var split_iter = std.mem.splitScalar(u8, line_str, ',');
+// Node indices are often written as floats e.g. 1.200000000000000000e+01 so 
+// we build the integer from the digits and exponent directly, only falling 
+// back to parsing a float if the value is not a whole number.
+pub fn parseIndex(num_str: []const u8) !usize {
+    const str = std.mem.trim(u8, num_str, " ");
 
-        while (split_iter.next()) |num_str| {
-            const num: f64 = try std.fmt.parseFloat(f64, num_str);
+    const exp_pos: ?usize = std.mem.indexOfAny(u8, str, "eE");
+    const mant_str = if (exp_pos) |ep| str[0..ep] else str;
 
-            if (num_count == 0) {
-                coords.x[ii] = num;
-            } else if (num_count == 1) {
-                coords.y[ii] = num;
-            } else if (num_count == 2) {
-                coords.z[ii] = num;
-            }
+    var exp: i64 = 0;
+    if (exp_pos) |ep| {
+        exp = std.fmt.parseInt(i64, str[ep + 1..], 10) catch {
+            return parseIndexFloat(str);
+        };
+    }
 
-            num_count += 1;
-            if (num_count >= num_coords) {
-                num_count = 0;
-                break;
+    var int_str: []const u8 = mant_str;
+    var frac_str: []const u8 = "";
+    if (std.mem.indexOfScalar(u8, mant_str, '.')) |dp| {
+        int_str = mant_str[0..dp];
+        frac_str = std.mem.trimRight(u8, mant_str[dp + 1..], "0");
+    }
+    if (int_str.len > 0 and int_str[0] == '+') {
+        int_str = int_str[1..];
+    }
+    if ((int_str.len == 0) and (frac_str.len == 0)) {
+        return parseIndexFloat(str);
+    }
+
+    var digits: usize = 0;
+    for ([_][]const u8{ int_str, frac_str }) |part| {
+        for (part) |char| {
+            if ((char < '0') or (char > '9')) {
+                return parseIndexFloat(str);
             }
+            digits = std.math.mul(usize, digits, 10) catch return parseIndexFloat(str);
+            digits = std.math.add(usize, digits, char - '0') catch return parseIndexFloat(str);
+        }
+    }
+
+    const shift: i64 = exp - @as(i64, @intCast(frac_str.len));
+    if (shift < 0) {
+        return parseIndexFloat(str);
+    }
+    for (0..@intCast(shift)) |_| {
+        if (digits == 0) {
+            break;
         }
+        digits = std.math.mul(usize, digits, 10) catch return parseIndexFloat(str);
     }
+    return digits;
 }
 
-// TODO: fix this so that connect has an allocator and passes back a reference 
-// and does not return the large connectivity table by copying!
-pub fn parseConnect(allocator: std.mem.Allocator, 
-                    csv_lines: *const std.ArrayList([]const u8)) !Connect {
-    // Get the number of elements and the number of nodes per element
-    const elem_count = csv_lines.items.len;
+fn parseIndexFloat(num_str: []const u8) !usize {
+    const num_f: f64 = try std.fmt.parseFloat(f64, num_str);
+    if (num_f < 0.0) {
+        return CsvError.CsvNegativeIndex;
+    }
+    return @intFromFloat(num_f);
+}
 
-    var split_iter = std.mem.splitScalar(u8, csv_lines.items[0], ',');
-    var nodes_per_elem: u8 = 0;
-    while (split_iter.next()) |num_str| {
-        _ = num_str;
-        nodes_per_elem += 1;
+const CsvDims = struct {
+    rows_n: usize = 0,
+    cols_n: usize = 0,
+
+    fn parseLine(self: *CsvDims, line_ind: usize, line: []const u8) !void {
+        if (line_ind == 0) {
+            self.cols_n = std.mem.count(u8, line, ",") + 1;
+        }
+        self.rows_n += 1;
     }
-    // print("Connect: total elements = {}\n", .{elem_count});
-    // print("Connect: nodes per element = {}\n",.{nodes_per_elem});
+};
 
-    const connect = Connect{
-        .elem_n = elem_count,
-        .nodes_per_elem = nodes_per_elem,
-        .table = try allocator.alloc(usize, elem_count * nodes_per_elem),
-    };
+// Returns the number of rows and the number of columns in the first row
+pub fn csvDims(path: []const u8, read_buff: []u8) !CsvDims {
+    var dims = CsvDims{};
+    _ = try streamCsv(path, read_buff, &dims);
+    return dims;
+}
 
-    // print("Connect: connect.len={}\n",.{connect.table.len});
+const CoordsParser = struct {
+    allocator: std.mem.Allocator,
+    x: std.ArrayList(f64) = .{},
+    y: std.ArrayList(f64) = .{},
+    z: std.ArrayList(f64) = .{},
+
+    fn parseLine(self: *CoordsParser, line_ind: usize, line: []const u8) !void {
+        _ = line_ind;
+        var tokens = CsvTokens{ .line = line };
+        const dests = [_]*std.ArrayList(f64){ &self.x, &self.y, &self.z };
+
+        // Any columns after x,y,z are ignored
+        for (dests) |dest| {
+            const num_str = tokens.next() orelse return CsvError.CsvRowLengthMismatch;
+            try dest.append(self.allocator, try std.fmt.parseFloat(f64, num_str));
+        }
+    }
+};
 
-    var elem: usize = 0;
-    var node: usize = 0;
-    for (csv_lines.items, 0..) |line_str, ii| {
-        elem = ii;
-        node = 0;
+pub fn parseCoords(allocator: std.mem.Allocator, 
+                   path: []const u8, 
+                   read_buff: []u8) !Coords {
 
-        split_iter = std.mem.splitScalar(u8, line_str, ',');
+    var parser = CoordsParser{ .allocator = allocator };
+    errdefer {
+        parser.x.deinit(allocator);
+        parser.y.deinit(allocator);
+        parser.z.deinit(allocator);
+    }
 
-        while (split_iter.next()) |num_str| {
-            const num_f: f64 = try std.fmt.parseFloat(f64, num_str);
-            const num_i: usize = @intFromFloat(num_f);
+    const coord_n = try streamCsv(path, read_buff, &parser);
 
-            connect.table[elem * nodes_per_elem + node] = num_i;
+    return .{
+        .x = try parser.x.toOwnedSlice(allocator),
+        .y = try parser.y.toOwnedSlice(allocator),
+        .z = try parser.z.toOwnedSlice(allocator),
+        .len = coord_n,
+    };
+}
 
-            // print("Line: {}, num str: {s}, usize: {}\n", .{ii,num_str,num_i});
+const ConnectParser = struct {
+    allocator: std.mem.Allocator,
+    nodes_per_elem: usize = 0,
+    table: std.ArrayList(Connect.Index) = .{},
+
+    fn parseLine(self: *ConnectParser, line_ind: usize, line: []const u8) !void {
+        if (line_ind == 0) {
+            self.nodes_per_elem = std.mem.count(u8, line, ",") + 1;
+        }
 
-            node += 1;
+        var tokens = CsvTokens{ .line = line };
+        var node_n: usize = 0;
+        while (tokens.next()) |num_str| {
+            const node_ind = std.math.cast(Connect.Index, try parseIndex(num_str))
+                orelse return MeshIOError.ConnectIndexOverflow;
+            try self.table.append(self.allocator, node_ind);
+            node_n += 1;
         }
-        //print("\n",.{});
 
+        if (node_n != self.nodes_per_elem) {
+            return CsvError.CsvRowLengthMismatch;
+        }
     }
-    return connect;
-}
+};
 
-pub fn getFieldTimeN(csv_lines: *const std.ArrayList([]const u8)) usize {
+pub fn parseConnect(allocator: std.mem.Allocator, 
+                    path: []const u8, 
+                    read_buff: []u8) !Connect {
+
+    var parser = ConnectParser{ .allocator = allocator };
+    errdefer parser.table.deinit(allocator);
 
-    var split_iter = std.mem.splitScalar(u8, csv_lines.items[0], ',');
-    var time_n: usize = 0;
-    while (split_iter.next()) |num_str| {
-        _ = num_str;
-        time_n += 1;
+    const elem_n = try streamCsv(path, read_buff, &parser);
+    if (elem_n == 0) {
+        return CsvError.CsvEmpty;
     }
 
-    return time_n;
+    return .{
+        .elem_n = elem_n,
+        .nodes_per_elem = @intCast(parser.nodes_per_elem),
+        .table = try parser.table.toOwnedSlice(allocator),
+    };
 }
 
-pub fn parseField(csv_lines: *const std.ArrayList([]const u8), 
-                  field: *Field,
-                  field_n: usize) !void {
+const FieldParser = struct {
+    field: *Field,
+    field_ind: usize,
 
-    // Each row is a coordinate
-    // Each field csv has row where each column in the row is a time step
-    var inds = [_]usize{0,0,0}; // time_n,coord_n,field_n
-    inds[2] = field_n;
+    // Each row is a coordinate and each column in the row is a time step, the
+    // values are written straight into field.array, shape=(time_n,coord_n,field_n)
+    fn parseLine(self: *FieldParser, line_ind: usize, line: []const u8) !void {
+        const time_n: usize = self.field.getTimeN();
+        const coord_n: usize = self.field.getCoordN();
+        const field_view = self.field.view3();
 
-    for (csv_lines.items, 0..) |line_str, ii| {
-        inds[0] = 0;     // time_n
-        inds[1] = ii;    // coord_n, each row is a new coord
+        if (line_ind >= coord_n) {
+            return CsvError.CsvRowCountMismatch;
+        }
 
-        var split_iter = std.mem.splitScalar(u8, line_str, ',');
+        var tokens = CsvTokens{ .line = line };
+        var tt: usize = 0;
+        while (tokens.next()) |num_str| {
+            if (tt >= time_n) {
+                return CsvError.CsvRowLengthMismatch;
+            }
+            field_view.setAt(.{ tt, line_ind, self.field_ind }, 
+                             try std.fmt.parseFloat(f64, num_str));
+            tt += 1;
+        }
 
-        while (split_iter.next()) |num_str| {
-            
-            const num_f: f64 = try std.fmt.parseFloat(f64, num_str);
-            
-            try field.array.set(inds[0..],num_f);
-          
-            inds[0] += 1; // increment time_n as we step along the row
+        if (tt != time_n) {
+            return CsvError.CsvRowLengthMismatch;
         }
     }
+};
+
+pub fn parseField(path: []const u8, 
+                  read_buff: []u8,
+                  field: *Field,
+                  field_ind: usize) !void {
+
+    var parser = FieldParser{ .field = field, .field_ind = field_ind };
+    const coord_n = try streamCsv(path, read_buff, &parser);
+
+    if (coord_n != field.getCoordN()) {
+        return CsvError.CsvRowCountMismatch;
+    }
 }
 
+// Parses one field csv per thread, each only writes its own field index
+const FieldWorker = struct {
+    path: []const u8,
+    read_buff: []u8,
+    field: *Field,
+    field_ind: usize,
+    time_parse: f64 = 0.0,
+    err: ?anyerror = null,
+
+    fn work(self: *FieldWorker) void {
+        self.parse() catch |err| {
+            self.err = err;
+        };
+    }
+
+    fn parse(self: *FieldWorker) !void {
+        const time_start = try Instant.now();
+        try parseField(self.path, self.read_buff, self.field, self.field_ind);
+        const time_end = try Instant.now();
+        self.time_parse = @floatFromInt(time_end.since(time_start));
+    }
+};
+
 pub const SimData = struct {
     coords: Coords,
     connect: Connect,
@@ -266,127 +475,93 @@ pub fn load_sim_data(allocator: std.mem.Allocator,
     var time_start = try Instant.now();
     var time_end = try Instant.now();
 
+    // Lines are parsed in place in this buffer as the file is streamed
+    const read_buff = try arena_alloc.alloc(u8, csv_read_buff_size);
+
     //--------------------------------------------------------------------------
     // Read and parse coordinates csv file
-
-    // Read the csv file into an array list
     time_start = try Instant.now();
-    var lines = try readCsvToList(arena_alloc, coord_path);
-    time_end = try Instant.now();
-    const time_read_coords: f64 = @floatFromInt(time_end.since(time_start));
-
-    // Print the array list line by line
-    // for (lines.items,0..) |line_str,line_num|{
-    //     print("Line {}: {s}\n", .{line_num,line_str});
-    // }
-    print("\nCoords: read {} lines from csv.\n", .{lines.items.len});
-    print("Coords: read time = {d:.3}ms\n", 
-        .{time_read_coords / time.ns_per_ms});
-
-    // Pass the coords into a series of arrays
-    const coord_count: usize = lines.items.len;
-    var coords = try Coords.init(allocator, coord_count);
-
-    time_start = try Instant.now();
-    try parseCoords(&lines, &coords);
+    const coords = try parseCoords(allocator, coord_path, read_buff);
     time_end = try Instant.now();
     const time_parse_coords: f64 = @floatFromInt(time_end.since(time_start));
-    print("Coords: parse time = {d:.3}ms\n", 
-        .{time_parse_coords / time.ns_per_ms});
 
-    // print("COORDS:\n",.{});
-    // for (0..coords.len) |cc| {
-    //     coords.getVec3(cc).vecPrint();
-    // }
-    // print("\n",.{});
-
-    // Clear the lines array for next read
-    lines.clearRetainingCapacity();
+    print("\nCoords: read {} lines from csv.\n", .{coords.len});
+    print("Coords: read and parse time = {d:.3}ms\n", 
+        .{time_parse_coords / time.ns_per_ms});
 
     //--------------------------------------------------------------------------
     // Read and parse the connectivity table
-
-    // Read the csv file into an array list
-    time_start = try Instant.now();
-    lines = try readCsvToList(arena_alloc, connect_path);
-    time_end = try Instant.now();
-    const time_read_connect: f64 = @floatFromInt(time_end.since(time_start));
-    print("\nConnect: read {} lines from csv.\n", .{lines.items.len});
-    print("Connect: read time = {d:.3}ms\n", 
-        .{time_read_connect / time.ns_per_ms});
-
     time_start = try Instant.now();
-    const connect = try parseConnect(allocator, &lines);
+    const connect = try parseConnect(allocator, connect_path, read_buff);
     time_end = try Instant.now();
     const time_parse_connect: f64 = @floatFromInt(time_end.since(time_start));
+
+    print("\nConnect: read {} lines from csv.\n", .{connect.elem_n});
     print("Connect: elements={}, nodes per element={}\n", 
        .{ connect.elem_n, connect.nodes_per_elem });
-    print("Connect: parse time = {d:.3}ms\n", 
+    print("Connect: read and parse time = {d:.3}ms\n", 
         .{time_parse_connect / time.ns_per_ms});
 
-    // print("\nCONNECT TABLE\n",.{});
-    // var ii: usize = 0;
-    // for (0..connect.elem_n) |ee| {
-    //     print("{} : ", .{ee});
-    //     for (0..connect.nodes_per_elem) |nn| {
-    //         print("{}," , .{connect.table[ee*connect.nodes_per_elem+nn]});
-    //         ii += 1;
-    //     }
-    //     print("\n",.{});
-    // }
-
-    lines.clearRetainingCapacity();
-
     //--------------------------------------------------------------------------
     // Parse fields
 
-    // Read the csv for the first field as this will tell us how many time steps
-    // we have and how many coords to pre-alloc our field struct
+    // Scan the csv for the first field as this will tell us how many time 
+    // steps we have and how many coords to pre-alloc our field struct
     time_start = try Instant.now();
-    lines = try readCsvToList(arena_alloc, field_paths[0]);
+    const field_dims = try csvDims(field_paths[0], read_buff);
     time_end = try Instant.now();
-    var time_read_field: f64 = @floatFromInt(time_end.since(time_start));
-    print("\nField 0: read {} lines from csv.\n", .{lines.items.len});
-    print("Field 0: read time = {d:.3}ms\n", 
-        .{time_read_field / time.ns_per_ms});
-                     
+    const time_scan_field: f64 = @floatFromInt(time_end.since(time_start));
+    print("\nField 0: scanned {} lines from csv.\n", .{field_dims.rows_n});
+    print("Field 0: scan time = {d:.3}ms\n", 
+        .{time_scan_field / time.ns_per_ms});
+
     // Create the field struct to hold all the data
-    const time_n: usize = getFieldTimeN(&lines);
-    const coord_n: usize = lines.items.len;
+    const time_n: usize = field_dims.cols_n;
+    const coord_n: usize = field_dims.rows_n;
     var field = try Field.init(allocator,time_n,coord_n,field_n);   
 
-    // Parse the first field 
+    // Each field csv is parsed on its own thread straight into the field array,
+    // buffers are allocated here as the arena is not thread safe
+    var workers = try arena_alloc.alloc(FieldWorker, field_n);
+    for (field_paths, 0..) |field_path, ii| {
+        workers[ii] = .{
+            .path = field_path,
+            .read_buff = if (ii == 0) read_buff 
+                         else try arena_alloc.alloc(u8, csv_read_buff_size),
+            .field = &field,
+            .field_ind = ii,
+        };
+    }
+
+    var threads = try arena_alloc.alloc(std.Thread, field_n);
     time_start = try Instant.now();
-    try parseField(&lines,&field,0);
+    {
+        // The first field is parsed on this thread, all threads are joined 
+        // when we leave this scope even if a spawn fails
+        var threads_n: usize = 0;
+        defer for (threads[0..threads_n]) |thread| {
+            thread.join();
+        };
+        for (workers[1..]) |*worker| {
+            threads[threads_n] = try std.Thread.spawn(.{}, FieldWorker.work, .{worker});
+            threads_n += 1;
+        }
+        workers[0].work();
+    }
     time_end = try Instant.now();
-    var time_parse_field: f64 = @floatFromInt(time_end.since(time_start));
-    print("Field 0: coords={}, time steps={}\n", 
-        .{ field.getCoordN(), field.getTimeN() });
-    print("Field 0: parse time = {d:.3}ms\n", 
-        .{time_parse_field / time.ns_per_ms});
-
-    lines.clearRetainingCapacity();
-
-    const remaining_field_paths = field_paths[1..];
-    for (remaining_field_paths,1..) |field_path,ii| {
-    
-        time_start = try Instant.now();
-        lines = try readCsvToList(arena_alloc, field_path);
-        time_end = try Instant.now();
-        time_read_field = @floatFromInt(time_end.since(time_start));
-        print("\nField {d}: read {d} lines from csv.\n", .{ii,lines.items.len});
-        print("Field {d}: read time = {d:.3}ms\n", 
-            .{ii,time_read_field / time.ns_per_ms});
-
-        time_start = try Instant.now();
-        try parseField(&lines,&field,ii);
-        time_end = try Instant.now();
-        time_parse_field = @floatFromInt(time_end.since(time_start));
-        print("Field {d}: parse time = {d:.3}ms\n", 
-            .{ii,time_parse_field / time.ns_per_ms});
-
-        lines.clearRetainingCapacity();      
+    const time_parse_fields: f64 = @floatFromInt(time_end.since(time_start));
+
+    for (workers) |worker| {
+        if (worker.err) |err| {
+            return err;
+        }
+        print("\nField {d}: coords={}, time steps={}\n", 
+            .{ worker.field_ind, field.getCoordN(), field.getTimeN() });
+        print("Field {d}: read and parse time = {d:.3}ms\n", 
+            .{ worker.field_ind, worker.time_parse / time.ns_per_ms });
     }
+    print("\nFields: {d} files parsed in parallel, total time = {d:.3}ms\n", 
+        .{ field_n, time_parse_fields / time.ns_per_ms });
 
     return .{
       .coords = coords,
@@ -394,3 +569,1097 @@ pub fn load_sim_data(allocator: std.mem.Allocator,
       .field = field,  
     };
 }
+
+//------------------------------------------------------------------------------
+// BINARY SIM DATA
+//
+// A fixed size header followed by the coords (x, y and z), connectivity table
+// and field array. Every array starts on a bin_align byte boundary and is 
+// stored in native byte order so that a memory mapped file can be used 
+// directly without copying or parsing. The header records the byte order and
+// dtypes so a file written on a different platform is rejected, not misread.
+
+pub const bin_magic = [8]u8{ 'Z', 'R', 'S', 'I', 'M', 'B', 'I', 'N' };
+pub const bin_version: u32 = 1;
+pub const bin_align: usize = 64;
+// Reads back as a different value if the file byte order does not match ours
+const bin_byte_order: u32 = 0x01020304;
+
+pub const BinDType = enum(u32) {
+    f64 = 1,
+    u64 = 2,
+    u32 = 3,
+};
+
+pub const BinHeader = extern struct {
+    magic: [8]u8,
+    version: u32,
+    byte_order: u32,
+    float_dtype: u32,
+    index_dtype: u32,
+    coord_n: u64,
+    elem_n: u64,
+    nodes_per_elem: u64,
+    time_n: u64,
+    fields_n: u64,
+    // Byte offsets from the start of the file, all multiples of bin_align
+    coords_x_offset: u64,
+    coords_y_offset: u64,
+    coords_z_offset: u64,
+    connect_offset: u64,  // shape=(elem_n,nodes_per_elem)
+    field_offset: u64,    // shape=(time_n,coord_n,fields_n)
+    file_size: u64,
+};
+
+pub const MeshIOError = error{
+    BinBadMagic,
+    BinUnsupportedVersion,
+    BinByteOrderMismatch,
+    BinDTypeMismatch,
+    BinTruncated,
+    RenumberSizeMismatch,
+    ConnectIndexOverflow,
+};
+
+fn binAlignUp(offset: usize) usize {
+    return std.mem.alignForward(usize, offset, bin_align);
+}
+
+fn binIndexSize(index_dtype: BinDType) usize {
+    return if (index_dtype == .u32) @sizeOf(u32) else @sizeOf(u64);
+}
+
+pub fn binHeaderInit(coord_n: usize,
+                     elem_n: usize,
+                     nodes_per_elem: usize,
+                     time_n: usize,
+                     fields_n: usize,
+                     index_dtype: BinDType) BinHeader {
+
+    const coords_bytes: usize = coord_n * @sizeOf(f64);
+    const connect_bytes: usize = elem_n * nodes_per_elem * binIndexSize(index_dtype);
+    const field_bytes: usize = time_n * coord_n * fields_n * @sizeOf(f64);
+
+    const coords_x_offset: usize = binAlignUp(@sizeOf(BinHeader));
+    const coords_y_offset: usize = binAlignUp(coords_x_offset + coords_bytes);
+    const coords_z_offset: usize = binAlignUp(coords_y_offset + coords_bytes);
+    const connect_offset: usize = binAlignUp(coords_z_offset + coords_bytes);
+    const field_offset: usize = binAlignUp(connect_offset + connect_bytes);
+
+    return .{
+        .magic = bin_magic,
+        .version = bin_version,
+        .byte_order = bin_byte_order,
+        .float_dtype = @intFromEnum(BinDType.f64),
+        .index_dtype = @intFromEnum(index_dtype),
+        .coord_n = coord_n,
+        .elem_n = elem_n,
+        .nodes_per_elem = nodes_per_elem,
+        .time_n = time_n,
+        .fields_n = fields_n,
+        .coords_x_offset = coords_x_offset,
+        .coords_y_offset = coords_y_offset,
+        .coords_z_offset = coords_z_offset,
+        .connect_offset = connect_offset,
+        .field_offset = field_offset,
+        .file_size = field_offset + field_bytes,
+    };
+}
+
+pub fn checkBinHeader(header: *const BinHeader, data_len: usize) !void {
+    if (!std.mem.eql(u8, header.magic[0..], bin_magic[0..])) {
+        return MeshIOError.BinBadMagic;
+    }
+    if (header.byte_order != bin_byte_order) {
+        return MeshIOError.BinByteOrderMismatch;
+    }
+    if (header.version != bin_version) {
+        return MeshIOError.BinUnsupportedVersion;
+    }
+    // u32 connectivity tables are used in place, u64 tables written before
+    // Connect used u32 are converted on load
+    const index_dtype = std.enums.fromInt(BinDType, header.index_dtype)
+        orelse return MeshIOError.BinDTypeMismatch;
+    if ((header.float_dtype != @intFromEnum(BinDType.f64))
+        or (index_dtype == .f64)) {
+        return MeshIOError.BinDTypeMismatch;
+    }
+
+    // Recompute the layout so a corrupt header cannot point outside the data
+    const layout = binHeaderInit(header.coord_n, 
+                                 header.elem_n, 
+                                 header.nodes_per_elem, 
+                                 header.time_n, 
+                                 header.fields_n,
+                                 index_dtype);
+    if (!std.meta.eql(layout, header.*) or (data_len < header.file_size)) {
+        return MeshIOError.BinTruncated;
+    }
+}
+
+fn writeBinPadding(writer: *std.Io.Writer, pos: *usize, offset: usize) !void {
+    try writer.splatByteAll(0, offset - pos.*);
+    pos.* = offset;
+}
+
+fn writeBinArray(writer: *std.Io.Writer, 
+                 pos: *usize, 
+                 offset: usize, 
+                 bytes: []const u8) !void {
+    try writeBinPadding(writer, pos, offset);
+    try writer.writeAll(bytes);
+    pos.* += bytes.len;
+}
+
+pub fn saveSimDataBin(sim_data: *const SimData, 
+                      out_dir: std.fs.Dir, 
+                      file_name: []const u8) !void {
+
+    const header = binHeaderInit(sim_data.coords.len,
+                                 sim_data.connect.elem_n,
+                                 sim_data.connect.nodes_per_elem,
+                                 sim_data.field.getTimeN(),
+                                 sim_data.field.getFieldsN(),
+                                 .u32);
+
+    const bin_file = try out_dir.createFile(file_name, .{});
+    defer bin_file.close();
+
+    var write_buf: [8192]u8 = undefined;
+    var file_writer = bin_file.writer(&write_buf);
+    const writer = &file_writer.interface;
+
+    var pos: usize = 0;
+    try writer.writeAll(std.mem.asBytes(&header));
+    pos += @sizeOf(BinHeader);
+
+    try writeBinArray(writer, &pos, header.coords_x_offset, 
+                      std.mem.sliceAsBytes(sim_data.coords.x));
+    try writeBinArray(writer, &pos, header.coords_y_offset, 
+                      std.mem.sliceAsBytes(sim_data.coords.y));
+    try writeBinArray(writer, &pos, header.coords_z_offset, 
+                      std.mem.sliceAsBytes(sim_data.coords.z));
+
+    try writeBinArray(writer, &pos, header.connect_offset, 
+                      std.mem.sliceAsBytes(sim_data.connect.table));
+
+    try writeBinArray(writer, &pos, header.field_offset, 
+                      std.mem.sliceAsBytes(sim_data.field.array.elems));
+
+    try writer.flush();
+}
+
+// Sim data whose coords, connectivity table and field values all point into
+// a private memory map of the binary file. Pages are only read from disk when
+// they are first touched and are copied on write so the file is never 
+// modified. Only deinit() should be used to free this, not the deinit of the
+// coords or field. A u64 connectivity table is converted into table_owned.
+pub const SimDataMapped = struct {
+    sim_data: SimData,
+    mapping: []align(std.heap.page_size_min) u8,
+    table_owned: []Connect.Index = &.{},
+
+    const Self = @This();
+
+    pub fn deinit(self: *Self, allocator: std.mem.Allocator) void {
+        self.sim_data.field.array.deinit(allocator);
+        allocator.free(self.sim_data.field.buffer_dims);
+        allocator.free(self.table_owned);
+        std.posix.munmap(self.mapping);
+    }
+};
+
+fn binSlice(comptime EType: type, 
+            mapping: []align(std.heap.page_size_min) u8, 
+            offset: usize, 
+            len: usize) []EType {
+    const bytes: []align(bin_align) u8 = @alignCast(mapping[offset..offset + len*@sizeOf(EType)]);
+    return std.mem.bytesAsSlice(EType, bytes);
+}
+
+pub fn loadSimDataBin(allocator: std.mem.Allocator, 
+                      dir: std.fs.Dir,
+                      path: []const u8) !SimDataMapped {
+
+    const time_start = try Instant.now();
+
+    var file = try dir.openFile(path, .{ .mode = .read_only });
+    defer file.close();
+
+    const file_size: usize = @intCast((try file.stat()).size);
+    if (file_size < @sizeOf(BinHeader)) {
+        return MeshIOError.BinTruncated;
+    }
+
+    const mapping = try std.posix.mmap(null,
+                                       file_size,
+                                       std.posix.PROT.READ | std.posix.PROT.WRITE,
+                                       .{ .TYPE = .PRIVATE },
+                                       file.handle,
+                                       0);
+    errdefer std.posix.munmap(mapping);
+
+    const header: *const BinHeader = @ptrCast(mapping.ptr);
+    try checkBinHeader(header, mapping.len);
+
+    const coord_n: usize = @intCast(header.coord_n);
+    const elem_n: usize = @intCast(header.elem_n);
+    const nodes_per_elem: usize = @intCast(header.nodes_per_elem);
+    const time_n: usize = @intCast(header.time_n);
+    const fields_n: usize = @intCast(header.fields_n);
+
+    const coords = Coords{
+        .x = binSlice(f64, mapping, header.coords_x_offset, coord_n),
+        .y = binSlice(f64, mapping, header.coords_y_offset, coord_n),
+        .z = binSlice(f64, mapping, header.coords_z_offset, coord_n),
+        .len = coord_n,
+    };
+
+    const table_len: usize = elem_n*nodes_per_elem;
+    var table_owned: []Connect.Index = &.{};
+    errdefer allocator.free(table_owned);
+    if (header.index_dtype == @intFromEnum(BinDType.u64)) {
+        const table_u64 = ConnectT(u64){
+            .nodes_per_elem = @intCast(nodes_per_elem),
+            .elem_n = elem_n,
+            .table = binSlice(u64, mapping, header.connect_offset, table_len),
+        };
+        table_owned = (try table_u64.convert(Connect.Index, allocator)).table;
+    }
+    const connect = Connect{
+        .nodes_per_elem = @intCast(nodes_per_elem),
+        .elem_n = elem_n,
+        .table = if (table_owned.len > 0) table_owned 
+            else binSlice(Connect.Index, mapping, header.connect_offset, table_len),
+    };
+
+    // Only the dims and strides are allocated, the values stay in the mapping
+    const field_elems = binSlice(f64, mapping, header.field_offset, 
+                                 time_n*coord_n*fields_n);
+    var buff_dims = try allocator.alloc(usize, 3);
+    errdefer allocator.free(buff_dims);
+    buff_dims[0] = time_n;
+    buff_dims[1] = coord_n;
+    buff_dims[2] = fields_n;
+
+    const field = Field{
+        .array = try NDArray(f64).init(allocator, field_elems, buff_dims),
+        .buffer_dims = buff_dims,
+        .buffer_array = field_elems,
+    };
+
+    const time_end = try Instant.now();
+    const time_load: f64 = @floatFromInt(time_end.since(time_start));
+    print("\nBinary: coords={}, elements={}, time steps={}, fields={}\n",
+        .{ coord_n, elem_n, time_n, fields_n });
+    print("Binary: map time = {d:.3}ms\n", .{time_load / time.ns_per_ms});
+
+    return .{
+        .sim_data = .{
+            .coords = coords,
+            .connect = connect,
+            .field = field,
+        },
+        .mapping = mapping,
+        .table_owned = table_owned,
+    };
+}
+
+//------------------------------------------------------------------------------
+// NUMPY SIM DATA
+//
+// Coords, connectivity and field as three .npy files that numpy can read and
+// write directly: coords shape=(coord_n,3) or wider with extra columns
+// ignored, connectivity shape=(elem_n,nodes_per_elem) with 0 based node
+// indices of any int or float dtype, and the field shape=(time_n,coord_n,
+// fields_n). A C order f64 field is used in place from a private memory map,
+// anything else is converted on load.
+
+// Sim data loaded from .npy files. Coords and the connectivity table are
+// copied into the arena, the field values can point into the field mapping.
+// Only deinit() should be used to free this.
+pub const SimDataNpy = struct {
+    sim_data: SimData,
+    arena: std.heap.ArenaAllocator,
+    field_mapped: npy.NpyMapped,
+
+    const Self = @This();
+
+    pub fn deinit(self: *Self) void {
+        self.field_mapped.deinit();
+        self.arena.deinit();
+    }
+};
+
+pub fn loadSimDataNpy(allocator: std.mem.Allocator,
+                      dir: std.fs.Dir,
+                      coords_path: []const u8,
+                      connect_path: []const u8,
+                      field_path: []const u8) !SimDataNpy {
+
+    const time_start = try Instant.now();
+
+    var arena = std.heap.ArenaAllocator.init(allocator);
+    errdefer arena.deinit();
+    const arena_alloc = arena.allocator();
+
+    //--------------------------------------------------------------------------
+    // Coords are stored by coord so are split into x, y and z
+    var coords_mapped = try npy.NpyMapped.mapFile(dir, coords_path);
+    defer coords_mapped.deinit();
+    const coords_shape = coords_mapped.view.header.shape();
+    if ((coords_shape.len != 2) or (coords_shape[1] < 3)) {
+        return npy.NpyError.NpyShapeMismatch;
+    }
+
+    const coord_n: usize = coords_shape[0];
+    const coords_elems = try arena_alloc.alloc(f64, coord_n * coords_shape[1]);
+    try coords_mapped.view.copyTo(f64, coords_elems);
+
+    var coords = try Coords.init(arena_alloc, coord_n);
+    for (0..coord_n) |nn| {
+        const row = coords_elems[nn * coords_shape[1]..][0..3];
+        coords.x[nn] = row[0];
+        coords.y[nn] = row[1];
+        coords.z[nn] = row[2];
+    }
+
+    //--------------------------------------------------------------------------
+    var connect_mapped = try npy.NpyMapped.mapFile(dir, connect_path);
+    defer connect_mapped.deinit();
+    const connect_shape = connect_mapped.view.header.shape();
+    if ((connect_shape.len != 2) or (connect_shape[1] > std.math.maxInt(u8))) {
+        return npy.NpyError.NpyShapeMismatch;
+    }
+
+    const connect = Connect{
+        .nodes_per_elem = @intCast(connect_shape[1]),
+        .elem_n = connect_shape[0],
+        .table = try arena_alloc.alloc(Connect.Index, 
+                                       connect_shape[0] * connect_shape[1]),
+    };
+    try connect_mapped.view.copyTo(Connect.Index, connect.table);
+    for (connect.table) |node_ind| {
+        if (node_ind >= coord_n) {
+            return npy.NpyError.NpyValueOutOfRange;
+        }
+    }
+
+    //--------------------------------------------------------------------------
+    var field_mapped = try npy.NpyMapped.mapFile(dir, field_path);
+    errdefer field_mapped.deinit();
+    const field_shape = field_mapped.view.header.shape();
+    if ((field_shape.len != 3) or (field_shape[1] != coord_n)) {
+        return npy.NpyError.NpyShapeMismatch;
+    }
+
+    const time_n: usize = field_shape[0];
+    const fields_n: usize = field_shape[2];
+    const field_in_place = field_mapped.view.slice(f64) catch null;
+    const field = if (field_in_place) |field_elems|
+        try Field.initView(arena_alloc, field_elems, time_n, coord_n, fields_n,
+                           .{ coord_n * fields_n, fields_n, 1 })
+    else blk: {
+        const field_copy = try Field.init(arena_alloc, time_n, coord_n, fields_n);
+        try field_mapped.view.copyTo(f64, field_copy.array.elems);
+        break :blk field_copy;
+    };
+
+    const time_end = try Instant.now();
+    const time_load: f64 = @floatFromInt(time_end.since(time_start));
+    print("\nNumpy: coords={}, elements={}, time steps={}, fields={}\n",
+        .{ coord_n, connect.elem_n, time_n, fields_n });
+    print("Numpy: load time = {d:.3}ms, field {s}\n",
+        .{ time_load / time.ns_per_ms,
+           if (field_in_place != null) "mapped" else "copied" });
+
+    return .{
+        .sim_data = .{
+            .coords = coords,
+            .connect = connect,
+            .field = field,
+        },
+        .arena = arena,
+        .field_mapped = field_mapped,
+    };
+}
+
+pub fn saveSimDataNpy(allocator: std.mem.Allocator,
+                      sim_data: *const SimData,
+                      out_dir: std.fs.Dir,
+                      coords_path: []const u8,
+                      connect_path: []const u8,
+                      field_path: []const u8) !void {
+
+    const coord_n: usize = sim_data.coords.len;
+    const coords_elems = try allocator.alloc(f64, 3 * coord_n);
+    defer allocator.free(coords_elems);
+    for (0..coord_n) |nn| {
+        coords_elems[3 * nn] = sim_data.coords.x[nn];
+        coords_elems[3 * nn + 1] = sim_data.coords.y[nn];
+        coords_elems[3 * nn + 2] = sim_data.coords.z[nn];
+    }
+    try npy.saveSlice(f64, out_dir, coords_path, &.{ coord_n, 3 }, coords_elems);
+
+    const connect = &sim_data.connect;
+    try npy.saveSlice(Connect.Index, out_dir, connect_path,
+                      &.{ connect.elem_n, connect.nodes_per_elem },
+                      connect.table);
+
+    // Mapped fields can be strided so they are gathered in [time,coord,field]
+    // order unless they already are
+    const field = &sim_data.field;
+    const field_shape = [_]usize{ field.getTimeN(), field.getCoordN(),
+                                  field.getFieldsN() };
+    const in_order = std.mem.eql(usize, field.array.strides,
+        &.{ field_shape[1] * field_shape[2], field_shape[2], 1 });
+    if (in_order) {
+        try npy.saveSlice(f64, out_dir, field_path, field_shape[0..],
+                          field.array.elems);
+        return;
+    }
+
+    const field_elems = try allocator.alloc(f64, field.array.elems.len);
+    defer allocator.free(field_elems);
+    var ind: usize = 0;
+    for (0..field_shape[0]) |tt| {
+        for (0..field_shape[1]) |nn| {
+            for (0..field_shape[2]) |ff| {
+                field_elems[ind] = field.at(tt, nn, ff);
+                ind += 1;
+            }
+        }
+    }
+    try npy.saveSlice(f64, out_dir, field_path, field_shape[0..], field_elems);
+}
+
+//------------------------------------------------------------------------------
+// SPACE FILLING CURVE RENUMBERING
+//
+// Meshes exported from Gmsh/MOOSE number their nodes and elements with no
+// useful spatial order, so the node gathers for consecutive elements jump all
+// over the coords and field. Renumbering the elements along a space filling
+// curve through their centroids, and the nodes in the order the renumbered
+// elements first use them, keeps neighbouring elements and their nodes close
+// in memory. The MeshOrder keeps both permutations so anything indexed by
+// node or element can be mapped back to the original numbering.
+//
+// Element order decides which element wins where two are at exactly the same
+// depth at a sub-pixel, so images of a renumbered mesh can differ from the
+// original at shared edges by the rounding of the field interpolation.
+
+pub const SpaceCurve = enum {
+    // Z-order, interleaves the coordinate bits
+    morton,
+    // Consecutive cells are always face neighbours, better locality than
+    // morton for a little more work per key
+    hilbert,
+};
+
+// Bits per axis of the quantised curve coordinates, 3*21 fits in a u64
+pub const curve_bits: u6 = 21;
+
+// Spreads the low 21 bits of val out to every third bit
+fn spreadBits3(val: u32) u64 {
+    var spread: u64 = val & 0x1f_ffff;
+    spread = (spread | (spread << 32)) & 0x001f_0000_0000_ffff;
+    spread = (spread | (spread << 16)) & 0x001f_0000_ff00_00ff;
+    spread = (spread | (spread << 8)) & 0x100f_00f0_0f00_f00f;
+    spread = (spread | (spread << 4)) & 0x10c3_0c30_c30c_30c3;
+    spread = (spread | (spread << 2)) & 0x1249_2492_4924_9249;
+    return spread;
+}
+
+pub fn mortonKey(cell: [3]u32) u64 {
+    return (spreadBits3(cell[0]) << 2) | (spreadBits3(cell[1]) << 1) 
+           | spreadBits3(cell[2]);
+}
+
+// Skilling's transform of the cell coords into the transposed Hilbert index,
+// which is then interleaved like a morton key. See J. Skilling, "Programming
+// the Hilbert curve", AIP Conf. Proc. 707 (2004).
+pub fn hilbertKey(cell: [3]u32) u64 {
+    var xx: [3]u32 = cell;
+    const top: u32 = @as(u32, 1) << (curve_bits - 1);
+
+    // Branch free: set is all ones where bit qq of xx[dd] is set, which
+    // inverts the low bits of xx[0], otherwise the low bits are swapped
+    var qq: u32 = top;
+    while (qq > 1) : (qq >>= 1) {
+        const pp: u32 = qq - 1;
+        for (0..3) |dd| {
+            const set: u32 = @as(u32, 0) -% @intFromBool(xx[dd] & qq != 0);
+            const swap: u32 = (xx[0] ^ xx[dd]) & pp & ~set;
+            xx[0] ^= (pp & set) | swap;
+            xx[dd] ^= swap;
+        }
+    }
+
+    // Gray encode
+    xx[1] ^= xx[0];
+    xx[2] ^= xx[1];
+    var flip: u32 = 0;
+    qq = top;
+    while (qq > 1) : (qq >>= 1) {
+        flip ^= (qq - 1) & (@as(u32, 0) -% @intFromBool(xx[2] & qq != 0));
+    }
+    for (0..3) |dd| {
+        xx[dd] ^= flip;
+    }
+
+    return mortonKey(xx);
+}
+
+pub const MeshOrder = struct {
+    // Original index of each renumbered node and element
+    node_perm: []usize,
+    elem_perm: []usize,
+    // Renumbered index of each original node and element
+    node_inv: []usize,
+    elem_inv: []usize,
+
+    const Self = @This();
+
+    const ElemKey = struct {
+        key: u64,
+        elem_ind: usize,
+
+        fn lessThan(_: void, key_a: ElemKey, key_b: ElemKey) bool {
+            if (key_a.key != key_b.key) {
+                return key_a.key < key_b.key;
+            }
+            return key_a.elem_ind < key_b.elem_ind;
+        }
+    };
+
+    pub fn init(allocator: std.mem.Allocator,
+                coords: *const Coords,
+                connect: *const Connect,
+                curve: SpaceCurve) !Self {
+
+        var self = Self{
+            .node_perm = try allocator.alloc(usize, coords.len),
+            .elem_perm = try allocator.alloc(usize, connect.elem_n),
+            .node_inv = try allocator.alloc(usize, coords.len),
+            .elem_inv = try allocator.alloc(usize, connect.elem_n),
+        };
+        errdefer self.deinit(allocator);
+
+        // Quantise into a cube so the curve has the same resolution on
+        // every axis
+        var lo = [_]f64{ std.math.inf(f64) } ** 3;
+        var extent: f64 = 0.0;
+        const axes = [_][]const f64{ coords.x, coords.y, coords.z };
+        for (axes, 0..) |axis, dd| {
+            if (axis.len == 0) break;
+            lo[dd] = std.mem.min(f64, axis);
+            extent = @max(extent, std.mem.max(f64, axis) - lo[dd]);
+        }
+        const cell_max: f64 = @floatFromInt((@as(u32, 1) << curve_bits) - 1);
+        const scale: f64 = if (extent > 0.0) cell_max / extent else 0.0;
+        const npe_inv: f64 = 1.0 / @as(f64, @floatFromInt(connect.nodes_per_elem));
+
+        const keys = try allocator.alloc(ElemKey, connect.elem_n);
+        defer allocator.free(keys);
+        for (0..connect.elem_n) |ee| {
+            var cent = [_]f64{ 0.0, 0.0, 0.0 };
+            for (connect.getElem(ee)) |nn| {
+                cent[0] += coords.x[nn];
+                cent[1] += coords.y[nn];
+                cent[2] += coords.z[nn];
+            }
+            var cell: [3]u32 = undefined;
+            for (0..3) |dd| {
+                const cell_f: f64 = (cent[dd] * npe_inv - lo[dd]) * scale;
+                cell[dd] = @intFromFloat(std.math.clamp(cell_f, 0.0, cell_max));
+            }
+            keys[ee] = .{
+                .key = switch (curve) {
+                    .morton => mortonKey(cell),
+                    .hilbert => hilbertKey(cell),
+                },
+                .elem_ind = ee,
+            };
+        }
+        std.sort.pdq(ElemKey, keys, {}, ElemKey.lessThan);
+
+        for (keys, 0..) |elem_key, ee| {
+            self.elem_perm[ee] = elem_key.elem_ind;
+            self.elem_inv[elem_key.elem_ind] = ee;
+        }
+
+        // Nodes in the order the renumbered elements first touch them, then
+        // any nodes no element uses in their original order
+        const unset: usize = std.math.maxInt(usize);
+        @memset(self.node_inv, unset);
+        var node_next: usize = 0;
+        for (self.elem_perm) |ee| {
+            for (connect.getElem(ee)) |nn| {
+                if (self.node_inv[nn] == unset) {
+                    self.node_inv[nn] = node_next;
+                    node_next += 1;
+                }
+            }
+        }
+        for (self.node_inv) |*node_new| {
+            if (node_new.* == unset) {
+                node_new.* = node_next;
+                node_next += 1;
+            }
+        }
+        for (self.node_inv, 0..) |node_new, nn| {
+            self.node_perm[node_new] = nn;
+        }
+
+        return self;
+    }
+
+    pub fn deinit(self: *Self, allocator: std.mem.Allocator) void {
+        allocator.free(self.node_perm);
+        allocator.free(self.elem_perm);
+        allocator.free(self.node_inv);
+        allocator.free(self.elem_inv);
+    }
+
+    // Scatters values indexed by the renumbered nodes or elements back to the
+    // original numbering, perm is node_perm or elem_perm
+    pub fn toOrig(comptime EType: type,
+                  perm: []const usize,
+                  vals_new: []const EType,
+                  vals_orig: []EType) void {
+        for (perm, vals_new) |ind_orig, val| {
+            vals_orig[ind_orig] = val;
+        }
+    }
+};
+
+// Copies the mesh into the order given by mesh_order, the input is left as it
+// is as it may be a read only mapping. The field is gathered into a new
+// [time,coord,field] buffer whatever its strides were.
+pub fn renumberSimData(allocator: std.mem.Allocator,
+                       sim_data: *const SimData,
+                       mesh_order: *const MeshOrder) !SimData {
+
+    const coords = &sim_data.coords;
+    const connect = &sim_data.connect;
+    const field = &sim_data.field;
+    if ((mesh_order.node_perm.len != coords.len)
+        or (mesh_order.elem_perm.len != connect.elem_n)
+        or (field.getCoordN() != coords.len)) {
+        return MeshIOError.RenumberSizeMismatch;
+    }
+
+    var coords_new = try Coords.init(allocator, coords.len);
+    errdefer coords_new.deinit(allocator);
+    for (mesh_order.node_perm, 0..) |nn, nn_new| {
+        coords_new.x[nn_new] = coords.x[nn];
+        coords_new.y[nn_new] = coords.y[nn];
+        coords_new.z[nn_new] = coords.z[nn];
+    }
+
+    const table_new = try allocator.alloc(Connect.Index, connect.table.len);
+    errdefer allocator.free(table_new);
+    for (mesh_order.elem_perm, 0..) |ee, ee_new| {
+        const elem_new = table_new[ee_new * connect.nodes_per_elem..][0..connect.nodes_per_elem];
+        for (connect.getElem(ee), elem_new) |nn, *nn_new| {
+            nn_new.* = @intCast(mesh_order.node_inv[nn]);
+        }
+    }
+
+    const time_n: usize = field.getTimeN();
+    const fields_n: usize = field.getFieldsN();
+    const field_new = try Field.init(allocator, time_n, coords.len, fields_n);
+    const field_view = field.view3();
+    var ind: usize = 0;
+    for (0..time_n) |tt| {
+        for (mesh_order.node_perm) |nn| {
+            for (0..fields_n) |ff| {
+                field_new.buffer_array[ind] = field_view.at(.{ tt, nn, ff });
+                ind += 1;
+            }
+        }
+    }
+
+    return .{
+        .coords = coords_new,
+        .connect = .{
+            .nodes_per_elem = connect.nodes_per_elem,
+            .elem_n = connect.elem_n,
+            .table = table_new,
+        },
+        .field = field_new,
+    };
+}
+
+//------------------------------------------------------------------------------
+const testing = std.testing;
+const expectEqualSlices = testing.expectEqualSlices;
+
+test "meshio.loadSimDataBin round trip" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    // Odd sizes so the arrays need padding to stay aligned
+    const coord_n: usize = 5;
+    var coords = try Coords.init(talloc, coord_n);
+    for (0..coord_n) |nn| {
+        const nn_f: f64 = @floatFromInt(nn);
+        coords.x[nn] = nn_f;
+        coords.y[nn] = -2.0 * nn_f;
+        coords.z[nn] = 0.5 + nn_f;
+    }
+
+    var table = [_]Connect.Index{ 0, 1, 2, 2, 3, 4, 4, 1, 0 };
+    const connect = Connect{
+        .nodes_per_elem = 3,
+        .elem_n = 3,
+        .table = table[0..],
+    };
+
+    var field = try Field.init(talloc, 3, coord_n, 2);
+    for (field.array.elems, 0..) |*val, ii| {
+        val.* = 0.25 * @as(f64, @floatFromInt(ii));
+    }
+
+    const sim_data = SimData{ .coords = coords, 
+                              .connect = connect, 
+                              .field = field };
+    try saveSimDataBin(&sim_data, tmp_dir.dir, "sim.bin");
+
+    var mapped = try loadSimDataBin(testing.allocator, tmp_dir.dir, "sim.bin");
+    defer mapped.deinit(testing.allocator);
+    const sim_bin = &mapped.sim_data;
+
+    try expectEqualSlices(f64, coords.x, sim_bin.coords.x);
+    try expectEqualSlices(f64, coords.y, sim_bin.coords.y);
+    try expectEqualSlices(f64, coords.z, sim_bin.coords.z);
+    try testing.expectEqual(connect.nodes_per_elem, sim_bin.connect.nodes_per_elem);
+    try expectEqualSlices(Connect.Index, connect.table, sim_bin.connect.table);
+    try expectEqualSlices(usize, field.buffer_dims, sim_bin.field.buffer_dims);
+    try expectEqualSlices(f64, field.array.elems, sim_bin.field.array.elems);
+
+    var inds = [_]usize{ 2, 4, 1 };
+    try testing.expectEqual(try field.array.get(inds[0..]), 
+                            try sim_bin.field.array.get(inds[0..]));
+
+    // Files with a u64 table are converted on load
+    const header_u64 = binHeaderInit(coord_n, 3, 3, 3, 2, .u64);
+    const bytes_u64 = try talloc.alignedAlloc(u8, .of(u64), header_u64.file_size);
+    @memset(bytes_u64, 0);
+    @memcpy(bytes_u64[0..@sizeOf(BinHeader)], std.mem.asBytes(&header_u64));
+    const arrays = [_]struct { u64, []const u8 }{
+        .{ header_u64.coords_x_offset, std.mem.sliceAsBytes(coords.x) },
+        .{ header_u64.coords_y_offset, std.mem.sliceAsBytes(coords.y) },
+        .{ header_u64.coords_z_offset, std.mem.sliceAsBytes(coords.z) },
+        .{ header_u64.field_offset, std.mem.sliceAsBytes(field.array.elems) },
+    };
+    for (arrays) |array| {
+        @memcpy(bytes_u64[array[0]..][0..array[1].len], array[1]);
+    }
+    const table_u64: []u64 = @alignCast(std.mem.bytesAsSlice(u64, 
+        bytes_u64[header_u64.connect_offset..][0..table.len * @sizeOf(u64)]));
+    for (table, table_u64) |node_ind, *node_u64| {
+        node_u64.* = node_ind;
+    }
+    try tmp_dir.dir.writeFile(.{ .sub_path = "sim_u64.bin", .data = bytes_u64 });
+
+    var mapped_u64 = try loadSimDataBin(testing.allocator, tmp_dir.dir, 
+                                        "sim_u64.bin");
+    defer mapped_u64.deinit(testing.allocator);
+    try expectEqualSlices(Connect.Index, connect.table, 
+                          mapped_u64.sim_data.connect.table);
+    try expectEqualSlices(f64, field.array.elems, 
+                          mapped_u64.sim_data.field.array.elems);
+
+    // A bad magic must be rejected rather than mapped
+    const bad_bytes = [_]u8{0} ** @sizeOf(BinHeader);
+    try tmp_dir.dir.writeFile(.{ .sub_path = "bad.bin", .data = bad_bytes[0..] });
+    try testing.expectError(MeshIOError.BinBadMagic, 
+                            loadSimDataBin(testing.allocator, tmp_dir.dir, "bad.bin"));
+}
+
+test "meshio.parseIndex" {
+    try testing.expectEqual(@as(usize, 0), try parseIndex("0.000000000000000000e+00"));
+    try testing.expectEqual(@as(usize, 12), try parseIndex("1.200000000000000000e+01"));
+    try testing.expectEqual(@as(usize, 828), try parseIndex("8.280000000000000000e+02"));
+    try testing.expectEqual(@as(usize, 7), try parseIndex("7"));
+    try testing.expectEqual(@as(usize, 3), try parseIndex("3.0"));
+    try testing.expectEqual(@as(usize, 1500), try parseIndex("1.5E3"));
+    // Not whole numbers so these truncate like a float cast
+    try testing.expectEqual(@as(usize, 2), try parseIndex("2.5"));
+    try testing.expectEqual(@as(usize, 0), try parseIndex("5e-01"));
+    try testing.expectError(CsvError.CsvNegativeIndex, parseIndex("-1.0e+00"));
+    try testing.expectError(error.InvalidCharacter, parseIndex("abc"));
+}
+
+test "meshio.load_sim_data streams csv files" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    try tmp_dir.dir.writeFile(.{ .sub_path = "coords.csv", 
+        .data = "0.0,1.0,2.0\n3.5,4.5,5.5\r\n-1e+00,2.5e-01,0\n\n" });
+    try tmp_dir.dir.writeFile(.{ .sub_path = "connect.csv", 
+        .data = "0.000000000000000000e+00,1.000000000000000000e+00,2.000000000000000000e+00\n" 
+                ++ "2.000000000000000000e+00,1.000000000000000000e+00,0.000000000000000000e+00\n" });
+    try tmp_dir.dir.writeFile(.{ .sub_path = "field_a.csv", 
+        .data = "1.0,2.0\n3.0,4.0\n5.0,6.0\n" });
+    try tmp_dir.dir.writeFile(.{ .sub_path = "field_b.csv", 
+        .data = "-1.0,-2.0\n-3.0,-4.0\n-5.0,-6.0\n" });
+    try tmp_dir.dir.writeFile(.{ .sub_path = "field_bad.csv", 
+        .data = "1.0,2.0\n3.0\n5.0,6.0\n" });
+
+    const dir_path = try std.fs.path.join(talloc, 
+        &.{ ".zig-cache", "tmp", tmp_dir.sub_path[0..] });
+    const path_coords = try std.fs.path.join(talloc, &.{ dir_path, "coords.csv" });
+    const path_connect = try std.fs.path.join(talloc, &.{ dir_path, "connect.csv" });
+    const path_fields = [_][]const u8{
+        try std.fs.path.join(talloc, &.{ dir_path, "field_a.csv" }),
+        try std.fs.path.join(talloc, &.{ dir_path, "field_b.csv" }),
+    };
+
+    const sim_data = try load_sim_data(talloc, path_coords, path_connect, 
+                                       path_fields[0..]);
+
+    try expectEqualSlices(f64, &.{ 0.0, 3.5, -1.0 }, sim_data.coords.x);
+    try expectEqualSlices(f64, &.{ 1.0, 4.5, 0.25 }, sim_data.coords.y);
+    try expectEqualSlices(f64, &.{ 2.0, 5.5, 0.0 }, sim_data.coords.z);
+    try testing.expectEqual(@as(usize, 2), sim_data.connect.elem_n);
+    try testing.expectEqual(@as(u8, 3), sim_data.connect.nodes_per_elem);
+    try expectEqualSlices(Connect.Index, &.{ 0, 1, 2, 2, 1, 0 }, sim_data.connect.table);
+
+    // shape=(time_n,coord_n,field_n)
+    try expectEqualSlices(usize, &.{ 2, 3, 2 }, sim_data.field.buffer_dims);
+    try expectEqualSlices(f64, &.{ 1.0, -1.0, 3.0, -3.0, 5.0, -5.0,
+                                   2.0, -2.0, 4.0, -4.0, 6.0, -6.0 }, 
+                          sim_data.field.array.elems);
+
+    const path_bad = [_][]const u8{
+        path_fields[0],
+        try std.fs.path.join(talloc, &.{ dir_path, "field_bad.csv" }),
+    };
+    try testing.expectError(CsvError.CsvRowLengthMismatch, 
+                            load_sim_data(talloc, path_coords, path_connect, 
+                                          path_bad[0..]));
+}
+
+test "meshio.loadSimDataNpy round trip" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    const coord_n: usize = 4;
+    var coords = try Coords.init(talloc, coord_n);
+    for (0..coord_n) |nn| {
+        const nn_f: f64 = @floatFromInt(nn);
+        coords.x[nn] = nn_f;
+        coords.y[nn] = 10.0 + nn_f;
+        coords.z[nn] = -nn_f;
+    }
+    var table = [_]Connect.Index{ 0, 1, 2, 3, 2, 1 };
+    const connect = Connect{ .nodes_per_elem = 3, .elem_n = 2, .table = table[0..] };
+
+    // Strided view so the field has to be gathered on save
+    const field_vals = try talloc.alloc(f64, 3 * coord_n * 2);
+    for (field_vals, 0..) |*val, ii| {
+        val.* = 0.5 * @as(f64, @floatFromInt(ii));
+    }
+    const field = try Field.initView(talloc, field_vals, 3, coord_n, 2,
+                                     .{ 2, 3 * 2, 1 });
+
+    const sim_data = SimData{ .coords = coords, .connect = connect, .field = field };
+    try saveSimDataNpy(talloc, &sim_data, tmp_dir.dir,
+                       "coords.npy", "connect.npy", "field.npy");
+
+    var loaded = try loadSimDataNpy(testing.allocator, tmp_dir.dir,
+                                    "coords.npy", "connect.npy", "field.npy");
+    defer loaded.deinit();
+    const sim_npy = &loaded.sim_data;
+
+    try expectEqualSlices(f64, coords.x, sim_npy.coords.x);
+    try expectEqualSlices(f64, coords.y, sim_npy.coords.y);
+    try expectEqualSlices(f64, coords.z, sim_npy.coords.z);
+    try expectEqualSlices(Connect.Index, connect.table, sim_npy.connect.table);
+    try testing.expectEqual(@as(u8, 3), sim_npy.connect.nodes_per_elem);
+    try expectEqualSlices(usize, &.{ 3, coord_n, 2 }, sim_npy.field.buffer_dims);
+    for (0..3) |tt| {
+        for (0..coord_n) |nn| {
+            for (0..2) |ff| {
+                try testing.expectEqual(field.at(tt, nn, ff), 
+                                        sim_npy.field.at(tt, nn, ff));
+            }
+        }
+    }
+
+    // Float connectivity as written by np.savetxt style scripts, node 9 is
+    // past the last coord
+    const bad_table = [_]f32{ 0.0, 1.0, 9.0 };
+    try npy.saveSlice(f32, tmp_dir.dir, "bad.npy", &.{ 1, 3 }, bad_table[0..]);
+    try testing.expectError(npy.NpyError.NpyValueOutOfRange,
+                            loadSimDataNpy(testing.allocator, tmp_dir.dir,
+                                           "coords.npy", "bad.npy", "field.npy"));
+}
+
+test "meshio.hilbertKey steps between face neighbours" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    // Cells of an 8^3 block in the corner of the curve's cube are a whole
+    // sub-cube of the curve, so it visits them consecutively
+    const side: u32 = 8;
+    const cells = try talloc.alloc([3]u32, side * side * side);
+    const keys = try talloc.alloc(u64, cells.len);
+    for (cells, 0..) |*cell, ii| {
+        const ii_u: u32 = @intCast(ii);
+        cell.* = .{ ii_u % side, (ii_u / side) % side, ii_u / (side * side) };
+    }
+
+    const Context = struct {
+        cells: [][3]u32,
+        fn lessThan(ctx: @This(), cell_a: [3]u32, cell_b: [3]u32) bool {
+            _ = ctx;
+            return hilbertKey(cell_a) < hilbertKey(cell_b);
+        }
+    };
+    std.sort.pdq([3]u32, cells, Context{ .cells = cells }, Context.lessThan);
+
+    for (cells, 0..) |cell, ii| {
+        keys[ii] = hilbertKey(cell);
+    }
+    try testing.expectEqual(@as(u64, 0), keys[0]);
+    for (1..cells.len) |ii| {
+        try testing.expectEqual(keys[ii - 1] + 1, keys[ii]);
+        var dist: u32 = 0;
+        for (0..3) |dd| {
+            dist += @max(cells[ii][dd], cells[ii - 1][dd]) 
+                    - @min(cells[ii][dd], cells[ii - 1][dd]);
+        }
+        try testing.expectEqual(@as(u32, 1), dist);
+    }
+
+    // x is the most significant of each group of three bits
+    try testing.expectEqual(@as(u64, 0b001_010_100), mortonKey(.{ 1, 2, 4 }));
+}
+
+test "meshio.renumberSimData permutes consistently" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    // Triangulated plate with scrambled node and element numbers
+    const grid_n: usize = 9;
+    const coord_n: usize = grid_n * grid_n;
+    const elem_n: usize = 2 * (grid_n - 1) * (grid_n - 1);
+    var prng = std.Random.DefaultPrng.init(1234);
+    const node_shuffle = try talloc.alloc(usize, coord_n);
+    for (node_shuffle, 0..) |*nn, ii| nn.* = ii;
+    prng.random().shuffle(usize, node_shuffle);
+
+    var coords = try Coords.init(talloc, coord_n + 1);
+    for (0..grid_n) |jj| {
+        for (0..grid_n) |ii| {
+            const nn: usize = node_shuffle[jj * grid_n + ii];
+            coords.x[nn] = @floatFromInt(ii);
+            coords.y[nn] = @floatFromInt(jj);
+            coords.z[nn] = 0.25 * @as(f64, @floatFromInt(ii * jj));
+        }
+    }
+    // Node used by no element
+    coords.x[coord_n] = 100.0;
+    coords.y[coord_n] = 100.0;
+    coords.z[coord_n] = 100.0;
+
+    const table = try talloc.alloc(Connect.Index, 3 * elem_n);
+    var ee: usize = 0;
+    for (0..grid_n - 1) |jj| {
+        for (0..grid_n - 1) |ii| {
+            const n0: usize = jj * grid_n + ii;
+            const tris = [_]usize{ n0, n0 + 1, n0 + grid_n,
+                                   n0 + 1, n0 + grid_n + 1, n0 + grid_n };
+            for (tris, 0..) |nn, kk| {
+                table[3 * ee + kk] = @intCast(node_shuffle[nn]);
+            }
+            ee += 2;
+        }
+    }
+    const connect = Connect{ .nodes_per_elem = 3, .elem_n = elem_n, .table = table };
+
+    // Strided view to check the field is gathered through its strides
+    const time_n: usize = 2;
+    const fields_n: usize = 3;
+    const field_vals = try talloc.alloc(f64, time_n * (coord_n + 1) * fields_n);
+    for (field_vals, 0..) |*val, ii| {
+        val.* = @floatFromInt(ii);
+    }
+    const field = try Field.initView(talloc, field_vals, time_n, coord_n + 1,
+                                     fields_n, .{ fields_n, time_n * fields_n, 1 });
+    const sim_data = SimData{ .coords = coords, .connect = connect, .field = field };
+
+    for ([_]SpaceCurve{ .morton, .hilbert }) |curve| {
+        const mesh_order = try MeshOrder.init(talloc, &coords, &connect, curve);
+        const sim_new = try renumberSimData(talloc, &sim_data, &mesh_order);
+
+        for (0..coord_n + 1) |nn| {
+            try testing.expectEqual(nn, mesh_order.node_perm[mesh_order.node_inv[nn]]);
+        }
+        for (0..elem_n) |elem| {
+            try testing.expectEqual(elem, mesh_order.elem_perm[mesh_order.elem_inv[elem]]);
+        }
+        try testing.expectEqual(coord_n, mesh_order.node_inv[coord_n]);
+
+        for (0..elem_n) |elem_new| {
+            const elem_orig = connect.getElem(mesh_order.elem_perm[elem_new]);
+            for (sim_new.connect.getElem(elem_new), elem_orig) |nn_new, nn| {
+                try testing.expectEqual(nn, mesh_order.node_perm[nn_new]);
+                try testing.expectEqual(coords.x[nn], sim_new.coords.x[nn_new]);
+                try testing.expectEqual(coords.y[nn], sim_new.coords.y[nn_new]);
+                try testing.expectEqual(coords.z[nn], sim_new.coords.z[nn_new]);
+                for (0..time_n) |tt| {
+                    for (0..fields_n) |ff| {
+                        try testing.expectEqual(field.at(tt, nn, ff),
+                                                sim_new.field.at(tt, nn_new, ff));
+                    }
+                }
+            }
+        }
+
+        // Values computed on the renumbered mesh map back to the original
+        const x_orig = try talloc.alloc(f64, coord_n + 1);
+        MeshOrder.toOrig(f64, mesh_order.node_perm, sim_new.coords.x, x_orig);
+        try expectEqualSlices(f64, coords.x, x_orig);
+    }
+
+    const bad_order = try MeshOrder.init(talloc, &coords, &connect, .hilbert);
+    var short_data = sim_data;
+    short_data.connect.elem_n = elem_n - 1;
+    try testing.expectError(MeshIOError.RenumberSizeMismatch,
+                            renumberSimData(talloc, &short_data, &bad_order));
+}
+
+test "meshio.ConnectT.convert" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var table_usize = [_]usize{ 0, 1, 2, 2, 1, 3 };
+    const connect_usize = ConnectT(usize){ .nodes_per_elem = 3, .elem_n = 2,
+                                           .table = table_usize[0..] };
+    const connect = try connect_usize.convert(Connect.Index, talloc);
+    try expectEqualSlices(Connect.Index, &.{ 0, 1, 2, 2, 1, 3 }, connect.table);
+    try testing.expectEqual(@as(usize, 3), connect.getInd(1, 2));
+
+    table_usize[4] = @as(usize, std.math.maxInt(Connect.Index)) + 1;
+    try testing.expectError(MeshIOError.ConnectIndexOverflow,
+                            connect_usize.convert(Connect.Index, talloc));
+}
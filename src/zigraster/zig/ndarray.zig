@@ -10,6 +10,7 @@ const expectEqualSlices = testing.expectEqualSlices;
 
 const MatSlice = @import("matslice.zig").MatSlice;
 const sliceops = @import("sliceops.zig");
+const npy = @import("npy.zig");
 
 const NDArrayError = error{
     ElemsWrongLenForDims,
@@ -178,6 +179,68 @@ pub fn NDArray(comptime EType: type) type {
 
 	    	return self.elems[start_ind..end_ind];                     	
         } 
+
+        // Fixed rank view for hot loops, the rank must match the array
+        pub fn view(self: *const Self, comptime rank: usize) !NDView(EType, rank) {
+            if (self.dims.len != rank) {
+                return NDArrayError.IndicesWrongLenForDims;
+            }
+            return .{
+                .elems = self.elems,
+                .dims = self.dims[0..rank].*,
+                .strides = self.strides[0..rank].*,
+            };
+        }
+
+        // Saves as a C order .npy file that np.load reads with the same shape
+        pub fn saveNpy(self: *const Self,
+                       out_dir: std.fs.Dir,
+                       file_name: []const u8) !void {
+            try npy.saveSlice(EType, out_dir, file_name, self.dims, self.elems);
+        }
+
+        pub fn view2(self: *const Self) !NDView(EType, 2) {
+            return self.view(2);
+        }
+
+        pub fn view3(self: *const Self) !NDView(EType, 3) {
+            return self.view(3);
+        }
+    };
+}
+
+// Fixed rank view of an NDArray with the dims and strides held by value, so
+// indexing is a few multiply adds with no loop over the rank and no error
+// union. Bounds are only asserted, they are checked in Debug and ReleaseSafe
+// builds and compiled out in ReleaseFast and ReleaseSmall.
+pub fn NDView(comptime EType: type, comptime rank: usize) type {
+    return struct {
+        elems: []EType,
+        dims: [rank]usize,
+        strides: [rank]usize,
+
+        const Self: type = @This();
+
+        pub inline fn flatInd(self: *const Self, indices: [rank]usize) usize {
+            var flat: usize = 0;
+            inline for (0..rank) |dd| {
+                assert(indices[dd] < self.dims[dd]);
+                flat += indices[dd] * self.strides[dd];
+            }
+            return flat;
+        }
+
+        pub inline fn at(self: *const Self, indices: [rank]usize) EType {
+            return self.elems[self.flatInd(indices)];
+        }
+
+        pub inline fn ptrAt(self: *const Self, indices: [rank]usize) *EType {
+            return &self.elems[self.flatInd(indices)];
+        }
+
+        pub inline fn setAt(self: *const Self, indices: [rank]usize, val: EType) void {
+            self.elems[self.flatInd(indices)] = val;
+        }
     };
 }
 
@@ -391,3 +454,44 @@ test "getSlice" {
     try expectEqualSlices(f64, check_arr0[0..], ext_slice0[0..]);
 	try expectEqualSlices(f64, check_arr1[0..], ext_slice1[0..]);
 }
+
+test "NDView" {
+    var dims0 = [_]usize{ 2, 3, 3 };
+    var elems0 = [_]f64{0.0} ** 18;
+    var arr0 = try NDArray(f64).init(talloc, elems0[0..], dims0[0..]);
+    defer arr0.deinit(talloc);
+
+    const view0 = try arr0.view3();
+    try expectEqual(view0.flatInd(.{ 1, 2, 1 }), 16);
+    try expectEqual(view0.flatInd(.{ 1, 2, 2 }), 17);
+
+    view0.setAt(.{ 1, 0, 2 }, 7.0);
+    const inds0 = [_]usize{ 1, 0, 2 };
+    try expectEqual(try arr0.get(inds0[0..]), 7.0);
+    try expectEqual(view0.at(.{ 1, 0, 2 }), 7.0);
+
+    view0.ptrAt(.{ 0, 1, 0 }).* += 2.0;
+    try expectEqual(elems0[3], 2.0);
+
+    try testing.expectError(NDArrayError.IndicesWrongLenForDims, arr0.view2());
+}
+
+test "NDArray.saveNpy" {
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    var dims0 = [_]usize{ 2, 1, 3 };
+    var elems0 = [_]f64{ 1.0, 2.0, 3.0, 4.0, 5.0, 6.0 };
+    var arr0 = try NDArray(f64).init(talloc, elems0[0..], dims0[0..]);
+    defer arr0.deinit(talloc);
+    try arr0.saveNpy(tmp_dir.dir, "arr0.npy");
+
+    var arr1 = try npy.loadNDArray(f64, talloc, tmp_dir.dir, "arr0.npy");
+    defer {
+        talloc.free(arr1.elems);
+        arr1.deinit(talloc);
+    }
+    try expectEqualSlices(usize, arr0.dims, arr1.dims);
+    try expectEqualSlices(usize, arr0.strides, arr1.strides);
+    try expectEqualSlices(f64, arr0.elems, arr1.elems);
+}
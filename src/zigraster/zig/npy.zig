@@ -0,0 +1,896 @@
+const std = @import("std");
+const builtin = @import("builtin");
+
+const testing = std.testing;
+const expect = testing.expect;
+const expectEqual = testing.expectEqual;
+const expectEqualSlices = testing.expectEqualSlices;
+const expectEqualStrings = testing.expectEqualStrings;
+const expectError = testing.expectError;
+
+const NDArray = @import("ndarray.zig").NDArray;
+
+//------------------------------------------------------------------------------
+// NUMPY .NPY FORMAT
+//
+// Version 1.0 files are the magic string, a two byte version, a little endian
+// u16 header length and then a python dict literal giving the dtype, memory
+// order and shape. The header is padded with spaces and ends in a newline so
+// the array data starts on a header_align byte boundary. The data is the raw
+// array in the given order with no padding. Versions 2.0 and 3.0 only differ
+// by a u32 header length and are read but not written.
+//
+// A .npz file is a zip archive of .npy files, one per named array. Only
+// members stored without compression (np.savez) can be read here, files from
+// np.savez_compressed are rejected.
+
+pub const magic = "\x93NUMPY";
+pub const header_align: usize = 64;
+// Header dict plus padding, version 1.0 stores the length in a u16
+pub const header_len_max: usize = std.math.maxInt(u16);
+pub const max_dims: usize = 8;
+
+pub const NpyError = error{
+    NpyHeaderTooLong,
+    NpyBadMagic,
+    NpyUnsupportedVersion,
+    NpyBadHeader,
+    NpyUnsupportedDType,
+    NpyByteOrderMismatch,
+    NpyTooManyDims,
+    NpyTruncated,
+    NpyShapeMismatch,
+    NpyDTypeMismatch,
+    NpyNotCOrder,
+    NpyMisaligned,
+    NpyValueOutOfRange,
+    NpzBadArchive,
+    NpzMemberNotFound,
+    NpzCompressed,
+    NpzTooLarge,
+};
+
+const native_order: u8 = if (builtin.cpu.arch.endian() == .little) '<' else '>';
+
+pub const DType = enum {
+    f32,
+    f64,
+    i8,
+    i16,
+    i32,
+    i64,
+    u8,
+    u16,
+    u32,
+    u64,
+
+    pub fn Type(comptime self: DType) type {
+        return switch (self) {
+            .f32 => f32,
+            .f64 => f64,
+            .i8 => i8,
+            .i16 => i16,
+            .i32 => i32,
+            .i64 => i64,
+            .u8 => u8,
+            .u16 => u16,
+            .u32 => u32,
+            .u64 => u64,
+        };
+    }
+
+    pub fn of(comptime EType: type) DType {
+        return switch (EType) {
+            f32 => .f32,
+            f64 => .f64,
+            i8 => .i8,
+            i16 => .i16,
+            i32 => .i32,
+            i64 => .i64,
+            u8 => .u8,
+            u16 => .u16,
+            u32 => .u32,
+            u64 => .u64,
+            usize => if (@sizeOf(usize) == 8) .u64 else .u32,
+            else => @compileError("No npy dtype for " ++ @typeName(EType)),
+        };
+    }
+
+    pub fn size(self: DType) usize {
+        return switch (self) {
+            inline else => |dt| @sizeOf(dt.Type()),
+        };
+    }
+
+    // Array protocol type string in native byte order, e.g. '<f8'
+    pub fn descr(self: DType) []const u8 {
+        return switch (self) {
+            inline else => |dt| comptime blk: {
+                const EType = dt.Type();
+                const kind = switch (@typeInfo(EType)) {
+                    .float => "f",
+                    .int => |info| if (info.signedness == .signed) "i" else "u",
+                    else => unreachable,
+                };
+                const order = if (@sizeOf(EType) == 1) "|" else &[_]u8{native_order};
+                break :blk order ++ kind ++ std.fmt.comptimePrint("{d}", .{@sizeOf(EType)});
+            },
+        };
+    }
+
+    // Parses a descr such as '<f8', '|u1' or '=i4', swapped byte orders and
+    // structured, string or complex dtypes are rejected
+    pub fn fromDescr(dtype_descr: []const u8) !DType {
+        if (dtype_descr.len < 3) {
+            return NpyError.NpyUnsupportedDType;
+        }
+        const bytes: usize = std.fmt.parseInt(usize, dtype_descr[2..], 10)
+            catch return NpyError.NpyUnsupportedDType;
+
+        var name_buff: [8]u8 = undefined;
+        const name = std.fmt.bufPrint(name_buff[0..], "{c}{d}",
+                                      .{ dtype_descr[1], 8 * bytes })
+            catch return NpyError.NpyUnsupportedDType;
+        const dtype = std.meta.stringToEnum(DType, name)
+            orelse return NpyError.NpyUnsupportedDType;
+
+        switch (dtype_descr[0]) {
+            '|', '=' => {},
+            '<', '>' => if ((dtype.size() > 1) and (dtype_descr[0] != native_order)) {
+                return NpyError.NpyByteOrderMismatch;
+            },
+            else => return NpyError.NpyUnsupportedDType,
+        }
+        return dtype;
+    }
+};
+
+// Array protocol type string for EType in native byte order, e.g. '<f8'
+pub fn descr(comptime EType: type) []const u8 {
+    return comptime DType.of(EType).descr();
+}
+
+//------------------------------------------------------------------------------
+// HEADER
+
+pub const Header = struct {
+    dtype: DType,
+    fortran_order: bool,
+    shape_buff: [max_dims]usize = @splat(0),
+    dims_n: usize = 0,
+    // Byte offset of the array data from the start of the file
+    data_offset: usize,
+
+    pub fn shape(self: *const Header) []const usize {
+        return self.shape_buff[0..self.dims_n];
+    }
+
+    pub fn elemsN(self: *const Header) usize {
+        var elems_n: usize = 1;
+        for (self.shape()) |dim| {
+            elems_n *= dim;
+        }
+        return elems_n;
+    }
+
+    pub fn dataBytes(self: *const Header) usize {
+        return self.elemsN() * self.dtype.size();
+    }
+};
+
+// Writes the magic, version, length and padded header dict into buff and
+// returns the written bytes. The array data should follow immediately.
+pub fn formatHeader(buff: []u8,
+                    dtype_descr: []const u8,
+                    fortran_order: bool,
+                    shape: []const usize) ![]u8 {
+
+    // Dict is written after the 10 byte preamble and measured afterwards
+    const preamble_len: usize = magic.len + 2 + 2;
+    var dict_writer = std.Io.Writer.fixed(buff[preamble_len..]);
+    const writer = &dict_writer;
+
+    try writer.print("{{'descr': '{s}', 'fortran_order': {s}, 'shape': (",
+                     .{ dtype_descr, if (fortran_order) "True" else "False" });
+    for (shape, 0..) |dim, dd| {
+        try writer.print("{d}", .{dim});
+        // A one element tuple needs the trailing comma
+        if ((dd < shape.len - 1) or (shape.len == 1)) {
+            try writer.writeAll(",");
+        }
+        if (dd < shape.len - 1) {
+            try writer.writeAll(" ");
+        }
+    }
+    try writer.writeAll("), }");
+
+    const unpadded_len: usize = preamble_len + writer.end + 1;
+    const total_len: usize = std.mem.alignForward(usize, unpadded_len,
+                                                  header_align);
+    const dict_len: usize = total_len - preamble_len;
+    if ((dict_len > header_len_max) or (total_len > buff.len)) {
+        return NpyError.NpyHeaderTooLong;
+    }
+
+    @memset(buff[preamble_len + writer.end..total_len - 1], ' ');
+    buff[total_len - 1] = '\n';
+
+    @memcpy(buff[0..magic.len], magic);
+    buff[magic.len] = 1;
+    buff[magic.len + 1] = 0;
+    std.mem.writeInt(u16, buff[magic.len + 2..][0..2], @intCast(dict_len),
+                     .little);
+
+    return buff[0..total_len];
+}
+
+// Returns the text after 'key': in the header dict
+fn dictValue(dict: []const u8, key: []const u8) ![]const u8 {
+    var key_buff: [32]u8 = undefined;
+    const quoted = std.fmt.bufPrint(key_buff[0..], "'{s}'", .{key})
+        catch return NpyError.NpyBadHeader;
+    const key_ind = std.mem.indexOf(u8, dict, quoted)
+        orelse return NpyError.NpyBadHeader;
+    const rest = dict[key_ind + quoted.len..];
+    const colon_ind = std.mem.indexOfScalar(u8, rest, ':')
+        orelse return NpyError.NpyBadHeader;
+    return std.mem.trimLeft(u8, rest[colon_ind + 1..], " ");
+}
+
+// Parses the header at the start of bytes, which can be the whole file
+pub fn parseHeader(bytes: []const u8) !Header {
+    if ((bytes.len < magic.len + 4) or !std.mem.startsWith(u8, bytes, magic)) {
+        return NpyError.NpyBadMagic;
+    }
+
+    var dict_start: usize = 0;
+    var dict_len: usize = 0;
+    switch (bytes[magic.len]) {
+        1 => {
+            dict_start = magic.len + 2 + 2;
+            dict_len = std.mem.readInt(u16, bytes[magic.len + 2..][0..2], .little);
+        },
+        2, 3 => {
+            dict_start = magic.len + 2 + 4;
+            if (bytes.len < dict_start) {
+                return NpyError.NpyTruncated;
+            }
+            dict_len = std.mem.readInt(u32, bytes[magic.len + 2..][0..4], .little);
+        },
+        else => return NpyError.NpyUnsupportedVersion,
+    }
+    if (bytes.len < dict_start + dict_len) {
+        return NpyError.NpyTruncated;
+    }
+    const dict = bytes[dict_start..dict_start + dict_len];
+
+    // 'descr': '<f8'
+    const descr_val = try dictValue(dict, "descr");
+    if ((descr_val.len < 2) or (descr_val[0] != '\'')) {
+        return NpyError.NpyUnsupportedDType;
+    }
+    const descr_end = std.mem.indexOfScalarPos(u8, descr_val, 1, '\'')
+        orelse return NpyError.NpyBadHeader;
+
+    // 'fortran_order': False
+    const order_val = try dictValue(dict, "fortran_order");
+    const fortran_order: bool = if (std.mem.startsWith(u8, order_val, "True")) true
+        else if (std.mem.startsWith(u8, order_val, "False")) false
+        else return NpyError.NpyBadHeader;
+
+    var header = Header{
+        .dtype = try DType.fromDescr(descr_val[1..descr_end]),
+        .fortran_order = fortran_order,
+        .data_offset = dict_start + dict_len,
+    };
+
+    // 'shape': (9, 3, 1280, 960), an empty tuple is a scalar
+    const shape_val = try dictValue(dict, "shape");
+    if ((shape_val.len == 0) or (shape_val[0] != '(')) {
+        return NpyError.NpyBadHeader;
+    }
+    const shape_end = std.mem.indexOfScalar(u8, shape_val, ')')
+        orelse return NpyError.NpyBadHeader;
+    var dims = std.mem.tokenizeAny(u8, shape_val[1..shape_end], ", ");
+    while (dims.next()) |dim_str| {
+        if (header.dims_n >= max_dims) {
+            return NpyError.NpyTooManyDims;
+        }
+        // Python 2 writes longs with an L suffix
+        const digits = std.mem.trimRight(u8, dim_str, "L");
+        header.shape_buff[header.dims_n] = std.fmt.parseInt(usize, digits, 10)
+            catch return NpyError.NpyBadHeader;
+        header.dims_n += 1;
+    }
+
+    return header;
+}
+
+//------------------------------------------------------------------------------
+// READING
+
+fn castElem(comptime EType: type, comptime SType: type, value: SType) !EType {
+    if (EType == SType) {
+        return value;
+    }
+    switch (@typeInfo(EType)) {
+        .float => return switch (@typeInfo(SType)) {
+            .float => @floatCast(value),
+            else => @floatFromInt(value),
+        },
+        else => switch (@typeInfo(SType)) {
+            // Integer arrays saved as floats, e.g. connectivity from np.savetxt
+            .float => {
+                const min_val: SType = @floatFromInt(std.math.minInt(EType));
+                const max_val: SType = @floatFromInt(std.math.maxInt(EType));
+                if (!std.math.isFinite(value) or (value < min_val)
+                    or (value >= max_val)) {
+                    return NpyError.NpyValueOutOfRange;
+                }
+                return @intFromFloat(value);
+            },
+            else => return std.math.cast(EType, value)
+                orelse NpyError.NpyValueOutOfRange,
+        },
+    }
+}
+
+// Header and data of one array, in a mapped .npy file or an .npz member
+pub const NpyView = struct {
+    header: Header,
+    data: []u8,
+
+    pub fn init(bytes: []u8) !NpyView {
+        const header = try parseHeader(bytes);
+        if (bytes.len < header.data_offset + header.dataBytes()) {
+            return NpyError.NpyTruncated;
+        }
+        return .{
+            .header = header,
+            .data = bytes[header.data_offset..header.data_offset + header.dataBytes()],
+        };
+    }
+
+    // The data in place without copying, the dtype must be EType and it must
+    // be C order. The header padding keeps files written by numpy or this
+    // module aligned.
+    pub fn slice(self: *const NpyView, comptime EType: type) ![]EType {
+        if (self.header.dtype != DType.of(EType)) {
+            return NpyError.NpyDTypeMismatch;
+        }
+        if (self.header.fortran_order and (self.header.dims_n > 1)) {
+            return NpyError.NpyNotCOrder;
+        }
+        if (@intFromPtr(self.data.ptr) % @alignOf(EType) != 0) {
+            return NpyError.NpyMisaligned;
+        }
+        const bytes: []align(@alignOf(EType)) u8 = @alignCast(self.data);
+        return std.mem.bytesAsSlice(EType, bytes);
+    }
+
+    // Copies the data into out in C order converting it to EType. Integers
+    // that do not fit, or non-finite floats converted to integers, are an
+    // error.
+    pub fn copyTo(self: *const NpyView, comptime EType: type, out: []EType) !void {
+        if (out.len != self.header.elemsN()) {
+            return NpyError.NpyShapeMismatch;
+        }
+
+        switch (self.header.dtype) {
+            inline else => |dt| {
+                const SType = dt.Type();
+                // align(1) so npz members at odd offsets can be read
+                const src = std.mem.bytesAsSlice(SType, self.data);
+                const shape = self.header.shape();
+
+                if (!self.header.fortran_order or (shape.len <= 1)) {
+                    for (src, out) |value, *dest| {
+                        dest.* = try castElem(EType, SType, value);
+                    }
+                    return;
+                }
+
+                // Step through the C order index and track the matching F
+                // order flat index, the first dim has unit stride in F order
+                var f_strides: [max_dims]usize = undefined;
+                var f_stride: usize = 1;
+                for (shape, 0..) |dim, dd| {
+                    f_strides[dd] = f_stride;
+                    f_stride *= dim;
+                }
+                var inds: [max_dims]usize = @splat(0);
+                var f_ind: usize = 0;
+                for (out) |*dest| {
+                    dest.* = try castElem(EType, SType, src[f_ind]);
+
+                    var dd: usize = shape.len;
+                    while (dd > 0) {
+                        dd -= 1;
+                        inds[dd] += 1;
+                        f_ind += f_strides[dd];
+                        if (inds[dd] < shape[dd]) {
+                            break;
+                        }
+                        f_ind -= inds[dd] * f_strides[dd];
+                        inds[dd] = 0;
+                    }
+                }
+            },
+        }
+    }
+};
+
+fn mapFileBytes(dir: std.fs.Dir,
+                path: []const u8) ![]align(std.heap.page_size_min) u8 {
+    var file = try dir.openFile(path, .{ .mode = .read_only });
+    defer file.close();
+
+    const file_size: usize = @intCast((try file.stat()).size);
+    if (file_size == 0) {
+        return NpyError.NpyTruncated;
+    }
+
+    // Private so callers can modify the values without changing the file
+    return std.posix.mmap(null,
+                          file_size,
+                          std.posix.PROT.READ | std.posix.PROT.WRITE,
+                          .{ .TYPE = .PRIVATE },
+                          file.handle,
+                          0);
+}
+
+// A memory mapped .npy file, pages are only read when they are touched
+pub const NpyMapped = struct {
+    mapping: []align(std.heap.page_size_min) u8,
+    view: NpyView,
+
+    const Self = @This();
+
+    pub fn mapFile(dir: std.fs.Dir, path: []const u8) !Self {
+        const mapping = try mapFileBytes(dir, path);
+        errdefer std.posix.munmap(mapping);
+        return .{
+            .mapping = mapping,
+            .view = try NpyView.init(mapping),
+        };
+    }
+
+    pub fn deinit(self: *Self) void {
+        std.posix.munmap(self.mapping);
+    }
+};
+
+// Reads a .npy file into a new C order array of EType, converting the dtype.
+// The caller owns the elements and the array, free with allocator.free(
+// arr.elems) and arr.deinit(allocator).
+pub fn loadNDArray(comptime EType: type,
+                   allocator: std.mem.Allocator,
+                   dir: std.fs.Dir,
+                   path: []const u8) !NDArray(EType) {
+    var mapped = try NpyMapped.mapFile(dir, path);
+    defer mapped.deinit();
+
+    const header = &mapped.view.header;
+    const elems = try allocator.alloc(EType, header.elemsN());
+    errdefer allocator.free(elems);
+    try mapped.view.copyTo(EType, elems);
+
+    // NDArray needs at least one dim so a scalar is stored with shape (1,)
+    var dims_buff: [max_dims]usize = header.shape_buff;
+    if (header.dims_n == 0) {
+        dims_buff[0] = 1;
+    }
+    return NDArray(EType).init(allocator, elems, dims_buff[0..@max(header.dims_n, 1)]);
+}
+
+//------------------------------------------------------------------------------
+// WRITING
+
+fn checkShape(shape: []const usize, elems_n: usize) !void {
+    var shape_n: usize = 1;
+    for (shape) |dim| {
+        shape_n *= dim;
+    }
+    if ((shape_n != elems_n) or (shape.len > max_dims)) {
+        return NpyError.NpyShapeMismatch;
+    }
+}
+
+// Saves elems as a C order .npy file with the given shape
+pub fn saveSlice(comptime EType: type,
+                 dir: std.fs.Dir,
+                 path: []const u8,
+                 shape: []const usize,
+                 elems: []const EType) !void {
+    try checkShape(shape, elems.len);
+
+    var header_buff: [512]u8 = undefined;
+    const header = try formatHeader(header_buff[0..], descr(EType), false, shape);
+
+    const npy_file = try dir.createFile(path, .{});
+    defer npy_file.close();
+
+    var write_buf: [8192]u8 = undefined;
+    var file_writer = npy_file.writer(&write_buf);
+    const writer = &file_writer.interface;
+
+    try writer.writeAll(header);
+    try writer.writeAll(std.mem.sliceAsBytes(elems));
+    try writer.flush();
+}
+
+//------------------------------------------------------------------------------
+// NPZ
+//
+// Stored zip archive: a local file header then the .npy bytes for each member
+// followed by a central directory entry for every member and an end record.
+// Zip64 is not supported so the archive must be under 4GB.
+
+const zip_local_sig: u32 = 0x04034b50;
+const zip_central_sig: u32 = 0x02014b50;
+const zip_end_sig: u32 = 0x06054b50;
+const zip_local_len: usize = 30;
+const zip_central_len: usize = 46;
+const zip_end_len: usize = 22;
+const zip_version: u16 = 20;
+
+// One named array to save in an .npz, stored as name.npy
+pub const NpzMember = struct {
+    name: []const u8,
+    dtype: DType,
+    shape: []const usize,
+    bytes: []const u8,
+
+    pub fn init(comptime EType: type,
+                name: []const u8,
+                shape: []const usize,
+                elems: []const EType) NpzMember {
+        return .{
+            .name = name,
+            .dtype = DType.of(EType),
+            .shape = shape,
+            .bytes = std.mem.sliceAsBytes(elems),
+        };
+    }
+};
+
+fn writeZipEntry(writer: *std.Io.Writer,
+                 central: bool,
+                 name: []const u8,
+                 crc: u32,
+                 size: u32,
+                 local_offset: u32) !void {
+    try writer.writeInt(u32, if (central) zip_central_sig else zip_local_sig, .little);
+    if (central) {
+        try writer.writeInt(u16, zip_version, .little); // made by
+    }
+    try writer.writeInt(u16, zip_version, .little); // needed to extract
+    try writer.writeInt(u16, 0, .little); // flags
+    try writer.writeInt(u16, 0, .little); // stored
+    try writer.writeInt(u16, 0, .little); // mod time
+    try writer.writeInt(u16, (1 << 5) | 1, .little); // mod date 1980-01-01
+    try writer.writeInt(u32, crc, .little);
+    try writer.writeInt(u32, size, .little); // compressed
+    try writer.writeInt(u32, size, .little); // uncompressed
+    try writer.writeInt(u16, @intCast(name.len + 4), .little);
+    try writer.writeInt(u16, 0, .little); // extra length
+    if (central) {
+        try writer.writeInt(u16, 0, .little); // comment length
+        try writer.writeInt(u16, 0, .little); // disk number
+        try writer.writeInt(u16, 0, .little); // internal attributes
+        try writer.writeInt(u32, 0, .little); // external attributes
+        try writer.writeInt(u32, local_offset, .little);
+    }
+    try writer.writeAll(name);
+    try writer.writeAll(".npy");
+}
+
+// Saves the arrays as an uncompressed .npz that np.load opens by name
+pub fn saveNpz(dir: std.fs.Dir, path: []const u8, members: []const NpzMember) !void {
+    const npz_file = try dir.createFile(path, .{});
+    defer npz_file.close();
+
+    var write_buf: [8192]u8 = undefined;
+    var file_writer = npz_file.writer(&write_buf);
+    const writer = &file_writer.interface;
+
+    const crcs = try std.heap.page_allocator.alloc(u32, members.len);
+    defer std.heap.page_allocator.free(crcs);
+
+    var header_buff: [512]u8 = undefined;
+    var pos: usize = 0;
+
+    for (members, crcs) |member, *crc_out| {
+        try checkShape(member.shape, member.bytes.len / member.dtype.size());
+        const header = try formatHeader(header_buff[0..],
+                                        member.dtype.descr(),
+                                        false,
+                                        member.shape);
+        const size: usize = header.len + member.bytes.len;
+        const entry_len: usize = zip_local_len + member.name.len + 4 + size;
+        if (pos + entry_len > std.math.maxInt(u32)) {
+            return NpyError.NpzTooLarge;
+        }
+
+        var crc = std.hash.Crc32.init();
+        crc.update(header);
+        crc.update(member.bytes);
+        crc_out.* = crc.final();
+
+        try writeZipEntry(writer, false, member.name, crc_out.*,
+                          @intCast(size), 0);
+        try writer.writeAll(header);
+        try writer.writeAll(member.bytes);
+        pos += entry_len;
+    }
+
+    const central_start: usize = pos;
+    var local_offset: usize = 0;
+    for (members, crcs) |member, crc| {
+        const header = try formatHeader(header_buff[0..],
+                                        member.dtype.descr(),
+                                        false,
+                                        member.shape);
+        const size: usize = header.len + member.bytes.len;
+        try writeZipEntry(writer, true, member.name, crc,
+                          @intCast(size), @intCast(local_offset));
+        local_offset += zip_local_len + member.name.len + 4 + size;
+        pos += zip_central_len + member.name.len + 4;
+    }
+
+    try writer.writeInt(u32, zip_end_sig, .little);
+    try writer.writeInt(u16, 0, .little); // this disk
+    try writer.writeInt(u16, 0, .little); // central directory disk
+    try writer.writeInt(u16, @intCast(members.len), .little);
+    try writer.writeInt(u16, @intCast(members.len), .little);
+    try writer.writeInt(u32, @intCast(pos - central_start), .little);
+    try writer.writeInt(u32, @intCast(central_start), .little);
+    try writer.writeInt(u16, 0, .little); // comment length
+    try writer.flush();
+}
+
+// A memory mapped .npz, members are found through the central directory
+pub const NpzMapped = struct {
+    mapping: []align(std.heap.page_size_min) u8,
+    central_start: usize,
+    members_n: usize,
+
+    const Self = @This();
+
+    pub fn mapFile(dir: std.fs.Dir, path: []const u8) !Self {
+        const mapping = try mapFileBytes(dir, path);
+        errdefer std.posix.munmap(mapping);
+
+        // The end record is last unless the archive has a comment
+        if (mapping.len < zip_end_len) {
+            return NpyError.NpzBadArchive;
+        }
+        var end_ind: usize = mapping.len - zip_end_len;
+        while (std.mem.readInt(u32, mapping[end_ind..][0..4], .little) != zip_end_sig) {
+            if (end_ind == 0) {
+                return NpyError.NpzBadArchive;
+            }
+            end_ind -= 1;
+        }
+
+        const central_start: usize = std.mem.readInt(u32, mapping[end_ind + 16..][0..4],
+                                                     .little);
+        if (central_start > end_ind) {
+            return NpyError.NpzBadArchive;
+        }
+
+        return .{
+            .mapping = mapping,
+            .central_start = central_start,
+            .members_n = std.mem.readInt(u16, mapping[end_ind + 10..][0..2], .little),
+        };
+    }
+
+    pub fn deinit(self: *Self) void {
+        std.posix.munmap(self.mapping);
+    }
+
+    // The array saved under name, as passed to np.savez without the .npy
+    pub fn member(self: *const Self, name: []const u8) !NpyView {
+        const bytes = self.mapping;
+        var pos: usize = self.central_start;
+
+        for (0..self.members_n) |_| {
+            if ((pos + zip_central_len > bytes.len)
+                or (std.mem.readInt(u32, bytes[pos..][0..4], .little) != zip_central_sig)) {
+                return NpyError.NpzBadArchive;
+            }
+            const method = std.mem.readInt(u16, bytes[pos + 10..][0..2], .little);
+            const size: usize = std.mem.readInt(u32, bytes[pos + 20..][0..4], .little);
+            const name_len: usize = std.mem.readInt(u16, bytes[pos + 28..][0..2], .little);
+            const extra_len: usize = std.mem.readInt(u16, bytes[pos + 30..][0..2], .little);
+            const comment_len: usize = std.mem.readInt(u16, bytes[pos + 32..][0..2], .little);
+            const local_offset: usize = std.mem.readInt(u32, bytes[pos + 42..][0..4], .little);
+            if (pos + zip_central_len + name_len > bytes.len) {
+                return NpyError.NpzBadArchive;
+            }
+            const member_name = bytes[pos + zip_central_len..][0..name_len];
+            pos += zip_central_len + name_len + extra_len + comment_len;
+
+            const stem = if (std.mem.endsWith(u8, member_name, ".npy"))
+                member_name[0..member_name.len - 4] else member_name;
+            if (!std.mem.eql(u8, stem, name)) {
+                continue;
+            }
+            if (method != 0) {
+                return NpyError.NpzCompressed;
+            }
+
+            // The local header can have a different extra field length
+            if ((local_offset + zip_local_len > bytes.len)
+                or (std.mem.readInt(u32, bytes[local_offset..][0..4], .little) != zip_local_sig)) {
+                return NpyError.NpzBadArchive;
+            }
+            const local_name_len: usize = std.mem.readInt(u16, bytes[local_offset + 26..][0..2],
+                                                          .little);
+            const local_extra_len: usize = std.mem.readInt(u16, bytes[local_offset + 28..][0..2],
+                                                           .little);
+            const data_start: usize = local_offset + zip_local_len
+                                      + local_name_len + local_extra_len;
+            if (data_start + size > bytes.len) {
+                return NpyError.NpzBadArchive;
+            }
+            return NpyView.init(bytes[data_start..data_start + size]);
+        }
+
+        return NpyError.NpzMemberNotFound;
+    }
+};
+
+//------------------------------------------------------------------------------
+test "npy.formatHeader" {
+    var buff: [256]u8 = undefined;
+
+    const shape = [_]usize{ 9, 3, 1280, 960 };
+    try expectEqualStrings("<f8", descr(f64));
+    const header = try formatHeader(buff[0..], descr(f64), false, shape[0..]);
+
+    try expectEqual(@as(usize, 0), header.len % header_align);
+    try expect(std.mem.startsWith(u8, header, magic));
+    try expectEqual(@as(u16, @intCast(header.len - 10)),
+                    std.mem.readInt(u16, header[8..10], .little));
+    try expectEqual(@as(u8, '\n'), header[header.len - 1]);
+
+    const dict = std.mem.trimRight(u8, header[10..], " \n");
+    try expectEqualStrings(
+        "{'descr': '<f8', 'fortran_order': False, 'shape': (9, 3, 1280, 960), }",
+        dict);
+
+    const shape_1d = [_]usize{7};
+    const header_1d = try formatHeader(buff[0..], "<f4", true, shape_1d[0..]);
+    const dict_1d = std.mem.trimRight(u8, header_1d[10..], " \n");
+    try expectEqualStrings(
+        "{'descr': '<f4', 'fortran_order': True, 'shape': (7,), }", dict_1d);
+}
+
+test "npy.parseHeader" {
+    var buff: [256]u8 = undefined;
+    const shape = [_]usize{ 4, 2 };
+    const header_bytes = try formatHeader(buff[0..], descr(u8), true, shape[0..]);
+    const header = try parseHeader(header_bytes);
+    try expectEqual(DType.u8, header.dtype);
+    try expect(header.fortran_order);
+    try expectEqualSlices(usize, shape[0..], header.shape());
+    try expectEqual(header_bytes.len, header.data_offset);
+
+    try expectEqualStrings("|u1", descr(u8));
+    try expectEqual(DType.i64, try DType.fromDescr(descr(i64)));
+    try expectEqual(DType.f32, try DType.fromDescr("=f4"));
+    const swapped = if (native_order == '<') ">f8" else "<f8";
+    try expectError(NpyError.NpyByteOrderMismatch, DType.fromDescr(swapped));
+    try expectError(NpyError.NpyUnsupportedDType, DType.fromDescr("<U8"));
+    try expectError(NpyError.NpyUnsupportedDType, DType.fromDescr("<c16"));
+
+    // Scalars have an empty shape tuple
+    const scalar = try formatHeader(buff[0..], "<f8", false, &.{});
+    const scalar_header = try parseHeader(scalar);
+    try expectEqual(@as(usize, 0), scalar_header.dims_n);
+    try expectEqual(@as(usize, 1), scalar_header.elemsN());
+
+    try expectError(NpyError.NpyBadMagic, parseHeader("not a npy file"));
+}
+
+test "npy save and load round trip" {
+    const talloc = testing.allocator;
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    // C order with a matching dtype is used in place in the mapping
+    const elems = [_]f64{ 0.0, 1.0, 2.0, 3.0, 4.0, 5.5 };
+    const shape = [_]usize{ 2, 3 };
+    try saveSlice(f64, tmp_dir.dir, "arr.npy", shape[0..], elems[0..]);
+
+    var mapped = try NpyMapped.mapFile(tmp_dir.dir, "arr.npy");
+    defer mapped.deinit();
+    try expectEqualSlices(f64, elems[0..], try mapped.view.slice(f64));
+    try expectEqualSlices(usize, shape[0..], mapped.view.header.shape());
+    try expectError(NpyError.NpyDTypeMismatch, mapped.view.slice(f32));
+
+    // Loading converts the dtype
+    var loaded = try loadNDArray(f32, talloc, tmp_dir.dir, "arr.npy");
+    defer {
+        talloc.free(loaded.elems);
+        loaded.deinit(talloc);
+    }
+    try expectEqualSlices(usize, shape[0..], loaded.dims);
+    try expectEqual(@as(f32, 5.5), loaded.elems[5]);
+
+    // Float indices, as written by np.savetxt, load as integers
+    var loaded_ind = try loadNDArray(usize, talloc, tmp_dir.dir, "arr.npy");
+    defer {
+        talloc.free(loaded_ind.elems);
+        loaded_ind.deinit(talloc);
+    }
+    try expectEqual(@as(usize, 2), loaded_ind.elems[2]);
+
+    const neg = [_]i32{ 3, -1 };
+    try saveSlice(i32, tmp_dir.dir, "neg.npy", &.{2}, neg[0..]);
+    try expectError(NpyError.NpyValueOutOfRange,
+                    loadNDArray(usize, talloc, tmp_dir.dir, "neg.npy"));
+    try expectError(NpyError.NpyShapeMismatch,
+                    saveSlice(i32, tmp_dir.dir, "bad.npy", &.{3}, neg[0..]));
+}
+
+test "npy fortran order is loaded as C order" {
+    const talloc = testing.allocator;
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    // C order [[0,1,2],[3,4,5]] is [0,3,1,4,2,5] in F order
+    const f_elems = [_]u16{ 0, 3, 1, 4, 2, 5 };
+    const shape = [_]usize{ 2, 3 };
+    var header_buff: [128]u8 = undefined;
+    const header = try formatHeader(header_buff[0..], descr(u16), true, shape[0..]);
+    {
+        const file = try tmp_dir.dir.createFile("f.npy", .{});
+        defer file.close();
+        try file.pwriteAll(header, 0);
+        try file.pwriteAll(std.mem.sliceAsBytes(f_elems[0..]), header.len);
+    }
+
+    var loaded = try loadNDArray(u64, talloc, tmp_dir.dir, "f.npy");
+    defer {
+        talloc.free(loaded.elems);
+        loaded.deinit(talloc);
+    }
+    try expectEqualSlices(u64, &.{ 0, 1, 2, 3, 4, 5 }, loaded.elems);
+
+    var mapped = try NpyMapped.mapFile(tmp_dir.dir, "f.npy");
+    defer mapped.deinit();
+    try expectError(NpyError.NpyNotCOrder, mapped.view.slice(u16));
+}
+
+test "npz save and load round trip" {
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    const coords = [_]f64{ 0.0, 1.0, 2.0, 3.0, 4.0, 5.0 };
+    const connect = [_]u32{ 0, 1, 1, 0 };
+    const members = [_]NpzMember{
+        NpzMember.init(f64, "coords", &.{ 2, 3 }, coords[0..]),
+        NpzMember.init(u32, "connectivity", &.{ 2, 2 }, connect[0..]),
+    };
+    try saveNpz(tmp_dir.dir, "sim.npz", members[0..]);
+
+    var npz = try NpzMapped.mapFile(tmp_dir.dir, "sim.npz");
+    defer npz.deinit();
+    try expectEqual(@as(usize, 2), npz.members_n);
+
+    const coords_view = try npz.member("coords");
+    try expectEqualSlices(usize, &.{ 2, 3 }, coords_view.header.shape());
+    var coords_out: [6]f64 = undefined;
+    try coords_view.copyTo(f64, coords_out[0..]);
+    try expectEqualSlices(f64, coords[0..], coords_out[0..]);
+
+    const connect_view = try npz.member("connectivity");
+    var connect_out: [4]usize = undefined;
+    try connect_view.copyTo(usize, connect_out[0..]);
+    try expectEqualSlices(usize, &.{ 0, 1, 1, 0 }, connect_out[0..]);
+
+    try expectError(NpyError.NpzMemberNotFound, npz.member("field"));
+}
@@ -1,5 +1,6 @@
 const std = @import("std");
 const print = std.debug.print;
+const assert = std.debug.assert;
 const time = std.time;
 const Instant = time.Instant;
 
@@ -11,6 +12,7 @@ const Mat44Ops = @import("matstack.zig").Mat44Ops;
 const VecSlice = @import("vecslice.zig").VecSlice;
 const MatSlice = @import("matslice.zig").MatSlice;
 const NDArray = @import("ndarray.zig").NDArray;
+const NDView = @import("ndarray.zig").NDView;
 
 const sliceops = @import("sliceops.zig");
 
@@ -19,10 +21,157 @@ const Connect = @import("meshio.zig").Connect;
 const Field = @import("meshio.zig").Field;
 
 const Camera = @import("camera.zig").Camera;
+const ElemBVH = @import("elemindex.zig").ElemBVH;
+
+const framesink = @import("framesink.zig");
+const FrameSink = framesink.FrameSink;
+const FrameDims = framesink.FrameDims;
+
+pub const RasterOpts = struct {
+    // Number of threads used to raster a frame. With more than one thread the
+    // sub-pixel image is split into square tiles which are rastered in
+    // parallel, otherwise all elements are rastered serially.
+    threads_n: usize = 1,
+    // Edge length of the screen tiles in sub-pixels
+    tile_size: usize = 64,
+    // Number of threads used by rasterAllFrames to raster whole frames in
+    // parallel. Each worker owns its sub-pixel buffers and rasters its frames
+    // serially, so threads_n is ignored when this is more than one.
+    frame_threads_n: usize = 1,
+    // For static meshes rasterAllFrames rasters a visibility buffer once and
+    // then shades every frame by gathering the field at the visible element.
+    vis_buffer: bool = false,
+    // Field components [x,y,z] added to the coords each frame so the deformed
+    // mesh is rastered, null rasters the undeformed coords. The displacement
+    // is multiplied by disp_scale before it is added.
+    disp_fields: ?[3]usize = null,
+    disp_scale: f64 = 1.0,
+    // How sub-pixels in an element's bounding box are visited, see RasterMode
+    raster_mode: RasterMode = .bound_scan,
+    // Skip elements whose nearest node is behind everything already rastered
+    // under their bounding box, using a coarse max depth per block of the
+    // depth buffer. This is conservative so the images do not change.
+    early_depth: bool = false,
+    // Raster elements front to back by their nearest node so more of them
+    // are rejected by the early depth test. Where two elements have exactly
+    // the same depth at a sub-pixel the winner can differ from element order.
+    depth_sort: bool = false,
+    // Gather the field at the nodes of every visible element into one
+    // contiguous buffer per frame before rastering. Otherwise each element
+    // gathers its own field values, once for every tile it is binned to.
+    elem_field_buffer: bool = false,
+    // Float type of the sub-pixel buffers, see SubPxPrecision
+    subpx_precision: SubPxPrecision = .f64,
+    // Raster in tiles, even with one thread, and average each tile into the
+    // output image as soon as it is finished. The sub-pixel image and depth 
+    // only exist per tile so memory does not grow with sub_sample squared. 
+    // The tile size is rounded up to a multiple of sub_sample so tiles hold
+    // whole pixels.
+    tile_resolve: bool = false,
+    // Element BVH built on the coords being rastered, the cache then only
+    // projects and bounds the elements the BVH finds in view of the camera.
+    // The images do not change. Ignored when disp_fields is set as the index
+    // does not follow the deformed mesh.
+    elem_index: ?*const ElemBVH = null,
+    // Raster every pixel once at its centre, then re-raster at the camera
+    // sub_sample only the tiles holding a pixel that needs it, see the notes
+    // below. Tiles are sized as for tile_resolve and the full
+    // sub-pixel buffers are not allocated. Ignored by the visibility buffer.
+    adaptive_sample: bool = false,
+    // Neighbouring pixels whose field differs by more than adaptive_tol 
+    // times the range of that field over the frame are re-sampled
+    adaptive_tol: f64 = 1e-2,
+    // Print per frame element stats and raster timings to stderr. Off by 
+    // default so library and Python callers render silently.
+    verbose: bool = false,
+};
+
+// Adaptive sampling rasters the frame at one sample per pixel centre first.
+// A pixel is re-sampled if it and one of its 8 neighbours differ in coverage
+// (a silhouette against the background) or in any field by more than
+// adaptive_tol * (max - min of the field over the covered pixels). Every 
+// tile holding a re-sampled pixel is rastered at sub_sample and resolved as 
+// with tile_resolve, so those tiles are identical to the uniform images.
+// The other pixels keep their centre value, for a field that is linear over
+// the pixel this is the mean of the sub-pixels up to the perspective 
+// correction of the depth. 
+//
+// Edges that cross a pixel without changing the field at any pixel centre
+// around it are missed, e.g. a sliver thinner than a pixel or the corner of
+// a silhouette. The error on a pixel that is not re-sampled is of the order
+// of adaptive_tol * field range.
+//
+// Measured against uniform sampling at 960x1280 over all frames with the
+// default adaptive_tol = 1e-2 and tile_size = 64, one thread:
+//   block    sub_sample=4: max|adaptive - uniform| = 5.9e-4 * field range,
+//                          2.4s vs 24.1s, 5.5% of tiles re-sampled
+//   cylinder sub_sample=4: max|adaptive - uniform| = 1.1e-3 * field range,
+//                          2.3s vs 21.2s, 4.6% of tiles re-sampled
+
+// Edge functions, weights, depth and field interpolation are always in f64
+// so the f32 modes only round the values stored in the sub-pixel buffers.
+// Pixels are averaged from the sub-pixels in f64.
+//
+// With f32_image the visible element at every sub-pixel is the same as f64
+// and each stored value is rounded once, so for every pixel
+// |image_f32 - image_f64| <= 2^-24 * max|sub-pixel value in the pixel|.
+// With f32 depth, surfaces closer than ~1e-7 relative depth can also swap
+// at a sub-pixel. On a skinned surface with a continuous field this only
+// happens where elements share an edge, which adds an error of the order
+// of the field change across one sub-pixel.
+//
+// Measured against f64 at 960x1280 with sub_sample=2 over all frames, both
+// f32 modes give the same images:
+//   block:    max|f32 - f64| = 6.8e-12 = 5.0e-8 * max|f64|
+//   cylinder: max|f32 - f64| = 1.4e-11 = 3.5e-8 * max|f64|
+// so no pixel is further than 2^-24 * max|f64| from the f64 image.
+pub const SubPxPrecision = enum {
+    // f64 sub-pixel image and depth
+    f64,
+    // f32 sub-pixel image with f64 depth, halves the image memory
+    f32_image,
+    // f32 sub-pixel image and depth, halves all sub-pixel memory
+    f32,
+
+    pub fn ImageFloat(comptime self: SubPxPrecision) type {
+        return if (self == .f64) f64 else f32;
+    }
+
+    pub fn DepthFloat(comptime self: SubPxPrecision) type {
+        return if (self == .f32) f32 else f64;
+    }
+};
+
+pub const RasterMode = enum {
+    // Test every sub-pixel in the element bounding box
+    bound_scan,
+    // Classify 8x8 sub-pixel blocks against the element edges first, blocks
+    // outside are skipped and blocks inside are filled without edge tests.
+    // Gives the same images as bound_scan.
+    hierarchical,
+};
 
+// Rectangle of whole pixels of the full camera image, x along the pixel 
+// columns and y down the rows
+pub const PixelWindow = struct {
+    x_start: usize,
+    y_start: usize,
+    x_n: usize,
+    y_n: usize,
+};
+
+pub const RasterError = error{
+    CacheSizeMismatch,
+    DispFieldOutOfRange,
+    VisBufferDeformed,
+    OutputDimsMismatch,
+    FrameOutOfRange,
+    CameraDimsMismatch,
+    WindowOutOfRange,
+};
 
 pub const Raster = struct {
-    fn worldToRasterCoords(coord_world: Vec3f, camera: *const Camera) Vec3f {
+    pub fn worldToRasterCoords(coord_world: Vec3f, camera: *const Camera) Vec3f {
         // TODO: simplify this to a matrix mult
         var coord_raster: Vec3f = Mat44Ops.mulVec3(f64, 
         										   camera.world_to_cam_mat, 
@@ -57,11 +206,12 @@ pub const Raster = struct {
     }
 
     fn boundIndexMin(min_val: f64) usize {
-        var min_ind: usize = @as(usize, @intFromFloat(@floor(min_val)));
-        if (min_ind < 0) {
-            min_ind = 0;
+        // Elements can hang off the top/left of the image so clamp before the
+        // cast as a negative float to usize is illegal behaviour
+        if (min_val < 0.0) {
+            return 0;
         }
-        return min_ind;
+        return @as(usize, @intFromFloat(@floor(min_val)));
     }
 
     fn boundIndexMax(max_val: f64, pixels_num: usize) usize {
@@ -72,7 +222,9 @@ pub const Raster = struct {
         return max_ind;
     }
 
-    pub fn averageImage(image_subpx: *const MatSlice(f64), 
+    // Sub-pixels are summed in f64 whatever the sub-pixel float type
+    pub fn averageImage(comptime EType: type,
+                        image_subpx: *const MatSlice(EType), 
                         sub_samp: u8, 
                         image_avg: *MatSlice(f64)) void {
                         
@@ -82,337 +234,1591 @@ pub const Raster = struct {
         const sub_samp_f: f64 = @as(f64, @floatFromInt(sub_samp));
         const subpx_per_px: f64 = sub_samp_f * sub_samp_f;
 
-        // TODO: do some error checking on the Matrices here to check dims agree
-        // with the variables above
+        assert((image_avg.rows_n == num_px_y) and (image_avg.cols_n == num_px_x));
 
         var px_sum: f64 = 0.0;
 
         for (0..num_px_y) |iy| {
+            const avg_row: []f64 = image_avg.getRow(iy);
             for (0..num_px_x) |ix| {
                 px_sum = 0.0;
                 for (0..sub_samp_us) |sy| {
+                    const subpx_row: []EType = image_subpx.getRow(sub_samp_us * iy + sy);
                     for (0..sub_samp_us) |sx| {
-                        px_sum += image_subpx.get(sub_samp_us * iy + sy, 
-                                                  sub_samp_us * ix + sx);
+                        px_sum += subpx_row[sub_samp_us * ix + sx];
                     }
                 }
-                image_avg.set(iy, ix, px_sum / subpx_per_px);
+                avg_row[ix] = px_sum / subpx_per_px;
             }
         }
     }
 
-    pub fn rasterOneFrame(allocator: std.mem.Allocator, 
-                          frame_ind: usize, 
-                          coords: *const Coords, 
-                          connect: *const Connect, 
-                          field: *const Field, 
-                          camera: *const Camera, 
-                          image_out_arr: *NDArray(f64)) !void {
+    // Raster space data for an element that passed the back face and off image
+    // culling. The element nodes are stored in a separate buffer with z = 1/z.
+    const ElemBound = struct {
+        elem_ind: usize,
+        elem_area: f64,
+        xi_min: usize,
+        yi_min: usize,
+        bound_x_n: usize,
+        bound_y_n: usize,
+        // Depth of the nearest node and the bound on the depth of any of the
+        // element's sub-pixels used by the early depth test
+        depth_near: f64,
+        depth_cull: f64,
+    };
+
+    // Rectangular window of the sub-pixel image with its own depth and image
+    // buffers. The full sub-pixel image is a single tile starting at zero.
+    fn SubPxTile(comptime precision: SubPxPrecision) type {
+        return struct {
+            x_start: usize,
+            y_start: usize,
+            x_n: usize,
+            y_n: usize,
+            depth: []precision.DepthFloat(),  // shape=(y_n,x_n)
+            image: []precision.ImageFloat(),  // shape=(field_n,y_n,x_n)
+            // Only written when rastering a visibility buffer
+            vis_elems: []usize = &.{}, // shape=(y_n,x_n)
+            vis_weights: []f64 = &.{}, // shape=(y_n,x_n,nodes_per_elem)
+        };
+    }
 
-        // We allocate all temporary buffers on our arena so no need to defer
-        // free any temporary buffers in this function
-        var arena = std.heap.ArenaAllocator.init(allocator);
-        defer arena.deinit();
-        const arena_alloc = arena.allocator();
+    // Counts for the elements rastered in a frame. The tiled raster tests
+    // each element once per tile it is binned to so the rejected count is
+    // per element and tile. Adaptive sampling also counts the tiles it 
+    // re-samples.
+    const FrameStats = struct {
+        elems_in_image: usize = 0,
+        elems_rejected_early: usize = 0,
+        tiles_resampled: usize = 0,
+        tiles_n: usize = 0,
+    };
+
+    // Per thread buffers used to interpolate fields over a single element
+    const ElemScratch = struct {
+        nodes: []Vec3f,
+        weights: []f64,
+        field_mat: MatSlice(f64),
+        span_x: []f64,
+
+        // span_n is the widest row of sub-pixels an element can cover, the 
+        // tile or image width
+        fn init(allocator: std.mem.Allocator, 
+                nodes_per_elem: usize, 
+                num_fields: usize,
+                span_n: usize) !ElemScratch {
+            // Stores N weights, one for each node in the element
+            const weights = try allocator.alloc(f64, nodes_per_elem);
+            // Stores all F field values at the N nodes per element
+            const field_buff = try allocator.alloc(f64, num_fields*nodes_per_elem);
+            return .{
+                .nodes = try allocator.alloc(Vec3f, nodes_per_elem),
+                .weights = weights,
+                .field_mat = try MatSlice(f64).init(field_buff,
+                                                    num_fields,
+                                                    nodes_per_elem),
+                // Padded so the last span can be loaded as a full vector
+                .span_x = try allocator.alloc(f64, span_n + span_lanes),
+            };
+        }
+    };
+
+    const tol: f64 = 1e-12;
+
+    // Sub-pixels along a row of an element that are tested together
+    const span_lanes: usize = 4;
+    const SpanVec = @Vector(span_lanes, f64);
+    const SpanMask = @Vector(span_lanes, bool);
+
+    // Edge length in sub-pixels of the blocks classified by the hierarchical
+    // raster mode, a multiple of span_lanes
+    const block_size: usize = 8;
+    // Relative margin on the block classification, far larger than the
+    // rounding error of the edge function
+    const block_margin: f64 = 1e-10;
+    const BlockClass = enum { outside, inside, partial };
+
+    // Elements must cover at least this area in pixels to be rejected early,
+    // smaller elements can have large negative weights within the tolerance
+    const depth_cull_area_min: f64 = 1.0;
+    // Relative margin on the nearest node depth, far larger than the rounding
+    // error of the interpolated depth
+    const depth_cull_margin: f64 = 1e-6;
+
+    // Coarse max depth over block_size x block_size blocks of a tile's depth
+    // buffer for the early depth test. Depths only decrease as elements are
+    // rastered so a stale block max is still an upper bound. Blocks under an
+    // element are marked stale once it is rastered and are only recomputed
+    // when a later element is tested against them.
+    const DepthBlocks = struct {
+        depth_max: []f64,
+        stale: []bool,
+        blocks_x_n: usize = 0,
+        blocks_y_n: usize = 0,
+
+        // x_n and y_n are the largest tile the blocks are used for
+        fn init(allocator: std.mem.Allocator, 
+                x_n: usize, 
+                y_n: usize) !DepthBlocks {
+            const blocks_n: usize = (std.math.divCeil(usize, x_n, block_size) catch unreachable)
+                                    * (std.math.divCeil(usize, y_n, block_size) catch unreachable);
+            return .{
+                .depth_max = try allocator.alloc(f64, blocks_n),
+                .stale = try allocator.alloc(bool, blocks_n),
+            };
+        }
 
-        const tol: f64 = 1e-12;
-        var elems_in_image: usize = 0;
-        const num_fields: usize = field.getFieldsN();
+        // Call once the tile depth buffer has been set to the background
+        fn reset(self: *DepthBlocks, 
+                 comptime precision: SubPxPrecision,
+                 tile: *const SubPxTile(precision)) void {
+            self.blocks_x_n = std.math.divCeil(usize, tile.x_n, block_size) catch unreachable;
+            self.blocks_y_n = std.math.divCeil(usize, tile.y_n, block_size) catch unreachable;
+            const blocks_n: usize = self.blocks_x_n * self.blocks_y_n;
+            @memset(self.depth_max[0..blocks_n], 1e6);
+            @memset(self.stale[0..blocks_n], false);
+        }
 
-        var nodes_raster_buff: []Vec3f = try arena_alloc.alloc(
-            Vec3f, connect.nodes_per_elem);
-
-		// Stores N weights, one for each node in the element
-        var weights_buff: []f64 = try arena_alloc.alloc(
-            f64, connect.nodes_per_elem);
-
-		// Stores all F field values at the N nodes per element
-		var field_inds = [_]usize{frame_ind,0,0};
-        const field_buff: []f64 = try arena_alloc.alloc(
-            f64, num_fields*connect.nodes_per_elem);
-
-		var field_raster_mat = try MatSlice(f64).init(field_buff,
-		                                              connect.nodes_per_elem,
-		                                              num_fields);
-
-		// Stores field value at the pixel
-		var px_field: f64 = 0.0;
-
-		// Sub-pixel image buffers
-        const subpx_x: usize = @as(usize, camera.pixels_num[0]) 
-        					   * @as(usize, camera.sub_sample);
-        const subpx_y: usize = @as(usize, camera.pixels_num[1]) 
-                               * @as(usize, camera.sub_sample);
-
-        
-        var depth_subpx_inds = [_]usize{0,0};
-		var image_subpx_inds = [_]usize{0,0,0};
-
-        // Sub-pixel image buffer
-        var image_subpx_dims = [_]usize{num_fields,subpx_y,subpx_x};
-		const image_subpx_mem = try arena_alloc.alloc(
-		    f64,subpx_y*subpx_x*num_fields);
-		
-		var image_subpx = try NDArray(f64).init(arena_alloc,
-		                                        image_subpx_mem,
-		                                        image_subpx_dims[0..]);
-		
-		// Sub-pixel depth buffer
-		var depth_subpx_dims = [_]usize{subpx_y,subpx_x};
-	    const depth_subpx_mem = try arena_alloc.alloc(f64,subpx_y*subpx_x);
-		var depth_subpx = try NDArray(f64).init(arena_alloc,
-		                                        depth_subpx_mem,
-		                                        depth_subpx_dims[0..]);
+        // Inclusive range of blocks [x0,x1,y0,y1] under the element bound
+        // clipped to the tile, null if the bound misses the tile
+        fn boundBlocks(comptime precision: SubPxPrecision,
+                       bound: *const ElemBound, 
+                       sub_sample: u8, 
+                       tile: *const SubPxTile(precision)) ?[4]usize {
+            const sub_samp_us: usize = @as(usize, sub_sample);
+            const bound_x0: usize = sub_samp_us * bound.xi_min;
+            const bound_y0: usize = sub_samp_us * bound.yi_min;
+
+            const x0: usize = @max(bound_x0, tile.x_start) - tile.x_start;
+            const x1: usize = @min(bound_x0 + bound.bound_x_n, 
+                                   tile.x_start + tile.x_n) -| tile.x_start;
+            const y0: usize = @max(bound_y0, tile.y_start) - tile.y_start;
+            const y1: usize = @min(bound_y0 + bound.bound_y_n, 
+                                   tile.y_start + tile.y_n) -| tile.y_start;
+            if ((x0 >= x1) or (y0 >= y1)) {
+                return null;
+            }
+            return .{ x0 / block_size, (x1 - 1) / block_size,
+                      y0 / block_size, (y1 - 1) / block_size };
+        }
 
-		// Set image background to 0.0 and depth buffer to large value.
-        image_subpx.fill(0.0);
-        depth_subpx.fill(1e6);
+        fn blockMax(self: *DepthBlocks, 
+                    comptime precision: SubPxPrecision,
+                    tile: *const SubPxTile(precision), 
+                    bx: usize, by: usize) f64 {
+            const bb: usize = by*self.blocks_x_n + bx;
+            if (self.stale[bb]) {
+                const x0: usize = bx * block_size;
+                const x1: usize = @min(x0 + block_size, tile.x_n);
+                const y0: usize = by * block_size;
+                const y1: usize = @min(y0 + block_size, tile.y_n);
+
+                var depth_max: f64 = -std.math.inf(f64);
+                for (y0..y1) |yy| {
+                    depth_max = @max(depth_max, 
+                                     std.mem.max(precision.DepthFloat(), 
+                                                 tile.depth[yy*tile.x_n + x0..yy*tile.x_n + x1]));
+                }
+                self.depth_max[bb] = depth_max;
+                self.stale[bb] = false;
+            }
+            return self.depth_max[bb];
+        }
 
-        var px_coord_buff: Vec3f = Vec3f.initZeros();
+        // True if every sub-pixel under the element bound already holds a
+        // depth in front of the element so it would fail every depth test
+        fn occludes(self: *DepthBlocks, 
+                    comptime precision: SubPxPrecision,
+                    bound: *const ElemBound, 
+                    sub_sample: u8, 
+                    tile: *const SubPxTile(precision)) bool {
+            const blocks = boundBlocks(precision, bound, sub_sample, tile) 
+                orelse return false;
+            for (blocks[2]..blocks[3]+1) |by| {
+                for (blocks[0]..blocks[1]+1) |bx| {
+                    if (!(bound.depth_cull >= self.blockMax(precision, tile, bx, by))) {
+                        return false;
+                    }
+                }
+            }
+            return true;
+        }
 
-        // Lifted constants out of loop
-        const sub_samp_f: f64 = @as(f64, @floatFromInt(camera.sub_sample));
-        const coord_step: f64 = 1.0 / sub_samp_f;
-        const coord_offset: f64 = 1.0 / (2.0 * sub_samp_f);
+        fn markWritten(self: *DepthBlocks, 
+                       comptime precision: SubPxPrecision,
+                       bound: *const ElemBound, 
+                       sub_sample: u8, 
+                       tile: *const SubPxTile(precision)) void {
+            const blocks = boundBlocks(precision, bound, sub_sample, tile) 
+                orelse return;
+            for (blocks[2]..blocks[3]+1) |by| {
+                @memset(self.stale[by*self.blocks_x_n + blocks[0]..by*self.blocks_x_n + blocks[1] + 1], true);
+            }
+        }
+    };
+
+    // Raster space coords of all nodes for one camera, stored as x, y and 1/z,
+    // along with the bounds of the elements that survive culling. Building
+    // this once avoids reprojecting shared nodes for every element, frame and
+    // field. It is rebuilt by update() only if the camera or coords change.
+    // With an element index only the nodes of elements the index finds in
+    // view are projected, the rest of x, y and inv_z is left stale.
+    pub const RasterCache = struct {
+        x: []f64,
+        y: []f64,
+        inv_z: []f64,
+        elem_visible: []bool,
+        // Bounds of the visible elements in element order
+        elem_bounds: []ElemBound,
+        elem_bounds_buff: []ElemBound,
+        nodes_buff: []Vec3f,
+        // Elements returned by the element index query
+        candidates_buff: []usize,
+        // Nodes already projected in this update are stamped with epoch
+        node_epoch: []u32,
+        epoch: u32 = 0,
+        elem_index: ?*const ElemBVH = null,
+        camera: Camera = undefined,
+        coords_x: []const f64 = &.{},
+        valid: bool = false,
+        // Set once elem_bounds has been sorted front to back
+        depth_sorted: bool = false,
+
+        const Self = @This();
+
+        pub fn init(allocator: std.mem.Allocator, 
+                    coords: *const Coords, 
+                    connect: *const Connect) !Self {
+            const elem_bounds_buff = try allocator.alloc(ElemBound, 
+                                                         connect.elem_n);
+            return .{
+                .x = try allocator.alloc(f64, coords.len),
+                .y = try allocator.alloc(f64, coords.len),
+                .inv_z = try allocator.alloc(f64, coords.len),
+                .elem_visible = try allocator.alloc(bool, connect.elem_n),
+                .elem_bounds = elem_bounds_buff[0..0],
+                .elem_bounds_buff = elem_bounds_buff,
+                .nodes_buff = try allocator.alloc(Vec3f, 
+                                                  connect.nodes_per_elem),
+                .candidates_buff = try allocator.alloc(usize, connect.elem_n),
+                .node_epoch = try allocator.alloc(u32, coords.len),
+            };
+        }
 
-		//----------------------------------------------------------------------
-		// Raster Loop
-        for (0..connect.elem_n) |ee| {
-            const coord_inds: []usize = connect.getElem(ee);
+        pub fn deinit(self: *Self, allocator: std.mem.Allocator) void {
+            allocator.free(self.x);
+            allocator.free(self.y);
+            allocator.free(self.inv_z);
+            allocator.free(self.elem_visible);
+            allocator.free(self.elem_bounds_buff);
+            allocator.free(self.nodes_buff);
+            allocator.free(self.candidates_buff);
+            allocator.free(self.node_epoch);
+        }
+
+        // Call if the coords have been modified in place
+        pub fn invalidate(self: *Self) void {
+            self.valid = false;
+        }
+
+        pub fn update(self: *Self,
+                      coords: *const Coords, 
+                      connect: *const Connect, 
+                      camera: *const Camera) !void {
+            try self.updateIndexed(coords, connect, camera, null);
+        }
+
+        // Same as update() but only the elements elem_index finds in view are
+        // projected and bounded. The index must be built on coords.
+        pub fn updateIndexed(self: *Self,
+                             coords: *const Coords, 
+                             connect: *const Connect, 
+                             camera: *const Camera,
+                             elem_index: ?*const ElemBVH) !void {
+
+            if ((coords.len != self.x.len) 
+                or (connect.elem_n != self.elem_visible.len)
+                or (connect.nodes_per_elem != self.nodes_buff.len)) {
+                return RasterError.CacheSizeMismatch;
+            }
+
+            if (self.valid 
+                and (self.coords_x.ptr == coords.x.ptr)
+                and (self.elem_index == elem_index)
+                and std.meta.eql(self.camera, camera.*)) {
+                return;
+            }
+
+            var elems_vis: usize = 0;
+            if (elem_index) |index| {
+                if (index.elem_n != connect.elem_n) {
+                    return RasterError.CacheSizeMismatch;
+                }
+                const candidates = try index.queryFrustum(camera, 
+                                                          self.candidates_buff);
+
+                // Projecting shared nodes once only pays off if most of the
+                // mesh is out of view
+                if (candidates.len * connect.nodes_per_elem < coords.len) {
+                    self.epoch +%= 1;
+                    if (self.epoch == 0) {
+                        @memset(self.node_epoch, 0);
+                        self.epoch = 1;
+                    }
+                    for (candidates) |ee| {
+                        for (connect.getElem(ee)) |nn| {
+                            if (self.node_epoch[nn] != self.epoch) {
+                                self.node_epoch[nn] = self.epoch;
+                                self.projectNode(coords, camera, nn);
+                            }
+                        }
+                    }
+                } else {
+                    for (0..coords.len) |nn| {
+                        self.projectNode(coords, camera, nn);
+                    }
+                }
+
+                // Candidates come in tree order, marking them and scanning
+                // the marks puts them back in element order without a sort
+                @memset(self.elem_visible, false);
+                for (candidates) |ee| {
+                    self.elem_visible[ee] = true;
+                }
+                for (0..connect.elem_n) |ee| {
+                    if (!self.elem_visible[ee]) {
+                        continue;
+                    }
+                    if (self.boundElem(ee, connect, camera, 
+                                       self.nodes_buff)) |bound| {
+                        self.elem_bounds_buff[elems_vis] = bound;
+                        elems_vis += 1;
+                    } else {
+                        self.elem_visible[ee] = false;
+                    }
+                }
+            } else {
+                for (0..coords.len) |nn| {
+                    self.projectNode(coords, camera, nn);
+                }
+
+                for (0..connect.elem_n) |ee| {
+                    self.elem_visible[ee] = false;
+                    if (self.boundElem(ee, connect, camera, 
+                                       self.nodes_buff)) |bound| {
+                        self.elem_visible[ee] = true;
+                        self.elem_bounds_buff[elems_vis] = bound;
+                        elems_vis += 1;
+                    }
+                }
+            }
+
+            self.elem_bounds = self.elem_bounds_buff[0..elems_vis];
+            self.camera = camera.*;
+            self.coords_x = coords.x;
+            self.elem_index = elem_index;
+            self.valid = true;
+            self.depth_sorted = false;
+        }
+
+        fn projectNode(self: *Self, 
+                       coords: *const Coords, 
+                       camera: *const Camera,
+                       node_ind: usize) void {
+            const node_raster = worldToRasterCoords(coords.getVec3(node_ind), 
+                                                    camera);
+            self.x[node_ind] = node_raster.get(0);
+            self.y[node_ind] = node_raster.get(1);
+            self.inv_z[node_ind] = 1.0 / node_raster.get(2);
+        }
+
+        // Stable sort of the visible elements by the depth of their nearest
+        // node, does nothing if they are already sorted
+        pub fn sortFrontToBack(self: *Self) void {
+            if (self.depth_sorted) {
+                return;
+            }
+            std.sort.block(ElemBound, self.elem_bounds, {}, nearerThan);
+            self.depth_sorted = true;
+        }
+
+        fn nearerThan(_: void, bound_a: ElemBound, bound_b: ElemBound) bool {
+            return bound_a.depth_near < bound_b.depth_near;
+        }
 
+        pub fn gatherNodes(self: *const Self,
+                           connect: *const Connect,
+                           elem_ind: usize,
+                           nodes_raster: []Vec3f) void {
+            const coord_inds: []Connect.Index = connect.getElem(elem_ind);
             for (0..connect.nodes_per_elem) |nn| {
-                nodes_raster_buff[nn] = worldToRasterCoords(
-                	coords.getVec3(coord_inds[nn]), camera);
+                nodes_raster[nn].set(0, self.x[coord_inds[nn]]);
+                nodes_raster[nn].set(1, self.y[coord_inds[nn]]);
+                nodes_raster[nn].set(2, self.inv_z[coord_inds[nn]]);
             }
+        }
+
+        fn boundElem(self: *const Self,
+                     elem_ind: usize,
+                     connect: *const Connect, 
+                     camera: *const Camera,
+                     nodes_raster: []Vec3f) ?ElemBound {
 
-            const elem_area: f64 = edgeFun3(nodes_raster_buff[0], 
-                                            nodes_raster_buff[1], 
-                                            nodes_raster_buff[2]);
+            self.gatherNodes(connect, elem_ind, nodes_raster);
+
+            const elem_area: f64 = edgeFun3(nodes_raster[0], 
+                                            nodes_raster[1], 
+                                            nodes_raster[2]);
 
             if (elem_area < -tol) {
-                continue;
+                return null;
             }
 
-            // print("Node 0:",.{});
-            // nodes_raster[0].vecPrint();
-            // print("Node 1:",.{});
-            // nodes_raster[1].vecPrint();
-            // print("Node 2:", .{});
-            // nodes_raster[2].vecPrint();
-            // print("{} ELEM AREA : {d:.4}\n\n",.{ee,elem_area});
-
-            const x_min: f64 = Vec3SliceOps.min(f64, nodes_raster_buff, 0);
-            const x_max: f64 = Vec3SliceOps.max(f64, nodes_raster_buff, 0);
+            const x_min: f64 = Vec3SliceOps.min(f64, nodes_raster, 0);
+            const x_max: f64 = Vec3SliceOps.max(f64, nodes_raster, 0);
 
             if ((x_min > @as(f64, @floatFromInt(camera.pixels_num[0] - 1))) or (x_max < 0.0)) {
-                continue;
+                return null;
             }
 
-            const y_min: f64 = Vec3SliceOps.min(f64, nodes_raster_buff, 1);
-            const y_max: f64 = Vec3SliceOps.max(f64, nodes_raster_buff, 1);
+            const y_min: f64 = Vec3SliceOps.min(f64, nodes_raster, 1);
+            const y_max: f64 = Vec3SliceOps.max(f64, nodes_raster, 1);
 
             if ((y_min > @as(f64, @floatFromInt(camera.pixels_num[1] - 1))) or (y_max < 0.0)) {
-                continue;
+                return null;
             }
 
-            elems_in_image += 1;
-
-            // print("Elem {}: x, min {}\n", .{ ee, x_min });
-            // print("Elem {}: x, max {}\n", .{ ee, x_max });
-            // print("Elem {}: x, min {}\n", .{ ee, y_min });
-            // print("Elem {}: x, max {}\n\n", .{ ee, y_max });
-
             const xi_min: usize = boundIndexMin(x_min);
             const xi_max: usize = boundIndexMax(x_max, @as(usize, camera.pixels_num[0]));
             const yi_min: usize = boundIndexMin(y_min);
             const yi_max: usize = boundIndexMax(y_max, @as(usize, camera.pixels_num[1]));
 
-            // print("Elem {}: xi, min {}\n", .{ ee, xi_min });
-            // print("Elem {}: xi, max {}\n", .{ ee, xi_max });
-            // print("Elem {}: yi, min {}\n", .{ ee, yi_min });
-            // print("Elem {}: yi, max {}\n", .{ ee, yi_max });
-            // print("\n",.{});
+            const coord_step: f64 = 1.0 / @as(f64, @floatFromInt(camera.sub_sample));
+
+            // The depth of a sub-pixel interpolates 1/z with weights that sum
+            // to one, so it can only be nearer than the nearest node by the
+            // rounding error and the negative weights allowed by the edge
+            // tolerance. Elements behind the camera are never rejected early.
+            const inv_z_max: f64 = Vec3SliceOps.max(f64, nodes_raster[0..3], 2);
+            const inv_z_min: f64 = Vec3SliceOps.min(f64, nodes_raster[0..3], 2);
+            const depth_near: f64 = 1.0 / inv_z_max;
+            const depth_cull: f64 = 
+                if ((inv_z_min > 0.0) and (elem_area >= depth_cull_area_min)) 
+                    depth_near * (1.0 - depth_cull_margin)
+                else -std.math.inf(f64);
+
+            return .{
+                .elem_ind = elem_ind,
+                .elem_area = elem_area,
+                .xi_min = xi_min,
+                .yi_min = yi_min,
+                .bound_x_n = sliceops.rangeLen(@as(f64, @floatFromInt(xi_min)), 
+                                               @as(f64, @floatFromInt(xi_max)), 
+                                               coord_step),
+                .bound_y_n = sliceops.rangeLen(@as(f64, @floatFromInt(yi_min)), 
+                                               @as(f64, @floatFromInt(yi_max)), 
+                                               coord_step),
+                .depth_near = depth_near,
+                .depth_cull = depth_cull,
+            };
+        }
+    };
+
+    // Sub-pixel centre coords are built by repeated addition of the step so
+    // that every tile lands on exactly the same floating point coordinate as
+    // a scan over the whole element bound.
+    fn stepCoord(coord_start: f64, coord_step: f64, steps: usize) f64 {
+        var coord: f64 = coord_start;
+        for (0..steps) |_| {
+            coord += coord_step;
+        }
+        return coord;
+    }
+
+    // Per element state for rastering spans of sub-pixels. The edge function
+    // of the sub-pixel at (x,y) against the edge (v0,v1) is 
+    // (x - v0.x)*(v1.y - v0.y) - (y - v0.y)*(v1.x - v0.x). The x term is
+    // evaluated for a span of sub-pixels at once and the y term once per row,
+    // with the same operations as edgeFun3 so the tolerance test is unchanged.
+    const ElemSpan = struct {
+        bound: *const ElemBound,
+        nodes_per_elem: usize,
+        // Field at the element nodes, shape=(field_n,nodes_per_elem), null
+        // when rastering a visibility buffer
+        elem_field: ?[]const f64,
+        scratch: *ElemScratch,
+        edge_x0: [3]SpanVec,
+        edge_dy: [3]SpanVec,
+        edge_y0: [3]f64,
+        edge_dx: [3]f64,
+        node_inv_z: [3]SpanVec,
+
+        const edge_v0 = [_]usize{ 1, 2, 0 };
+        const edge_v1 = [_]usize{ 2, 0, 1 };
+
+        fn init(bound: *const ElemBound,
+                nodes_raster: []const Vec3f,
+                elem_field: ?[]const f64,
+                scratch: *ElemScratch) ElemSpan {
+
+            var span = ElemSpan{
+                .bound = bound,
+                .nodes_per_elem = nodes_raster.len,
+                .elem_field = elem_field,
+                .scratch = scratch,
+                .edge_x0 = undefined,
+                .edge_dy = undefined,
+                .edge_y0 = undefined,
+                .edge_dx = undefined,
+                .node_inv_z = undefined,
+            };
+            for (0..3) |ee| {
+                const v0: Vec3f = nodes_raster[edge_v0[ee]];
+                const v1: Vec3f = nodes_raster[edge_v1[ee]];
+                span.edge_x0[ee] = @splat(v0.get(0));
+                span.edge_dy[ee] = @splat(v1.get(1) - v0.get(1));
+                span.edge_y0[ee] = v0.get(1);
+                span.edge_dx[ee] = v1.get(0) - v0.get(0);
+            }
+            for (0..3) |nn| {
+                span.node_inv_z[nn] = @splat(nodes_raster[nn].get(2));
+            }
+            return span;
+        }
+
+        fn rowTerms(self: *const ElemSpan, coord_y: f64) [3]SpanVec {
+            var edge_row: [3]SpanVec = undefined;
+            for (0..3) |ee| {
+                edge_row[ee] = @splat((coord_y - self.edge_y0[ee]) * self.edge_dx[ee]);
+            }
+            return edge_row;
+        }
+
+        // Classifies the rectangle of sub-pixel centres [x0,x1]x[y0,y1]
+        // against all three edges. The edge function is linear so its range
+        // over the block is set by the corners. A margin well above the 
+        // rounding error of the edge function keeps the result exact, blocks
+        // near the tolerance are left to the per sub-pixel test.
+        fn classifyBlock(self: *const ElemSpan, 
+                         x0: f64, x1: f64, 
+                         y0: f64, y1: f64) BlockClass {
+            const corners_x = [_]f64{ x0, x1, x0, x1 };
+            const corners_y = [_]f64{ y0, y0, y1, y1 };
+            var inside: bool = true;
+
+            for (0..3) |ee| {
+                var edge_min: f64 = std.math.inf(f64);
+                var edge_max: f64 = -std.math.inf(f64);
+                var term_max: f64 = 0.0;
+                for (0..4) |cc| {
+                    const term_x: f64 = (corners_x[cc] - self.edge_x0[ee][0]) 
+                                        * self.edge_dy[ee][0];
+                    const term_y: f64 = (corners_y[cc] - self.edge_y0[ee]) 
+                                        * self.edge_dx[ee];
+                    const edge_val: f64 = term_x - term_y;
+                    edge_min = @min(edge_min, edge_val);
+                    edge_max = @max(edge_max, edge_val);
+                    term_max = @max(term_max, @abs(term_x) + @abs(term_y));
+                }
+
+                const margin: f64 = block_margin * term_max;
+                if (edge_max < -tol - margin) {
+                    return .outside;
+                }
+                if (!(edge_min >= -tol + margin)) {
+                    inside = false;
+                }
+            }
+            return if (inside) .inside else .partial;
+        }
 
-            const xi_min_f: f64 = @as(f64, @floatFromInt(xi_min));
-            const xi_max_f: f64 = @as(f64, @floatFromInt(xi_max));
-            const yi_min_f: f64 = @as(f64, @floatFromInt(yi_min));
-            const yi_max_f: f64 = @as(f64, @floatFromInt(yi_max));
+        // Rasters up to span_lanes sub-pixels of one row starting at
+        // tile_ind_0. The edge test is skipped if the span is known to be
+        // inside the element.
+        fn rasterSpan(self: *const ElemSpan,
+                      comptime precision: SubPxPrecision,
+                      comptime test_edges: bool,
+                      tile: *const SubPxTile(precision),
+                      edge_row: *const [3]SpanVec,
+                      px_x: SpanVec,
+                      lanes_n: usize,
+                      tile_ind_0: usize) !void {
+
+            const tile_px_n: usize = tile.x_n * tile.y_n;
+            const weights_buff: []f64 = self.scratch.weights;
+            const tol_neg: SpanVec = @splat(-tol);
+            const elem_area: SpanVec = @splat(self.bound.elem_area);
+
+            var in_span: [span_lanes]bool = undefined;
+            for (0..span_lanes) |ll| {
+                in_span[ll] = (ll < lanes_n);
+            }
 
-            var bound_coord_x: f64 = xi_min_f + 1.0 / (2.0 * sub_samp_f);
-            var bound_coord_y: f64 = yi_min_f + 1.0 / (2.0 * sub_samp_f);
-            var bound_ind_x: usize = @as(usize, camera.sub_sample) * xi_min;
-            var bound_ind_y: usize = @as(usize, camera.sub_sample) * yi_min;
+            var weights: [3]SpanVec = undefined;
+            var outside: SpanMask = ~@as(SpanMask, in_span);
+            for (0..3) |ee| {
+                weights[ee] = (px_x - self.edge_x0[ee]) * self.edge_dy[ee] 
+                              - edge_row[ee];
+                if (test_edges) {
+                    outside = outside | (weights[ee] < tol_neg);
+                }
+            }
+            if (test_edges and !@reduce(.Or, ~outside)) {
+                return;
+            }
 
-            const num_bound_x: usize = sliceops.rangeLen(xi_min_f, xi_max_f, coord_step);
-            const num_bound_y: usize = sliceops.rangeLen(yi_min_f, yi_max_f, coord_step);
+            // Depth at each sub-pixel from the normalised weights
+            var weight_dot_nodes: SpanVec = @splat(0.0);
+            for (0..3) |nn| {
+                weights[nn] = weights[nn] / elem_area;
+                weight_dot_nodes += weights[nn] * self.node_inv_z[nn];
+            }
+            const px_coord_z: SpanVec = @as(SpanVec, @splat(1.0)) / weight_dot_nodes;
 
-            var inv_buff: f64 = 0.0;
-            for (0..connect.nodes_per_elem) |nn| {
-                inv_buff = 1.0 / nodes_raster_buff[nn].get(2);
-                nodes_raster_buff[nn].set(2, inv_buff);
+            // If a sub-pixel is behind another we move on
+            var depth_span: [span_lanes]f64 = @splat(0.0);
+            for (0..lanes_n) |ll| {
+                depth_span[ll] = tile.depth[tile_ind_0 + ll];
+            }
+            outside = outside | (px_coord_z >= @as(SpanVec, depth_span));
+            if (!@reduce(.Or, ~outside)) {
+                return;
             }
 
-            // print("Elem {}: bound_coord_x={d}\n",.{ee,bound_coord_x});
-            // print("Elem {}: bound_coord_y={d}\n",.{ee,bound_coord_y});
-            // print("Elem {}: bound_ind_x={}\n",.{ee,bound_ind_x});
-            // print("Elem {}: bound_ind_y={}\n",.{ee,bound_ind_y});
-            // print("Elem {}: coord_step={d}\n",.{ee,coord_step});
-            // print("Elem {}: num_bound_x={}\n",.{ee,num_bound_x});
-            // print("Elem {}: num_bound_y={}\n\n",.{ee,num_bound_y});
+            for (0..lanes_n) |ll| {
+                const tile_ind: usize = tile_ind_0 + ll;
+                if (outside[ll]) {
+                    continue;
+                }
 
-            for (0..num_bound_y) |jj| {
-                _ = jj;
+                tile.depth[tile_ind] = @floatCast(px_coord_z[ll]);
 
-                bound_coord_x = xi_min_f + coord_offset;
-                bound_ind_x = camera.sub_sample * xi_min;
+                // Without a field we only keep the visible element and its
+                // weights so the field can be shaded later
+                const elem_field = self.elem_field orelse {
+                    tile.vis_elems[tile_ind] = self.bound.elem_ind;
+                    for (0..3) |nn| {
+                        tile.vis_weights[tile_ind*self.nodes_per_elem + nn] = weights[nn][ll];
+                    }
+                    continue;
+                };
 
-                for (0..num_bound_x) |ii| {
-                    _ = ii;
+                for (0..3) |nn| {
+                    weights_buff[nn] = weights[nn][ll];
+                }
 
-                    px_coord_buff.set(0, bound_coord_x);
-                    px_coord_buff.set(1, bound_coord_y);
+                const num_fields: usize = elem_field.len / self.nodes_per_elem;
+                for (0..num_fields) |ff| {
+                    const field_slice = elem_field[ff*self.nodes_per_elem..(ff+1)*self.nodes_per_elem];
+                    var px_field: f64 = sliceops.dot(f64, field_slice, weights_buff);
+                    px_field = px_field * px_coord_z[ll];
 
-                    weights_buff[0] = edgeFun3(nodes_raster_buff[1], 
-                                               nodes_raster_buff[2], 
-                                               px_coord_buff);
-                    if (weights_buff[0] < -tol) {
-                        bound_coord_x += coord_step;
-                        bound_ind_x += 1;
-                        continue;
+                    tile.image[ff*tile_px_n + tile_ind] = @floatCast(px_field);
+                }
+            }
+        }
+    };
+
+    fn rasterElem(comptime precision: SubPxPrecision,
+                  bound: *const ElemBound,
+                  nodes_raster: []const Vec3f,
+                  elem_field: ?[]const f64,
+                  sub_sample: u8,
+                  mode: RasterMode,
+                  tile: *const SubPxTile(precision),
+                  scratch: *ElemScratch) !void {
+
+        const sub_samp_us: usize = @as(usize, sub_sample);
+        const sub_samp_f: f64 = @as(f64, @floatFromInt(sub_sample));
+        const coord_step: f64 = 1.0 / sub_samp_f;
+        const coord_offset: f64 = 1.0 / (2.0 * sub_samp_f);
+
+        // Clip the element bound in sub-pixels to this tile
+        const bound_ind_x0: usize = sub_samp_us * bound.xi_min;
+        const bound_ind_y0: usize = sub_samp_us * bound.yi_min;
+
+        const jj_start: usize = if (tile.y_start > bound_ind_y0) 
+            tile.y_start - bound_ind_y0 else 0;
+        const jj_end: usize = @min(bound.bound_y_n, 
+            (tile.y_start + tile.y_n) -| bound_ind_y0);
+        const ii_start: usize = if (tile.x_start > bound_ind_x0) 
+            tile.x_start - bound_ind_x0 else 0;
+        const ii_end: usize = @min(bound.bound_x_n, 
+            (tile.x_start + tile.x_n) -| bound_ind_x0);
+
+        if ((jj_start >= jj_end) or (ii_start >= ii_end)) {
+            return;
+        }
+
+        const xi_min_f: f64 = @as(f64, @floatFromInt(bound.xi_min));
+        const yi_min_f: f64 = @as(f64, @floatFromInt(bound.yi_min));
+        const coord_x_start: f64 = stepCoord(xi_min_f + coord_offset, 
+                                             coord_step, ii_start);
+
+        var bound_coord_y: f64 = stepCoord(yi_min_f + coord_offset, 
+                                           coord_step, jj_start);
+
+        // Sub-pixel centres along x are the same for every row so they are
+        // built once by repeated addition, as for a scan of the whole bound.
+        // Padding lanes repeat the last centre and are masked out.
+        const span_n: usize = ii_end - ii_start;
+        const span_x: []f64 = scratch.span_x[0..span_n + span_lanes];
+        var bound_coord_x: f64 = coord_x_start;
+        for (0..span_n) |ss| {
+            span_x[ss] = bound_coord_x;
+            bound_coord_x += coord_step;
+        }
+        @memset(span_x[span_n..], span_x[span_n - 1]);
+
+        const elem_span = ElemSpan.init(bound, nodes_raster, elem_field, 
+                                        scratch);
+        const tile_ind_x0: usize = bound_ind_x0 + ii_start - tile.x_start;
+
+        switch (mode) {
+            .bound_scan => {
+                for (jj_start..jj_end) |jj| {
+                    const tile_ind_y: usize = bound_ind_y0 + jj - tile.y_start;
+                    const edge_row = elem_span.rowTerms(bound_coord_y);
+
+                    var ss: usize = 0;
+                    while (ss < span_n) : (ss += span_lanes) {
+                        try elem_span.rasterSpan(precision, true, tile, &edge_row, 
+                                                 span_x[ss..][0..span_lanes].*,
+                                                 @min(span_lanes, span_n - ss),
+                                                 tile_ind_y*tile.x_n + tile_ind_x0 + ss);
                     }
 
-                    weights_buff[1] = edgeFun3(nodes_raster_buff[2], 
-                    						   nodes_raster_buff[0], 
-                    						   px_coord_buff);
-                    if (weights_buff[1] < -tol) {
-                        bound_coord_x += coord_step;
-                        bound_ind_x += 1;
-                        continue;
+                    bound_coord_y += coord_step;
+                }
+            },
+            .hierarchical => {
+                var block_y: [block_size]f64 = undefined;
+                var jb: usize = jj_start;
+                while (jb < jj_end) : (jb += block_size) {
+                    const rows_n: usize = @min(block_size, jj_end - jb);
+                    for (0..rows_n) |rr| {
+                        block_y[rr] = bound_coord_y;
+                        bound_coord_y += coord_step;
                     }
 
-                    weights_buff[2] = edgeFun3(nodes_raster_buff[0], 
-                    						   nodes_raster_buff[1], 
-                    						   px_coord_buff);
-                    if (weights_buff[2] < -tol) {
-                        bound_coord_x += coord_step;
-                        bound_ind_x += 1;
+                    var sb: usize = 0;
+                    while (sb < span_n) : (sb += block_size) {
+                        const cols_n: usize = @min(block_size, span_n - sb);
+                        const block_class = elem_span.classifyBlock(
+                            span_x[sb], span_x[sb + cols_n - 1],
+                            block_y[0], block_y[rows_n - 1]);
+                        if (block_class == .outside) {
+                            continue;
+                        }
+
+                        for (0..rows_n) |rr| {
+                            const tile_ind_y: usize = bound_ind_y0 + jb + rr - tile.y_start;
+                            const edge_row = elem_span.rowTerms(block_y[rr]);
+
+                            var ss: usize = sb;
+                            while (ss < sb + cols_n) : (ss += span_lanes) {
+                                const px_x: SpanVec = span_x[ss..][0..span_lanes].*;
+                                const lanes_n: usize = @min(span_lanes, sb + cols_n - ss);
+                                const tile_ind_0: usize = tile_ind_y*tile.x_n + tile_ind_x0 + ss;
+                                if (block_class == .inside) {
+                                    try elem_span.rasterSpan(precision, false, tile, 
+                                                             &edge_row, px_x, 
+                                                             lanes_n, tile_ind_0);
+                                } else {
+                                    try elem_span.rasterSpan(precision, true, tile, 
+                                                             &edge_row, px_x, 
+                                                             lanes_n, tile_ind_0);
+                                }
+                            }
+                        }
+                    }
+                }
+            },
+        }
+    }
+
+    // Gathers the field at the nodes of one element for one frame into 
+    // elem_field, shape=(field_n,nodes_per_elem), the layout used for the dot
+    // product with the weights at each sub-pixel
+    fn gatherElemField(field_view: *const NDView(f64, 3),
+                       frame_ind: usize,
+                       coord_inds: []const Connect.Index,
+                       elem_field: []f64) void {
+        const nodes_per_elem: usize = coord_inds.len;
+        const num_fields: usize = field_view.dims[2];
+        for (coord_inds, 0..) |coord_ind, nn| {
+            for (0..num_fields) |ff| {
+                elem_field[ff*nodes_per_elem + nn] = 
+                    field_view.at(.{ frame_ind, coord_ind, ff });
+            }
+        }
+    }
+
+    // Gathers the field at the nodes of every visible element for one frame
+    // into elem_fields, shape=(elem_vis_n,field_n,nodes_per_elem), in the 
+    // order of the cached element bounds
+    fn gatherFrameElemFields(frame_ind: usize,
+                             cache: *const RasterCache,
+                             connect: *const Connect,
+                             field: *const Field,
+                             elem_fields: []f64) !void {
+
+        const elem_field_n: usize = field.getFieldsN() * connect.nodes_per_elem;
+        if (elem_fields.len != cache.elem_bounds.len * elem_field_n) {
+            return RasterError.CacheSizeMismatch;
+        }
+
+        const field_view = field.view3();
+        for (cache.elem_bounds, 0..) |bound, bb| {
+            gatherElemField(&field_view, frame_ind, 
+                            connect.getElem(bound.elem_ind), 
+                            elem_fields[bb*elem_field_n..(bb+1)*elem_field_n]);
+        }
+    }
+
+    // Field at the nodes of the bb'th cached element, taken from the frame 
+    // buffer if there is one or else gathered into the scratch buffer
+    fn elemField(bb: usize,
+                 bound: *const ElemBound,
+                 connect: *const Connect,
+                 field_view: *const NDView(f64, 3),
+                 frame_ind: usize,
+                 elem_fields: []const f64,
+                 scratch: *ElemScratch) []const f64 {
+
+        const elem_field: []f64 = scratch.field_mat.elems;
+        if (elem_fields.len > 0) {
+            return elem_fields[bb*elem_field.len..(bb+1)*elem_field.len];
+        }
+        gatherElemField(field_view, frame_ind, connect.getElem(bound.elem_ind), 
+                        elem_field);
+        return elem_field;
+    }
+
+    fn TileWorker(comptime precision: SubPxPrecision) type {
+        return struct {
+            depth: []precision.DepthFloat(),
+            image: []precision.ImageFloat(),
+            // Averaged pixels of one tile, only used with tile_resolve
+            image_px: []f64,
+            scratch: ElemScratch,
+            depth_blocks: DepthBlocks,
+            elems_rejected: usize = 0,
+            err: ?anyerror = null,
+        };
+    }
+
+    fn TileRaster(comptime precision: SubPxPrecision) type {
+        return struct {
+            frame_ind: usize,
+            connect: *const Connect,
+            field: *const Field,
+            sub_sample: u8,
+            raster_mode: RasterMode,
+            early_depth: bool,
+            cache: *const RasterCache,
+            // Optional per frame field of the cached elements
+            elem_fields: []const f64,
+            // CSR list of the elements binned to each tile, elements for tile tt
+            // are tile_elems[tile_starts[tt]..tile_starts[tt+1]]
+            tile_starts: []const usize,
+            tile_elems: []const usize,
+            tile_size: usize,
+            tiles_x_n: usize,
+            subpx_x: usize,
+            subpx_y: usize,
+            depth_subpx: []precision.DepthFloat(),
+            image_subpx: []precision.ImageFloat(),
+            // Set to resolve each tile straight into the output image, the
+            // full sub-pixel buffers are not used
+            image_out: ?*NDArray(f64),
+            // Only the tiles set are rastered, the rest of image_out is left
+            // as it is. Null rasters every tile.
+            tile_mask: ?[]const bool,
+            tile_next: std.atomic.Value(usize) = std.atomic.Value(usize).init(0),
+
+            const Self = @This();
+
+            fn work(self: *Self, worker: *TileWorker(precision)) void {
+                self.rasterTiles(worker) catch |err| {
+                    worker.err = err;
+                };
+            }
+
+            fn rasterTiles(self: *Self, worker: *TileWorker(precision)) !void {
+                const num_fields: usize = self.field.getFieldsN();
+                const tiles_n: usize = self.tile_starts.len - 1;
+                const subpx_n: usize = self.subpx_x * self.subpx_y;
+                const field_view = self.field.view3();
+
+                while (true) {
+                    const tt = self.tile_next.fetchAdd(1, .monotonic);
+                    if (tt >= tiles_n) {
+                        break;
+                    }
+
+                    if (self.tile_mask) |tile_mask| {
+                        if (!tile_mask[tt]) {
+                            continue;
+                        }
+                    }
+
+                    const tile_elems = self.tile_elems[self.tile_starts[tt]..self.tile_starts[tt+1]];
+                    if ((tile_elems.len == 0) and (self.image_out == null)) {
+                        // Background already set in the full sub-pixel buffers
                         continue;
                     }
 
-                    // if ((ee % 10) == 0){
-                    //     print("Elem: {}\n",.{ee});
-                    //     print("x bound ind={}, coord={d}\n",
-                    //         .{bound_ind_x,bound_coord_x});
-                    //     print("y bound ind={}, coord={d}\n",
-                    //         .{bound_ind_y,bound_coord_y});
-                    //     print("weights=[{d},{d},{d}]\n",
-                    //         .{weights_buff[0],weights_buff[1],weights_buff[2]});
-                    //     print("\n",.{});
-                    // }
-
-                    var weight_dot_nodes: f64 = 0.0;
-                    for (0..connect.nodes_per_elem) |nn| {
-                        weights_buff[nn] = weights_buff[nn] / elem_area;
-                        weight_dot_nodes += weights_buff[nn] 
-                        			        * nodes_raster_buff[nn].get(2);
+                    const x_start: usize = (tt % self.tiles_x_n) * self.tile_size;
+                    const y_start: usize = (tt / self.tiles_x_n) * self.tile_size;
+                    const x_n: usize = @min(self.tile_size, self.subpx_x - x_start);
+                    const y_n: usize = @min(self.tile_size, self.subpx_y - y_start);
+                    const tile_px_n: usize = x_n * y_n;
+
+                    const tile = SubPxTile(precision){
+                        .x_start = x_start,
+                        .y_start = y_start,
+                        .x_n = x_n,
+                        .y_n = y_n,
+                        .depth = worker.depth[0..tile_px_n],
+                        .image = worker.image[0..num_fields*tile_px_n],
+                    };
+                    @memset(tile.depth, 1e6);
+                    @memset(tile.image, 0.0);
+                    worker.depth_blocks.reset(precision, &tile);
+
+                    // Elements are binned in their original order so ties in the
+                    // depth test resolve exactly as in the serial loop
+                    for (tile_elems) |bb| {
+                        const bound = &self.cache.elem_bounds[bb];
+                        if (self.early_depth) {
+                            if (worker.depth_blocks.occludes(precision, bound, 
+                                                       self.sub_sample, &tile)) {
+                                worker.elems_rejected += 1;
+                                continue;
+                            }
+                            worker.depth_blocks.markWritten(precision, bound, 
+                                                        self.sub_sample, &tile);
+                        }
+
+                        self.cache.gatherNodes(self.connect, bound.elem_ind, 
+                                               worker.scratch.nodes);
+                        const elem_field = elemField(bb, bound, self.connect, 
+                                                     &field_view, self.frame_ind,
+                                                     self.elem_fields,
+                                                     &worker.scratch);
+
+                        try rasterElem(precision,
+                                       bound,
+                                       worker.scratch.nodes,
+                                       elem_field,
+                                       self.sub_sample,
+                                       self.raster_mode,
+                                       &tile,
+                                       &worker.scratch);
                     }
 
-                    // Calculate the depth for this sub-pixel
-                    const px_coord_z: f64 = 1.0 / weight_dot_nodes;
-
-                    // If this pixel is behind another we move on
-					depth_subpx_inds[0] = bound_ind_y;
-					depth_subpx_inds[1] = bound_ind_x;
-					
-					const depth_arr_z: f64 = try depth_subpx.get(depth_subpx_inds[0..]); 
-					
-                    if (px_coord_z >= depth_arr_z) {
-                        bound_coord_x += coord_step;
-                        bound_ind_x += 1;
+                    if (self.image_out) |image_out| {
+                        try self.resolveTile(&tile, worker.image_px, image_out);
                         continue;
                     }
 
-                    try depth_subpx.set(depth_subpx_inds[0..], px_coord_z);
-
-                    // if ((ee % 10) == 0) {
-                    //     print("Elem: {}\n", .{ee});
-                    //     print("x bound ind={}, coord={d}\n", 
-                    //     .{ bound_ind_x, bound_coord_x });
-                    //     print("y bound ind={}, coord={d}\n", 
-                    //     .{ bound_ind_y, bound_coord_y });
-                    //     print("weight_dot_nodes={d}\n", .{weight_dot_nodes});
-                    //     print("depth_arr_z={d}\n",. {depth_arr_z});
-                    //     print("px_coord_z={d}\n", .{px_coord_z});
-                    //     print("\n", .{});
-                    // }
-
-					//----------------------------------------------------------
-					// BROKEN: PSEUDO CODE FROM HERE
-					// - Update to deal with rendering F fields in a single pass
-
-					var field_val: f64 = 0.0;
-                    for (0..connect.nodes_per_elem) |nn| {
-                        // NOTE:
-                        // field.array, shape=(time_n,coord_n,field_n)
-                        // field_raster_mat, shape=(field_n,nodes_per_elem)
-						for (0..num_fields) |ff|{
-							field_inds[1] = coord_inds[nn]; // This is scattered
-							field_inds[2] = ff;
-
-							field_val = try	field.array.get(field_inds[0..]);
-
-	                        field_raster_mat.set(ff,nn,field_val);
-	                    }
+                    // Tiles are disjoint so each worker can write back directly
+                    for (0..y_n) |yy| {
+                        const full_start: usize = (y_start + yy)*self.subpx_x + x_start;
+                        @memcpy(self.depth_subpx[full_start..full_start+x_n],
+                                tile.depth[yy*x_n..(yy+1)*x_n]);
+
+                        for (0..num_fields) |ff| {
+                            const full_ff: usize = ff*subpx_n + full_start;
+                            const tile_ff: usize = ff*tile_px_n + yy*x_n;
+                            @memcpy(self.image_subpx[full_ff..full_ff+x_n],
+                                    tile.image[tile_ff..tile_ff+x_n]);
+                        }
+                    }
+                }
+            }
+
+            // Averages the sub-pixels of a finished tile into its pixels of 
+            // image_out, the tile starts on and covers whole pixels
+            fn resolveTile(self: *const Self,
+                           tile: *const SubPxTile(precision),
+                           image_px: []f64,
+                           image_out: *NDArray(f64)) !void {
+                const num_fields: usize = self.field.getFieldsN();
+                const sub_samp_us: usize = @as(usize, self.sub_sample);
+                const tile_px_n: usize = tile.x_n * tile.y_n;
+                const px_x_start: usize = tile.x_start / sub_samp_us;
+                const px_y_start: usize = tile.y_start / sub_samp_us;
+                const px_x_n: usize = tile.x_n / sub_samp_us;
+                const px_y_n: usize = tile.y_n / sub_samp_us;
+                const out_x_n: usize = image_out.dims[2];
+                const out_n: usize = image_out.dims[1] * out_x_n;
+
+                for (0..num_fields) |ff| {
+                    const tile_mat = try MatSlice(precision.ImageFloat()).init(
+                        tile.image[ff*tile_px_n..(ff+1)*tile_px_n],
+                        tile.y_n,
+                        tile.x_n);
+                    var px_mat = try MatSlice(f64).init(
+                        image_px[0..px_x_n*px_y_n], px_y_n, px_x_n);
+
+                    averageImage(precision.ImageFloat(), &tile_mat, 
+                                 self.sub_sample, &px_mat);
+
+                    for (0..px_y_n) |py| {
+                        const out_start: usize = ff*out_n 
+                                                 + (px_y_start + py)*out_x_n 
+                                                 + px_x_start;
+                        @memcpy(image_out.elems[out_start..out_start+px_x_n],
+                                px_mat.getRow(py));
+                    }
+                }
+            }
+        };
+    }
+
+    // Tiles resolved straight into the output image hold whole pixels so the
+    // tile size is rounded up to a multiple of sub_sample
+    fn resolveTileSize(tile_size: usize, sub_sample: u8) usize {
+        const sub_samp_us: usize = @as(usize, sub_sample);
+        return sub_samp_us * (std.math.divCeil(usize, @max(tile_size, 1), 
+                                               sub_samp_us) 
+                              catch unreachable);
+    }
+
+    fn rasterElemsTiled(comptime precision: SubPxPrecision,
+                        allocator: std.mem.Allocator,
+                        arena_alloc: std.mem.Allocator,
+                        frame_ind: usize, 
+                        cache: *const RasterCache, 
+                        connect: *const Connect, 
+                        field: *const Field, 
+                        camera: *const Camera,
+                        opts: RasterOpts,
+                        elem_fields: []const f64,
+                        full_tile: *const SubPxTile(precision),
+                        image_out: ?*NDArray(f64),
+                        tile_mask: ?[]const bool) !FrameStats {
+
+        const num_fields: usize = field.getFieldsN();
+        const sub_samp_us: usize = @as(usize, camera.sub_sample);
+        const tile_size: usize = if (image_out != null) 
+            resolveTileSize(opts.tile_size, camera.sub_sample) 
+            else @max(opts.tile_size, 1);
+        const tiles_x_n: usize = std.math.divCeil(usize, full_tile.x_n, tile_size) catch unreachable;
+        const tiles_y_n: usize = std.math.divCeil(usize, full_tile.y_n, tile_size) catch unreachable;
+        const tiles_n: usize = tiles_x_n * tiles_y_n;
+        assert((tile_mask == null) or (tile_mask.?.len == tiles_n));
+
+        //----------------------------------------------------------------------
+        // Bin elements to tiles by their sub-pixel bounding box: count, prefix
+        // sum and then fill so each tile's elements stay in element order.
+        // Tiles that are masked out are left empty.
+        var tile_starts = try arena_alloc.alloc(usize, tiles_n + 1);
+        @memset(tile_starts, 0);
+
+        for (cache.elem_bounds) |bound| {
+            if ((bound.bound_x_n == 0) or (bound.bound_y_n == 0)) {
+                continue;
+            }
+            const tx_min: usize = (sub_samp_us*bound.xi_min) / tile_size;
+            const tx_max: usize = (sub_samp_us*bound.xi_min + bound.bound_x_n - 1) / tile_size;
+            const ty_min: usize = (sub_samp_us*bound.yi_min) / tile_size;
+            const ty_max: usize = (sub_samp_us*bound.yi_min + bound.bound_y_n - 1) / tile_size;
+
+            for (ty_min..ty_max+1) |ty| {
+                for (tx_min..tx_max+1) |tx| {
+                    if ((tile_mask == null) or tile_mask.?[ty*tiles_x_n + tx]) {
+                        tile_starts[ty*tiles_x_n + tx + 1] += 1;
+                    }
+                }
+            }
+        }
+
+        for (1..tiles_n+1) |tt| {
+            tile_starts[tt] += tile_starts[tt-1];
+        }
+
+        const tile_elems = try arena_alloc.alloc(usize, tile_starts[tiles_n]);
+        const tile_fill = try arena_alloc.dupe(usize, tile_starts[0..tiles_n]);
 
+        for (cache.elem_bounds, 0..) |bound, bb| {
+            if ((bound.bound_x_n == 0) or (bound.bound_y_n == 0)) {
+                continue;
+            }
+            const tx_min: usize = (sub_samp_us*bound.xi_min) / tile_size;
+            const tx_max: usize = (sub_samp_us*bound.xi_min + bound.bound_x_n - 1) / tile_size;
+            const ty_min: usize = (sub_samp_us*bound.yi_min) / tile_size;
+            const ty_max: usize = (sub_samp_us*bound.yi_min + bound.bound_y_n - 1) / tile_size;
+
+            for (ty_min..ty_max+1) |ty| {
+                for (tx_min..tx_max+1) |tx| {
+                    const tt: usize = ty*tiles_x_n + tx;
+                    if ((tile_mask != null) and !tile_mask.?[tt]) {
+                        continue;
                     }
-                    
-                    // TODO: works up to here getting field values                        
-					image_subpx_inds[1] = bound_ind_y;
-					image_subpx_inds[2] = bound_ind_x;
+                    tile_elems[tile_fill[tt]] = bb;
+                    tile_fill[tt] += 1;
+                }
+            }
+        }
+
+        //----------------------------------------------------------------------
+        // Worker buffers are allocated up front as the arena is not thread safe
+        const threads_n: usize = @max(1, @min(opts.threads_n, tiles_n));
+        const tile_px_n: usize = tile_size * tile_size;
+        const image_px_n: usize = if (image_out != null) 
+            tile_px_n / (sub_samp_us*sub_samp_us) else 0;
+        var workers = try arena_alloc.alloc(TileWorker(precision), threads_n);
+        for (0..threads_n) |ww| {
+            workers[ww] = .{
+                .depth = try arena_alloc.alloc(precision.DepthFloat(), tile_px_n),
+                .image = try arena_alloc.alloc(precision.ImageFloat(), 
+                                               num_fields*tile_px_n),
+                .image_px = try arena_alloc.alloc(f64, image_px_n),
+                .scratch = try ElemScratch.init(arena_alloc, 
+                                                connect.nodes_per_elem, 
+                                                num_fields,
+                                                tile_size),
+                .depth_blocks = try DepthBlocks.init(arena_alloc, 
+                                                     tile_size, 
+                                                     tile_size),
+            };
+        }
+
+        var tile_raster = TileRaster(precision){
+            .frame_ind = frame_ind,
+            .connect = connect,
+            .field = field,
+            .sub_sample = camera.sub_sample,
+            .raster_mode = opts.raster_mode,
+            .early_depth = opts.early_depth,
+            .cache = cache,
+            .elem_fields = elem_fields,
+            .tile_starts = tile_starts,
+            .tile_elems = tile_elems,
+            .tile_size = tile_size,
+            .tiles_x_n = tiles_x_n,
+            .subpx_x = full_tile.x_n,
+            .subpx_y = full_tile.y_n,
+            .depth_subpx = full_tile.depth,
+            .image_subpx = full_tile.image,
+            .image_out = image_out,
+            .tile_mask = tile_mask,
+        };
+
+        // One worker is the tile_resolve case with a single thread
+        if (threads_n == 1) {
+            tile_raster.work(&workers[0]);
+        } else {
+            var pool: std.Thread.Pool = undefined;
+            try pool.init(.{ .allocator = allocator, .n_jobs = threads_n });
+            defer pool.deinit();
+
+            var wait_group: std.Thread.WaitGroup = .{};
+            for (workers) |*worker| {
+                pool.spawnWg(&wait_group, TileRaster(precision).work, 
+                             .{&tile_raster, worker});
+            }
+            pool.waitAndWork(&wait_group);
+        }
+
+        var stats = FrameStats{ .elems_in_image = cache.elem_bounds.len };
+        for (workers) |worker| {
+            if (worker.err) |err| {
+                return err;
+            }
+            stats.elems_rejected_early += worker.elems_rejected;
+        }
+
+        return stats;
+    }
+
+    fn rasterElemsSerial(comptime precision: SubPxPrecision,
+                         frame_ind: usize, 
+                         cache: *const RasterCache, 
+                         connect: *const Connect, 
+                         field: *const Field, 
+                         camera: *const Camera,
+                         opts: RasterOpts,
+                         elem_fields: []const f64,
+                         buffs: *FrameBuffers,
+                         full_tile: *const SubPxTile(precision)) !FrameStats {
+
+        const nodes_raster: []Vec3f = buffs.scratch.nodes;
+        const field_view = field.view3();
+        var stats = FrameStats{ .elems_in_image = cache.elem_bounds.len };
+        buffs.depth_blocks.reset(precision, full_tile);
+
+        for (cache.elem_bounds, 0..) |*bound, bb| {
+            if (opts.early_depth) {
+                if (buffs.depth_blocks.occludes(precision, bound, 
+                                                camera.sub_sample, full_tile)) {
+                    stats.elems_rejected_early += 1;
+                    continue;
+                }
+                buffs.depth_blocks.markWritten(precision, bound, 
+                                               camera.sub_sample, full_tile);
+            }
+
+            cache.gatherNodes(connect, bound.elem_ind, nodes_raster);
+            const elem_field = elemField(bb, bound, connect, &field_view, 
+                                         frame_ind, elem_fields, &buffs.scratch);
 
-					for (0..num_fields) |ff| {
-						const field_slice = try field_raster_mat.getSlice(ff);
-                    	px_field = sliceops.dot(f64, field_slice, weights_buff);
+            try rasterElem(precision, bound, nodes_raster, elem_field, 
+                           camera.sub_sample, opts.raster_mode, full_tile, 
+                           &buffs.scratch);
+        }
 
-	                    px_field = px_field * px_coord_z;
+        return stats;
+    }
 
-	                    // print("\nind_y={} , ind_x={}, px_field={}\n",
-	                    //      .{bound_ind_y,bound_ind_x,px_field});
+    // Marks the tiles of tile_px x tile_px pixels holding a pixel that differs
+    // from one of its 8 neighbours in coverage or field, see the adaptive 
+    // sampling notes after RasterOpts.
+    // field_tols is scratch for the tolerance on each field.
+    fn markAdaptiveTiles(comptime precision: SubPxPrecision,
+                         px_tile: *const SubPxTile(precision),
+                         adaptive_tol: f64,
+                         tile_px: usize,
+                         field_tols: []f64,
+                         tile_mask: []bool) void {
+
+        const x_n: usize = px_tile.x_n;
+        const y_n: usize = px_tile.y_n;
+        const px_n: usize = x_n * y_n;
+        const tiles_x_n: usize = std.math.divCeil(usize, x_n, tile_px) catch unreachable;
+        const image = px_tile.image;
+        const depth = px_tile.depth;
+
+        for (field_tols, 0..) |*field_tol, ff| {
+            var field_min: f64 = std.math.inf(f64);
+            var field_max: f64 = -std.math.inf(f64);
+            for (image[ff*px_n..(ff+1)*px_n], depth) |px_val, px_depth| {
+                if (px_depth < 1e6) {
+                    field_min = @min(field_min, px_val);
+                    field_max = @max(field_max, px_val);
+                }
+            }
+            field_tol.* = if (field_max >= field_min) 
+                adaptive_tol * (field_max - field_min) else 0.0;
+        }
 
-						image_subpx_inds[0] = ff;
-					    try image_subpx.set(image_subpx_inds[0..], px_field);
-					}
+        // Each neighbouring pair is compared once: right, down left, down
+        // and down right
+        const neigh_dx = [_]isize{ 1, -1, 0, 1 };
+        const neigh_dy = [_]usize{ 0, 1, 1, 1 };
+
+        @memset(tile_mask, false);
+        for (0..y_n) |yy| {
+            for (0..x_n) |xx| {
+                const pp: usize = yy*x_n + xx;
+                const covered_p: bool = depth[pp] < 1e6;
+
+                for (neigh_dx, neigh_dy) |dx, dy| {
+                    const qx_i: isize = @as(isize, @intCast(xx)) + dx;
+                    const qy: usize = yy + dy;
+                    if ((qx_i < 0) or (qx_i >= @as(isize, @intCast(x_n))) 
+                        or (qy >= y_n)) {
+                        continue;
+                    }
+                    const qx: usize = @intCast(qx_i);
+                    const qq: usize = qy*x_n + qx;
+
+                    var differ: bool = covered_p != (depth[qq] < 1e6);
+                    for (field_tols, 0..) |field_tol, ff| {
+                        const val_p: f64 = image[ff*px_n + pp];
+                        const val_q: f64 = image[ff*px_n + qq];
+                        differ = differ or (@abs(val_p - val_q) > field_tol);
+                    }
 
-					//----------------------------------------------------------
-                    // End for(x) - increment the x coords
-                    bound_coord_x += coord_step;
-                    bound_ind_x += 1;
+                    if (differ) {
+                        tile_mask[(yy / tile_px)*tiles_x_n + xx / tile_px] = true;
+                        tile_mask[(qy / tile_px)*tiles_x_n + qx / tile_px] = true;
+                    }
                 }
-				//--------------------------------------------------------------
-                // End for(y) - increment the y coords
-                bound_coord_y += coord_step;
-                bound_ind_y += 1;
             }
         }
+    }
+
+    // Rasters one sample at each pixel centre straight into image_out, then
+    // re-rasters the tiles marked by markAdaptiveTiles at sub_sample and 
+    // resolves them over the top.
+    fn rasterElemsAdaptive(comptime precision: SubPxPrecision,
+                           allocator: std.mem.Allocator,
+                           arena_alloc: std.mem.Allocator,
+                           frame_ind: usize, 
+                           cache: *const RasterCache, 
+                           connect: *const Connect, 
+                           field: *const Field, 
+                           camera: *const Camera,
+                           opts: RasterOpts,
+                           elem_fields: []const f64,
+                           buffs: *FrameBuffers,
+                           image_out: *NDArray(f64)) !FrameStats {
+
+        const num_fields: usize = field.getFieldsN();
+        const sub_samp_us: usize = @as(usize, camera.sub_sample);
+        const px_x: usize = @as(usize, camera.pixels_num[0]);
+        const px_y: usize = @as(usize, camera.pixels_num[1]);
+        const px_n: usize = px_x * px_y;
+
+        //----------------------------------------------------------------------
+        // One sample per pixel: the same elements with their bounds counted
+        // in pixels rather than sub-pixels
+        var camera_px: Camera = camera.*;
+        camera_px.sub_sample = 1;
+        var cache_px: RasterCache = cache.*;
+        cache_px.elem_bounds = try arena_alloc.dupe(ElemBound, cache.elem_bounds);
+        for (cache_px.elem_bounds) |*bound| {
+            bound.bound_x_n = std.math.divCeil(usize, bound.bound_x_n, 
+                                               sub_samp_us) catch unreachable;
+            bound.bound_y_n = std.math.divCeil(usize, bound.bound_y_n, 
+                                               sub_samp_us) catch unreachable;
+        }
+
+        const px_tile = SubPxTile(precision){
+            .x_start = 0,
+            .y_start = 0,
+            .x_n = px_x,
+            .y_n = px_y,
+            .depth = try arena_alloc.alloc(precision.DepthFloat(), px_n),
+            .image = try arena_alloc.alloc(precision.ImageFloat(), num_fields*px_n),
+        };
+        @memset(px_tile.depth, 1e6);
+        @memset(px_tile.image, 0.0);
+
+        var stats = FrameStats{};
+        if (opts.threads_n > 1) {
+            stats = try rasterElemsTiled(precision, allocator, arena_alloc, 
+                                         frame_ind, &cache_px, connect, 
+                                         field, &camera_px, opts, elem_fields,
+                                         &px_tile, null, null);
+        } else {
+            stats = try rasterElemsSerial(precision, frame_ind, &cache_px, 
+                                          connect, field, &camera_px, opts, 
+                                          elem_fields, buffs, &px_tile);
+        }
+
+        for (image_out.elems[0..num_fields*px_n], px_tile.image) |*px_out, px_val| {
+            px_out.* = px_val;
+        }
+
+        //----------------------------------------------------------------------
+        // Re-sample the tiles with edges at sub_sample
+        const tile_px: usize = resolveTileSize(opts.tile_size, camera.sub_sample) 
+                               / sub_samp_us;
+        const tiles_n: usize = (std.math.divCeil(usize, px_x, tile_px) catch unreachable)
+                               * (std.math.divCeil(usize, px_y, tile_px) catch unreachable);
+        const tile_mask = try arena_alloc.alloc(bool, tiles_n);
+        const field_tols = try arena_alloc.alloc(f64, num_fields);
+        markAdaptiveTiles(precision, &px_tile, opts.adaptive_tol, tile_px, 
+                          field_tols, tile_mask);
+
+        const full_tile = buffs.fullTile(precision);
+        const stats_tiles = try rasterElemsTiled(precision, allocator, arena_alloc, 
+                                                 frame_ind, cache, connect, 
+                                                 field, camera, opts, elem_fields,
+                                                 &full_tile, image_out, tile_mask);
+
+        stats.elems_rejected_early += stats_tiles.elems_rejected_early;
+        stats.tiles_resampled = std.mem.count(bool, tile_mask, &.{true});
+        stats.tiles_n = tiles_n;
+        return stats;
+    }
+
+    // Writes coords plus the scaled displacement for this frame into 
+    // coords_def, which is allocated once and reused for every frame.
+    pub fn deformCoords(frame_ind: usize,
+                        coords: *const Coords,
+                        field: *const Field,
+                        disp_fields: [3]usize,
+                        disp_scale: f64,
+                        coords_def: *Coords) !void {
+
+        const num_fields: usize = field.getFieldsN();
+        if ((coords_def.len != coords.len) 
+            or (field.getCoordN() != coords.len)) {
+            return RasterError.CacheSizeMismatch;
+        }
+        for (disp_fields) |ff| {
+            if (ff >= num_fields) {
+                return RasterError.DispFieldOutOfRange;
+            }
+        }
+
+        // Fields may be views with any layout so we step by the strides
+        var frame_inds = [_]usize{frame_ind,0,0};
+        const frame_start: usize = try field.array.getFlatInd(frame_inds[0..]);
+        const coord_stride: usize = field.array.strides[1];
+        const field_stride: usize = field.array.strides[2];
+        const elems: []f64 = field.array.elems;
+
+        for (0..coords.len) |nn| {
+            const field_start: usize = frame_start + nn*coord_stride;
+            coords_def.x[nn] = coords.x[nn] 
+                + disp_scale*elems[field_start + disp_fields[0]*field_stride];
+            coords_def.y[nn] = coords.y[nn] 
+                + disp_scale*elems[field_start + disp_fields[1]*field_stride];
+            coords_def.z[nn] = coords.z[nn] 
+                + disp_scale*elems[field_start + disp_fields[2]*field_stride];
+        }
+    }
+
+    // Updates the cache with the coords to raster for this frame. If the mesh
+    // is deformed the displaced coords are written into coords_def first and
+    // the cache is always rebuilt as the buffer is reused between frames.
+    fn updateFrameCache(frame_ind: usize,
+                        coords: *const Coords,
+                        connect: *const Connect,
+                        field: *const Field,
+                        camera: *const Camera,
+                        opts: RasterOpts,
+                        coords_def: *Coords,
+                        cache: *RasterCache) !void {
+
+        if (opts.disp_fields) |disp_fields| {
+            try deformCoords(frame_ind, coords, field, disp_fields, 
+                             opts.disp_scale, coords_def);
+            cache.invalidate();
+            var opts_def = opts;
+            opts_def.elem_index = null;
+            try updateCache(coords_def, connect, camera, opts_def, cache);
+        } else {
+            try updateCache(coords, connect, camera, opts, cache);
+        }
+    }
+
+    // Updates the cache and puts its elements in the order asked for by the
+    // depth_sort option, a cache sorted for an earlier call is rebuilt if
+    // element order is wanted
+    fn updateCache(coords: *const Coords,
+                   connect: *const Connect,
+                   camera: *const Camera,
+                   opts: RasterOpts,
+                   cache: *RasterCache) !void {
+
+        if (cache.depth_sorted and !opts.depth_sort) {
+            cache.invalidate();
+        }
+        try cache.updateIndexed(coords, connect, camera, opts.elem_index);
+        if (opts.depth_sort) {
+            cache.sortFrontToBack();
+        }
+    }
+
+    // Sub-pixel buffers needed to raster a frame. These are allocated once,
+    // normally on an arena, and reused when rastering many frames. The image
+    // and depth buffers are stored as bytes sized for the float type given
+    // by precision and read through imageSubPx and depthSubPx. They are 
+    // empty if full_frame is false as tile_resolve only needs tile buffers.
+    pub const FrameBuffers = struct {
+        subpx_x: usize,
+        subpx_y: usize,
+        num_fields: usize,
+        precision: SubPxPrecision,
+        image_subpx_mem: []align(8) u8, // shape=(num_fields,subpx_y,subpx_x)
+        depth_subpx_mem: []align(8) u8, // shape=(subpx_y,subpx_x)
+        scratch: ElemScratch,
+        depth_blocks: DepthBlocks,
+
+        pub fn init(allocator: std.mem.Allocator,
+                    camera: *const Camera,
+                    num_fields: usize,
+                    nodes_per_elem: usize,
+                    precision: SubPxPrecision,
+                    full_frame: bool) !FrameBuffers {
+
+            const subpx_x: usize = @as(usize, camera.pixels_num[0]) 
+                                   * @as(usize, camera.sub_sample);
+            const subpx_y: usize = @as(usize, camera.pixels_num[1]) 
+                                   * @as(usize, camera.sub_sample);
+
+            const image_float_size: usize = switch (precision) {
+                inline else => |prec| @sizeOf(prec.ImageFloat()),
+            };
+            const depth_float_size: usize = switch (precision) {
+                inline else => |prec| @sizeOf(prec.DepthFloat()),
+            };
+            const full_n: usize = if (full_frame) subpx_y*subpx_x else 0;
+
+            return .{
+                .subpx_x = subpx_x,
+                .subpx_y = subpx_y,
+                .num_fields = num_fields,
+                .precision = precision,
+                .image_subpx_mem = try allocator.alignedAlloc(
+                    u8, .@"8", image_float_size*num_fields*full_n),
+                .depth_subpx_mem = try allocator.alignedAlloc(
+                    u8, .@"8", depth_float_size*full_n),
+                .scratch = try ElemScratch.init(allocator, 
+                                                nodes_per_elem, 
+                                                num_fields,
+                                                subpx_x),
+                .depth_blocks = try DepthBlocks.init(allocator, 
+                                                     subpx_x, 
+                                                     subpx_y),
+            };
+        }
+
+        pub fn imageSubPx(self: *const FrameBuffers, 
+                          comptime precision: SubPxPrecision) []precision.ImageFloat() {
+            assert(self.precision == precision);
+            return @alignCast(std.mem.bytesAsSlice(precision.ImageFloat(), 
+                                                   self.image_subpx_mem));
+        }
+
+        pub fn depthSubPx(self: *const FrameBuffers, 
+                          comptime precision: SubPxPrecision) []precision.DepthFloat() {
+            assert(self.precision == precision);
+            return @alignCast(std.mem.bytesAsSlice(precision.DepthFloat(), 
+                                                   self.depth_subpx_mem));
+        }
+
+        pub fn fullTile(self: *const FrameBuffers, 
+                        comptime precision: SubPxPrecision) SubPxTile(precision) {
+            return .{
+                .x_start = 0,
+                .y_start = 0,
+                .x_n = self.subpx_x,
+                .y_n = self.subpx_y,
+                .depth = self.depthSubPx(precision),
+                .image = self.imageSubPx(precision),
+            };
+        }
+    };
+
+    // Adaptive sampling only helps with more than one sample per pixel
+    fn adaptiveSample(camera: *const Camera, opts: RasterOpts) bool {
+        return opts.adaptive_sample and (camera.sub_sample > 1);
+    }
+
+    // Whole frame sub-pixel buffers are only needed when the frame is not
+    // resolved tile by tile
+    fn fullFrameBuffers(camera: *const Camera, opts: RasterOpts) bool {
+        return !(opts.tile_resolve or adaptiveSample(camera, opts));
+    }
 
-        const image_subpx_max = std.mem.max(f64,image_subpx.elems);
-        const image_subpx_min = std.mem.min(f64,image_subpx.elems);
-        const depth_subpx_max = std.mem.max(f64,depth_subpx.elems);
-        const depth_subpx_min = std.mem.min(f64,depth_subpx.elems);
-        print("\nimage_subpx_max,min=[{d:.6},{d:.6}]\n",.{image_subpx_max,image_subpx_min});
-        print("depth_subpx_max,min=[{d:.6},{d:.6}]\n",.{depth_subpx_max,depth_subpx_min});
+    // Averages the sub-pixel images of each field down to image_out_arr
+    fn resolveFrame(comptime precision: SubPxPrecision,
+                    buffs: *FrameBuffers,
+                    camera: *const Camera,
+                    image_out_arr: *NDArray(f64)) !void {
 
+        const image_subpx = buffs.imageSubPx(precision);
+        const subpx_n: usize = buffs.subpx_x*buffs.subpx_y;
 
         var out_slice_inds = [_]usize{0,0,0};
-        for (0..num_fields) |ff| {
+        for (0..buffs.num_fields) |ff| {
             out_slice_inds[0] = ff;
 
             // 1) Create MatSlice for sub-pixel image for given field ff
-            const image_subpx_slice = try image_subpx.getSlice(
-                out_slice_inds[0..],0);
-            const image_subpx_mat = try MatSlice(f64).init(image_subpx_slice,
-                                                          subpx_y,
-                                                          subpx_x);
+            const image_subpx_mat = try MatSlice(precision.ImageFloat()).init(
+                image_subpx[ff*subpx_n..(ff+1)*subpx_n],
+                buffs.subpx_y,
+                buffs.subpx_x);
 
             // 2) Create wrapper MatSlice for actual images dims from last
             // two dims of the image_out_arr using getSlice()
@@ -423,10 +1829,115 @@ pub const Raster = struct {
                                                       camera.pixels_num[1],
                                                       camera.pixels_num[0]);
 
-            averageImage(&image_subpx_mat, camera.sub_sample, &image_out_mat);
+            averageImage(precision.ImageFloat(), &image_subpx_mat, 
+                         camera.sub_sample, &image_out_mat);
         }
-    
-        //----------------------------------------------------------------------
+    }
+
+    // Rasters one frame into image_out_arr using preallocated sub-pixel 
+    // buffers. The arena is only used for the tiled element bins and the 
+    // element field buffer.
+    fn rasterFrame(allocator: std.mem.Allocator,
+                   arena_alloc: std.mem.Allocator,
+                   frame_ind: usize, 
+                   cache: *const RasterCache, 
+                   connect: *const Connect, 
+                   field: *const Field, 
+                   camera: *const Camera, 
+                   opts: RasterOpts,
+                   buffs: *FrameBuffers,
+                   image_out_arr: *NDArray(f64)) !void {
+
+        switch (buffs.precision) {
+            inline else => |precision| try rasterFrameTyped(
+                precision, allocator, arena_alloc, frame_ind, cache, connect,
+                field, camera, opts, buffs, image_out_arr),
+        }
+    }
+
+    fn rasterFrameTyped(comptime precision: SubPxPrecision,
+                        allocator: std.mem.Allocator,
+                        arena_alloc: std.mem.Allocator,
+                        frame_ind: usize, 
+                        cache: *const RasterCache, 
+                        connect: *const Connect, 
+                        field: *const Field, 
+                        camera: *const Camera, 
+                        opts: RasterOpts,
+                        buffs: *FrameBuffers,
+                        image_out_arr: *NDArray(f64)) !void {
+
+        const num_fields: usize = field.getFieldsN();
+        const full_tile = buffs.fullTile(precision);
+        const image_subpx = full_tile.image;
+        const depth_subpx = full_tile.depth;
+
+		// Set image background to 0.0 and depth buffer to large value.
+        @memset(image_subpx, 0.0);
+        @memset(depth_subpx, 1e6);
+
+        // Gather the field of every visible element up front so the raster
+        // loop reads it contiguously in element order
+        var elem_fields: []f64 = &.{};
+        if (opts.elem_field_buffer) {
+            elem_fields = try arena_alloc.alloc(f64, cache.elem_bounds.len
+                                                     * num_fields
+                                                     * connect.nodes_per_elem);
+            try gatherFrameElemFields(frame_ind, cache, connect, field, 
+                                      elem_fields);
+        }
+
+		//----------------------------------------------------------------------
+		// Raster Loop
+        var stats = FrameStats{};
+        if (adaptiveSample(camera, opts)) {
+            stats = try rasterElemsAdaptive(precision, allocator, arena_alloc, 
+                                            frame_ind, cache, connect, field, 
+                                            camera, opts, elem_fields, buffs, 
+                                            image_out_arr);
+            if (opts.verbose) {
+                print("\nelems_in_image={}, elems_rejected_early={}, " ++
+                      "tiles_resampled={}/{}\n",
+                      .{stats.elems_in_image, stats.elems_rejected_early,
+                        stats.tiles_resampled, stats.tiles_n});
+            }
+            return;
+        } else if (opts.tile_resolve) {
+            stats = try rasterElemsTiled(precision, allocator, arena_alloc, 
+                                         frame_ind, cache, connect, 
+                                         field, camera, opts, elem_fields,
+                                         &full_tile, image_out_arr, null);
+            if (opts.verbose) {
+                print("\nelems_in_image={}, elems_rejected_early={}\n",
+                      .{stats.elems_in_image, stats.elems_rejected_early});
+            }
+            return;
+        } else if (opts.threads_n > 1) {
+            stats = try rasterElemsTiled(precision, allocator, arena_alloc, 
+                                         frame_ind, cache, connect, 
+                                         field, camera, opts, elem_fields,
+                                         &full_tile, null, null);
+        } else {
+            stats = try rasterElemsSerial(precision, frame_ind, cache, connect, 
+                                          field, camera, opts, elem_fields,
+                                          buffs, &full_tile);
+        }
+
+        if (opts.verbose) {
+            const image_subpx_max = std.mem.max(precision.ImageFloat(),image_subpx);
+            const image_subpx_min = std.mem.min(precision.ImageFloat(),image_subpx);
+            const depth_subpx_max = std.mem.max(precision.DepthFloat(),depth_subpx);
+            const depth_subpx_min = std.mem.min(precision.DepthFloat(),depth_subpx);
+            print("\nelems_in_image={}, elems_rejected_early={}\n",
+                  .{stats.elems_in_image, stats.elems_rejected_early});
+            print("image_subpx_max,min=[{d:.6},{d:.6}]\n",.{image_subpx_max,image_subpx_min});
+            print("depth_subpx_max,min=[{d:.6},{d:.6}]\n",.{depth_subpx_max,depth_subpx_min});
+        }
+
+
+        try resolveFrame(precision, buffs, camera, image_out_arr);
+    
+        //----------------------------------------------------------------------
         // DEBUG: SAVE SUB-PIXEL IMAGES TO DISK
 //         const cwd = std.fs.cwd();
 //         const dir_name = "raster-out";
@@ -470,12 +1981,620 @@ pub const Raster = struct {
         		
     }
 
+    pub fn rasterOneFrame(allocator: std.mem.Allocator, 
+                          frame_ind: usize, 
+                          coords: *const Coords, 
+                          connect: *const Connect, 
+                          field: *const Field, 
+                          camera: *const Camera, 
+                          opts: RasterOpts,
+                          image_out_arr: *NDArray(f64)) !void {
+
+        // We allocate all temporary buffers on our arena so no need to defer
+        // free any temporary buffers in this function
+        var arena = std.heap.ArenaAllocator.init(allocator);
+        defer arena.deinit();
+        const arena_alloc = arena.allocator();
+
+        var cache = try RasterCache.init(arena_alloc, coords, connect);
+
+        try rasterOneFrameCached(allocator, frame_ind, coords, connect, field,
+                                 camera, opts, &cache, image_out_arr);
+    }
+
+    // Same as rasterOneFrame but the node projection and element culling are
+    // taken from the cache, which is only rebuilt if the camera or coords have
+    // changed. Rastering many frames this way only projects the mesh once,
+    // unless the mesh is deformed in which case it is projected every frame.
+    pub fn rasterOneFrameCached(allocator: std.mem.Allocator, 
+                                frame_ind: usize, 
+                                coords: *const Coords, 
+                                connect: *const Connect, 
+                                field: *const Field, 
+                                camera: *const Camera, 
+                                opts: RasterOpts,
+                                cache: *RasterCache,
+                                image_out_arr: *NDArray(f64)) !void {
+
+        // Fields are read unchecked in the raster loop
+        if (frame_ind >= field.getTimeN()) {
+            return RasterError.FrameOutOfRange;
+        }
+
+        var arena = std.heap.ArenaAllocator.init(allocator);
+        defer arena.deinit();
+        const arena_alloc = arena.allocator();
+
+        var coords_def = try Coords.init(arena_alloc, 
+            if (opts.disp_fields != null) coords.len else 0);
+        try updateFrameCache(frame_ind, coords, connect, field, camera, opts, 
+                             &coords_def, cache);
+
+        var buffs = try FrameBuffers.init(arena_alloc, 
+                                          camera, 
+                                          field.getFieldsN(), 
+                                          connect.nodes_per_elem,
+                                          opts.subpx_precision,
+                                          fullFrameBuffers(camera, opts));
+
+        try rasterFrame(allocator, arena_alloc, frame_ind, cache, connect, 
+                        field, camera, opts, &buffs, image_out_arr);
+    }
+
+    // Rasters only the pixel windows of the camera image for one frame, each
+    // into its own image in images_out with shape=(field_n,y_n,x_n). The
+    // sub-pixel buffers are sized for the largest window rather than the
+    // full image and each window only rasters the elements whose bounds
+    // overlap it, so the images are the same as cropping the full image.
+    // Windows are shared between threads_n threads, each window is rastered
+    // by a single thread. tile_resolve and adaptive_sample are ignored.
+    pub fn rasterWindows(allocator: std.mem.Allocator, 
+                         frame_ind: usize, 
+                         coords: *const Coords, 
+                         connect: *const Connect, 
+                         field: *const Field, 
+                         camera: *const Camera, 
+                         opts: RasterOpts,
+                         windows: []const PixelWindow,
+                         images_out: []NDArray(f64)) !void {
+
+        var arena = std.heap.ArenaAllocator.init(allocator);
+        defer arena.deinit();
+
+        var cache = try RasterCache.init(arena.allocator(), coords, connect);
+
+        try rasterWindowsCached(allocator, frame_ind, coords, connect, field,
+                                camera, opts, &cache, windows, images_out);
+    }
+
+    // Same as rasterWindows with the node projection and element culling
+    // taken from the cache as for rasterOneFrameCached
+    pub fn rasterWindowsCached(allocator: std.mem.Allocator, 
+                               frame_ind: usize, 
+                               coords: *const Coords, 
+                               connect: *const Connect, 
+                               field: *const Field, 
+                               camera: *const Camera, 
+                               opts: RasterOpts,
+                               cache: *RasterCache,
+                               windows: []const PixelWindow,
+                               images_out: []NDArray(f64)) !void {
+
+        if (frame_ind >= field.getTimeN()) {
+            return RasterError.FrameOutOfRange;
+        }
+        if (windows.len != images_out.len) {
+            return RasterError.OutputDimsMismatch;
+        }
+        const num_fields: usize = field.getFieldsN();
+        for (windows, images_out) |window, image_out| {
+            if ((window.x_n == 0) or (window.y_n == 0)
+                or (window.x_start + window.x_n > camera.pixels_num[0])
+                or (window.y_start + window.y_n > camera.pixels_num[1])) {
+                return RasterError.WindowOutOfRange;
+            }
+            if (!std.mem.eql(usize, image_out.dims, 
+                             &.{ num_fields, window.y_n, window.x_n })) {
+                return RasterError.OutputDimsMismatch;
+            }
+        }
+        if (windows.len == 0) {
+            return;
+        }
+
+        var arena = std.heap.ArenaAllocator.init(allocator);
+        defer arena.deinit();
+        const arena_alloc = arena.allocator();
+
+        var coords_def = try Coords.init(arena_alloc, 
+            if (opts.disp_fields != null) coords.len else 0);
+        try updateFrameCache(frame_ind, coords, connect, field, camera, opts, 
+                             &coords_def, cache);
+
+        var elem_fields: []f64 = &.{};
+        if (opts.elem_field_buffer) {
+            elem_fields = try arena_alloc.alloc(f64, cache.elem_bounds.len
+                                                     * num_fields
+                                                     * connect.nodes_per_elem);
+            try gatherFrameElemFields(frame_ind, cache, connect, field, 
+                                      elem_fields);
+        }
+
+        switch (opts.subpx_precision) {
+            inline else => |precision| try rasterWindowsTyped(
+                precision, allocator, arena_alloc, frame_ind, cache, connect,
+                field, camera, opts, elem_fields, windows, images_out),
+        }
+    }
+
+    fn WindowRaster(comptime precision: SubPxPrecision) type {
+        return struct {
+            frame_ind: usize,
+            connect: *const Connect,
+            field: *const Field,
+            camera: *const Camera,
+            opts: RasterOpts,
+            cache: *const RasterCache,
+            elem_fields: []const f64,
+            windows: []const PixelWindow,
+            images_out: []NDArray(f64),
+            window_next: std.atomic.Value(usize) = std.atomic.Value(usize).init(0),
+
+            const Self = @This();
+
+            fn work(self: *Self, worker: *TileWorker(precision)) void {
+                self.rasterWindows(worker) catch |err| {
+                    worker.err = err;
+                };
+            }
+
+            fn rasterWindows(self: *Self, worker: *TileWorker(precision)) !void {
+                const num_fields: usize = self.field.getFieldsN();
+                const sub_samp_us: usize = @as(usize, self.camera.sub_sample);
+                const field_view = self.field.view3();
+
+                while (true) {
+                    const ww = self.window_next.fetchAdd(1, .monotonic);
+                    if (ww >= self.windows.len) {
+                        break;
+                    }
+
+                    const window = self.windows[ww];
+                    const x_n: usize = sub_samp_us * window.x_n;
+                    const y_n: usize = sub_samp_us * window.y_n;
+                    const tile_px_n: usize = x_n * y_n;
+                    const tile = SubPxTile(precision){
+                        .x_start = sub_samp_us * window.x_start,
+                        .y_start = sub_samp_us * window.y_start,
+                        .x_n = x_n,
+                        .y_n = y_n,
+                        .depth = worker.depth[0..tile_px_n],
+                        .image = worker.image[0..num_fields*tile_px_n],
+                    };
+                    @memset(tile.depth, 1e6);
+                    @memset(tile.image, 0.0);
+                    worker.depth_blocks.reset(precision, &tile);
+
+                    for (self.cache.elem_bounds, 0..) |*bound, bb| {
+                        // Cull by the sub-pixel bound as for binning to tiles
+                        const bound_x0: usize = sub_samp_us * bound.xi_min;
+                        const bound_y0: usize = sub_samp_us * bound.yi_min;
+                        if ((bound_x0 >= tile.x_start + tile.x_n) 
+                            or (bound_x0 + bound.bound_x_n <= tile.x_start)
+                            or (bound_y0 >= tile.y_start + tile.y_n) 
+                            or (bound_y0 + bound.bound_y_n <= tile.y_start)) {
+                            continue;
+                        }
+
+                        if (self.opts.early_depth) {
+                            if (worker.depth_blocks.occludes(precision, bound, 
+                                                             self.camera.sub_sample, 
+                                                             &tile)) {
+                                worker.elems_rejected += 1;
+                                continue;
+                            }
+                            worker.depth_blocks.markWritten(precision, bound, 
+                                                            self.camera.sub_sample, 
+                                                            &tile);
+                        }
+
+                        self.cache.gatherNodes(self.connect, bound.elem_ind, 
+                                               worker.scratch.nodes);
+                        const elem_field = elemField(bb, bound, self.connect, 
+                                                     &field_view, self.frame_ind,
+                                                     self.elem_fields,
+                                                     &worker.scratch);
+
+                        try rasterElem(precision,
+                                       bound,
+                                       worker.scratch.nodes,
+                                       elem_field,
+                                       self.camera.sub_sample,
+                                       self.opts.raster_mode,
+                                       &tile,
+                                       &worker.scratch);
+                    }
+
+                    const image_out = &self.images_out[ww];
+                    const px_n: usize = window.x_n * window.y_n;
+                    for (0..num_fields) |ff| {
+                        const tile_mat = try MatSlice(precision.ImageFloat()).init(
+                            tile.image[ff*tile_px_n..(ff+1)*tile_px_n], y_n, x_n);
+                        var image_mat = try MatSlice(f64).init(
+                            image_out.elems[ff*px_n..(ff+1)*px_n], 
+                            window.y_n, window.x_n);
+                        averageImage(precision.ImageFloat(), &tile_mat, 
+                                     self.camera.sub_sample, &image_mat);
+                    }
+                }
+            }
+        };
+    }
+
+    fn rasterWindowsTyped(comptime precision: SubPxPrecision,
+                          allocator: std.mem.Allocator,
+                          arena_alloc: std.mem.Allocator,
+                          frame_ind: usize, 
+                          cache: *const RasterCache, 
+                          connect: *const Connect, 
+                          field: *const Field, 
+                          camera: *const Camera, 
+                          opts: RasterOpts,
+                          elem_fields: []const f64,
+                          windows: []const PixelWindow,
+                          images_out: []NDArray(f64)) !void {
+
+        const num_fields: usize = field.getFieldsN();
+        const sub_samp_us: usize = @as(usize, camera.sub_sample);
+        var x_max: usize = 0;
+        var y_max: usize = 0;
+        var px_max: usize = 0;
+        for (windows) |window| {
+            x_max = @max(x_max, sub_samp_us * window.x_n);
+            y_max = @max(y_max, sub_samp_us * window.y_n);
+            px_max = @max(px_max, window.x_n * window.y_n);
+        }
+        const tile_px_n: usize = sub_samp_us * sub_samp_us * px_max;
+
+        // Worker buffers are allocated up front as the arena is not thread safe
+        const threads_n: usize = @max(1, @min(opts.threads_n, windows.len));
+        var workers = try arena_alloc.alloc(TileWorker(precision), threads_n);
+        for (0..threads_n) |ww| {
+            workers[ww] = .{
+                .depth = try arena_alloc.alloc(precision.DepthFloat(), tile_px_n),
+                .image = try arena_alloc.alloc(precision.ImageFloat(), 
+                                               num_fields*tile_px_n),
+                .image_px = &.{},
+                .scratch = try ElemScratch.init(arena_alloc, 
+                                                connect.nodes_per_elem, 
+                                                num_fields,
+                                                x_max),
+                .depth_blocks = try DepthBlocks.init(arena_alloc, x_max, y_max),
+            };
+        }
+
+        var window_raster = WindowRaster(precision){
+            .frame_ind = frame_ind,
+            .connect = connect,
+            .field = field,
+            .camera = camera,
+            .opts = opts,
+            .cache = cache,
+            .elem_fields = elem_fields,
+            .windows = windows,
+            .images_out = images_out,
+        };
+
+        if (threads_n == 1) {
+            window_raster.work(&workers[0]);
+        } else {
+            var pool: std.Thread.Pool = undefined;
+            try pool.init(.{ .allocator = allocator, .n_jobs = threads_n });
+            defer pool.deinit();
+
+            var wait_group: std.Thread.WaitGroup = .{};
+            for (workers) |*worker| {
+                pool.spawnWg(&wait_group, WindowRaster(precision).work, 
+                             .{&window_raster, worker});
+            }
+            pool.waitAndWork(&wait_group);
+        }
+
+        for (workers) |worker| {
+            if (worker.err) |err| {
+                return err;
+            }
+        }
+    }
+
+    // Per sub-pixel record of the element that wins the depth test along with
+    // its normalised barycentric weights and depth. For a static mesh and
+    // camera this is the same for every frame and field so it only needs to 
+    // be rastered once, after which each frame is shaded by a gather.
+    pub const VisBuffer = struct {
+        subpx_x: usize,
+        subpx_y: usize,
+        nodes_per_elem: usize,
+        elems: []usize,   // shape=(subpx_y,subpx_x)
+        weights: []f64,   // shape=(subpx_y,subpx_x,nodes_per_elem)
+        depth: []f64,     // shape=(subpx_y,subpx_x)
+        visible_n: usize = 0,
+
+        // Element index for sub-pixels with no element in them
+        pub const no_elem: usize = std.math.maxInt(usize);
+
+        const Self = @This();
+
+        pub fn init(allocator: std.mem.Allocator, 
+                    camera: *const Camera, 
+                    nodes_per_elem: usize) !Self {
+            const subpx_x: usize = @as(usize,camera.pixels_num[0]) 
+                                   * @as(usize,camera.sub_sample);
+            const subpx_y: usize = @as(usize,camera.pixels_num[1]) 
+                                   * @as(usize,camera.sub_sample);
+            const subpx_n: usize = subpx_x * subpx_y;
+
+            return .{
+                .subpx_x = subpx_x,
+                .subpx_y = subpx_y,
+                .nodes_per_elem = nodes_per_elem,
+                .elems = try allocator.alloc(usize, subpx_n),
+                .weights = try allocator.alloc(f64, subpx_n * nodes_per_elem),
+                .depth = try allocator.alloc(f64, subpx_n),
+            };
+        }
+
+        pub fn deinit(self: *Self, allocator: std.mem.Allocator) void {
+            allocator.free(self.elems);
+            allocator.free(self.weights);
+            allocator.free(self.depth);
+        }
+    };
+
+    // Runs the edge functions and depth test for all cached visible elements
+    // without touching the field. Returns the number of elements rastered.
+    pub fn rasterVisBuffer(allocator: std.mem.Allocator,
+                           cache: *const RasterCache,
+                           connect: *const Connect,
+                           camera: *const Camera,
+                           raster_mode: RasterMode,
+                           vis: *VisBuffer) !usize {
+
+        if (vis.nodes_per_elem != connect.nodes_per_elem) {
+            return RasterError.CacheSizeMismatch;
+        }
+
+        @memset(vis.elems, VisBuffer.no_elem);
+        @memset(vis.depth, 1e6);
+        @memset(vis.weights, 0.0);
+
+        const full_tile = SubPxTile(.f64){
+            .x_start = 0,
+            .y_start = 0,
+            .x_n = vis.subpx_x,
+            .y_n = vis.subpx_y,
+            .depth = vis.depth,
+            .image = &.{},
+            .vis_elems = vis.elems,
+            .vis_weights = vis.weights,
+        };
+
+        var arena = std.heap.ArenaAllocator.init(allocator);
+        defer arena.deinit();
+
+        var scratch = try ElemScratch.init(arena.allocator(), 
+                                           connect.nodes_per_elem, 
+                                           0,
+                                           vis.subpx_x);
+
+        for (cache.elem_bounds) |*bound| {
+            cache.gatherNodes(connect, bound.elem_ind, scratch.nodes);
+
+            try rasterElem(.f64, bound, scratch.nodes, null, camera.sub_sample, 
+                           raster_mode, &full_tile, &scratch);
+        }
+
+        vis.visible_n = cache.elem_bounds.len;
+        return vis.visible_n;
+    }
+
+    // Shades one frame from the visibility buffer, there are no edge functions
+    // or depth tests here only a gather and dot product per sub-pixel. The
+    // arithmetic is the same as rasterElem so the images match exactly.
+    fn shadeFrame(frame_ind: usize, 
+                  connect: *const Connect, 
+                  field: *const Field, 
+                  camera: *const Camera,
+                  vis: *const VisBuffer,
+                  buffs: *FrameBuffers,
+                  image_out_arr: *NDArray(f64)) !void {
+
+        switch (buffs.precision) {
+            inline else => |precision| try shadeFrameTyped(
+                precision, frame_ind, connect, field, camera, vis, buffs, 
+                image_out_arr),
+        }
+    }
+
+    fn shadeFrameTyped(comptime precision: SubPxPrecision,
+                       frame_ind: usize, 
+                       connect: *const Connect, 
+                       field: *const Field, 
+                       camera: *const Camera,
+                       vis: *const VisBuffer,
+                       buffs: *FrameBuffers,
+                       image_out_arr: *NDArray(f64)) !void {
+
+        const num_fields: usize = field.getFieldsN();
+        const nodes_per_elem: usize = connect.nodes_per_elem;
+        const subpx_n: usize = vis.subpx_x * vis.subpx_y;
+        const image_subpx = buffs.imageSubPx(precision);
+        const field_mat = &buffs.scratch.field_mat;
+
+        if (frame_ind >= field.getTimeN()) {
+            return RasterError.FrameOutOfRange;
+        }
+        const field_view = field.view3();
+
+        @memset(image_subpx, 0.0);
+
+        for (0..subpx_n) |pp| {
+            const elem_ind: usize = vis.elems[pp];
+            if (elem_ind == VisBuffer.no_elem) {
+                continue;
+            }
+
+            const coord_inds: []Connect.Index = connect.getElem(elem_ind);
+            const weights: []const f64 = 
+                vis.weights[pp*nodes_per_elem..(pp+1)*nodes_per_elem];
+
+            for (0..nodes_per_elem) |nn| {
+                for (0..num_fields) |ff| {
+                    field_mat.set(ff,nn,field_view.at(.{ frame_ind, coord_inds[nn], ff }));
+                }
+            }
+
+            for (0..num_fields) |ff| {
+                const field_slice = field_mat.getRow(ff);
+                var px_field: f64 = sliceops.dot(f64, field_slice, weights);
+                px_field = px_field * vis.depth[pp];
+
+                image_subpx[ff*subpx_n + pp] = @floatCast(px_field);
+            }
+        }
+
+        try resolveFrame(precision, buffs, camera, image_out_arr);
+    }
+
+    pub fn shadeOneFrame(allocator: std.mem.Allocator, 
+                         frame_ind: usize, 
+                         connect: *const Connect, 
+                         field: *const Field, 
+                         camera: *const Camera, 
+                         vis: *const VisBuffer,
+                         image_out_arr: *NDArray(f64)) !void {
+
+        var arena = std.heap.ArenaAllocator.init(allocator);
+        defer arena.deinit();
+        const arena_alloc = arena.allocator();
+
+        var buffs = try FrameBuffers.init(arena_alloc, 
+                                          camera, 
+                                          field.getFieldsN(), 
+                                          connect.nodes_per_elem,
+                                          .f64,
+                                          true);
+
+        try shadeFrame(frame_ind, connect, field, camera, vis, &buffs, 
+                       image_out_arr);
+    }
+
+    const FrameWorker = struct {
+        buffs: FrameBuffers,
+        // Only used to raster a deformed mesh, each worker projects its own
+        // displaced coords every frame
+        coords_def: Coords,
+        cache: RasterCache,
+        // Frame is rastered here if no sink gives out storage for it
+        image: []f64,
+        arena: std.heap.ArenaAllocator,
+        frames_n: usize = 0,
+        time_raster: f64 = 0.0,
+        err: ?anyerror = null,
+    };
+
+    const FrameRaster = struct {
+        allocator: std.mem.Allocator,
+        // Every finished frame is pushed to all of these
+        sinks: []const FrameSink,
+        coords: *const Coords,
+        cache: *const RasterCache,
+        // Frames are shaded from this instead of rastered if it is set
+        vis: ?*const VisBuffer,
+        connect: *const Connect,
+        field: *const Field,
+        camera: *const Camera,
+        opts: RasterOpts,
+        // Time steps to raster, each frame has dims [field,px_y,px_x]
+        frame_inds: []const usize,
+        frame_dims: []usize,
+        frame_next: std.atomic.Value(usize) = std.atomic.Value(usize).init(0),
+
+        fn work(self: *FrameRaster, worker: *FrameWorker) void {
+            self.rasterFrames(worker) catch |err| {
+                worker.err = err;
+            };
+        }
+
+        fn rasterFrames(self: *FrameRaster, worker: *FrameWorker) !void {
+            while (true) {
+                const ii = self.frame_next.fetchAdd(1, .monotonic);
+                if (ii >= self.frame_inds.len) {
+                    break;
+                }
+                const tt: usize = self.frame_inds[ii];
+
+                const time_start = try Instant.now();
+
+                // The arena only holds the tiled element bins and element
+                // field buffer of the last frame
+                _ = worker.arena.reset(.retain_capacity);
+
+                // Raster straight into a sink's storage if one has it
+                var frame_elems: []f64 = worker.image;
+                for (self.sinks) |sink| {
+                    if (sink.frameSlot(ii)) |slot| {
+                        frame_elems = slot;
+                        break;
+                    }
+                }
+                var frame_arr = try NDArray(f64).init(worker.arena.allocator(),
+                                                      frame_elems,
+                                                      self.frame_dims);
+                const images_arr = &frame_arr;
+
+                if (self.vis) |vis| {
+                    try shadeFrame(tt, self.connect, self.field, self.camera,
+                                   vis, &worker.buffs, images_arr);
+                } else if (self.opts.disp_fields != null) {
+                    try updateFrameCache(tt, self.coords, self.connect, 
+                                         self.field, self.camera, self.opts, 
+                                         &worker.coords_def, &worker.cache);
+                    try rasterFrame(self.allocator, worker.arena.allocator(), tt, 
+                                    &worker.cache, self.connect, self.field, 
+                                    self.camera, self.opts, &worker.buffs, 
+                                    images_arr);
+                } else {
+                    try rasterFrame(self.allocator, worker.arena.allocator(), tt, 
+                                    self.cache, self.connect, self.field, 
+                                    self.camera, self.opts, &worker.buffs, 
+                                    images_arr);
+                }
+
+                for (self.sinks) |sink| {
+                    try sink.push(ii, tt, frame_elems);
+                }
+
+                const time_end = try Instant.now();
+                const time_raster: f64 = @floatFromInt(time_end.since(time_start));
+                worker.time_raster += time_raster;
+                worker.frames_n += 1;
+
+                if (self.opts.verbose) {
+                    print("Frame {}, raster time = {d:.3}ms\n", 
+                          .{ tt, time_raster / time.ns_per_ms });
+                }
+            }
+        }
+    };
+
     pub fn rasterAllFrames(allocator: std.mem.Allocator, 
                            out_dir: std.fs.Dir, 
                            coords: *const Coords, 
                            connect: *const Connect, 
                            field: *const Field, 
-                           camera: *const Camera) !NDArray(f64) {
+                           camera: *const Camera,
+                           opts: RasterOpts) !NDArray(f64) {
 
         // We allocate all temporary buffers on our arena so no need to defer
         // free any temporary buffers in this function
@@ -494,6 +2613,7 @@ pub const Raster = struct {
         // We are going to return this so we use the input allocator instead of
         // the arena.
         const frame_arr_mem = try allocator.alloc(f64, frame_arr_size);
+        errdefer allocator.free(frame_arr_mem);
 
 		// This is duped and heap allocated inside the NDArray.init so NDArray
 		// is safe to return from this function
@@ -507,61 +2627,1450 @@ pub const Raster = struct {
         var frame_arr = try NDArray(f64).init(allocator, 
                                               frame_arr_mem, 
                                               frame_arr_dims[0..]);
+        errdefer frame_arr.deinit(allocator);
+
+        const frame_inds = try arena_alloc.alloc(usize, num_time);
+        for (0..num_time) |tt| {
+            frame_inds[tt] = tt;
+        }
 
-        const image_stride: usize = frame_arr.strides[0];
-        var image_inds = [_]usize{ 0, 0, 0 ,0}; // frame,field,px_y,px_x
-		var field_inds = [_]usize{0,0,0}; // field,px_y_px_x
+        var memory_sink = framesink.MemorySink.init(&frame_arr);
+        var csv_sink = framesink.CsvSink.init(out_dir);
+        const sinks = [_]FrameSink{ memory_sink.frameSink(), 
+                                    csv_sink.frameSink() };
 
-        var time_start = try Instant.now();
-        var time_end = try Instant.now();
-        var time_raster: f64 = 0.0;
+        try rasterFramesSinks(allocator, frame_inds, coords, connect, field, 
+                              camera, opts, null, sinks[0..]);
 
-        var name_buff: [1024]u8 = undefined;
+        return frame_arr;
+    }
 
-        print("Starting rastering frames.\n", .{});
+    // Rasters every time step and pushes each frame to the sinks as it is 
+    // finished, no frames are kept here. See framesink.zig for the sinks.
+    pub fn rasterAllFramesToSinks(allocator: std.mem.Allocator, 
+                                  coords: *const Coords, 
+                                  connect: *const Connect, 
+                                  field: *const Field, 
+                                  camera: *const Camera,
+                                  opts: RasterOpts,
+                                  sinks: []const FrameSink) !void {
 
+        const num_time: usize = field.getTimeN();
+        const frame_inds = try allocator.alloc(usize, num_time);
+        defer allocator.free(frame_inds);
         for (0..num_time) |tt| {
-            time_start = try Instant.now();
+            frame_inds[tt] = tt;
+        }
 
-            image_inds[0] = tt;
-            const start_ind = try frame_arr.getFlatInd(image_inds[0..]);
-            const end_ind = start_ind + image_stride;
+        try rasterFramesToSinks(allocator, frame_inds, coords, connect, field, 
+                                camera, opts, sinks);
+    }
+
+    // As rasterAllFramesToSinks for the time steps in frame_inds
+    pub fn rasterFramesToSinks(allocator: std.mem.Allocator, 
+                               frame_inds: []const usize,
+                               coords: *const Coords, 
+                               connect: *const Connect, 
+                               field: *const Field, 
+                               camera: *const Camera,
+                               opts: RasterOpts,
+                               sinks: []const FrameSink) !void {
+
+        for (frame_inds) |tt| {
+            if (tt >= field.getTimeN()) {
+                return RasterError.FrameOutOfRange;
+            }
+        }
+        if (frame_inds.len == 0) {
+            return;
+        }
+
+        try rasterFramesSinks(allocator, frame_inds, coords, connect, field, 
+                              camera, opts, null, sinks);
+    }
+
+    // Starts the sinks, rasters the frames into them and then ends every 
+    // sink even if rastering failed so files are closed and writer threads 
+    // are joined. The first error is returned.
+    fn rasterFramesSinks(allocator: std.mem.Allocator, 
+                         frame_inds: []const usize,
+                         coords: *const Coords, 
+                         connect: *const Connect, 
+                         field: *const Field, 
+                         camera: *const Camera,
+                         opts: RasterOpts,
+                         cache_in: ?*RasterCache,
+                         sinks: []const FrameSink) !void {
+
+        const dims = FrameDims{
+            .frames_n = frame_inds.len,
+            .fields_n = field.getFieldsN(),
+            .px_y = camera.pixels_num[1],
+            .px_x = camera.pixels_num[0],
+        };
+
+        for (sinks, 0..) |sink, ss| {
+            sink.begin(dims) catch |err| {
+                endSinks(sinks[0..ss]) catch {};
+                return err;
+            };
+        }
+
+        const raster_result = rasterFramesInto(allocator, frame_inds, coords, 
+                                               connect, field, camera, opts, 
+                                               cache_in, sinks);
+        const end_result = endSinks(sinks);
+        try raster_result;
+        try end_result;
+    }
 
-            const images_mem = frame_arr.elems[start_ind..end_ind];
-            // This is only temporary so we use our arena - the slice belongs to
-            // the larger NDArray we will return which is on the input allocator
-            var images_arr = try NDArray(f64).init(arena_alloc,
-                                                   images_mem, 
-            									   frame_arr_dims[1..]);
+    fn endSinks(sinks: []const FrameSink) !void {
+        var end_err: ?anyerror = null;
+        for (sinks) |sink| {
+            sink.end() catch |err| {
+                end_err = end_err orelse err;
+            };
+        }
+        if (end_err) |err| {
+            return err;
+        }
+    }
 
-            // This will create it's own arena for temporary storage so we pass
-            // through the input allocator for this.
-            try rasterOneFrame(allocator, tt, coords, connect, 
-                               field, camera, &images_arr);
+    // Rasters the given time steps and pushes each frame to the sinks, which
+    // must have been started. The projected nodes are kept in cache_in if it 
+    // is set so they can be reused by the next call with the same camera.
+    fn rasterFramesInto(allocator: std.mem.Allocator, 
+                        frame_inds: []const usize,
+                        coords: *const Coords, 
+                        connect: *const Connect, 
+                        field: *const Field, 
+                        camera: *const Camera,
+                        opts: RasterOpts,
+                        cache_in: ?*RasterCache,
+                        sinks: []const FrameSink) !void {
+
+        // The visibility buffer is only valid if the mesh does not move
+        if (opts.vis_buffer and (opts.disp_fields != null)) {
+            return RasterError.VisBufferDeformed;
+        }
 
+        // We allocate all temporary buffers on our arena so no need to defer
+        // free any temporary buffers in this function
+        var arena = std.heap.ArenaAllocator.init(allocator);
+        defer arena.deinit();
+        const arena_alloc = arena.allocator();
+
+        const num_fields: usize = field.getFieldsN();
+        const num_time: usize = frame_inds.len;
+
+        var frame_dims = [_]usize{ num_fields, 
+                                   camera.pixels_num[1], 
+                                   camera.pixels_num[0] };
+        const frame_len: usize = num_fields 
+                                 * camera.pixels_num[1] 
+                                 * camera.pixels_num[0];
+
+        // Workers only need their own frame buffer if no sink has storage
+        var worker_image_len: usize = frame_len;
+        for (sinks) |sink| {
+            if (sink.frameSlot(0) != null) {
+                worker_image_len = 0;
+                break;
+            }
+        }
+
+        // Frames are rastered serially within each worker when we parallelise
+        // over frames, otherwise tiles would oversubscribe the cores.
+        const frame_threads_n: usize = @max(1, @min(opts.frame_threads_n, num_time));
+        var frame_opts: RasterOpts = opts;
+        if (frame_threads_n > 1) {
+            frame_opts.threads_n = 1;
+        }
+
+        // Each worker owns a reusable set of sub-pixel buffers, plus coords
+        // and a cache for the deformed mesh if it changes every frame
+        const coords_def_n: usize = if (opts.disp_fields != null) coords.len else 0;
+        const connect_empty = Connect{ .nodes_per_elem = 0, .elem_n = 0, .table = &.{} };
+        const cache_connect: *const Connect = 
+            if (opts.disp_fields != null) connect else &connect_empty;
+
+        var workers = try arena_alloc.alloc(FrameWorker, frame_threads_n);
+        for (0..frame_threads_n) |ww| {
+            var coords_def = try Coords.init(arena_alloc, coords_def_n);
+            workers[ww] = .{
+                .buffs = try FrameBuffers.init(arena_alloc, camera, num_fields,
+                                               connect.nodes_per_elem,
+                                               opts.subpx_precision,
+                                               opts.vis_buffer 
+                                               or fullFrameBuffers(camera, opts)),
+                .coords_def = coords_def,
+                .cache = try RasterCache.init(arena_alloc, &coords_def, 
+                                              cache_connect),
+                .image = try arena_alloc.alloc(f64, worker_image_len),
+                .arena = std.heap.ArenaAllocator.init(allocator),
+            };
+        }
+
+        defer for (workers) |*worker| {
+            worker.arena.deinit();
+        };
+
+        // Nodes are projected once for all frames and shared read only
+        var cache_local: RasterCache = undefined;
+        const cache: *RasterCache = cache_in orelse blk: {
+            cache_local = try RasterCache.init(arena_alloc, coords, connect);
+            break :blk &cache_local;
+        };
+        if (opts.disp_fields == null) {
+            try updateCache(coords, connect, camera, opts, cache);
+        }
+
+        // The depth test is the same for every frame of a static mesh so we
+        // can raster it once up front and only shade in the frame loop
+        var vis: ?*const VisBuffer = null;
+        var vis_buffer: VisBuffer = undefined;
+        if (opts.vis_buffer) {
+            const time_vis_start = try Instant.now();
+
+            vis_buffer = try VisBuffer.init(arena_alloc, camera, 
+                                            connect.nodes_per_elem);
+            const elems_in_image = try rasterVisBuffer(allocator, cache, 
+                                                       connect, camera, 
+                                                       opts.raster_mode,
+                                                       &vis_buffer);
+            vis = &vis_buffer;
+
+            const time_vis_end = try Instant.now();
+            const time_vis: f64 = @floatFromInt(time_vis_end.since(time_vis_start));
+            if (opts.verbose) {
+                print("Visibility buffer, elems_in_image={}, raster time = {d:.3}ms\n",
+                      .{ elems_in_image, time_vis / time.ns_per_ms });
+            }
+        }
+
+        var frame_raster = FrameRaster{
+            .allocator = allocator,
+            .sinks = sinks,
+            .coords = coords,
+            .cache = cache,
+            .vis = vis,
+            .connect = connect,
+            .field = field,
+            .camera = camera,
+            .opts = frame_opts,
+            .frame_inds = frame_inds,
+            .frame_dims = frame_dims[0..],
+        };
+
+        if (opts.verbose) {
+            print("Starting rastering frames.\n", .{});
+        }
+        const time_start = try Instant.now();
+
+        if (frame_threads_n > 1) {
+            var pool: std.Thread.Pool = undefined;
+            try pool.init(.{ .allocator = allocator, .n_jobs = frame_threads_n });
+            defer pool.deinit();
+
+            var wait_group: std.Thread.WaitGroup = .{};
+            for (workers) |*worker| {
+                pool.spawnWg(&wait_group, FrameRaster.work, .{&frame_raster, worker});
+            }
+            pool.waitAndWork(&wait_group);
+        } else {
+            frame_raster.work(&workers[0]);
+        }
+
+        const time_end = try Instant.now();
+        const time_total: f64 = @floatFromInt(time_end.since(time_start));
+
+        var time_frames: f64 = 0.0;
+        for (workers) |worker| {
+            if (worker.err) |err| {
+                return err;
+            }
+            time_frames += worker.time_raster;
+        }
+
+        if (opts.verbose) {
+            print("Rastering complete.\n", .{});
+            print("Frames={}, workers={}, total raster time = {d:.3}ms\n",
+                  .{ num_time, frame_threads_n, time_total / time.ns_per_ms });
+            print("Summed frame time = {d:.3}ms, mean frame time = {d:.3}ms\n\n",
+                  .{ time_frames / time.ns_per_ms, 
+                     time_frames / @as(f64, @floatFromInt(num_time)) / time.ns_per_ms });
+        }
+    }
+
+    fn checkFramesOut(frame_inds: []const usize,
+                      field: *const Field, 
+                      camera: *const Camera,
+                      frames_out: *const NDArray(f64)) !void {
+        const frames_dims = [_]usize{ frame_inds.len,
+                                      field.getFieldsN(),
+                                      camera.pixels_num[1],
+                                      camera.pixels_num[0] };
+        if (!std.mem.eql(usize, frames_out.dims, frames_dims[0..])) {
+            return RasterError.OutputDimsMismatch;
+        }
+        for (frame_inds) |tt| {
+            if (tt >= field.getTimeN()) {
+                return RasterError.FrameOutOfRange;
+            }
+        }
+    }
+
+    // Rasters the time steps in frame_inds into frames_out which must have
+    // shape=(frame_inds.len,field_n,px_y,px_x). Nothing is saved to disk.
+    pub fn rasterFrames(allocator: std.mem.Allocator, 
+                        frame_inds: []const usize,
+                        coords: *const Coords, 
+                        connect: *const Connect, 
+                        field: *const Field, 
+                        camera: *const Camera,
+                        opts: RasterOpts,
+                        frames_out: *NDArray(f64)) !void {
+
+        try checkFramesOut(frame_inds, field, camera, frames_out);
+        if (frame_inds.len == 0) {
+            return;
+        }
+
+        var memory_sink = framesink.MemorySink.init(frames_out);
+        const sinks = [_]FrameSink{ memory_sink.frameSink() };
+        try rasterFramesSinks(allocator, frame_inds, coords, connect, field, 
+                              camera, opts, null, sinks[0..]);
+    }
+
+    // As rasterFrames but keeps the projected nodes in a cache owned by the
+    // caller, rendering the same mesh with the same camera again skips the 
+    // projection. The cache is not thread safe.
+    pub fn rasterFramesCached(allocator: std.mem.Allocator, 
+                              frame_inds: []const usize,
+                              coords: *const Coords, 
+                              connect: *const Connect, 
+                              field: *const Field, 
+                              camera: *const Camera,
+                              opts: RasterOpts,
+                              cache: *RasterCache,
+                              frames_out: *NDArray(f64)) !void {
+
+        try checkFramesOut(frame_inds, field, camera, frames_out);
+        if (frame_inds.len == 0) {
+            return;
+        }
+
+        var memory_sink = framesink.MemorySink.init(frames_out);
+        const sinks = [_]FrameSink{ memory_sink.frameSink() };
+        try rasterFramesSinks(allocator, frame_inds, coords, connect, field, 
+                              camera, opts, cache, sinks[0..]);
+    }
+
+    // Copies the field values of one time step into frame_field,
+    // shape=(1,coord_n,field_n), so they are read once and then contiguous
+    // for every view of the frame.
+    fn gatherFrameField(frame_ind: usize,
+                        field: *const Field,
+                        frame_field: *Field) !void {
+
+        const num_fields: usize = field.getFieldsN();
+        if ((frame_field.getCoordN() != field.getCoordN())
+            or (frame_field.getFieldsN() != num_fields)) {
+            return RasterError.CacheSizeMismatch;
+        }
+
+        // Fields may be views with any layout so we step by the strides
+        var frame_inds = [_]usize{frame_ind,0,0};
+        const frame_start: usize = try field.array.getFlatInd(frame_inds[0..]);
+        const coord_stride: usize = field.array.strides[1];
+        const field_stride: usize = field.array.strides[2];
+        const elems: []f64 = field.array.elems;
+        const frame_elems: []f64 = frame_field.array.elems;
+
+        for (0..field.getCoordN()) |nn| {
+            const field_start: usize = frame_start + nn*coord_stride;
             for (0..num_fields) |ff| {
-		    	const file_name = try std.fmt.bufPrint(name_buff[0..], 
-                                                   "raster_all_field{d}_frame{d}.csv", 
-                                                   .{ ff,tt });
+                frame_elems[nn*num_fields + ff] = elems[field_start + ff*field_stride];
+            }
+        }
+    }
 
-				field_inds[0] = ff;
-				const field_slice = try images_arr.getSlice(field_inds[0..],0);
-				
-			    const image_mat = try MatSlice(f64).init(field_slice,
-			                                             camera.pixels_num[1],
-			                                             camera.pixels_num[0]);
-            	try image_mat.saveCSV(out_dir, file_name);
-			}
-			
-            time_end = try Instant.now();
-            time_raster = @floatFromInt(time_end.since(time_start));
+    const ViewWorker = struct {
+        buffs: FrameBuffers,
+        cache: RasterCache,
+        arena: std.heap.ArenaAllocator,
+        err: ?anyerror = null,
+    };
+
+    const ViewRaster = struct {
+        allocator: std.mem.Allocator,
+        // Already displaced if the mesh is deformed
+        coords: *const Coords,
+        connect: *const Connect,
+        // Single time step gathered from the input field
+        frame_field: *const Field,
+        cameras: []const Camera,
+        opts: RasterOpts,
+        // One [field,px_y,px_x] array for each camera that views into the
+        // output array
+        view_images: []NDArray(f64),
+        view_next: std.atomic.Value(usize) = std.atomic.Value(usize).init(0),
+
+        fn work(self: *ViewRaster, worker: *ViewWorker) void {
+            self.rasterViews(worker) catch |err| {
+                worker.err = err;
+            };
+        }
 
-            print("Frame {}, raster time = {d:.3}ms\n", 
-                  .{ tt, time_raster / time.ns_per_ms });
+        fn rasterViews(self: *ViewRaster, worker: *ViewWorker) !void {
+            while (true) {
+                const vv = self.view_next.fetchAdd(1, .monotonic);
+                if (vv >= self.cameras.len) {
+                    break;
+                }
+                const camera = &self.cameras[vv];
+
+                _ = worker.arena.reset(.retain_capacity);
+                try updateCache(self.coords, self.connect, camera, self.opts, 
+                                &worker.cache);
+                try rasterFrame(self.allocator, worker.arena.allocator(), 0, 
+                                &worker.cache, self.connect, self.frame_field,
+                                camera, self.opts, &worker.buffs, 
+                                &self.view_images[vv]);
+            }
+        }
+    };
+
+    // Rasters one time step from each of the cameras into images_out with
+    // shape=(camera_n,field_n,px_y,px_x). All cameras must have the same pixel
+    // count and sub-sampling. The field values of the frame are gathered once
+    // and, if the mesh is deformed, the displaced coords are built once and
+    // shared by all views. Views are rastered in parallel using up to 
+    // opts.threads_n workers, each view is then rastered serially. A single
+    // camera uses the tiled raster as normal. The visibility buffer option is
+    // ignored as each view is only rastered once.
+    pub fn rasterFrameMultiCamera(allocator: std.mem.Allocator, 
+                                  frame_ind: usize, 
+                                  coords: *const Coords, 
+                                  connect: *const Connect, 
+                                  field: *const Field, 
+                                  cameras: []const Camera, 
+                                  opts: RasterOpts,
+                                  images_out: *NDArray(f64)) !void {
+
+        if (cameras.len == 0) {
+            return RasterError.OutputDimsMismatch;
+        }
+        const camera_ref: *const Camera = &cameras[0];
+        for (cameras[1..]) |camera| {
+            if (!std.meta.eql(camera.pixels_num, camera_ref.pixels_num)
+                or (camera.sub_sample != camera_ref.sub_sample)) {
+                return RasterError.CameraDimsMismatch;
+            }
         }
 
-        print("Rastering complete.\n\n", .{});
+        const num_fields: usize = field.getFieldsN();
+        const images_dims = [_]usize{ cameras.len,
+                                      num_fields,
+                                      camera_ref.pixels_num[1],
+                                      camera_ref.pixels_num[0] };
+        if (!std.mem.eql(usize, images_out.dims, images_dims[0..])) {
+            return RasterError.OutputDimsMismatch;
+        }
+        if (frame_ind >= field.getTimeN()) {
+            return RasterError.FrameOutOfRange;
+        }
 
-        return frame_arr;
+        // We allocate all temporary buffers on our arena so no need to defer
+        // free any temporary buffers in this function
+        var arena = std.heap.ArenaAllocator.init(allocator);
+        defer arena.deinit();
+        const arena_alloc = arena.allocator();
+
+        var frame_field = try Field.init(arena_alloc, 1, field.getCoordN(), 
+                                         num_fields);
+        try gatherFrameField(frame_ind, field, &frame_field);
+
+        var coords_view: *const Coords = coords;
+        var coords_def: Coords = undefined;
+        if (opts.disp_fields) |disp_fields| {
+            coords_def = try Coords.init(arena_alloc, coords.len);
+            try deformCoords(frame_ind, coords, field, disp_fields, 
+                             opts.disp_scale, &coords_def);
+            coords_view = &coords_def;
+        }
+
+        // Each view writes straight into its slice of the output array
+        const image_stride: usize = images_out.strides[0];
+        const view_images = try arena_alloc.alloc(NDArray(f64), cameras.len);
+        for (0..cameras.len) |vv| {
+            const start_ind: usize = vv * image_stride;
+            view_images[vv] = try NDArray(f64).init(arena_alloc,
+                                                    images_out.elems[start_ind..start_ind+image_stride], 
+                                                    images_out.dims[1..]);
+        }
+
+        const view_threads_n: usize = @max(1, @min(opts.threads_n, cameras.len));
+        var view_opts: RasterOpts = opts;
+        if (opts.disp_fields != null) {
+            view_opts.elem_index = null;
+        }
+        if (view_threads_n > 1) {
+            view_opts.threads_n = 1;
+        }
+
+        var workers = try arena_alloc.alloc(ViewWorker, view_threads_n);
+        for (0..view_threads_n) |ww| {
+            workers[ww] = .{
+                .buffs = try FrameBuffers.init(arena_alloc, camera_ref, num_fields,
+                                               connect.nodes_per_elem,
+                                               opts.subpx_precision,
+                                               fullFrameBuffers(camera_ref, opts)),
+                .cache = try RasterCache.init(arena_alloc, coords, connect),
+                .arena = std.heap.ArenaAllocator.init(allocator),
+            };
+        }
+
+        defer for (workers) |*worker| {
+            worker.arena.deinit();
+        };
+
+        var view_raster = ViewRaster{
+            .allocator = allocator,
+            .coords = coords_view,
+            .connect = connect,
+            .frame_field = &frame_field,
+            .cameras = cameras,
+            .opts = view_opts,
+            .view_images = view_images,
+        };
+
+        if (view_threads_n > 1) {
+            var pool: std.Thread.Pool = undefined;
+            try pool.init(.{ .allocator = allocator, .n_jobs = view_threads_n });
+            defer pool.deinit();
+
+            var wait_group: std.Thread.WaitGroup = .{};
+            for (workers) |*worker| {
+                pool.spawnWg(&wait_group, ViewRaster.work, .{&view_raster, worker});
+            }
+            pool.waitAndWork(&wait_group);
+        } else {
+            view_raster.work(&workers[0]);
+        }
+
+        for (workers) |worker| {
+            if (worker.err) |err| {
+                return err;
+            }
+        }
     }
 };
+
+//------------------------------------------------------------------------------
+const testing = std.testing;
+const expect = testing.expect;
+const expectEqualSlices = testing.expectEqualSlices;
+const Rotation = @import("rotation.zig").Rotation;
+
+// Two overlapping triangulated planes, the front plane is smaller and offset so
+// the depth test and tile borders are both exercised.
+const TestMesh = struct {
+    coords: Coords,
+    connect: Connect,
+    field: Field,
+    camera: Camera,
+
+    const grid_n: usize = 6;
+    const time_n: usize = 2;
+    const fields_n: usize = 2;
+
+    fn init(allocator: std.mem.Allocator) !TestMesh {
+        const plane_nodes_n: usize = grid_n * grid_n;
+        const plane_elems_n: usize = 2 * (grid_n - 1) * (grid_n - 1);
+
+        var coords = try Coords.init(allocator, 2 * plane_nodes_n);
+        const planes_half = [_]f64{ 5.0, 2.5 };
+        const planes_shift = [_]f64{ 0.0, 1.3 };
+        const planes_z = [_]f64{ 0.0, 2.0 };
+
+        for (0..2) |pp| {
+            const step: f64 = 2.0 * planes_half[pp] / @as(f64, @floatFromInt(grid_n - 1));
+            for (0..grid_n) |jj| {
+                for (0..grid_n) |ii| {
+                    const nn: usize = pp * plane_nodes_n + jj * grid_n + ii;
+                    coords.x[nn] = -planes_half[pp] + planes_shift[pp] 
+                                   + step * @as(f64, @floatFromInt(ii));
+                    coords.y[nn] = -planes_half[pp] + planes_shift[pp] 
+                                   + step * @as(f64, @floatFromInt(jj));
+                    coords.z[nn] = planes_z[pp];
+                }
+            }
+        }
+
+        const table = try allocator.alloc(Connect.Index, 3 * 2 * plane_elems_n);
+        var ee: usize = 0;
+        for (0..2) |pp| {
+            const offset: usize = pp * plane_nodes_n;
+            for (0..grid_n - 1) |jj| {
+                for (0..grid_n - 1) |ii| {
+                    const n0: Connect.Index = @intCast(offset + jj * grid_n + ii);
+                    const row: Connect.Index = @intCast(grid_n);
+                    const tris = [_]Connect.Index{ n0, n0 + 1, n0 + row, 
+                                                   n0 + 1, n0 + row + 1, n0 + row };
+                    @memcpy(table[3 * ee .. 3 * ee + 6], tris[0..]);
+                    ee += 2;
+                }
+            }
+        }
+
+        const connect = Connect{
+            .nodes_per_elem = 3,
+            .elem_n = 2 * plane_elems_n,
+            .table = table,
+        };
+
+        var field = try Field.init(allocator, time_n, coords.len, fields_n);
+        var inds = [_]usize{ 0, 0, 0 };
+        for (0..time_n) |tt| {
+            for (0..coords.len) |nn| {
+                inds[0] = tt;
+                inds[1] = nn;
+                inds[2] = 0;
+                try field.array.set(inds[0..], coords.x[nn] 
+                                    + @as(f64, @floatFromInt(tt)));
+                inds[2] = 1;
+                try field.array.set(inds[0..], coords.x[nn] * coords.y[nn] 
+                                    - coords.z[nn]);
+            }
+        }
+
+        const pos_arr = [_]f64{ 0.0, 0.0, 100.0 };
+        const roi_arr = [_]f64{ 0.0, 0.0, 0.0 };
+        const camera = Camera.init([_]u32{ 52, 40 }, 
+                                   [_]f64{ 0.1, 0.1 }, 
+                                   Vec3f.initSlice(&pos_arr), 
+                                   Rotation.init(0.0, 0.0, 0.0), 
+                                   Vec3f.initSlice(&roi_arr), 
+                                   50.0, 
+                                   2);
+
+        return .{
+            .coords = coords,
+            .connect = connect,
+            .field = field,
+            .camera = camera,
+        };
+    }
+
+    fn initImages(self: *const TestMesh, allocator: std.mem.Allocator) !NDArray(f64) {
+        const images_mem = try allocator.alloc(f64, fields_n
+                                                    * self.camera.pixels_num[1]
+                                                    * self.camera.pixels_num[0]);
+        @memset(images_mem, 0.0);
+        var images_dims = [_]usize{ fields_n,
+                                    self.camera.pixels_num[1],
+                                    self.camera.pixels_num[0] };
+        return try NDArray(f64).init(allocator, images_mem, images_dims[0..]);
+    }
+};
+
+test "Raster.rasterOneFrame tiled matches serial" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    const mesh = try TestMesh.init(talloc);
+
+    var images_serial = try mesh.initImages(talloc);
+    try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                              &mesh.field, &mesh.camera, .{}, &images_serial);
+
+    try expect(std.mem.max(f64, images_serial.elems) > 0.0);
+
+    // Odd tile size so tiles do not line up with pixels or the image edge
+    const tiled_opts = [_]RasterOpts{
+        .{ .threads_n = 3, .tile_size = 7 },
+        .{ .threads_n = 4, .tile_size = 64 },
+        .{ .threads_n = 2, .tile_size = 1 },
+    };
+
+    for (tiled_opts) |opts| {
+        var images_tiled = try mesh.initImages(talloc);
+        try Raster.rasterOneFrame(testing.allocator, 1, &mesh.coords, 
+                                  &mesh.connect, &mesh.field, &mesh.camera, 
+                                  opts, &images_tiled);
+
+        try expectEqualSlices(f64, images_serial.elems, images_tiled.elems);
+    }
+}
+
+test "Raster tile resolve matches full sub-pixel resolve" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    const mesh = try TestMesh.init(talloc);
+
+    // Tile size 7 is rounded up to whole pixels
+    const resolve_opts = [_]RasterOpts{
+        .{ .tile_resolve = true },
+        .{ .tile_resolve = true, .threads_n = 3, .tile_size = 7 },
+        .{ .tile_resolve = true, .threads_n = 2, .early_depth = true, 
+           .subpx_precision = .f32 },
+    };
+
+    for (resolve_opts) |opts| {
+        var full_opts = opts;
+        full_opts.tile_resolve = false;
+
+        var images_full = try mesh.initImages(talloc);
+        try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                                  &mesh.field, &mesh.camera, full_opts, 
+                                  &images_full);
+        try expect(std.mem.max(f64, images_full.elems) > 0.0);
+
+        var images_tile = try mesh.initImages(talloc);
+        // Resolved tiles must overwrite every pixel
+        images_tile.fill(-1.0);
+        try Raster.rasterOneFrame(testing.allocator, 1, &mesh.coords, 
+                                  &mesh.connect, &mesh.field, &mesh.camera, 
+                                  opts, &images_tile);
+
+        try expectEqualSlices(f64, images_full.elems, images_tile.elems);
+    }
+
+    const frames_full = try Raster.rasterAllFrames(talloc, tmp_dir.dir, 
+                                                   &mesh.coords, &mesh.connect, 
+                                                   &mesh.field, &mesh.camera, 
+                                                   .{});
+    const frames_tile = try Raster.rasterAllFrames(talloc, tmp_dir.dir, 
+                                                   &mesh.coords, &mesh.connect, 
+                                                   &mesh.field, &mesh.camera, 
+                                                   .{ .tile_resolve = true,
+                                                      .frame_threads_n = 2 });
+    try expectEqualSlices(f64, frames_full.elems, frames_tile.elems);
+}
+
+test "Raster adaptive sampling matches uniform sampling" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var mesh = try TestMesh.init(talloc);
+    mesh.camera.sub_sample = 4;
+
+    // With no tolerance every tile with a field gradient is re-sampled, so
+    // only background tiles keep their pixel samples and these are exact
+    const exact_opts = [_]RasterOpts{
+        .{ .adaptive_sample = true, .adaptive_tol = 0.0 },
+        .{ .adaptive_sample = true, .adaptive_tol = 0.0, .threads_n = 3, 
+           .tile_size = 7, .early_depth = true },
+        .{ .adaptive_sample = true, .adaptive_tol = 0.0, .subpx_precision = .f32,
+           .elem_field_buffer = true },
+    };
+
+    for (exact_opts) |opts| {
+        var uniform_opts = opts;
+        uniform_opts.adaptive_sample = false;
+
+        var images_uniform = try mesh.initImages(talloc);
+        try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                                  &mesh.field, &mesh.camera, uniform_opts, 
+                                  &images_uniform);
+
+        var images_adaptive = try mesh.initImages(talloc);
+        images_adaptive.fill(-1.0);
+        try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                                  &mesh.field, &mesh.camera, opts, 
+                                  &images_adaptive);
+
+        try expectEqualSlices(f64, images_uniform.elems, images_adaptive.elems);
+    }
+
+    // The fields are linear over each element so pixels that are not
+    // re-sampled are within the tolerance
+    var images_uniform = try mesh.initImages(talloc);
+    try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                              &mesh.field, &mesh.camera, .{}, &images_uniform);
+
+    const adaptive_tol: f64 = 0.05;
+    var images_adaptive = try mesh.initImages(talloc);
+    try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                              &mesh.field, &mesh.camera, 
+                              .{ .adaptive_sample = true, 
+                                 .adaptive_tol = adaptive_tol, 
+                                 .tile_size = 8 }, 
+                              &images_adaptive);
+
+    const image_n: usize = images_uniform.elems.len / TestMesh.fields_n;
+    var pixels_diff: usize = 0;
+    for (0..TestMesh.fields_n) |ff| {
+        const image_ref = images_uniform.elems[ff*image_n..(ff+1)*image_n];
+        const image = images_adaptive.elems[ff*image_n..(ff+1)*image_n];
+        const field_range: f64 = std.mem.max(f64, image_ref) 
+                                 - std.mem.min(f64, image_ref);
+        for (image_ref, image) |px_ref, px| {
+            try expect(@abs(px - px_ref) <= adaptive_tol * field_range);
+            pixels_diff += @intFromBool(px != px_ref);
+        }
+    }
+    try expect(pixels_diff > 0);
+}
+
+test "Raster.rasterWindows matches the full image" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    const mesh = try TestMesh.init(talloc);
+    const px_x: usize = mesh.camera.pixels_num[0];
+    const px_y: usize = mesh.camera.pixels_num[1];
+
+    // Overlapping windows, one on the bottom right corner, a single pixel 
+    // and the whole image
+    const windows = [_]PixelWindow{
+        .{ .x_start = 10, .y_start = 5, .x_n = 17, .y_n = 11 },
+        .{ .x_start = 20, .y_start = 12, .x_n = 32, .y_n = 28 },
+        .{ .x_start = 31, .y_start = 9, .x_n = 1, .y_n = 1 },
+        .{ .x_start = 0, .y_start = 0, .x_n = px_x, .y_n = px_y },
+    };
+
+    const window_opts = [_]RasterOpts{
+        .{},
+        .{ .threads_n = 3, .early_depth = true, .raster_mode = .hierarchical },
+        .{ .subpx_precision = .f32, .elem_field_buffer = true, .depth_sort = true },
+    };
+
+    for (window_opts) |opts| {
+        var images_full = try mesh.initImages(talloc);
+        try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                                  &mesh.field, &mesh.camera, opts, &images_full);
+
+        var images_win: [windows.len]NDArray(f64) = undefined;
+        for (windows, &images_win) |window, *image_win| {
+            var dims = [_]usize{ TestMesh.fields_n, window.y_n, window.x_n };
+            image_win.* = try NDArray(f64).init(
+                talloc, 
+                try talloc.alloc(f64, TestMesh.fields_n * window.y_n * window.x_n), 
+                dims[0..]);
+            image_win.fill(-1.0);
+        }
+        try Raster.rasterWindows(talloc, 1, &mesh.coords, &mesh.connect, 
+                                 &mesh.field, &mesh.camera, opts, 
+                                 windows[0..], images_win[0..]);
+
+        for (windows, images_win) |window, image_win| {
+            for (0..TestMesh.fields_n) |ff| {
+                for (0..window.y_n) |yy| {
+                    const full_start: usize = (ff*px_y + window.y_start + yy)*px_x 
+                                              + window.x_start;
+                    const win_start: usize = (ff*window.y_n + yy)*window.x_n;
+                    try expectEqualSlices(f64, 
+                        images_full.elems[full_start..full_start + window.x_n],
+                        image_win.elems[win_start..win_start + window.x_n]);
+                }
+            }
+        }
+    }
+
+    var image_bad = [_]NDArray(f64){ try mesh.initImages(talloc) };
+    const windows_bad = [_]PixelWindow{ .{ .x_start = 1, .y_start = 0, 
+                                           .x_n = px_x, .y_n = px_y } };
+    try testing.expectError(RasterError.WindowOutOfRange,
+                            Raster.rasterWindows(talloc, 1, &mesh.coords, 
+                                                 &mesh.connect, &mesh.field, 
+                                                 &mesh.camera, .{}, 
+                                                 windows_bad[0..], image_bad[0..]));
+    try testing.expectError(RasterError.OutputDimsMismatch,
+                            Raster.rasterWindows(talloc, 1, &mesh.coords, 
+                                                 &mesh.connect, &mesh.field, 
+                                                 &mesh.camera, .{}, 
+                                                 windows[0..1], image_bad[0..]));
+}
+
+test "Raster.rasterAllFrames frame parallel matches serial" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    const mesh = try TestMesh.init(talloc);
+
+    const frames_serial = try Raster.rasterAllFrames(talloc, tmp_dir.dir, 
+                                                     &mesh.coords, &mesh.connect, 
+                                                     &mesh.field, &mesh.camera, 
+                                                     .{});
+
+    const frames_par = try Raster.rasterAllFrames(talloc, tmp_dir.dir, 
+                                                  &mesh.coords, &mesh.connect, 
+                                                  &mesh.field, &mesh.camera, 
+                                                  .{ .frame_threads_n = 3 });
+
+    try expectEqualSlices(usize, frames_serial.dims, frames_par.dims);
+    try expectEqualSlices(f64, frames_serial.elems, frames_par.elems);
+
+    // Each frame must match rastering it on its own
+    var image_inds = [_]usize{ 0, 0, 0, 0 };
+    for (0..TestMesh.time_n) |tt| {
+        var images_one = try mesh.initImages(talloc);
+        try Raster.rasterOneFrame(talloc, tt, &mesh.coords, &mesh.connect, 
+                                  &mesh.field, &mesh.camera, .{}, &images_one);
+
+        image_inds[0] = tt;
+        const frame_slice = try frames_par.getSlice(image_inds[0..], 0);
+        try expectEqualSlices(f64, images_one.elems, frame_slice);
+    }
+}
+
+test "Raster.rasterAllFramesToSinks matches rasterAllFrames" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    const mesh = try TestMesh.init(talloc);
+
+    const frames_ref = try Raster.rasterAllFrames(talloc, tmp_dir.dir, 
+                                                  &mesh.coords, &mesh.connect, 
+                                                  &mesh.field, &mesh.camera, 
+                                                  .{});
+
+    // Raw file written on the background thread plus a mapped stack that
+    // frames are rastered straight into
+    var file_sink = framesink.FileSink.init(tmp_dir.dir, "frames.raw", .raw);
+    var threaded_sink = framesink.ThreadedSink.init(testing.allocator, 
+                                                    file_sink.frameSink(), 2);
+    defer threaded_sink.deinit();
+    var stack_sink = framesink.MmapStackSink.init(tmp_dir.dir, "stack.raw", 
+                                                  false);
+    var null_sink = framesink.NullSink{};
+
+    const sinks = [_]FrameSink{ threaded_sink.frameSink(), 
+                                stack_sink.frameSink(),
+                                null_sink.frameSink() };
+    try Raster.rasterAllFramesToSinks(testing.allocator, &mesh.coords, 
+                                      &mesh.connect, &mesh.field, 
+                                      &mesh.camera, .{ .frame_threads_n = 3 }, 
+                                      sinks[0..]);
+    try expect(null_sink.frames_n.load(.monotonic) == TestMesh.time_n);
+
+    const frames_file = try talloc.alloc(f64, frames_ref.elems.len);
+    for ([_][]const u8{ "frames.raw", "stack.raw" }) |path| {
+        const file = try tmp_dir.dir.openFile(path, .{});
+        defer file.close();
+        const read_n = try file.preadAll(std.mem.sliceAsBytes(frames_file), 0);
+        try expect(read_n == frames_ref.elems.len * @sizeOf(f64));
+        try expectEqualSlices(f64, frames_ref.elems, frames_file);
+    }
+}
+
+test "Raster.RasterCache rebuilds on camera change" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var mesh = try TestMesh.init(talloc);
+    var cache = try Raster.RasterCache.init(talloc, &mesh.coords, &mesh.connect);
+
+    var images_cached = try mesh.initImages(talloc);
+    var images_ref = try mesh.initImages(talloc);
+
+    try Raster.rasterOneFrameCached(talloc, 0, &mesh.coords, &mesh.connect, 
+                                    &mesh.field, &mesh.camera, .{}, &cache, 
+                                    &images_cached);
+    try Raster.rasterOneFrame(talloc, 0, &mesh.coords, &mesh.connect, 
+                              &mesh.field, &mesh.camera, .{}, &images_ref);
+    try expectEqualSlices(f64, images_ref.elems, images_cached.elems);
+
+    var visible_n: usize = 0;
+    for (cache.elem_visible) |visible| {
+        if (visible) visible_n += 1;
+    }
+    try expect(visible_n == cache.elem_bounds.len);
+
+    // Moving the camera must invalidate the projected nodes
+    const x_before: f64 = cache.x[0];
+    const pos_arr = [_]f64{ 1.5, 0.0, 100.0 };
+    mesh.camera = Camera.init(mesh.camera.pixels_num, 
+                              mesh.camera.pixels_size, 
+                              Vec3f.initSlice(&pos_arr), 
+                              mesh.camera.rot_world, 
+                              mesh.camera.roi_cent_world, 
+                              mesh.camera.focal_length, 
+                              mesh.camera.sub_sample);
+
+    try Raster.rasterOneFrameCached(talloc, 1, &mesh.coords, &mesh.connect, 
+                                    &mesh.field, &mesh.camera, .{ .threads_n = 3 }, 
+                                    &cache, &images_cached);
+    try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                              &mesh.field, &mesh.camera, .{}, &images_ref);
+    try expect(cache.x[0] != x_before);
+    try expectEqualSlices(f64, images_ref.elems, images_cached.elems);
+
+    const connect_empty = Connect{
+        .nodes_per_elem = 3,
+        .elem_n = 0,
+        .table = &.{},
+    };
+    try testing.expectError(RasterError.CacheSizeMismatch, 
+                            cache.update(&mesh.coords, &connect_empty, 
+                                         &mesh.camera));
+}
+
+test "Raster element index matches full cache update" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var mesh = try TestMesh.init(talloc);
+    const elem_index = try ElemBVH.init(talloc, &mesh.coords, &mesh.connect);
+
+    var cache_full = try Raster.RasterCache.init(talloc, &mesh.coords, 
+                                                 &mesh.connect);
+    var cache_index = try Raster.RasterCache.init(talloc, &mesh.coords, 
+                                                  &mesh.connect);
+
+    // Whole mesh in view, zoomed in on a corner and looking past the mesh
+    const views = [_]struct { pos: [3]f64, pixels_size: f64 }{
+        .{ .pos = .{ 0.0, 0.0, 100.0 }, .pixels_size = 0.1 },
+        .{ .pos = .{ 2.7, -1.9, 100.0 }, .pixels_size = 0.02 },
+        .{ .pos = .{ -4.0, 3.5, 60.0 }, .pixels_size = 0.03 },
+        .{ .pos = .{ 40.0, 0.0, 100.0 }, .pixels_size = 0.1 },
+    };
+    var visible_n = [_]usize{0} ** views.len;
+
+    for (views, 0..) |view, vv| {
+        const roi_arr = [_]f64{ view.pos[0], view.pos[1], 0.0 };
+        mesh.camera = Camera.init(mesh.camera.pixels_num, 
+                                  .{ view.pixels_size, view.pixels_size }, 
+                                  Vec3f.initSlice(&view.pos), 
+                                  mesh.camera.rot_world, 
+                                  Vec3f.initSlice(&roi_arr), 
+                                  mesh.camera.focal_length, 
+                                  mesh.camera.sub_sample);
+
+        try cache_full.update(&mesh.coords, &mesh.connect, &mesh.camera);
+        try cache_index.updateIndexed(&mesh.coords, &mesh.connect, 
+                                      &mesh.camera, &elem_index);
+        try expectEqualSlices(bool, cache_full.elem_visible, 
+                              cache_index.elem_visible);
+        try expect(cache_full.elem_bounds.len == cache_index.elem_bounds.len);
+        for (cache_full.elem_bounds, cache_index.elem_bounds) |full, index| {
+            try expect(std.meta.eql(full, index));
+        }
+        visible_n[vv] = cache_index.elem_bounds.len;
+
+        const index_opts = RasterOpts{ .elem_index = &elem_index };
+        var images_ref = try mesh.initImages(talloc);
+        var images_index = try mesh.initImages(talloc);
+        try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                                  &mesh.field, &mesh.camera, .{}, &images_ref);
+        try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                                  &mesh.field, &mesh.camera, index_opts, 
+                                  &images_index);
+        try expectEqualSlices(f64, images_ref.elems, images_index.elems);
+    }
+    try expect(visible_n[1] < visible_n[0]);
+    try expect(visible_n[3] == 0);
+
+    // An index built for another mesh is rejected
+    const coords_short = try Coords.init(talloc, 3);
+    @memset(coords_short.x, 0.0);
+    @memset(coords_short.y, 0.0);
+    @memset(coords_short.z, 0.0);
+    var table_short = [_]Connect.Index{ 0, 1, 2 };
+    const connect_short = Connect{
+        .nodes_per_elem = 3,
+        .elem_n = 1,
+        .table = &table_short,
+    };
+    const index_short = try ElemBVH.init(talloc, &coords_short, &connect_short);
+    try testing.expectError(RasterError.CacheSizeMismatch, 
+                            cache_index.updateIndexed(&mesh.coords, 
+                                                      &mesh.connect, 
+                                                      &mesh.camera, 
+                                                      &index_short));
+}
+
+test "Raster.shadeOneFrame from visibility buffer matches raster" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    const mesh = try TestMesh.init(talloc);
+
+    var cache = try Raster.RasterCache.init(talloc, &mesh.coords, &mesh.connect);
+    try cache.update(&mesh.coords, &mesh.connect, &mesh.camera);
+
+    var vis = try Raster.VisBuffer.init(talloc, &mesh.camera, 
+                                        mesh.connect.nodes_per_elem);
+    _ = try Raster.rasterVisBuffer(talloc, &cache, &mesh.connect, 
+                                   &mesh.camera, .bound_scan, &vis);
+
+    for (0..TestMesh.time_n) |tt| {
+        var images_ref = try mesh.initImages(talloc);
+        try Raster.rasterOneFrame(talloc, tt, &mesh.coords, &mesh.connect, 
+                                  &mesh.field, &mesh.camera, .{}, &images_ref);
+
+        var images_vis = try mesh.initImages(talloc);
+        try Raster.shadeOneFrame(talloc, tt, &mesh.connect, &mesh.field, 
+                                 &mesh.camera, &vis, &images_vis);
+
+        try expectEqualSlices(f64, images_ref.elems, images_vis.elems);
+    }
+
+    const frames_ref = try Raster.rasterAllFrames(talloc, tmp_dir.dir, 
+                                                  &mesh.coords, &mesh.connect, 
+                                                  &mesh.field, &mesh.camera, 
+                                                  .{});
+    const frames_vis = try Raster.rasterAllFrames(talloc, tmp_dir.dir, 
+                                                  &mesh.coords, &mesh.connect, 
+                                                  &mesh.field, &mesh.camera, 
+                                                  .{ .vis_buffer = true,
+                                                     .frame_threads_n = 2 });
+    try expectEqualSlices(f64, frames_ref.elems, frames_vis.elems);
+}
+
+test "Raster.rasterAllFrames deformed matches displaced coords" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var tmp_dir = testing.tmpDir(.{});
+    defer tmp_dir.cleanup();
+
+    const mesh = try TestMesh.init(talloc);
+    const def_opts = RasterOpts{ .disp_fields = .{ 0, 1, 1 }, 
+                                 .disp_scale = 0.05 };
+
+    var par_opts = def_opts;
+    par_opts.frame_threads_n = 2;
+    const frames_def = try Raster.rasterAllFrames(talloc, tmp_dir.dir, 
+                                                  &mesh.coords, &mesh.connect, 
+                                                  &mesh.field, &mesh.camera, 
+                                                  par_opts);
+
+    var coords_def = try Coords.init(talloc, mesh.coords.len);
+    var image_inds = [_]usize{ 0, 0, 0, 0 };
+    for (0..TestMesh.time_n) |tt| {
+        try Raster.deformCoords(tt, &mesh.coords, &mesh.field, 
+                                def_opts.disp_fields.?, def_opts.disp_scale, 
+                                &coords_def);
+
+        var images_ref = try mesh.initImages(talloc);
+        try Raster.rasterOneFrame(talloc, tt, &coords_def, &mesh.connect, 
+                                  &mesh.field, &mesh.camera, .{}, &images_ref);
+
+        var images_def = try mesh.initImages(talloc);
+        try Raster.rasterOneFrame(talloc, tt, &mesh.coords, &mesh.connect, 
+                                  &mesh.field, &mesh.camera, def_opts, 
+                                  &images_def);
+
+        image_inds[0] = tt;
+        const frame_slice = try frames_def.getSlice(image_inds[0..], 0);
+        try expectEqualSlices(f64, images_ref.elems, images_def.elems);
+        try expectEqualSlices(f64, images_ref.elems, frame_slice);
+    }
+
+    // The deformation moves the mesh so the image must change
+    var images_undef = try mesh.initImages(talloc);
+    try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                              &mesh.field, &mesh.camera, .{}, &images_undef);
+    image_inds[0] = 1;
+    const frame_def = try frames_def.getSlice(image_inds[0..], 0);
+    try expect(!std.mem.eql(f64, images_undef.elems, frame_def));
+
+    try testing.expectError(RasterError.DispFieldOutOfRange, 
+                            Raster.deformCoords(0, &mesh.coords, &mesh.field, 
+                                                .{ 0, 1, 2 }, 1.0, &coords_def));
+    try testing.expectError(RasterError.VisBufferDeformed, 
+                            Raster.rasterAllFrames(talloc, tmp_dir.dir, 
+                                                   &mesh.coords, &mesh.connect, 
+                                                   &mesh.field, &mesh.camera, 
+                                                   .{ .vis_buffer = true,
+                                                      .disp_fields = .{ 0, 0, 0 } }));
+}
+
+test "Raster.rasterFrameMultiCamera matches one camera at a time" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    const mesh = try TestMesh.init(talloc);
+
+    // Stereo pair either side of the original camera plus the original
+    const cam_x = [_]f64{ -3.0, 0.0, 3.0 };
+    const cam_rot_y = [_]f64{ 0.03, 0.0, -0.03 };
+    var cameras: [cam_x.len]Camera = undefined;
+    for (0..cam_x.len) |vv| {
+        const pos_arr = [_]f64{ cam_x[vv], 0.0, 100.0 };
+        cameras[vv] = Camera.init(mesh.camera.pixels_num, 
+                                  mesh.camera.pixels_size, 
+                                  Vec3f.initSlice(&pos_arr), 
+                                  Rotation.init(0.0, cam_rot_y[vv], 0.0), 
+                                  mesh.camera.roi_cent_world, 
+                                  mesh.camera.focal_length, 
+                                  mesh.camera.sub_sample);
+    }
+
+    const image_n: usize = TestMesh.fields_n * mesh.camera.pixels_num[1]
+                           * mesh.camera.pixels_num[0];
+    var views_dims = [_]usize{ cameras.len,
+                               TestMesh.fields_n,
+                               mesh.camera.pixels_num[1],
+                               mesh.camera.pixels_num[0] };
+    var views = try NDArray(f64).init(talloc, 
+                                      try talloc.alloc(f64, cameras.len * image_n),
+                                      views_dims[0..]);
+
+    const multi_opts = [_]RasterOpts{
+        .{},
+        .{ .threads_n = 2 },
+        .{ .threads_n = 4, .disp_fields = .{ 0, 1, 1 }, .disp_scale = 0.05 },
+    };
+    var coords_def = try Coords.init(talloc, mesh.coords.len);
+
+    for (multi_opts) |opts| {
+        @memset(views.elems, -1.0);
+        try Raster.rasterFrameMultiCamera(talloc, 1, &mesh.coords, &mesh.connect, 
+                                          &mesh.field, cameras[0..], opts, 
+                                          &views);
+
+        var coords_ref: *const Coords = &mesh.coords;
+        if (opts.disp_fields) |disp_fields| {
+            try Raster.deformCoords(1, &mesh.coords, &mesh.field, disp_fields, 
+                                    opts.disp_scale, &coords_def);
+            coords_ref = &coords_def;
+        }
+
+        for (cameras, 0..) |camera, vv| {
+            var images_ref = try mesh.initImages(talloc);
+            try Raster.rasterOneFrame(talloc, 1, coords_ref, &mesh.connect, 
+                                      &mesh.field, &camera, .{}, &images_ref);
+            try expect(std.mem.max(f64, images_ref.elems) > 0.0);
+            try expectEqualSlices(f64, images_ref.elems, 
+                                  views.elems[vv*image_n..(vv+1)*image_n]);
+        }
+    }
+
+    // Views must differ or the test is not checking the camera is used
+    try expect(!std.mem.eql(f64, views.elems[0..image_n], 
+                            views.elems[image_n..2*image_n]));
+
+    var cameras_bad = cameras;
+    cameras_bad[1].sub_sample = 1;
+    try testing.expectError(RasterError.CameraDimsMismatch,
+                            Raster.rasterFrameMultiCamera(talloc, 0, &mesh.coords, 
+                                                          &mesh.connect, &mesh.field, 
+                                                          cameras_bad[0..], .{}, 
+                                                          &views));
+    try testing.expectError(RasterError.FrameOutOfRange,
+                            Raster.rasterFrameMultiCamera(talloc, TestMesh.time_n, 
+                                                          &mesh.coords, &mesh.connect, 
+                                                          &mesh.field, cameras[0..], 
+                                                          .{}, &views));
+}
+
+test "Raster hierarchical mode matches bounding box scan" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var mesh = try TestMesh.init(talloc);
+
+    // Close up camera so single elements cover many 8x8 blocks
+    const pos_arr = [_]f64{ 0.5, -0.3, 30.0 };
+    const camera_close = Camera.init(mesh.camera.pixels_num, 
+                                     mesh.camera.pixels_size, 
+                                     Vec3f.initSlice(&pos_arr), 
+                                     Rotation.init(0.0, 0.05, -0.02), 
+                                     mesh.camera.roi_cent_world, 
+                                     mesh.camera.focal_length, 
+                                     3);
+    const cameras = [_]Camera{ mesh.camera, camera_close };
+
+    for (cameras) |camera| {
+        mesh.camera = camera;
+        const mode_opts = [_]RasterOpts{
+            .{},
+            .{ .threads_n = 3, .tile_size = 13 },
+        };
+
+        for (mode_opts) |opts| {
+            var images_scan = try mesh.initImages(talloc);
+            try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                                      &mesh.field, &mesh.camera, opts, 
+                                      &images_scan);
+            try expect(std.mem.max(f64, images_scan.elems) > 0.0);
+
+            var hier_opts = opts;
+            hier_opts.raster_mode = .hierarchical;
+            var images_hier = try mesh.initImages(talloc);
+            try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                                      &mesh.field, &mesh.camera, hier_opts, 
+                                      &images_hier);
+            try expectEqualSlices(f64, images_scan.elems, images_hier.elems);
+        }
+
+        var cache = try Raster.RasterCache.init(talloc, &mesh.coords, &mesh.connect);
+        try cache.update(&mesh.coords, &mesh.connect, &mesh.camera);
+
+        var vis_scan = try Raster.VisBuffer.init(talloc, &mesh.camera, 
+                                                 mesh.connect.nodes_per_elem);
+        _ = try Raster.rasterVisBuffer(talloc, &cache, &mesh.connect, 
+                                       &mesh.camera, .bound_scan, &vis_scan);
+        var vis_hier = try Raster.VisBuffer.init(talloc, &mesh.camera, 
+                                                 mesh.connect.nodes_per_elem);
+        _ = try Raster.rasterVisBuffer(talloc, &cache, &mesh.connect, 
+                                       &mesh.camera, .hierarchical, &vis_hier);
+        try expectEqualSlices(usize, vis_scan.elems, vis_hier.elems);
+        try expectEqualSlices(f64, vis_scan.weights, vis_hier.weights);
+        try expectEqualSlices(f64, vis_scan.depth, vis_hier.depth);
+    }
+}
+
+test "Raster early depth rejection matches full depth test" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var mesh = try TestMesh.init(talloc);
+
+    const base_opts = [_]RasterOpts{
+        .{},
+        .{ .threads_n = 3, .tile_size = 13 },
+        .{ .raster_mode = .hierarchical },
+    };
+
+    for (base_opts) |opts| {
+        var images_full = try mesh.initImages(talloc);
+        try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                                  &mesh.field, &mesh.camera, opts, 
+                                  &images_full);
+
+        // The planes are at different depths so sorting does not change ties
+        for ([_]bool{ false, true }) |depth_sort| {
+            var early_opts = opts;
+            early_opts.early_depth = true;
+            early_opts.depth_sort = depth_sort;
+            var images_early = try mesh.initImages(talloc);
+            try Raster.rasterOneFrame(talloc, 1, &mesh.coords, &mesh.connect, 
+                                      &mesh.field, &mesh.camera, early_opts, 
+                                      &images_early);
+            try expectEqualSlices(f64, images_full.elems, images_early.elems);
+        }
+    }
+
+    // Front to back the back plane is hidden wherever the planes overlap
+    var cache = try Raster.RasterCache.init(talloc, &mesh.coords, &mesh.connect);
+    const sort_opts = RasterOpts{ .early_depth = true, .depth_sort = true };
+    try Raster.updateCache(&mesh.coords, &mesh.connect, &mesh.camera, 
+                           sort_opts, &cache);
+    for (1..cache.elem_bounds.len) |bb| {
+        try expect(cache.elem_bounds[bb-1].depth_near 
+                   <= cache.elem_bounds[bb].depth_near);
+    }
+
+    var buffs = try Raster.FrameBuffers.init(talloc, &mesh.camera, TestMesh.fields_n, 
+                                             mesh.connect.nodes_per_elem, .f64, 
+                                             true);
+    const full_tile = buffs.fullTile(.f64);
+    @memset(full_tile.depth, 1e6);
+    @memset(full_tile.image, 0.0);
+    const stats = try Raster.rasterElemsSerial(.f64, 1, &cache, &mesh.connect, 
+                                               &mesh.field, &mesh.camera, 
+                                               sort_opts, &.{}, &buffs, 
+                                               &full_tile);
+    try expect(stats.elems_rejected_early > 0);
+    try expect(stats.elems_rejected_early < stats.elems_in_image);
+
+    // Going back to element order rebuilds the cache
+    try Raster.updateCache(&mesh.coords, &mesh.connect, &mesh.camera, 
+                           .{}, &cache);
+    try expect(!cache.depth_sorted);
+    for (1..cache.elem_bounds.len) |bb| {
+        try expect(cache.elem_bounds[bb-1].elem_ind < cache.elem_bounds[bb].elem_ind);
+    }
+}
+
+test "Raster element field buffer matches per element gather" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var mesh = try TestMesh.init(talloc);
+
+    const base_opts = [_]RasterOpts{
+        .{},
+        .{ .threads_n = 3, .tile_size = 13 },
+        .{ .early_depth = true, .raster_mode = .hierarchical },
+    };
+
+    for (base_opts) |opts| {
+        for (0..mesh.field.getTimeN()) |tt| {
+            var images_elem = try mesh.initImages(talloc);
+            try Raster.rasterOneFrame(talloc, tt, &mesh.coords, &mesh.connect, 
+                                      &mesh.field, &mesh.camera, opts, 
+                                      &images_elem);
+            try expect(std.mem.max(f64, images_elem.elems) > 0.0);
+
+            var buff_opts = opts;
+            buff_opts.elem_field_buffer = true;
+            var images_buff = try mesh.initImages(talloc);
+            try Raster.rasterOneFrame(talloc, tt, &mesh.coords, &mesh.connect, 
+                                      &mesh.field, &mesh.camera, buff_opts, 
+                                      &images_buff);
+            try expectEqualSlices(f64, images_elem.elems, images_buff.elems);
+        }
+    }
+}
+
+test "Raster f32 sub-pixel buffers are within rounding of f64" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    var mesh = try TestMesh.init(talloc);
+
+    const base_opts = [_]RasterOpts{
+        .{},
+        .{ .threads_n = 3, .tile_size = 13 },
+        .{ .early_depth = true, .raster_mode = .hierarchical },
+    };
+
+    for (base_opts) |opts| {
+        for (0..mesh.field.getTimeN()) |tt| {
+            var images_f64 = try mesh.initImages(talloc);
+            try Raster.rasterOneFrame(talloc, tt, &mesh.coords, &mesh.connect, 
+                                      &mesh.field, &mesh.camera, opts, 
+                                      &images_f64);
+            const tol = std.math.floatEps(f32) 
+                        * @max(std.mem.max(f64, images_f64.elems), 
+                               -std.mem.min(f64, images_f64.elems));
+
+            for ([_]SubPxPrecision{ .f32_image, .f32 }) |precision| {
+                var prec_opts = opts;
+                prec_opts.subpx_precision = precision;
+                var images_f32 = try mesh.initImages(talloc);
+                try Raster.rasterOneFrame(talloc, tt, &mesh.coords, 
+                                          &mesh.connect, &mesh.field, 
+                                          &mesh.camera, prec_opts, 
+                                          &images_f32);
+                for (images_f64.elems, images_f32.elems) |px_f64, px_f32| {
+                    try expect(@abs(px_f64 - px_f32) <= tol);
+                }
+            }
+        }
+    }
+}
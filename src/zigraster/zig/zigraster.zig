@@ -2,6 +2,22 @@ const std = @import("std");
 const print = std.debug.print;
 const testing = std.testing;
 
+const Vec3f = @import("vecstack.zig").Vec3f;
+const Mat44f = @import("matstack.zig").Mat44f;
+const NDArray = @import("ndarray.zig").NDArray;
+const Rotation = @import("rotation.zig").Rotation;
+const Camera = @import("camera.zig").Camera;
+
+const meshio = @import("meshio.zig");
+const Coords = meshio.Coords;
+const Connect = meshio.Connect;
+const Field = meshio.Field;
+
+const Raster = @import("raster.zig").Raster;
+const RasterOpts = @import("raster.zig").RasterOpts;
+const PixelWindow = @import("raster.zig").PixelWindow;
+const ElemBVH = @import("elemindex.zig").ElemBVH;
+
 pub const CVec2U32 = extern struct {
     x: u32,
     y: u32,
@@ -31,6 +47,22 @@ pub const CNDArrayF = extern struct {
     dims_num: usize,
 };
 
+pub const CNDArrayU = extern struct {
+    elems: [*c]usize,
+    dims: [*c]usize,
+    elems_num: usize,
+    dims_num: usize,
+};
+
+// Connectivity is passed as u32 to match Connect.Index so the caller's 
+// table is used in place
+pub const CNDArrayU32 = extern struct {
+    elems: [*c]Connect.Index,
+    dims: [*c]usize,
+    elems_num: usize,
+    dims_num: usize,
+};
+
 pub const CCamera = extern struct {
     pixels_num: CVec2U32,
     pixels_size: CVec2F,
@@ -45,6 +77,29 @@ pub const CCamera = extern struct {
     world_to_cam: CMat44F,
 };
 
+pub const CPixelWindow = extern struct {
+    x_start: usize,
+    y_start: usize,
+    x_n: usize,
+    y_n: usize,
+};
+
+pub const CRasterOpts = extern struct {
+    threads_n: usize,
+    tile_size: usize,
+    frame_threads_n: usize,
+    vis_buffer: u8,
+};
+
+pub fn rasterOptsFromC(c_opts: *const CRasterOpts) RasterOpts {
+    return .{
+        .threads_n = c_opts.threads_n,
+        .tile_size = c_opts.tile_size,
+        .frame_threads_n = c_opts.frame_threads_n,
+        .vis_buffer = (c_opts.vis_buffer != 0),
+    };
+}
+
 // Function for testing sending a complex struct to Zig
 pub export fn printCamera(cam: *const CCamera) void {
     print("\nZig Camera:\n", .{});
@@ -61,3 +116,847 @@ pub export fn printCamera(cam: *const CCamera) void {
     print("\n", .{});
 }
 
+pub export fn printRasterOpts(c_opts: *const CRasterOpts) void {
+    const opts = rasterOptsFromC(c_opts);
+    print("\nZig Raster Options:\n", .{});
+    print("--------------------\n", .{});
+    print("threads_n={}\n", .{opts.threads_n});
+    print("tile_size={}\n", .{opts.tile_size});
+    print("frame_threads_n={}\n", .{opts.frame_threads_n});
+    print("vis_buffer={}\n", .{opts.vis_buffer});
+    print("\n", .{});
+}
+
+pub const CRenderStatus = enum(c_int) {
+    ok = 0,
+    invalid_input = 1,
+    out_of_memory = 2,
+    raster_failed = 3,
+};
+
+pub const ZigRasterError = error{
+    InvalidCoordsDims,
+    InvalidConnectDims,
+    InvalidFieldsDims,
+    InvalidImagesDims,
+    InvalidCameraMat,
+    NodeIndexOutOfRange,
+};
+
+// The raster only needs the projection so we use the camera matrices as given
+// rather than rebuilding them from the rotation angles.
+pub fn cameraFromC(c_cam: *const CCamera) !Camera {
+    if ((c_cam.world_to_cam.elems_num != 16) 
+        or (c_cam.cam_to_world.elems_num != 16)) {
+        return ZigRasterError.InvalidCameraMat;
+    }
+
+    const pos_arr = [_]f64{ c_cam.pos_world.x, c_cam.pos_world.y, c_cam.pos_world.z };
+    const roi_arr = [_]f64{ c_cam.roi_cent_world.x, 
+                            c_cam.roi_cent_world.y, 
+                            c_cam.roi_cent_world.z };
+
+    return .{
+        .pixels_num = .{ c_cam.pixels_num.x, c_cam.pixels_num.y },
+        .pixels_size = .{ c_cam.pixels_size.x, c_cam.pixels_size.y },
+        .pos_world = Vec3f.initSlice(&pos_arr),
+        .rot_world = Rotation.init(c_cam.rot_world.x, 
+                                   c_cam.rot_world.y, 
+                                   c_cam.rot_world.z),
+        .roi_cent_world = Vec3f.initSlice(&roi_arr),
+        .focal_length = c_cam.image_dist * c_cam.sensor_size.x 
+                        / c_cam.image_dims.x,
+        .sub_sample = c_cam.subsample,
+        .sensor_size = .{ c_cam.sensor_size.x, c_cam.sensor_size.y },
+        .image_dims = .{ c_cam.image_dims.x, c_cam.image_dims.y },
+        .image_dist = c_cam.image_dist,
+        .cam_to_world_mat = Mat44f.initSlice(c_cam.cam_to_world.elems[0..16]),
+        .world_to_cam_mat = Mat44f.initSlice(c_cam.world_to_cam.elems[0..16]),
+    };
+}
+
+// Coords, shape=(3,coord_n) so x, y and z are each contiguous
+fn coordsFromC(c_coords: *const CNDArrayF) !Coords {
+    if ((c_coords.dims_num != 2) or (c_coords.dims[0] != 3)
+        or (c_coords.elems_num != 3*c_coords.dims[1])) {
+        return ZigRasterError.InvalidCoordsDims;
+    }
+    const coord_n: usize = c_coords.dims[1];
+    return .{
+        .x = c_coords.elems[0..coord_n],
+        .y = c_coords.elems[coord_n..2*coord_n],
+        .z = c_coords.elems[2*coord_n..3*coord_n],
+        .len = coord_n,
+    };
+}
+
+// Connectivity, shape=(elem_n,nodes_per_elem), viewed in place from the 
+// caller's u32 table after checking every index is a valid node.
+fn connectFromC(c_connect: *const CNDArrayU32, coord_n: usize) !Connect {
+    if ((c_connect.dims_num != 2) 
+        or (c_connect.dims[1] < 3) or (c_connect.dims[1] > std.math.maxInt(u8))
+        or (c_connect.elems_num != c_connect.dims[0]*c_connect.dims[1])) {
+        return ZigRasterError.InvalidConnectDims;
+    }
+    const connect = Connect{
+        .nodes_per_elem = @intCast(c_connect.dims[1]),
+        .elem_n = c_connect.dims[0],
+        .table = c_connect.elems[0..c_connect.elems_num],
+    };
+    for (connect.table) |node_ind| {
+        if (node_ind >= coord_n) {
+            return ZigRasterError.NodeIndexOutOfRange;
+        }
+    }
+    return connect;
+}
+
+// Fields, shape=(coord_n,time_n,field_n) as in the pyvale render mesh. The
+// field views the caller's buffer, only the dims and strides are allocated.
+fn fieldFromC(allocator: std.mem.Allocator, 
+              c_fields: *const CNDArrayF, 
+              coord_n: usize) !Field {
+    if ((c_fields.dims_num != 3) or (c_fields.dims[0] != coord_n)
+        or (c_fields.elems_num != coord_n*c_fields.dims[1]*c_fields.dims[2])) {
+        return ZigRasterError.InvalidFieldsDims;
+    }
+    const time_n: usize = c_fields.dims[1];
+    const fields_n: usize = c_fields.dims[2];
+    return try Field.initView(allocator, 
+                              c_fields.elems[0..c_fields.elems_num],
+                              time_n, coord_n, fields_n,
+                              .{ fields_n, time_n*fields_n, 1 });
+}
+
+// Images, shape=(N,field_n,px_y,px_x) or flat for windows, are always 
+// provided by the caller and written in place.
+fn imagesFromC(arena_alloc: std.mem.Allocator,
+               images_dims: []const usize,
+               c_images: *CNDArrayF) !NDArray(f64) {
+    var images_n: usize = 1;
+    for (images_dims) |dim| {
+        images_n *= dim;
+    }
+    if ((c_images.dims_num != images_dims.len) 
+        or !std.mem.eql(usize, c_images.dims[0..images_dims.len], images_dims)) {
+        return ZigRasterError.InvalidImagesDims;
+    }
+
+    if ((c_images.elems == null) or (c_images.elems_num != images_n)) {
+        return ZigRasterError.InvalidImagesDims;
+    }
+
+    return try NDArray(f64).init(arena_alloc, 
+                                 c_images.elems[0..images_n],
+                                 c_images.dims[0..images_dims.len]);
+}
+
+fn renderInto(coords: *const Coords,
+              connect: *const Connect,
+              field: *const Field,
+              c_camera: *const CCamera,
+              c_opts: *const CRasterOpts,
+              c_frames: [*c]const usize,
+              frames_n: usize,
+              cache: ?*Raster.RasterCache,
+              elem_index: ?*const ElemBVH,
+              c_images: *CNDArrayF) !void {
+
+    var arena = std.heap.ArenaAllocator.init(std.heap.page_allocator);
+    defer arena.deinit();
+    const arena_alloc = arena.allocator();
+
+    const camera = try cameraFromC(c_camera);
+    var opts = rasterOptsFromC(c_opts);
+    opts.elem_index = elem_index;
+
+    const images_dims = [_]usize{ frames_n, 
+                                  field.getFieldsN(), 
+                                  camera.pixels_num[1], 
+                                  camera.pixels_num[0] };
+    var images_arr = try imagesFromC(arena_alloc, images_dims[0..], c_images);
+
+    if (cache) |cache_ptr| {
+        try Raster.rasterFramesCached(std.heap.page_allocator, 
+                                      c_frames[0..frames_n],
+                                      coords, 
+                                      connect, 
+                                      field, 
+                                      &camera, 
+                                      opts, 
+                                      cache_ptr,
+                                      &images_arr);
+    } else {
+        try Raster.rasterFrames(std.heap.page_allocator, 
+                                c_frames[0..frames_n],
+                                coords, 
+                                connect, 
+                                field, 
+                                &camera, 
+                                opts, 
+                                &images_arr);
+    }
+}
+
+fn renderMultiCameraInto(coords: *const Coords,
+                         connect: *const Connect,
+                         field: *const Field,
+                         c_cameras: [*]const CCamera,
+                         cameras_n: usize,
+                         c_opts: *const CRasterOpts,
+                         frame_ind: usize,
+                         elem_index: ?*const ElemBVH,
+                         c_images: *CNDArrayF) !void {
+
+    var arena = std.heap.ArenaAllocator.init(std.heap.page_allocator);
+    defer arena.deinit();
+    const arena_alloc = arena.allocator();
+
+    if (cameras_n == 0) {
+        return ZigRasterError.InvalidImagesDims;
+    }
+    const cameras = try arena_alloc.alloc(Camera, cameras_n);
+    for (0..cameras_n) |vv| {
+        cameras[vv] = try cameraFromC(&c_cameras[vv]);
+    }
+    var opts = rasterOptsFromC(c_opts);
+    opts.elem_index = elem_index;
+
+    const images_dims = [_]usize{ cameras_n, 
+                                  field.getFieldsN(), 
+                                  cameras[0].pixels_num[1], 
+                                  cameras[0].pixels_num[0] };
+    var images_arr = try imagesFromC(arena_alloc, images_dims[0..], c_images);
+
+    try Raster.rasterFrameMultiCamera(std.heap.page_allocator, 
+                                      frame_ind,
+                                      coords, 
+                                      connect, 
+                                      field, 
+                                      cameras, 
+                                      opts, 
+                                      &images_arr);
+}
+
+// Window images are flat with each window in turn stored as 
+// (frames_n,field_n,y_n,x_n)
+fn renderWindowsInto(coords: *const Coords,
+                     connect: *const Connect,
+                     field: *const Field,
+                     c_camera: *const CCamera,
+                     c_opts: *const CRasterOpts,
+                     c_frames: [*c]const usize,
+                     frames_n: usize,
+                     c_windows: [*c]const CPixelWindow,
+                     windows_n: usize,
+                     cache: ?*Raster.RasterCache,
+                     elem_index: ?*const ElemBVH,
+                     c_images: *CNDArrayF) !void {
+
+    var arena = std.heap.ArenaAllocator.init(std.heap.page_allocator);
+    defer arena.deinit();
+    const arena_alloc = arena.allocator();
+
+    const camera = try cameraFromC(c_camera);
+    var opts = rasterOptsFromC(c_opts);
+    opts.elem_index = elem_index;
+
+    const num_fields: usize = field.getFieldsN();
+    const windows = try arena_alloc.alloc(PixelWindow, windows_n);
+    var images_n: usize = 0;
+    for (windows, 0..) |*window, ww| {
+        window.* = .{ .x_start = c_windows[ww].x_start,
+                      .y_start = c_windows[ww].y_start,
+                      .x_n = c_windows[ww].x_n,
+                      .y_n = c_windows[ww].y_n };
+        images_n += frames_n * num_fields * window.y_n * window.x_n;
+    }
+
+    const images_dims = [_]usize{ images_n };
+    const images_arr = try imagesFromC(arena_alloc, images_dims[0..], c_images);
+
+    var cache_local: Raster.RasterCache = undefined;
+    const cache_ptr: *Raster.RasterCache = cache orelse blk: {
+        cache_local = try Raster.RasterCache.init(arena_alloc, coords, connect);
+        break :blk &cache_local;
+    };
+
+    const images_win = try arena_alloc.alloc(NDArray(f64), windows_n);
+    for (0..frames_n) |tt| {
+        var images_start: usize = 0;
+        for (windows, images_win) |window, *image_win| {
+            const image_n: usize = num_fields * window.y_n * window.x_n;
+            const start: usize = images_start + tt * image_n;
+            var dims = [_]usize{ num_fields, window.y_n, window.x_n };
+            image_win.* = try NDArray(f64).init(arena_alloc, 
+                                                images_arr.elems[start..start + image_n],
+                                                dims[0..]);
+            images_start += frames_n * image_n;
+        }
+
+        try Raster.rasterWindowsCached(std.heap.page_allocator, 
+                                       c_frames[tt],
+                                       coords, 
+                                       connect, 
+                                       field, 
+                                       &camera, 
+                                       opts, 
+                                       cache_ptr,
+                                       windows,
+                                       images_win);
+    }
+}
+
+fn statusFromErr(func_name: []const u8, err: anyerror) c_int {
+    print("zigraster: {s} failed with {s}\n", .{ func_name, @errorName(err) });
+    const status: CRenderStatus = switch (err) {
+        error.OutOfMemory => .out_of_memory,
+        error.InvalidCoordsDims,
+        error.InvalidConnectDims,
+        error.InvalidFieldsDims,
+        error.InvalidImagesDims,
+        error.InvalidCameraMat,
+        error.NodeIndexOutOfRange,
+        error.FrameOutOfRange,
+        error.CameraDimsMismatch,
+        error.WindowOutOfRange,
+        error.TooManyElems => .invalid_input,
+        else => .raster_failed,
+    };
+    return @intFromEnum(status);
+}
+
+fn renderFramesC(c_coords: *const CNDArrayF,
+                 c_connect: *const CNDArrayU32,
+                 c_fields: *const CNDArrayF,
+                 c_camera: *const CCamera,
+                 c_opts: *const CRasterOpts,
+                 c_frames: [*c]const usize,
+                 frames_n: usize,
+                 c_images: *CNDArrayF) !void {
+
+    // Only the field dims and strides are allocated, coords, connectivity and
+    // field values are used in place from the caller's buffers
+    var arena = std.heap.ArenaAllocator.init(std.heap.page_allocator);
+    defer arena.deinit();
+
+    const coords = try coordsFromC(c_coords);
+    const connect = try connectFromC(c_connect, coords.len);
+    const field = try fieldFromC(arena.allocator(), c_fields, coords.len);
+
+    try renderInto(&coords, &connect, &field, c_camera, c_opts, 
+                   c_frames, frames_n, null, null, c_images);
+}
+
+// Renders the time steps listed in c_frames straight from the caller's 
+// buffers without copying. The images are written into the caller's buffer.
+pub export fn renderFrames(c_coords: *const CNDArrayF,
+                           c_connect: *const CNDArrayU32,
+                           c_fields: *const CNDArrayF,
+                           c_camera: *const CCamera,
+                           c_opts: *const CRasterOpts,
+                           c_frames: [*c]const usize,
+                           frames_n: usize,
+                           c_images: *CNDArrayF) c_int {
+
+    renderFramesC(c_coords, c_connect, c_fields, c_camera, c_opts, 
+                  c_frames, frames_n, c_images) catch |err| {
+        return statusFromErr("renderFrames", err);
+    };
+    return @intFromEnum(CRenderStatus.ok);
+}
+
+fn renderFrameMultiCameraC(c_coords: *const CNDArrayF,
+                           c_connect: *const CNDArrayU32,
+                           c_fields: *const CNDArrayF,
+                           c_cameras: [*]const CCamera,
+                           cameras_n: usize,
+                           c_opts: *const CRasterOpts,
+                           frame_ind: usize,
+                           c_images: *CNDArrayF) !void {
+
+    var arena = std.heap.ArenaAllocator.init(std.heap.page_allocator);
+    defer arena.deinit();
+
+    const coords = try coordsFromC(c_coords);
+    const connect = try connectFromC(c_connect, coords.len);
+    const field = try fieldFromC(arena.allocator(), c_fields, coords.len);
+
+    try renderMultiCameraInto(&coords, &connect, &field, c_cameras, cameras_n,
+                              c_opts, frame_ind, null, c_images);
+}
+
+// Renders one time step from each camera into c_images with shape
+// (cameras_n,field_n,px_y,px_x). All cameras must have the same pixel count
+// and sub-sampling. Buffers are used as for renderFrames.
+pub export fn renderFrameMultiCamera(c_coords: *const CNDArrayF,
+                                     c_connect: *const CNDArrayU32,
+                                     c_fields: *const CNDArrayF,
+                                     c_cameras: [*]const CCamera,
+                                     cameras_n: usize,
+                                     c_opts: *const CRasterOpts,
+                                     frame_ind: usize,
+                                     c_images: *CNDArrayF) c_int {
+
+    renderFrameMultiCameraC(c_coords, c_connect, c_fields, c_cameras, 
+                            cameras_n, c_opts, frame_ind, c_images) catch |err| {
+        return statusFromErr("renderFrameMultiCamera", err);
+    };
+    return @intFromEnum(CRenderStatus.ok);
+}
+
+fn renderWindowsC(c_coords: *const CNDArrayF,
+                  c_connect: *const CNDArrayU32,
+                  c_fields: *const CNDArrayF,
+                  c_camera: *const CCamera,
+                  c_opts: *const CRasterOpts,
+                  c_frames: [*c]const usize,
+                  frames_n: usize,
+                  c_windows: [*c]const CPixelWindow,
+                  windows_n: usize,
+                  c_images: *CNDArrayF) !void {
+
+    var arena = std.heap.ArenaAllocator.init(std.heap.page_allocator);
+    defer arena.deinit();
+
+    const coords = try coordsFromC(c_coords);
+    const connect = try connectFromC(c_connect, coords.len);
+    const field = try fieldFromC(arena.allocator(), c_fields, coords.len);
+
+    try renderWindowsInto(&coords, &connect, &field, c_camera, c_opts, 
+                          c_frames, frames_n, c_windows, windows_n, null, null,
+                          c_images);
+}
+
+// Renders only the pixel windows of the camera image for the time steps in 
+// c_frames. c_images is flat, each window in turn is stored with shape
+// (frames_n,field_n,y_n,x_n), and is the same as cropping the full images.
+// Buffers are used as for renderFrames.
+pub export fn renderWindows(c_coords: *const CNDArrayF,
+                            c_connect: *const CNDArrayU32,
+                            c_fields: *const CNDArrayF,
+                            c_camera: *const CCamera,
+                            c_opts: *const CRasterOpts,
+                            c_frames: [*c]const usize,
+                            frames_n: usize,
+                            c_windows: [*c]const CPixelWindow,
+                            windows_n: usize,
+                            c_images: *CNDArrayF) c_int {
+
+    renderWindowsC(c_coords, c_connect, c_fields, c_camera, c_opts, c_frames,
+                   frames_n, c_windows, windows_n, c_images) catch |err| {
+        return statusFromErr("renderWindows", err);
+    };
+    return @intFromEnum(CRenderStatus.ok);
+}
+
+//------------------------------------------------------------------------------
+// Persistent renderer, the mesh and fields are copied into zig memory once and
+// kept with the projected node cache so only the camera crosses the boundary
+// for each render. The element BVH is built once here so each camera only
+// projects the elements in its view. A renderer must not be used from two
+// threads at once.
+pub const Renderer = struct {
+    arena: std.heap.ArenaAllocator,
+    coords: Coords,
+    connect: Connect,
+    field: Field,
+    cache: Raster.RasterCache,
+    elem_index: ElemBVH,
+
+    const Self = @This();
+
+    pub fn create(c_coords: *const CNDArrayF,
+                  c_connect: *const CNDArrayU32,
+                  c_fields: *const CNDArrayF) !*Self {
+
+        // Validate and view the caller's buffers before copying anything
+        var view_arena = std.heap.ArenaAllocator.init(std.heap.page_allocator);
+        defer view_arena.deinit();
+
+        const coords_view = try coordsFromC(c_coords);
+        const connect_view = try connectFromC(c_connect, coords_view.len);
+        const field_view = try fieldFromC(view_arena.allocator(), c_fields, 
+                                          coords_view.len);
+
+        // Everything the renderer owns lives on its arena and is freed 
+        // together in destroy
+        var arena = std.heap.ArenaAllocator.init(std.heap.page_allocator);
+        errdefer arena.deinit();
+        const arena_alloc = arena.allocator();
+
+        const coords = Coords{
+            .x = try arena_alloc.dupe(f64, coords_view.x),
+            .y = try arena_alloc.dupe(f64, coords_view.y),
+            .z = try arena_alloc.dupe(f64, coords_view.z),
+            .len = coords_view.len,
+        };
+        const connect = Connect{
+            .nodes_per_elem = connect_view.nodes_per_elem,
+            .elem_n = connect_view.elem_n,
+            .table = try arena_alloc.dupe(Connect.Index, connect_view.table),
+        };
+        const field = try Field.initView(arena_alloc, 
+                                         try arena_alloc.dupe(f64, field_view.array.elems),
+                                         field_view.getTimeN(), 
+                                         coords_view.len, 
+                                         field_view.getFieldsN(),
+                                         field_view.array.strides[0..3].*);
+        const cache = try Raster.RasterCache.init(arena_alloc, &coords, &connect);
+        const elem_index = try ElemBVH.init(arena_alloc, &coords, &connect);
+
+        const self = try arena_alloc.create(Self);
+        self.* = .{
+            .arena = undefined,
+            .coords = coords,
+            .connect = connect,
+            .field = field,
+            .cache = cache,
+            .elem_index = elem_index,
+        };
+        // The arena struct is moved in last so it includes the allocation of
+        // the renderer itself
+        self.arena = arena;
+        return self;
+    }
+
+    pub fn destroy(self: *Self) void {
+        var arena = self.arena;
+        arena.deinit();
+    }
+
+    pub fn render(self: *Self,
+                  c_camera: *const CCamera,
+                  c_opts: *const CRasterOpts,
+                  c_frames: [*c]const usize,
+                  frames_n: usize,
+                  c_images: *CNDArrayF) !void {
+        try renderInto(&self.coords, &self.connect, &self.field, c_camera, 
+                       c_opts, c_frames, frames_n, &self.cache, 
+                       &self.elem_index, c_images);
+    }
+
+    pub fn renderWindows(self: *Self,
+                         c_camera: *const CCamera,
+                         c_opts: *const CRasterOpts,
+                         c_frames: [*c]const usize,
+                         frames_n: usize,
+                         c_windows: [*c]const CPixelWindow,
+                         windows_n: usize,
+                         c_images: *CNDArrayF) !void {
+        try renderWindowsInto(&self.coords, &self.connect, &self.field, 
+                              c_camera, c_opts, c_frames, frames_n, c_windows,
+                              windows_n, &self.cache, &self.elem_index, c_images);
+    }
+
+    pub fn renderMultiCamera(self: *Self,
+                             c_cameras: [*]const CCamera,
+                             cameras_n: usize,
+                             c_opts: *const CRasterOpts,
+                             frame_ind: usize,
+                             c_images: *CNDArrayF) !void {
+        try renderMultiCameraInto(&self.coords, &self.connect, &self.field, 
+                                  c_cameras, cameras_n, c_opts, frame_ind, 
+                                  &self.elem_index, c_images);
+    }
+};
+
+// Returns null if the mesh is invalid or the copy fails
+pub export fn rendererCreate(c_coords: *const CNDArrayF,
+                             c_connect: *const CNDArrayU32,
+                             c_fields: *const CNDArrayF) ?*anyopaque {
+    const renderer = Renderer.create(c_coords, c_connect, c_fields) catch |err| {
+        _ = statusFromErr("rendererCreate", err);
+        return null;
+    };
+    return @ptrCast(renderer);
+}
+
+pub export fn rendererDestroy(handle: ?*anyopaque) void {
+    const renderer: *Renderer = @ptrCast(@alignCast(handle orelse return));
+    renderer.destroy();
+}
+
+// Same as renderFrames using the mesh and fields held by the renderer
+pub export fn rendererRender(handle: *anyopaque,
+                             c_camera: *const CCamera,
+                             c_opts: *const CRasterOpts,
+                             c_frames: [*c]const usize,
+                             frames_n: usize,
+                             c_images: *CNDArrayF) c_int {
+    const renderer: *Renderer = @ptrCast(@alignCast(handle));
+    renderer.render(c_camera, c_opts, c_frames, frames_n, c_images) catch |err| {
+        return statusFromErr("rendererRender", err);
+    };
+    return @intFromEnum(CRenderStatus.ok);
+}
+
+// Same as renderFrameMultiCamera using the mesh and fields held by the renderer
+pub export fn rendererRenderMultiCamera(handle: *anyopaque,
+                                        c_cameras: [*]const CCamera,
+                                        cameras_n: usize,
+                                        c_opts: *const CRasterOpts,
+                                        frame_ind: usize,
+                                        c_images: *CNDArrayF) c_int {
+    const renderer: *Renderer = @ptrCast(@alignCast(handle));
+    renderer.renderMultiCamera(c_cameras, cameras_n, c_opts, frame_ind, 
+                               c_images) catch |err| {
+        return statusFromErr("rendererRenderMultiCamera", err);
+    };
+    return @intFromEnum(CRenderStatus.ok);
+}
+
+// Same as renderWindows using the mesh and fields held by the renderer
+pub export fn rendererRenderWindows(handle: *anyopaque,
+                                    c_camera: *const CCamera,
+                                    c_opts: *const CRasterOpts,
+                                    c_frames: [*c]const usize,
+                                    frames_n: usize,
+                                    c_windows: [*c]const CPixelWindow,
+                                    windows_n: usize,
+                                    c_images: *CNDArrayF) c_int {
+    const renderer: *Renderer = @ptrCast(@alignCast(handle));
+    renderer.renderWindows(c_camera, c_opts, c_frames, frames_n, c_windows,
+                           windows_n, c_images) catch |err| {
+        return statusFromErr("rendererRenderWindows", err);
+    };
+    return @intFromEnum(CRenderStatus.ok);
+}
+
+//------------------------------------------------------------------------------
+test "renderFrames, multi-camera and Renderer match rasterOneFrame" {
+    var arena = std.heap.ArenaAllocator.init(testing.allocator);
+    defer arena.deinit();
+    const talloc = arena.allocator();
+
+    // Two triangles making a square facing the camera, laid out as pyvale
+    // passes them: coords (3,coord_n) and fields (coord_n,time_n,fields_n)
+    const coord_n: usize = 4;
+    const time_n: usize = 3;
+    const fields_n: usize = 2;
+
+    var coords_flat = [_]f64{ -4.0, 4.0, 4.0, -4.0,
+                              -3.0, -3.0, 3.0, 3.0,
+                              0.0, 0.0, 0.5, 0.5 };
+    var coords_dims = [_]usize{ 3, coord_n };
+    const c_coords = CNDArrayF{ .elems = &coords_flat, 
+                                .dims = &coords_dims,
+                                .elems_num = coords_flat.len, 
+                                .dims_num = 2 };
+
+    var table = [_]Connect.Index{ 0, 1, 2, 0, 2, 3 };
+    var connect_dims = [_]usize{ 2, 3 };
+    const c_connect = CNDArrayU32{ .elems = &table, 
+                                 .dims = &connect_dims,
+                                 .elems_num = table.len, 
+                                 .dims_num = 2 };
+
+    var fields_flat: [coord_n * time_n * fields_n]f64 = undefined;
+    for (0..coord_n) |nn| {
+        for (0..time_n) |tt| {
+            for (0..fields_n) |ff| {
+                fields_flat[(nn * time_n + tt) * fields_n + ff] = 
+                    @as(f64, @floatFromInt(nn + 1)) * coords_flat[nn]
+                    + @as(f64, @floatFromInt(10 * tt + ff));
+            }
+        }
+    }
+    var fields_dims = [_]usize{ coord_n, time_n, fields_n };
+    const c_fields = CNDArrayF{ .elems = &fields_flat, 
+                                .dims = &fields_dims,
+                                .elems_num = fields_flat.len, 
+                                .dims_num = 3 };
+
+    const pos_arr = [_]f64{ 0.0, 0.0, 100.0 };
+    const roi_arr = [_]f64{ 0.0, 0.0, 0.0 };
+    const camera = Camera.init([_]u32{ 30, 20 }, 
+                               [_]f64{ 0.1, 0.1 }, 
+                               Vec3f.initSlice(&pos_arr), 
+                               Rotation.init(0.0, 0.0, 0.0), 
+                               Vec3f.initSlice(&roi_arr), 
+                               50.0, 
+                               2);
+    var cam_to_world = camera.cam_to_world_mat.elems;
+    var world_to_cam = camera.world_to_cam_mat.elems;
+    const c_camera = CCamera{
+        .pixels_num = .{ .x = camera.pixels_num[0], .y = camera.pixels_num[1] },
+        .pixels_size = .{ .x = camera.pixels_size[0], .y = camera.pixels_size[1] },
+        .pos_world = .{ .x = 0.0, .y = 0.0, .z = 100.0 },
+        .rot_world = .{ .x = 0.0, .y = 0.0, .z = 0.0 },
+        .roi_cent_world = .{ .x = 0.0, .y = 0.0, .z = 0.0 },
+        .subsample = camera.sub_sample,
+        .sensor_size = .{ .x = camera.sensor_size[0], .y = camera.sensor_size[1] },
+        .image_dims = .{ .x = camera.image_dims[0], .y = camera.image_dims[1] },
+        .image_dist = camera.image_dist,
+        .cam_to_world = .{ .elems = &cam_to_world, .elems_num = 16 },
+        .world_to_cam = .{ .elems = &world_to_cam, .elems_num = 16 },
+    };
+    const c_opts = CRasterOpts{ .threads_n = 2, 
+                                .tile_size = 8, 
+                                .frame_threads_n = 2, 
+                                .vis_buffer = 0 };
+
+    const frames = [_]usize{ 2, 0 };
+    const image_n: usize = fields_n * camera.pixels_num[1] * camera.pixels_num[0];
+    var images_dims = [_]usize{ frames.len, 
+                                fields_n, 
+                                camera.pixels_num[1], 
+                                camera.pixels_num[0] };
+    const images_buff = try talloc.alloc(f64, frames.len * image_n);
+    defer talloc.free(images_buff);
+    var c_images = CNDArrayF{ .elems = images_buff.ptr, 
+                              .dims = &images_dims,
+                              .elems_num = images_buff.len, 
+                              .dims_num = 4 };
+
+    const status = renderFrames(&c_coords, &c_connect, &c_fields, &c_camera, 
+                                &c_opts, &frames, frames.len, &c_images);
+    try testing.expectEqual(@intFromEnum(CRenderStatus.ok), status);
+
+    // Reference from the zig side structs with the usual (time,coord,field)
+    // field layout
+    const coords = Coords{ .x = coords_flat[0..coord_n], 
+                           .y = coords_flat[coord_n..2*coord_n],
+                           .z = coords_flat[2*coord_n..], 
+                           .len = coord_n };
+    var table_ref = [_]Connect.Index{ 0, 1, 2, 0, 2, 3 };
+    const connect = Connect{ .nodes_per_elem = 3, .elem_n = 2, .table = &table_ref };
+    var field = try Field.init(talloc, time_n, coord_n, fields_n);
+    var inds = [_]usize{ 0, 0, 0 };
+    for (0..time_n) |tt| {
+        for (0..coord_n) |nn| {
+            for (0..fields_n) |ff| {
+                inds = .{ tt, nn, ff };
+                try field.array.set(inds[0..], 
+                                    fields_flat[(nn * time_n + tt) * fields_n + ff]);
+            }
+        }
+    }
+
+    const image_ref = try talloc.alloc(f64, image_n);
+    for (frames, 0..) |tt, ii| {
+        @memset(image_ref, 0.0);
+        var image_arr = try NDArray(f64).init(talloc, image_ref, images_dims[1..]);
+        try Raster.rasterOneFrame(talloc, tt, &coords, &connect, &field, 
+                                  &camera, .{}, &image_arr);
+        try testing.expect(std.mem.max(f64, image_ref) > 0.0);
+        try testing.expectEqualSlices(f64, image_ref, 
+                                      c_images.elems[ii * image_n..(ii + 1) * image_n]);
+    }
+
+    // Persistent renderer owns a copy of the mesh, rendering twice with the
+    // same camera reuses the projected nodes and must give the same images
+    const renderer = try Renderer.create(&c_coords, &c_connect, &c_fields);
+    defer renderer.destroy();
+
+    const images_renderer = try talloc.alloc(f64, frames.len * image_n);
+    var c_images_renderer = CNDArrayF{ .elems = images_renderer.ptr, 
+                                       .dims = &images_dims,
+                                       .elems_num = images_renderer.len, 
+                                       .dims_num = 4 };
+    for (0..2) |_| {
+        @memset(images_renderer, 0.0);
+        try testing.expectEqual(@intFromEnum(CRenderStatus.ok),
+                                rendererRender(renderer, &c_camera, &c_opts, 
+                                               &frames, frames.len,
+                                               &c_images_renderer));
+        try testing.expectEqualSlices(f64, 
+                                      c_images.elems[0..c_images.elems_num],
+                                      images_renderer);
+    }
+
+    // Multi-camera output for time step 2 from a repeated camera must match
+    // the single camera render for each view, directly and via the renderer
+    const c_cameras = [_]CCamera{ c_camera, c_camera };
+    var multi_dims = [_]usize{ c_cameras.len, 
+                               fields_n, 
+                               camera.pixels_num[1], 
+                               camera.pixels_num[0] };
+    const images_multi = try talloc.alloc(f64, c_cameras.len * image_n);
+    var c_images_multi = CNDArrayF{ .elems = images_multi.ptr, 
+                                    .dims = &multi_dims,
+                                    .elems_num = images_multi.len, 
+                                    .dims_num = 4 };
+    for (0..2) |use_renderer| {
+        @memset(images_multi, 0.0);
+        const multi_status = if (use_renderer == 1)
+            rendererRenderMultiCamera(renderer, &c_cameras, c_cameras.len, 
+                                      &c_opts, 2, &c_images_multi)
+        else
+            renderFrameMultiCamera(&c_coords, &c_connect, &c_fields, &c_cameras,
+                                   c_cameras.len, &c_opts, 2, &c_images_multi);
+        try testing.expectEqual(@intFromEnum(CRenderStatus.ok), multi_status);
+
+        for (0..c_cameras.len) |vv| {
+            try testing.expectEqualSlices(f64, c_images.elems[0..image_n],
+                                          images_multi[vv * image_n..(vv + 1) * image_n]);
+        }
+    }
+
+    // Windows cropped from the full images, directly and via the renderer
+    const c_windows = [_]CPixelWindow{ .{ .x_start = 3, .y_start = 2, .x_n = 11, .y_n = 7 },
+                                       .{ .x_start = 29, .y_start = 19, .x_n = 1, .y_n = 1 } };
+    var windows_n: usize = 0;
+    for (c_windows) |window| {
+        windows_n += frames.len * fields_n * window.y_n * window.x_n;
+    }
+    var windows_dims = [_]usize{ windows_n };
+    const images_windows = try talloc.alloc(f64, windows_n);
+    var c_images_windows = CNDArrayF{ .elems = images_windows.ptr, 
+                                      .dims = &windows_dims,
+                                      .elems_num = images_windows.len, 
+                                      .dims_num = 1 };
+    for (0..2) |use_renderer| {
+        @memset(images_windows, -1.0);
+        const windows_status = if (use_renderer == 1)
+            rendererRenderWindows(renderer, &c_camera, &c_opts, &frames, 
+                                  frames.len, &c_windows, c_windows.len, 
+                                  &c_images_windows)
+        else
+            renderWindows(&c_coords, &c_connect, &c_fields, &c_camera, &c_opts, 
+                          &frames, frames.len, &c_windows, c_windows.len, 
+                          &c_images_windows);
+        try testing.expectEqual(@intFromEnum(CRenderStatus.ok), windows_status);
+
+        var win_ind: usize = 0;
+        for (c_windows) |window| {
+            for (0..frames.len) |ii| {
+                for (0..fields_n) |ff| {
+                    for (0..window.y_n) |yy| {
+                        const full_start: usize = ii * image_n 
+                            + (ff * camera.pixels_num[1] + window.y_start + yy) 
+                            * camera.pixels_num[0] + window.x_start;
+                        try testing.expectEqualSlices(f64, 
+                            c_images.elems[full_start..full_start + window.x_n],
+                            images_windows[win_ind..win_ind + window.x_n]);
+                        win_ind += window.x_n;
+                    }
+                }
+            }
+        }
+    }
+
+    // Windows must lie inside the camera image
+    var c_windows_bad = c_windows;
+    c_windows_bad[1].x_start = 30;
+    try testing.expectEqual(@intFromEnum(CRenderStatus.invalid_input),
+                            renderWindows(&c_coords, &c_connect, &c_fields, 
+                                          &c_camera, &c_opts, &frames, frames.len,
+                                          &c_windows_bad, c_windows_bad.len, 
+                                          &c_images_windows));
+
+    // Images must be provided by the caller
+    var c_images_null = c_images;
+    c_images_null.elems = null;
+    try testing.expectEqual(@intFromEnum(CRenderStatus.invalid_input),
+                            renderFrames(&c_coords, &c_connect, &c_fields, 
+                                         &c_camera, &c_opts, &frames, frames.len, 
+                                         &c_images_null));
+
+    // Bad node index is rejected before any rastering
+    table[4] = coord_n;
+    try testing.expectEqual(@intFromEnum(CRenderStatus.invalid_input),
+                            renderFrames(&c_coords, &c_connect, &c_fields, 
+                                         &c_camera, &c_opts, &frames, frames.len, 
+                                         &c_images));
+}
@@ -0,0 +1,198 @@
+import numpy as np
+import pytest
+from scipy.spatial.transform import Rotation
+import pyvale.sensorsim as sens
+import zigraster.cyth.zraster as zr
+
+
+PIXELS_NUM = (30,20)
+# Half widths of the square mesh, which lies inside the camera view
+SQUARE_HALF = (0.1,0.08)
+
+
+def _quad_mesh(coord_cols: int) -> tuple[np.ndarray,np.ndarray,np.ndarray]:
+    coords = np.array([[0.0,0.0,0.0],
+                       [1.0,0.0,0.0],
+                       [1.0,1.0,0.0],
+                       [0.0,1.0,0.0]])
+    if coord_cols == 4:
+        coords = np.hstack((coords,np.ones((coords.shape[0],1))))
+    connectivity = np.array([[0,1,2],[0,2,3]],dtype=np.int64)
+    fields = np.zeros((coords.shape[0],1,1))
+    return (coords,connectivity,fields)
+
+
+def _square_mesh(time_n: int = 3) -> tuple[np.ndarray,np.ndarray,np.ndarray]:
+    # Field 0 is one everywhere, field 1 is linear in x and y and scaled by
+    # the time step so frames and fields can be told apart
+    (hx,hy) = SQUARE_HALF
+    coords = np.array([[-hx,-hy,0.0],
+                       [hx,-hy,0.0],
+                       [hx,hy,0.0],
+                       [-hx,hy,0.0]])
+    connectivity = np.array([[0,1,2],[0,2,3]],dtype=np.int64)
+    fields = np.empty((coords.shape[0],time_n,2))
+    for tt in range(time_n):
+        fields[:,tt,0] = 1.0
+        fields[:,tt,1] = (tt + 1)*(coords[:,0] + 10.0*coords[:,1])
+    return (coords,connectivity,fields)
+
+
+def _camera(pos_z: float = 100.0,
+            rot_y_deg: float = 0.0) -> sens.CameraData:
+    return sens.CameraData(pixels_num=np.array(PIXELS_NUM),
+                           pixels_size=np.array((5.3e-3,5.3e-3)),
+                           pos_world=np.array((0.0,0.0,pos_z)),
+                           rot_world=Rotation.from_euler("ZYX",
+                                                         (0.0,rot_y_deg,0.0),
+                                                         degrees=True),
+                           roi_cent_world=np.zeros(3),
+                           focal_length=50.0,
+                           sub_samp=2)
+
+
+def _pixel_centres(cam: sens.CameraData) -> tuple[np.ndarray,np.ndarray]:
+    # World x,y at the pixel centres on the z=0 plane for a camera looking
+    # straight down the z axis, image rows run from +y to -y
+    (px_x,px_y) = PIXELS_NUM
+    step_x = cam.image_dims[0]/px_x
+    step_y = cam.image_dims[1]/px_y
+    x_cent = (np.arange(px_x) + 0.5 - px_x/2)*step_x
+    y_cent = (px_y/2 - np.arange(px_y) - 0.5)*step_y
+    return (x_cent,y_cent)
+
+
+def test_mesh_to_np_accepts_homogeneous_coords() -> None:
+    (coords3,connect,fields) = _quad_mesh(3)
+    (coords4,_,_) = _quad_mesh(4)
+
+    (coords3_np,_,_) = zr._mesh_to_np(coords3,connect,fields)
+    (coords4_np,_,_) = zr._mesh_to_np(coords4,connect,fields)
+
+    assert coords4_np.shape == (3,coords4.shape[0])
+    assert coords4_np.flags.c_contiguous
+    np.testing.assert_array_equal(coords4_np,coords3_np)
+
+
+def test_mesh_to_np_rejects_narrow_coords() -> None:
+    (coords,connect,fields) = _quad_mesh(3)
+    with pytest.raises(ValueError):
+        zr._mesh_to_np(coords[:,:2],connect,fields)
+
+
+def test_mesh_to_np_uses_uint32_connectivity_in_place() -> None:
+    (coords,connect,fields) = _quad_mesh(3)
+    connect_u32 = connect.astype(np.uint32)
+
+    (_,connect_np,_) = zr._mesh_to_np(coords,connect_u32,fields)
+    (_,connect_conv,_) = zr._mesh_to_np(coords,connect,fields)
+
+    assert np.shares_memory(connect_np,connect_u32)
+    assert connect_conv.dtype == np.uint32
+    np.testing.assert_array_equal(connect_conv,connect)
+
+
+def test_mesh_to_np_rejects_wrapping_connectivity() -> None:
+    (coords,connect,fields) = _quad_mesh(3)
+    connect[0,0] = 2**32
+    with pytest.raises(ValueError):
+        zr._mesh_to_np(coords,connect,fields)
+
+
+def test_render_matches_reference() -> None:
+    (coords,connect,fields) = _square_mesh()
+    cam = _camera()
+
+    images = zr.render(coords,connect,fields,cam)
+
+    assert images.shape == (fields.shape[1],2,PIXELS_NUM[1],PIXELS_NUM[0])
+    assert np.all(np.isfinite(images))
+
+    # Pixels wholly inside the square are fully covered, pixels wholly
+    # outside it are background
+    (x_cent,y_cent) = _pixel_centres(cam)
+    step_x = cam.image_dims[0]/PIXELS_NUM[0]
+    step_y = cam.image_dims[1]/PIXELS_NUM[1]
+    (hx,hy) = SQUARE_HALF
+    inside = ((np.abs(y_cent) + step_y/2 < hy)[:,None]
+              & (np.abs(x_cent) + step_x/2 < hx)[None,:])
+    outside = ((np.abs(y_cent) - step_y/2 > hy)[:,None]
+               | (np.abs(x_cent) - step_x/2 > hx)[None,:])
+
+    for tt in range(fields.shape[1]):
+        assert np.all(images[tt,:,outside] == 0.0)
+        assert np.all(images[tt,0,inside] > 0.0)
+
+        # The rastered field is weighted by the sub-pixel depth, which is the
+        # same for both fields on this flat mesh, so the ratio to the unit
+        # field is the linear field at the pixel centre
+        field_ref = (tt + 1)*(x_cent[None,:] + 10.0*y_cent[:,None])
+        np.testing.assert_allclose(images[tt,1,inside]/images[tt,0,inside],
+                                   field_ref[inside],
+                                   rtol=1e-12,atol=1e-12)
+
+
+def test_render_accepts_out_and_homogeneous_coords() -> None:
+    (coords,connect,fields) = _square_mesh()
+    cam = _camera()
+    images = zr.render(coords,connect,fields,cam)
+
+    coords4 = np.hstack((coords,np.ones((coords.shape[0],1))))
+    out = np.zeros_like(images)
+    images_out = zr.render(coords4,connect.astype(np.uint32),fields,cam,
+                           out=out,threads_n=2)
+
+    assert images_out is out
+    np.testing.assert_array_equal(out,images)
+
+
+def test_renderer_matches_render() -> None:
+    (coords,connect,fields) = _square_mesh()
+    cams = (_camera(),_camera(pos_z=90.0,rot_y_deg=1.0))
+
+    with zr.Renderer(coords,connect,fields) as renderer:
+        for cam in cams:
+            images = zr.render(coords,connect,fields,cam)
+            assert np.all(np.isfinite(images))
+            np.testing.assert_array_equal(renderer.render(cam),images)
+            np.testing.assert_array_equal(renderer.render(cam,frames=[2,0]),
+                                          images[[2,0]])
+
+    assert renderer.closed
+
+
+def test_render_multi_camera_matches_render() -> None:
+    (coords,connect,fields) = _square_mesh()
+    cams = [_camera(),_camera(pos_z=90.0,rot_y_deg=1.0)]
+    frame = 1
+    images_ref = np.stack([zr.render(coords,connect,fields,cam,frames=[frame])[0]
+                           for cam in cams])
+
+    images = zr.render_multi_camera(coords,connect,fields,cams,frame=frame,
+                                    threads_n=2)
+    np.testing.assert_array_equal(images,images_ref)
+
+    with zr.Renderer(coords,connect,fields) as renderer:
+        np.testing.assert_array_equal(
+            renderer.render_multi_camera(cams,frame=frame),images_ref)
+
+
+def test_render_windows_matches_crop() -> None:
+    (coords,connect,fields) = _square_mesh()
+    cam = _camera()
+    images_full = zr.render(coords,connect,fields,cam)
+    # (x_start,y_start,x_num,y_num), including windows on the square edge
+    # and in the image corner
+    windows = [(0,0,PIXELS_NUM[0],PIXELS_NUM[1]),
+               (3,4,7,5),
+               (12,8,6,4),
+               (PIXELS_NUM[0]-1,PIXELS_NUM[1]-1,1,1)]
+
+    images = zr.render_windows(coords,connect,fields,cam,windows,threads_n=2)
+    with zr.Renderer(coords,connect,fields) as renderer:
+        images_res = renderer.render_windows(cam,windows,frames=[1])
+
+    for (image,image_res,(x0,y0,x_n,y_n)) in zip(images,images_res,windows):
+        crop = images_full[:,:,y0:y0+y_n,x0:x0+x_n]
+        np.testing.assert_array_equal(image,crop)
+        np.testing.assert_array_equal(image_res,crop[[1]])